@@ -5,6 +5,7 @@ from mysql.connector import Error as MySQLError # Renombrar Error de mysql para
 import os
 from dotenv import load_dotenv
 import logging
+import threading
 from typing import Optional
 
 # Configurar logging
@@ -32,12 +33,17 @@ POOL_NAME = "inventory_pool"
 POOL_SIZE = 5
 
 cnx_pool: Optional[pooling.MySQLConnectionPool] = None
+_pool_lock = threading.Lock() # El pool se crea en un hilo de arranque; evita crearlo dos veces
 
 def create_connection_pool():
     """Crea e inicializa el pool de conexiones si no existe."""
-    global cnx_pool
     if cnx_pool is not None: return
+    with _pool_lock:
+        if cnx_pool is not None: return # Otro hilo lo creó mientras esperábamos
+        _create_connection_pool()
 
+def _create_connection_pool():
+    global cnx_pool
     if not all([DB_CONFIG['database'], DB_CONFIG['user']]):
          logger.critical("Faltan variables de entorno críticas para la BD (DB_NAME, DB_USER).")
          # Usar la excepción definida aquí
@@ -84,6 +90,25 @@ def get_database_connection():
         logger.error(f"Error inesperado al obtener conexión del pool: {ex}")
         raise ConnectionError(f"Error inesperado al obtener conexión: {ex}") from ex
 
+def discard_connection(connection) -> None:
+    """
+    Devuelve al pool una conexión cortando antes el socket (p. ej. con un resultado sin buffer a medio leer):
+    el pool la reconecta al volver a entregarla, en vez de leer del servidor todo lo pendiente.
+    """
+    # Conexión real dentro de la del pool: atributo privado de PooledMySQLConnection, sin API pública
+    cnx = getattr(connection, "_cnx", None)
+    if cnx is None:
+        logger.warning(f"Conexión descartada sin '_cnx' ({type(connection).__name__}): vuelve al pool sin cortar el socket")
+    else:
+        try:
+            cnx.disconnect()
+        except MySQLError as e:
+            logger.warning(f"Error al cortar una conexión descartada: {e}")
+    try:
+        connection.close() # Libera su puesto en el pool aunque ya no esté conectada
+    except MySQLError:
+        pass # Sin sesión que reiniciar: el pool ya la recuperó
+
 def test_connection():
     """Prueba obtener una conexión del pool."""
     connection = None
@@ -26,9 +26,6 @@ logger = logging.getLogger(__name__) # Logger para este módulo (main)
 try:
     # Asume que estos módulos están directamente bajo el directorio raíz o en src
     from src.view import principal
-    # Asume que database.py está en el directorio raíz
-    # Importar la excepción personalizada definida en database.py
-    from database import create_connection_pool, ConnectionError as DBConnectionError
 except ImportError as ie:
      # Usar el logger configurado
      logger.critical(f"Error de importación crítico: {ie}. Asegúrate que la estructura de carpetas es correcta (ej. src/, database.py) y ejecutas desde la carpeta raíz del proyecto.", exc_info=True)
@@ -64,28 +61,11 @@ def run_app():
     logger.info("  Iniciando Sistema de Inventario Tahona ")
     logger.info("=========================================")
 
-    # 1. Inicializar Pool de Base de Datos
-    try:
-        logger.info("Inicializando pool de conexiones a la base de datos...")
-        create_connection_pool() # Llama a la función de database.py
-        logger.info("Pool de conexiones inicializado correctamente.")
-    # Capturar la excepción específica definida en database.py
-    except DBConnectionError as ce:
-        logger.critical(f"Fallo CRÍTICO al inicializar pool de BD: {ce}")
-        # Usar tk importado para el messagebox
-        root = tk.Tk(); root.withdraw()
-        messagebox.showerror("Error Crítico de BD", f"No se pudo conectar a la base de datos:\n{ce}\n\nVerifica la configuración (.env) y el servidor de base de datos.\nLa aplicación se cerrará.")
-        root.destroy()
-        sys.exit(1) # Salir si no hay conexión a BD
-    except Exception as e_pool:
-        # Capturar cualquier otro error durante la inicialización del pool
-        logger.critical(f"Error inesperado al inicializar pool de BD: {e_pool}", exc_info=True)
-        root = tk.Tk(); root.withdraw()
-        messagebox.showerror("Error Crítico", f"Error inesperado al conectar a la BD:\n{e_pool}\nLa aplicación se cerrará.")
-        root.destroy()
-        sys.exit(1)
+    # La conexión a la BD (pool + conexión de prueba) ya no bloquea aquí: la ventana
+    # principal se muestra enseguida y conecta y carga los datos en segundo plano.
+    # Si la BD no responde, es la propia ventana la que avisa y se cierra.
 
-    # 2. Lanzar la interfaz principal
+    # Lanzar la interfaz principal
     try:
         logger.info("Lanzando interfaz gráfica principal...")
         # Llama a la función main() dentro del módulo src.view.principal
@@ -0,0 +1,16 @@
+-- sql/001_cambios_productos.sql
+-- Marca de cambio por producto y registro de eliminaciones.
+-- Necesario para la réplica local (sincronización incremental por deltas).
+
+ALTER TABLE productos
+    ADD COLUMN actualizado_en TIMESTAMP(6) NOT NULL
+        DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    ADD INDEX idx_productos_actualizado_en (actualizado_en);
+
+-- Una fila por producto eliminado; ProductoDao.delete la escribe en la misma transacción.
+CREATE TABLE IF NOT EXISTS productos_eliminados (
+    id_productos INT NOT NULL,
+    eliminado_en TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    PRIMARY KEY (id_productos, eliminado_en),
+    INDEX idx_productos_eliminados_en (eliminado_en)
+);
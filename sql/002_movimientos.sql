@@ -0,0 +1,42 @@
+-- sql/002_movimientos.sql
+-- Libro de movimientos de stock (kardex) y cierres periódicos.
+-- productos.cantidad sigue siendo el stock actual; cada cambio deja además una fila aquí,
+-- escrita en la misma transacción (ProductoDao). Solo se inserta: nunca se actualiza ni se borra.
+
+CREATE TABLE IF NOT EXISTS movimientos (
+    id_movimiento BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    id_productos INT NOT NULL,              -- Sin FK: la historia sobrevive al producto
+    tipo ENUM('alta', 'venta', 'compra', 'ajuste', 'traspaso', 'baja') NOT NULL,
+    cantidad INT NOT NULL,                  -- Con signo: las ventas y bajas restan
+    referencia VARCHAR(100) NULL,           -- N.º de ticket, albarán, 'conteo', 'importación'...
+    creado_en TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_movimientos_producto (id_productos, creado_en),
+    INDEX idx_movimientos_creado_en (creado_en)
+);
+
+-- Cierre = stock de cada producto al instante 'hasta' (movimientos con creado_en < hasta).
+-- Cada cierre se calcula desde el anterior más los movimientos intermedios, así que una consulta
+-- histórica lee un cierre y la cola de movimientos posterior, no el libro entero.
+CREATE TABLE IF NOT EXISTS cierres_stock (
+    id_cierre INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    hasta TIMESTAMP(6) NOT NULL,
+    creado_en TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    UNIQUE INDEX idx_cierres_stock_hasta (hasta)
+);
+
+CREATE TABLE IF NOT EXISTS cierres_stock_detalle (
+    id_cierre INT NOT NULL,
+    id_productos INT NOT NULL,
+    cantidad INT NOT NULL,                  -- Solo productos con stock distinto de 0
+    PRIMARY KEY (id_cierre, id_productos),
+    CONSTRAINT fk_cierres_detalle_cierre FOREIGN KEY (id_cierre) REFERENCES cierres_stock (id_cierre) ON DELETE CASCADE
+);
+
+-- Saldo de apertura: el stock actual de cada producto como primer movimiento.
+-- Las consultas de stock a fechas anteriores a esta migración no tienen historia (devuelven 0).
+-- Solo la primera vez: repetir el script duplicaría el stock histórico de cada producto.
+INSERT INTO movimientos (id_productos, tipo, cantidad, referencia)
+SELECT id_productos, 'alta', cantidad, 'saldo inicial'
+FROM productos
+WHERE cantidad <> 0
+  AND NOT EXISTS (SELECT 1 FROM movimientos WHERE referencia = 'saldo inicial');
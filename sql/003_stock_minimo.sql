@@ -0,0 +1,10 @@
+-- sql/003_stock_minimo.sql
+-- Umbrales de reposición para las alertas de stock bajo.
+-- Un producto está bajo mínimo si cantidad <= su stock_minimo o, si no tiene, el de su categoría.
+-- NULL en ambos = sin alerta.
+
+ALTER TABLE productos
+    ADD COLUMN stock_minimo INT NULL; -- Cambiarlo actualiza actualizado_en: las réplicas lo reciben por delta
+
+ALTER TABLE categorias
+    ADD COLUMN stock_minimo INT NULL;
@@ -0,0 +1,20 @@
+-- sql/004_resumen_categorias.sql
+-- Totales por categoría mantenidos al día por ProductoDao, en la misma transacción que cada escritura
+-- (altas, modificaciones y cambios de categoría, bajas, ajustes, ventas, conteos, importaciones).
+-- Los paneles leen una fila por categoría en lugar de agregar todo el catálogo.
+-- Comprobar / reconstruir:  python -m src.cli resumen [--reconstruir]
+
+CREATE TABLE IF NOT EXISTS resumen_categorias (
+    id_categoria INT NOT NULL PRIMARY KEY,  -- Sin FK: CategoriaDao.delete pasa sus totales a la categoría 1
+    productos INT NOT NULL DEFAULT 0,
+    unidades BIGINT NOT NULL DEFAULT 0,
+    valor DECIMAL(20, 4) NOT NULL DEFAULT 0, -- SUM(cantidad * valor_unidad)
+    sin_stock INT NOT NULL DEFAULT 0,        -- Productos con cantidad 0
+    actualizado_en TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+);
+
+-- Carga inicial desde el catálogo actual
+INSERT INTO resumen_categorias (id_categoria, productos, unidades, valor, sin_stock)
+SELECT id_categoria, COUNT(*), SUM(cantidad), SUM(cantidad * valor_unidad), SUM(cantidad = 0)
+FROM productos
+GROUP BY id_categoria;
@@ -0,0 +1,17 @@
+-- sql/005_auditoria.sql
+-- Registro de auditoría: quién cambió qué producto o categoría, con los valores antes y después.
+-- Lo escribe por lotes un hilo en segundo plano (src/model/auditoria.py), no la transacción del cambio:
+-- creado_en es la hora del cambio en el puesto que lo hizo, no la de la escritura del lote.
+
+CREATE TABLE IF NOT EXISTS auditoria (
+    id_auditoria BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    entidad ENUM('producto', 'categoria') NOT NULL,
+    id_entidad INT NULL,                    -- NULL en operaciones masivas (importación: un registro resumen)
+    accion VARCHAR(20) NOT NULL,            -- alta, modificacion, baja, umbral, conteo, importacion, venta, compra...
+    antes JSON NULL,                        -- Campos antes del cambio (NULL en altas o si no se conocían)
+    despues JSON NULL,                      -- Campos después del cambio (NULL en bajas)
+    usuario VARCHAR(100) NOT NULL,          -- INVENTARIO_USUARIO, usuario@equipo o el TPV (cabecera X-Usuario)
+    creado_en TIMESTAMP(6) NOT NULL,
+    INDEX idx_auditoria_entidad (entidad, id_entidad, creado_en),
+    INDEX idx_auditoria_creado_en (creado_en)
+);
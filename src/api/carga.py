@@ -0,0 +1,111 @@
+# src/api/carga.py
+# Prueba de carga del servicio HTTP (src/api/servidor.py): N clientes concurrentes repiten una mezcla
+# de peticiones durante unos segundos y se informa de peticiones/s y latencias p50/p95/p99.
+#
+#   python -m src.api.carga http://127.0.0.1:8080 [--clientes 16] [--segundos 10] [--etag] [--ventas 1001,1002]
+#
+# Conviene lanzarla contra una BD local de pruebas (nunca la de producción: --ventas descuenta stock)
+# y con el servicio en la misma máquina, para medir el servicio y no la red. Sin MySQL, contra el
+# servicio en modo simulado (python -m src.api.servidor --simulado): mide el servicio sin la BD.
+import http.client
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+RUTAS_LECTURA = ("/productos", "/productos?buscar=pan", "/categorias")
+
+
+class Medicion:
+    """Latencias y códigos de estado acumulados por todos los clientes."""
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencias: List[float] = [] # Segundos
+        self.estados: Counter = Counter()
+        self.errores: Counter = Counter() # Fallos de conexión (sin respuesta HTTP)
+
+    def anotar(self, latencia: float, estado: int) -> None:
+        with self._lock:
+            self.latencias.append(latencia); self.estados[estado] += 1
+
+    def anotar_error(self, error: Exception) -> None:
+        with self._lock:
+            self.errores[type(error).__name__] += 1
+
+    def percentil(self, p: float) -> float:
+        """Percentil por rango más cercano (llamar con la prueba terminada)."""
+        if not self.latencias: return 0.0
+        ordenadas = sorted(self.latencias)
+        return ordenadas[min(len(ordenadas) - 1, max(0, int(round(p / 100 * len(ordenadas))) - 1))]
+
+
+def _cliente(base: str, peticiones: List[Tuple[str, str, Optional[bytes]]], fin: float,
+             medicion: Medicion, usar_etag: bool) -> None:
+    url = urlsplit(base)
+    etags: Dict[str, str] = {}
+    i = 0
+    while time.perf_counter() < fin:
+        metodo, ruta, cuerpo = peticiones[i % len(peticiones)]; i += 1
+        cabeceras = {"Content-Type": "application/json"} if cuerpo else {}
+        if usar_etag and ruta in etags: cabeceras["If-None-Match"] = etags[ruta]
+        # Una conexión por petición, como la atiende el servicio (HTTP/1.0)
+        conexion = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        inicio = time.perf_counter()
+        try:
+            conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            medicion.anotar(time.perf_counter() - inicio, respuesta.status)
+            if usar_etag and respuesta.getheader("ETag"): etags[ruta] = respuesta.getheader("ETag")
+        except (OSError, http.client.HTTPException) as e:
+            medicion.anotar_error(e)
+        finally:
+            conexion.close()
+
+
+def ejecutar(base: str, clientes: int = 16, segundos: float = 10.0, usar_etag: bool = False,
+             ids_venta: Optional[List[int]] = None) -> Tuple[Medicion, float]:
+    """Lanza la prueba y devuelve (medición, duración real en segundos)."""
+    peticiones: List[Tuple[str, str, Optional[bytes]]] = [("GET", ruta, None) for ruta in RUTAS_LECTURA]
+    if ids_venta:
+        peticiones.append(("POST", "/productos/lote", json.dumps({"ids": ids_venta}).encode()))
+        # Una unidad de cada producto por venta: ejercita los bloqueos de fila entre TPV concurrentes
+        venta = {"lineas": [{"id_productos": i, "cantidad": 1} for i in ids_venta]}
+        peticiones.append(("POST", "/ventas", json.dumps(venta).encode()))
+    medicion = Medicion()
+    inicio = time.perf_counter()
+    fin = inicio + segundos
+    hilos = [threading.Thread(target=_cliente, args=(base, peticiones[n % len(peticiones):] + peticiones[:n % len(peticiones)],
+                                                     fin, medicion, usar_etag), daemon=True)
+             for n in range(clientes)] # Cada cliente empieza la mezcla en un punto distinto
+    for hilo in hilos: hilo.start()
+    for hilo in hilos: hilo.join()
+    return medicion, time.perf_counter() - inicio
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio HTTP del inventario.")
+    parser.add_argument("url", help="URL base del servicio, p. ej. http://127.0.0.1:8080")
+    parser.add_argument("--clientes", type=int, default=16, help="Clientes concurrentes (por defecto 16)")
+    parser.add_argument("--segundos", type=float, default=10.0, help="Duración de la prueba (por defecto 10)")
+    parser.add_argument("--etag", action="store_true", help="Reenviar el ETag recibido (If-None-Match) como un TPV con caché")
+    parser.add_argument("--ventas", help="IDs separados por coma: añade lecturas en lote y ventas de esos productos")
+    args = parser.parse_args(argv)
+
+    ids_venta = [int(i) for i in args.ventas.split(",")] if args.ventas else None
+    medicion, duracion = ejecutar(args.url.rstrip("/"), args.clientes, args.segundos, args.etag, ids_venta)
+    total = len(medicion.latencias)
+    print(f"{total} peticiones en {duracion:.1f} s con {args.clientes} clientes: {total / duracion:,.0f} peticiones/s")
+    print(f"Latencia p50 {medicion.percentil(50) * 1000:.1f} ms · p95 {medicion.percentil(95) * 1000:.1f} ms · "
+          f"p99 {medicion.percentil(99) * 1000:.1f} ms")
+    print("Estados: " + ", ".join(f"{estado}: {n}" for estado, n in sorted(medicion.estados.items())))
+    if medicion.errores:
+        print("Errores de conexión: " + ", ".join(f"{tipo}: {n}" for tipo, n in medicion.errores.items()))
+    return 0 if total and not medicion.errores else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
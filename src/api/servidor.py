@@ -0,0 +1,424 @@
+# src/api/servidor.py
+# Servicio HTTP/JSON local para los TPV y la tienda web (solo biblioteca estándar).
+# Expone las operaciones de ProductoController / CategoriaController:
+#
+#   GET    /salud
+#   GET    /categorias                       (ETag / If-None-Match)
+#   GET    /categorias/{id}
+#   GET    /productos?buscar=&categoria=&aproximada=1   (ETag / If-None-Match)
+#   GET    /productos/{id}
+#   POST   /productos                        {"id_productos", "nombre", "cantidad", "valor_unidad", "id_categoria"}
+#   PUT    /productos/{id}                   mismo cuerpo + "actualizado_en" leído (409 si otro lo cambió)
+#   DELETE /productos/{id}?actualizado_en=
+#   POST   /productos/lote                   {"ids": [...]}                                  lectura en bloque
+#   POST   /productos/ajustes                {"ajustes": [{"id_productos", "delta"}, ...], "tipo", "referencia"}  todo o nada
+#   POST   /ventas                           {"lineas": [{"id_productos", "cantidad"}, ...], "referencia"}        todo o nada
+#   GET    /productos/{id}/movimientos?desde=&hasta=    historial (kardex) con el saldo tras cada movimiento
+#   GET    /stock?fecha=&producto=                      stock a una fecha pasada
+#   GET    /productos/bajo-minimo?categoria=            productos en o por debajo de su stock mínimo (ETag)
+#   GET    /resumen                                     totales por categoría (productos, unidades, valor, sin stock)
+#   GET    /productos/{id}/auditoria?limite=            quién cambió el producto y cómo (también /categorias/{id}/auditoria)
+#
+# Los cambios quedan en la auditoría a nombre de la cabecera X-Usuario (o "api@<ip del cliente>").
+#
+# Uso:  python -m src.api.servidor [--host 127.0.0.1] [--puerto 8080] [--simulado [--productos N]]
+# Prueba de carga:  python -m src.api.carga http://127.0.0.1:8080
+# Con --simulado los DAO trabajan sobre un almacén en memoria (src/api/simulado.py): sin MySQL.
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import database
+from database import create_connection_pool, ConnectionError as DBConnectionError
+
+# Controladores y modelo
+# Asegúrate que src.controller.* y src.model.* están accesibles
+from src.controller.producto import ProductoController
+from src.controller.categoria import CategoriaController
+from src.controller.movimiento import MovimientoController
+from src.controller.auditoria import AuditoriaController
+from src.model.producto import Producto, Categoria, DatabaseError, StaleDataError
+from src.model.replica import create_replica, get_replica, close_replica
+from src.model.auditoria import como_usuario, close_auditoria
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+MAX_CUERPO = 1024 * 1024 # Bytes; un cuerpo mayor se rechaza (413) sin leerlo
+MAX_LOTE = 1000          # Elementos por petición en los endpoints de lote
+TIMEOUT_SOCKET = 10      # Segundos: un cliente lento no retiene un hilo indefinidamente
+_ARRANQUE = format(int(time.time()), "x") # Parte de los ETag de la réplica: cambian al reiniciar el servicio
+
+
+class ErrorAPI(Exception):
+    """Error con código HTTP explícito (404, 400 por cuerpo mal formado, etc.)."""
+    def __init__(self, estado: HTTPStatus, mensaje: str) -> None:
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+# --- Serialización ---
+
+def _producto(p: Producto) -> Dict[str, Any]:
+    return {"id_productos": p.id_productos, "nombre": p.nombre, "cantidad": p.cantidad, "valor_unidad": p.valor_unidad,
+            "id_categoria": p.id_categoria, "categoria": p.nombre_categoria,
+            "actualizado_en": p.actualizado_en.isoformat(sep=" ") if p.actualizado_en else None,
+            "stock_minimo": p.stock_minimo}
+
+def _categoria(c: Categoria) -> Dict[str, Any]:
+    return {"id_categoria": c.id_categoria, "nombre": c.nombre, "descripcion": c.descripcion, "stock_minimo": c.stock_minimo}
+
+def _marca(valor: Optional[str]) -> Optional[datetime]:
+    """Fecha ISO 8601 (actualizado_en tal como se entregó en una lectura, con microsegundos, o un filtro)."""
+    if not valor: return None
+    try:
+        return datetime.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise ErrorAPI(HTTPStatus.BAD_REQUEST, f"Fecha inválida: '{valor}' (use AAAA-MM-DD[ HH:MM:SS])")
+
+def _entero(valor: Any, campo: str) -> int:
+    if isinstance(valor, bool) or not isinstance(valor, int):
+        raise ErrorAPI(HTTPStatus.BAD_REQUEST, f"'{campo}' debe ser un número entero")
+    return valor
+
+def _lista(cuerpo: Any, campo: str) -> List[Any]:
+    valores = cuerpo.get(campo) if isinstance(cuerpo, dict) else None
+    if not isinstance(valores, list) or not valores:
+        raise ErrorAPI(HTTPStatus.BAD_REQUEST, f"Se esperaba una lista no vacía en '{campo}'")
+    if len(valores) > MAX_LOTE:
+        raise ErrorAPI(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Como máximo {MAX_LOTE} elementos por lote")
+    return valores
+
+def _objetos(cuerpo: Any, campo: str) -> List[Dict[str, Any]]:
+    valores = _lista(cuerpo, campo)
+    if not all(isinstance(v, dict) for v in valores):
+        raise ErrorAPI(HTTPStatus.BAD_REQUEST, f"Los elementos de '{campo}' deben ser objetos")
+    return valores
+
+
+# --- Endpoints ---
+# Cada uno recibe (parámetros de la ruta, consulta, cuerpo JSON) y devuelve el objeto a serializar
+# o (estado, objeto). Los errores de dominio se traducen a HTTP en ManejadorAPI._despachar.
+
+Consulta = Dict[str, List[str]]
+
+def _salud(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    replica = get_replica()
+    return {"estado": "ok", "replica": replica is not None, "productos_en_replica": len(replica) if replica else None}
+
+def _listar_categorias(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    return [_categoria(c) for c in CategoriaController.get_all()]
+
+def _obtener_categoria(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    categoria = CategoriaController.get_one(int(ruta[0]))
+    if categoria is None: raise ErrorAPI(HTTPStatus.NOT_FOUND, f"No existe la categoría {ruta[0]}")
+    return _categoria(categoria)
+
+def _listar_productos(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    termino = consulta.get("buscar", [None])[0]
+    categoria = consulta.get("categoria", [""])[0]
+    id_categoria = int(categoria) if categoria.isdigit() else None
+    if termino and consulta.get("aproximada", ["0"])[0] == "1":
+        productos = ProductoController.fuzzy_search(termino, id_categoria)
+    else:
+        productos = ProductoController.search_products(termino, id_categoria)
+    return [_producto(p) for p in productos]
+
+def _resumen(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    return [{"id_categoria": g["id_categoria"], "categoria": g["nombre_categoria"], "productos": int(g["productos"]),
+             "unidades": int(g["unidades"]), "valor": float(g["valor"]), "sin_stock": int(g["sin_stock"])}
+            for g in ProductoController.get_stats()]
+
+def _auditoria(entidad: str) -> "Endpoint":
+    def endpoint(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+        limite = consulta.get("limite", ["100"])[0]
+        registros = AuditoriaController.history(entidad, int(ruta[0]), int(limite) if limite.isdigit() else 100)
+        return [{"accion": r.accion, "antes": r.antes, "despues": r.despues, "usuario": r.usuario,
+                 "creado_en": r.creado_en.isoformat(sep=" ")} for r in registros]
+    return endpoint
+
+def _bajo_minimo(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    categoria = consulta.get("categoria", [""])[0]
+    return [_producto(p) for p in ProductoController.low_stock(int(categoria) if categoria.isdigit() else None)]
+
+def _obtener_producto(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    producto = ProductoController.get_one(int(ruta[0]))
+    if producto is None: raise ErrorAPI(HTTPStatus.NOT_FOUND, f"No existe el producto {ruta[0]}")
+    return _producto(producto)
+
+def _crear_producto(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    if not isinstance(cuerpo, dict): raise ErrorAPI(HTTPStatus.BAD_REQUEST, "Se esperaba un objeto JSON")
+    id_producto = _entero(cuerpo.get("id_productos"), "id_productos")
+    ProductoController.new(id_producto, cuerpo.get("nombre"), cuerpo.get("cantidad"), cuerpo.get("valor_unidad"),
+                           cuerpo.get("id_categoria") or 1)
+    return HTTPStatus.CREATED, _producto(ProductoController.get_one(id_producto))
+
+def _modificar_producto(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    if not isinstance(cuerpo, dict): raise ErrorAPI(HTTPStatus.BAD_REQUEST, "Se esperaba un objeto JSON")
+    id_original = int(ruta[0])
+    nuevo_id = _entero(cuerpo.get("id_productos", id_original), "id_productos")
+    ProductoController.modify(id_original, nuevo_id, cuerpo.get("nombre"), cuerpo.get("cantidad"),
+                              cuerpo.get("valor_unidad"), cuerpo.get("id_categoria") or 1,
+                              actualizado_en=_marca(cuerpo.get("actualizado_en")))
+    return _producto(ProductoController.get_one(nuevo_id))
+
+def _eliminar_producto(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    ProductoController.delete(int(ruta[0]), actualizado_en=_marca(consulta.get("actualizado_en", [None])[0]))
+    return HTTPStatus.NO_CONTENT, None
+
+def _leer_lote(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    ids = [_entero(i, "ids") for i in _lista(cuerpo, "ids")]
+    productos = ProductoController.get_many(ids)
+    return {"productos": [_producto(productos[i]) for i in ids if i in productos],
+            "no_encontrados": [i for i in ids if i not in productos]}
+
+def _referencia(cuerpo: Dict[str, Any]) -> Optional[str]:
+    referencia = cuerpo.get("referencia")
+    if referencia is not None and (not isinstance(referencia, str) or len(referencia) > 100):
+        raise ErrorAPI(HTTPStatus.BAD_REQUEST, "'referencia' debe ser un texto de hasta 100 caracteres")
+    return referencia
+
+def _ajustar(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    ajustes = [(_entero(a.get("id_productos"), "id_productos"), _entero(a.get("delta"), "delta"))
+               for a in _objetos(cuerpo, "ajustes")]
+    tipo = cuerpo.get("tipo", "ajuste")
+    if tipo not in ("compra", "ajuste", "traspaso"):
+        raise ErrorAPI(HTTPStatus.BAD_REQUEST, "'tipo' debe ser compra, ajuste o traspaso (las ventas van a /ventas)")
+    return {"productos": [_producto(p) for p in ProductoController.apply_deltas(ajustes, tipo, _referencia(cuerpo))]}
+
+def _vender(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    lineas = [(_entero(l.get("id_productos"), "id_productos"), _entero(l.get("cantidad"), "cantidad"))
+              for l in _objetos(cuerpo, "lineas")]
+    if any(cantidad <= 0 for _, cantidad in lineas):
+        raise ErrorAPI(HTTPStatus.BAD_REQUEST, "La cantidad vendida debe ser positiva")
+    ventas = [(i, -c) for i, c in lineas]
+    return {"productos": [_producto(p) for p in ProductoController.apply_deltas(ventas, "venta", _referencia(cuerpo))]}
+
+def _movimientos(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    saldo_inicial, historial = MovimientoController.kardex(int(ruta[0]), _marca(consulta.get("desde", [None])[0]),
+                                                           _marca(consulta.get("hasta", [None])[0]))
+    return {"saldo_inicial": saldo_inicial,
+            "movimientos": [{"id_movimiento": m.id_movimiento, "tipo": m.tipo, "cantidad": m.cantidad,
+                             "referencia": m.referencia, "creado_en": m.creado_en.isoformat(sep=" "), "saldo": saldo}
+                            for m, saldo in historial]}
+
+def _stock_en(ruta: Tuple[str, ...], consulta: Consulta, cuerpo: Any) -> Any:
+    fecha = _marca(consulta.get("fecha", [None])[0])
+    if fecha is None: raise ErrorAPI(HTTPStatus.BAD_REQUEST, "Falta el parámetro 'fecha'")
+    producto = consulta.get("producto", [""])[0]
+    stock = MovimientoController.stock_at(fecha, int(producto) if producto.isdigit() else None)
+    return {"fecha": fecha.isoformat(sep=" "), "stock": [{"id_productos": i, "cantidad": c} for i, c in sorted(stock.items())]}
+
+
+Endpoint = Callable[[Tuple[str, ...], Consulta, Any], Any]
+
+# (método, patrón, función, admite ETag)
+RUTAS: List[Tuple[str, "re.Pattern[str]", Endpoint, bool]] = [
+    ("GET", re.compile(r"/salud"), _salud, False),
+    ("GET", re.compile(r"/categorias"), _listar_categorias, True),
+    ("GET", re.compile(r"/categorias/(\d+)"), _obtener_categoria, False),
+    ("GET", re.compile(r"/productos"), _listar_productos, True),
+    ("GET", re.compile(r"/productos/(\d+)"), _obtener_producto, False),
+    ("POST", re.compile(r"/productos"), _crear_producto, False),
+    ("PUT", re.compile(r"/productos/(\d+)"), _modificar_producto, False),
+    ("DELETE", re.compile(r"/productos/(\d+)"), _eliminar_producto, False),
+    ("POST", re.compile(r"/productos/lote"), _leer_lote, False),
+    ("POST", re.compile(r"/productos/ajustes"), _ajustar, False),
+    ("POST", re.compile(r"/ventas"), _vender, False),
+    ("GET", re.compile(r"/productos/(\d+)/movimientos"), _movimientos, False),
+    ("GET", re.compile(r"/stock"), _stock_en, False),
+    ("GET", re.compile(r"/productos/bajo-minimo"), _bajo_minimo, True),
+    ("GET", re.compile(r"/resumen"), _resumen, False),
+    ("GET", re.compile(r"/productos/(\d+)/auditoria"), _auditoria("producto"), False),
+    ("GET", re.compile(r"/categorias/(\d+)/auditoria"), _auditoria("categoria"), False),
+]
+
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    """
+    Una petición por conexión (HTTP/1.0): con keep-alive cada cliente ocuparía uno de los pocos
+    hilos mientras la conexión siga abierta, aunque no pida nada.
+    """
+    server_version = "InventarioTahona/1.0"
+    timeout = TIMEOUT_SOCKET
+
+    def do_GET(self) -> None: self._despachar("GET")
+    def do_POST(self) -> None: self._despachar("POST")
+    def do_PUT(self) -> None: self._despachar("PUT")
+    def do_DELETE(self) -> None: self._despachar("DELETE")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def _buscar_ruta(self, metodo: str, camino: str) -> Tuple[Endpoint, Tuple[str, ...], bool]:
+        encontrada = False
+        for metodo_ruta, patron, funcion, etag in RUTAS:
+            coincidencia = patron.fullmatch(camino)
+            if coincidencia is None: continue
+            if metodo_ruta == metodo: return funcion, coincidencia.groups(), etag
+            encontrada = True
+        if encontrada: raise ErrorAPI(HTTPStatus.METHOD_NOT_ALLOWED, f"Método {metodo} no admitido en {camino}")
+        raise ErrorAPI(HTTPStatus.NOT_FOUND, f"Ruta desconocida: {camino}")
+
+    def _leer_cuerpo(self) -> Any:
+        largo = int(self.headers.get("Content-Length") or 0)
+        if largo > MAX_CUERPO: raise ErrorAPI(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Cuerpo demasiado grande")
+        if not largo: return None
+        try:
+            return json.loads(self.rfile.read(largo))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ErrorAPI(HTTPStatus.BAD_REQUEST, f"JSON inválido: {e}")
+
+    def _despachar(self, metodo: str) -> None:
+        url = urlsplit(self.path)
+        camino = url.path.rstrip("/") or "/"
+        etag: Optional[str] = None
+        try:
+            funcion, ruta, admite_etag = self._buscar_ruta(metodo, camino)
+            replica = get_replica()
+            if admite_etag and replica is not None:
+                # Con réplica, la versión identifica el contenido: un 304 no recorre ni serializa nada.
+                # (Se lee ANTES de calcular: si cambia entretanto, el cliente solo pierde un 304.)
+                etag = f'"r{_ARRANQUE}-{replica.version}"'
+                if self._coincide(etag):
+                    self._responder(HTTPStatus.NOT_MODIFIED, None, etag); return
+            with como_usuario(self.headers.get("X-Usuario") or f"api@{self.client_address[0]}"):
+                resultado = funcion(ruta, parse_qs(url.query), self._leer_cuerpo())
+            estado, objeto = resultado if isinstance(resultado, tuple) else (HTTPStatus.OK, resultado)
+            cuerpo = None if objeto is None else json.dumps(objeto, ensure_ascii=False).encode("utf-8")
+            if admite_etag and etag is None and cuerpo is not None:
+                # Sin réplica: el ETag es un resumen del cuerpo; ahorra la transferencia, no la consulta
+                etag = '"' + hashlib.blake2b(cuerpo, digest_size=12).hexdigest() + '"'
+                if self._coincide(etag):
+                    self._responder(HTTPStatus.NOT_MODIFIED, None, etag); return
+            self._responder(estado, cuerpo, etag)
+        except ErrorAPI as e:
+            self._error(e.estado, str(e))
+        except StaleDataError as e:
+            self._error(HTTPStatus.CONFLICT, str(e))
+        except ValueError as e:
+            # Los controladores envuelven los errores inesperados (también los de conexión) en ValueError:
+            # sin BD o con el pool agotado es un 503 (el TPV reintenta), no una petición mal formada
+            if isinstance(e.__cause__, DBConnectionError): self._sin_bd(metodo, camino, e.__cause__)
+            else: self._error(HTTPStatus.BAD_REQUEST, str(e))
+        except DBConnectionError as e:
+            self._sin_bd(metodo, camino, e)
+        except DatabaseError as e:
+            self._error(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+        except Exception as e:
+            logger.error(f"API: error inesperado en {metodo} {camino}: {e}", exc_info=True)
+            self._error(HTTPStatus.INTERNAL_SERVER_ERROR, "Error inesperado")
+
+    def _sin_bd(self, metodo: str, camino: str, error: Exception) -> None:
+        logger.error(f"API: sin conexión a la BD en {metodo} {camino}: {error}")
+        self._error(HTTPStatus.SERVICE_UNAVAILABLE, "Base de datos no disponible")
+
+    def _coincide(self, etag: str) -> bool:
+        pedidas = self.headers.get("If-None-Match")
+        return pedidas is not None and (pedidas.strip() == "*" or etag in [e.strip() for e in pedidas.split(",")])
+
+    def _responder(self, estado: HTTPStatus, cuerpo: Optional[bytes], etag: Optional[str] = None) -> None:
+        self.send_response(estado)
+        if etag: self.send_header("ETag", etag)
+        if cuerpo is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        if cuerpo is not None and self.command != "HEAD":
+            self.wfile.write(cuerpo)
+
+    def _error(self, estado: HTTPStatus, mensaje: str) -> None:
+        self._responder(estado, json.dumps({"error": mensaje}, ensure_ascii=False).encode("utf-8"))
+
+
+class ServidorInventario(HTTPServer):
+    """
+    HTTPServer que atiende las conexiones en un ThreadPoolExecutor de tamaño fijo (no un hilo por
+    conexión): cada petición usa como mucho una conexión del pool de la BD a la vez, y el pool de
+    mysql.connector falla en lugar de esperar cuando se agota. Las conexiones que llegan con todos
+    los hilos ocupados esperan en la cola del ejecutor.
+    """
+    request_queue_size = 128 # Cola de escucha del socket (ráfagas de TPV al abrir)
+
+    def __init__(self, direccion: Tuple[str, int], hilos: int) -> None:
+        super().__init__(direccion, ManejadorAPI)
+        self.hilos = hilos
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="api")
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        self._executor.submit(self._atender, request, client_address)
+
+    def _atender(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def hilos_por_defecto(con_replica: bool) -> int:
+    """
+    Tantos hilos como conexiones tiene el pool, menos la del escritor de auditoría y, si la réplica
+    sondea la BD en paralelo, la suya.
+    """
+    return max(1, database.POOL_SIZE - 1 - (1 if con_replica else 0))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Arranca el servicio hasta Ctrl+C."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON del inventario para TPV y tienda web.")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"), help="Interfaz de escucha (por defecto 127.0.0.1)")
+    parser.add_argument("--puerto", type=int, default=int(os.getenv("API_PUERTO", "8080")), help="Puerto (por defecto 8080)")
+    parser.add_argument("--hilos", type=int, help="Hilos de atención (por defecto, según el pool de la BD)")
+    parser.add_argument("--simulado", action="store_true", help="Sin BD: almacén en memoria para pruebas de carga")
+    parser.add_argument("--productos", type=int, default=20000, help="Productos del almacén simulado (por defecto 20000)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - [%(name)s] - %(message)s')
+    if args.simulado:
+        from src.api.simulado import activar
+        activar(args.productos)
+    else:
+        try:
+            create_connection_pool()
+        except DBConnectionError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    # Réplica local (se desactiva con INVENTARIO_REPLICA=0): las lecturas no van a la BD.
+    # Sin instantánea en disco: la de la aplicación de escritorio es de ese proceso.
+    if os.getenv("INVENTARIO_REPLICA", "1") != "0":
+        try:
+            create_replica(intervalo_sondeo=float(os.getenv("REPLICA_INTERVALO", "15")))
+        except Exception as e:
+            logger.warning(f"Réplica local no disponible, se consultará la BD: {e}")
+    hilos = args.hilos or hilos_por_defecto(get_replica() is not None)
+    servidor = ServidorInventario((args.host, args.puerto), hilos)
+    logger.info(f"API escuchando en http://{args.host}:{args.puerto} ({hilos} hilos)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        close_replica()
+        close_auditoria() # Escribir lo que quede en la cola
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
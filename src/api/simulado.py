@@ -0,0 +1,149 @@
+# src/api/simulado.py
+# Almacén en memoria que sustituye a los DAO para medir el servicio HTTP sin MySQL:
+#
+#   python -m src.api.servidor --simulado [--productos 20000]
+#   python -m src.api.carga http://127.0.0.1:8080 --ventas 1,2,3
+#
+# Cubre lo que usa la prueba de carga (src/api/carga.py) y la réplica: categorías, lecturas, búsqueda,
+# lotes, ventas/ajustes (todo o nada), bajo mínimo, resumen y auditoría. El resto de operaciones siguen
+# yendo a la BD real y, sin pool configurado, responden 503. No guarda nada al terminar.
+import logging
+import random
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.model.producto import Producto, ProductoDao, Categoria, CategoriaDao, TIPOS_MOVIMIENTO
+from src.model.resumen import ResumenDao
+from src.model.auditoria import AuditoriaDao, RegistroAuditoria
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+CATEGORIAS = ("Sin Categoría", "Panes", "Bollería", "Pastelería", "Harinas", "Azúcares", "Lácteos", "Bebidas")
+PALABRAS = ("pan", "barra", "integral", "centeno", "croissant", "magdalena", "tarta", "harina", "azúcar",
+            "moreno", "leche", "nata", "café", "zumo", "hogaza", "chapata", "ensaimada", "empanada")
+
+
+class AlmacenSimulado:
+    """
+    Productos y categorías en diccionarios, con las mismas reglas que los DAO a los que sustituye.
+    Cada cambio crea un Producto nuevo con marca nueva (la réplica guarda los objetos que recibe).
+    """
+    def __init__(self, productos: int = 20000, semilla: int = 1) -> None:
+        rng = random.Random(semilla)
+        self._lock = threading.Lock()
+        ahora = datetime.now()
+        self.categorias: Dict[int, Categoria] = {
+            i: Categoria(i, nombre, stock_minimo=None if i == 1 else 5) for i, nombre in enumerate(CATEGORIAS, start=1)}
+        self.productos: Dict[int, Producto] = {}
+        for i in range(1, productos + 1):
+            nombre = " ".join(rng.sample(PALABRAS, rng.randint(1, 3))).capitalize() + f" {i}"
+            id_categoria = rng.randint(1, len(CATEGORIAS))
+            self.productos[i] = Producto(i, nombre, rng.randint(0, 500), round(rng.uniform(0.2, 30), 2), id_categoria,
+                                         self.categorias[id_categoria].nombre, ahora)
+        self.auditoria: List[RegistroAuditoria] = []
+
+    # --- CategoriaDao ---
+
+    def leer_categorias(self) -> List[Categoria]:
+        return sorted(self.categorias.values(), key=lambda c: c.nombre)
+
+    def leer_categoria(self, id_categoria: int) -> Optional[Categoria]:
+        return self.categorias.get(id_categoria)
+
+    # --- ProductoDao ---
+
+    def leer_cambios(self, desde: Optional[datetime]) -> Tuple[List[Producto], List[int], datetime]:
+        with self._lock:
+            ahora = datetime.now()
+            productos = [p for p in self.productos.values() if desde is None or p.actualizado_en >= desde]
+            return productos, [], ahora
+
+    def leer_uno(self, id_productos: int) -> Optional[Producto]:
+        return self.productos.get(id_productos)
+
+    def leer_varios(self, ids: List[int], tamano_lote: int = 1000) -> Dict[int, Producto]:
+        return {i: self.productos[i] for i in ids if i in self.productos}
+
+    def buscar(self, search_term: Optional[str] = None, category_id: Optional[int] = None) -> List[Producto]:
+        termino = search_term.casefold() if search_term else None # LIKE '%...%' con collation sin mayúsculas
+        with self._lock:
+            return [p for i, p in sorted(self.productos.items())
+                    if (termino is None or termino in p.nombre.casefold())
+                    and (category_id is None or p.id_categoria == category_id)]
+
+    def sumar_cantidades(self, deltas: Dict[int, int], tipo: str = "ajuste", referencia: Optional[str] = None) -> List[Producto]:
+        """Como ProductoDao.add_quantities: si un producto no existe o quedaría negativo no se aplica ninguno."""
+        if not deltas: return []
+        if tipo not in TIPOS_MOVIMIENTO: raise ValueError(f"Tipo de movimiento no válido: '{tipo}'")
+        ids = sorted(deltas)
+        with self._lock:
+            faltan = [i for i in ids if i not in self.productos]
+            insuficientes = [f"ID {i} (hay {self.productos[i].cantidad}, ajuste {deltas[i]:+d})"
+                             for i in ids if i in self.productos and self.productos[i].cantidad + deltas[i] < 0]
+            if faltan or insuficientes:
+                motivos = []
+                if faltan: motivos.append(f"no existen los productos {', '.join(map(str, faltan))}")
+                if insuficientes: motivos.append(f"stock insuficiente: {'; '.join(insuficientes)}")
+                raise ValueError("No se aplicó ningún ajuste: " + " y ".join(motivos))
+            marca = datetime.now()
+            for i in ids:
+                p = self.productos[i]
+                self.productos[i] = Producto(i, p.nombre, p.cantidad + deltas[i], p.valor_unidad, p.id_categoria,
+                                             p.nombre_categoria, marca, p.stock_minimo)
+            return [self.productos[i] for i in ids]
+
+    def bajo_minimo(self, category_id: Optional[int] = None) -> List[Producto]:
+        with self._lock:
+            return [p for i, p in sorted(self.productos.items())
+                    if (category_id is None or p.id_categoria == category_id)
+                    and self._umbral(p) is not None and p.cantidad <= self._umbral(p)]
+
+    def _umbral(self, producto: Producto) -> Optional[int]:
+        if producto.stock_minimo is not None: return producto.stock_minimo
+        categoria = self.categorias.get(producto.id_categoria)
+        return categoria.stock_minimo if categoria else None
+
+    # --- ResumenDao ---
+
+    def resumen(self) -> List[Dict[str, Any]]:
+        grupos: Dict[int, Dict[str, Any]] = {}
+        with self._lock:
+            for p in self.productos.values():
+                g = grupos.setdefault(p.id_categoria, {"id_categoria": p.id_categoria, "nombre_categoria": p.nombre_categoria,
+                                                       "productos": 0, "unidades": 0, "valor": 0.0, "sin_stock": 0})
+                g["productos"] += 1; g["unidades"] += p.cantidad
+                g["valor"] += p.cantidad * p.valor_unidad; g["sin_stock"] += p.cantidad == 0
+        return sorted(grupos.values(), key=lambda g: g["nombre_categoria"] or "")
+
+    # --- AuditoriaDao ---
+
+    def escribir_auditoria(self, registros: List[RegistroAuditoria]) -> None:
+        with self._lock:
+            self.auditoria.extend(registros)
+
+    def leer_auditoria(self, entidad: str, id_entidad: int, limite: int = 100) -> List[RegistroAuditoria]:
+        with self._lock:
+            registros = [r for r in self.auditoria if r.entidad == entidad and r.id_entidad == id_entidad]
+        return registros[::-1][:limite]
+
+
+def activar(productos: int = 20000) -> AlmacenSimulado:
+    """Sustituye los métodos de los DAO por los del almacén en memoria (para todo el proceso)."""
+    almacen = AlmacenSimulado(productos)
+    for clase, metodo, funcion in (
+            (CategoriaDao, "read_all", almacen.leer_categorias),
+            (CategoriaDao, "read_one", almacen.leer_categoria),
+            (ProductoDao, "read_changes_since", almacen.leer_cambios),
+            (ProductoDao, "read_one", almacen.leer_uno),
+            (ProductoDao, "read_many", almacen.leer_varios),
+            (ProductoDao, "search", almacen.buscar),
+            (ProductoDao, "add_quantities", almacen.sumar_cantidades),
+            (ProductoDao, "read_low_stock", almacen.bajo_minimo),
+            (ResumenDao, "read_all", almacen.resumen),
+            (AuditoriaDao, "create_many", almacen.escribir_auditoria),
+            (AuditoriaDao, "read_by_entity", almacen.leer_auditoria)):
+        setattr(clase, metodo, staticmethod(funcion))
+    logger.info(f"Modo simulado: {len(almacen.productos)} productos y {len(almacen.categorias)} categorías en memoria, sin BD.")
+    return almacen
@@ -0,0 +1,313 @@
+# src/controller/ajustes.py
+# Cola de ajustes rápidos de stock (+1 / -1 en el mostrador) con escritura diferida.
+#
+# Cada pulsación solo suma su delta en memoria (por id_productos) y vuelve: la interfaz no espera a
+# la BD. Un hilo escritor junta lo acumulado durante VENTANA segundos y lo escribe en UNA transacción
+# (ProductoDao.add_quantities: cantidad = cantidad + delta, con su movimiento en el libro), así diez
+# pulsaciones seguidas sobre el mismo producto son una sola fila actualizada.
+#
+# Lectura de lo propio: pendiente()/pendientes() devuelven lo aún no confirmado (acumulado y en vuelo)
+# para que la tabla muestre cantidad + pendiente mientras tanto.
+#
+# Durabilidad (opcional): con un diario local cada pulsación se anota (y se sincroniza a disco) antes
+# de aceptarla. Cada lote se anota con su referencia antes de escribirlo y se cierra después; al
+# arrancar se reponen las pulsaciones sin escribir y, para un lote que quedó a medias, se consulta en
+# el libro de movimientos qué productos ya llevan esa referencia: nada se pierde ni se aplica dos veces.
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# Asume que src.model.* está accesible
+from src.model.producto import Producto, ProductoDao
+from src.model.movimiento import MovimientoDao
+from src.controller.producto import ProductoController
+from src.utils.eventos import publicar, ProductoActualizado
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+VENTANA = 0.5          # Segundos que se acumulan pulsaciones antes de escribir
+ESPERA_REINTENTO = 5.0 # Tras un fallo de BD, antes de reintentar lo acumulado
+MARGEN_RELOJ = timedelta(days=1) # Al recuperar: la hora del diario es la del equipo, no la de la BD
+TIPO = "ajuste"        # Tipo de movimiento en el libro
+PREFIJO_REFERENCIA = "mostrador"
+
+# Aviso al terminar cada lote: productos escritos y errores (producto inexistente, stock insuficiente)
+AlConfirmar = Callable[[List[Producto], List[str]], None]
+
+
+def ruta_diario() -> Optional[str]:
+    """Ruta del diario: INVENTARIO_DIARIO_AJUSTES o ~/.inventario_tahona.ajustes; '0' lo desactiva."""
+    ruta = os.getenv("INVENTARIO_DIARIO_AJUSTES")
+    if ruta == "0": return None
+    return ruta or os.path.join(os.path.expanduser("~"), ".inventario_tahona.ajustes")
+
+
+class DiarioAjustes:
+    """
+    Archivo de líneas JSON, solo se añade: {"t": "d", "id", "d"} por pulsación, {"t": "lote", "ref", "en"}
+    al tomar lo acumulado y {"t": "fin", "ref", "resto"} al terminarlo ('resto': lo que vuelve a acumularse).
+    Se vacía cuando no queda nada pendiente.
+    """
+    def __init__(self, ruta: str, sincronizar: bool = True) -> None:
+        self.ruta = ruta
+        self.sincronizar = sincronizar # fsync por línea: sobrevive a un corte de luz, no solo a un cierre del proceso
+        self._archivo = None
+
+    def leer(self) -> Tuple[Dict[int, int], Dict[str, Tuple[Dict[int, int], datetime]]]:
+        """
+        Repasa el diario: (acumulado sin tomar, {ref: (deltas, hora)} de los lotes sin cerrar).
+        Una última línea cortada (caída a mitad de escritura) se ignora.
+        """
+        acumulado: Dict[int, int] = {}
+        lotes: Dict[str, Tuple[Dict[int, int], datetime]] = {}
+        if not os.path.exists(self.ruta): return acumulado, lotes
+        with open(self.ruta, "r", encoding="utf-8") as f:
+            for n, linea in enumerate(f, 1):
+                try:
+                    registro = json.loads(linea)
+                    tipo = registro["t"]
+                    if tipo == "d":
+                        _sumar(acumulado, {int(registro["id"]): int(registro["d"])})
+                    elif tipo == "lote": # El escritor tomó todo lo acumulado hasta aquí
+                        lotes[registro["ref"]] = (acumulado, datetime.fromisoformat(registro["en"]))
+                        acumulado = {}
+                    elif tipo == "fin":
+                        lotes.pop(registro["ref"], None)
+                        _sumar(acumulado, {int(i): int(d) for i, d in registro.get("resto", {}).items()})
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"Diario de ajustes {self.ruta}: línea {n} ilegible, se ignora: {e}")
+        return acumulado, lotes
+
+    def reescribir(self, acumulado: Dict[int, int]) -> None:
+        """Deja en el diario solo 'acumulado' (una línea por producto), de forma atómica."""
+        self.cerrar()
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            for id_producto, delta in sorted(acumulado.items()):
+                if delta: f.write(json.dumps({"t": "d", "id": id_producto, "d": delta}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta)
+
+    def anotar(self, id_producto: int, delta: int) -> None:
+        self._escribir({"t": "d", "id": id_producto, "d": delta})
+
+    def lote(self, referencia: str) -> None:
+        self._escribir({"t": "lote", "ref": referencia, "en": datetime.now().isoformat()})
+
+    def fin(self, referencia: str, resto: Dict[int, int]) -> None:
+        self._escribir({"t": "fin", "ref": referencia, "resto": {str(i): d for i, d in resto.items() if d}})
+
+    def vaciar(self) -> None:
+        """Nada pendiente: el diario vuelve a empezar."""
+        if self._archivo is None: return
+        self._archivo.seek(0)
+        self._archivo.truncate()
+        self._archivo.flush()
+
+    def _escribir(self, registro: dict) -> None:
+        if self._archivo is None:
+            self._archivo = open(self.ruta, "a", encoding="utf-8")
+        self._archivo.write(json.dumps(registro) + "\n")
+        self._archivo.flush()
+        if self.sincronizar: os.fsync(self._archivo.fileno())
+
+    def cerrar(self) -> None:
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+
+def _sumar(destino: Dict[int, int], deltas: Dict[int, int]) -> None:
+    for id_producto, delta in deltas.items():
+        destino[id_producto] = destino.get(id_producto, 0) + delta
+
+
+class ColaAjustes:
+    """
+    Deltas por producto pendientes de escribir y el hilo que los escribe por lotes.
+    'despachar' recibe cada aviso para la interfaz (la vista pasa una cola que lee desde el hilo de Tk);
+    por defecto se ejecutan en el hilo escritor.
+    """
+    def __init__(self, ventana: float = VENTANA, diario: Optional[str] = None, sincronizar: bool = True,
+                 despachar: Optional[Callable[[Callable[[], None]], None]] = None,
+                 al_confirmar: Optional[AlConfirmar] = None) -> None:
+        self.ventana = ventana
+        self._despachar = despachar or (lambda aviso: aviso())
+        self.al_confirmar = al_confirmar
+        self._lock = threading.Condition()
+        self._pendientes: Dict[int, int] = {} # Acumulado desde el último lote
+        self._en_vuelo: Dict[int, int] = {}   # Lote que se está escribiendo
+        self._desde: Optional[float] = None   # Primera pulsación del acumulado (time.monotonic)
+        self._detener = False
+        self.escritos = 0 # Lotes escritos
+        self.pulsaciones = 0
+        self._diario = DiarioAjustes(diario, sincronizar) if diario else None
+        if self._diario is not None:
+            self._recuperar()
+        self._hilo = threading.Thread(target=self._bucle, name="ajustes", daemon=True)
+        self._hilo.start()
+
+    def _recuperar(self) -> None:
+        """Repone lo que el diario tenga sin escribir (consulta la BD si un lote quedó a medias)."""
+        acumulado, lotes = self._diario.leer()
+        for referencia, (deltas, en) in lotes.items():
+            ya_escritos: Set[int] = MovimientoDao.read_ids_by_reference(referencia, en - MARGEN_RELOJ)
+            resto = {i: d for i, d in deltas.items() if i not in ya_escritos}
+            logger.info(f"Ajustes: lote {referencia} sin cerrar, {len(deltas) - len(resto)} productos ya escritos, "
+                        f"{len(resto)} se reponen.")
+            _sumar(acumulado, resto)
+        self._diario.reescribir(acumulado)
+        self._pendientes = {i: d for i, d in acumulado.items() if d}
+        if self._pendientes:
+            self._desde = time.monotonic()
+            logger.info(f"Ajustes: {len(self._pendientes)} productos con ajustes recuperados del diario {self._diario.ruta}.")
+
+    # --- Desde la interfaz ---
+
+    def sumar(self, id_producto: int, delta: int) -> int:
+        """Acumula un ajuste (no toca la BD). Devuelve lo pendiente del producto tras sumarlo."""
+        with self._lock:
+            if self._detener: raise ValueError("La cola de ajustes está cerrada.")
+            if delta:
+                if self._diario is not None:
+                    self._diario.anotar(id_producto, delta) # Antes de aceptarlo: lo aceptado sobrevive a una caída
+                self._pendientes[id_producto] = self._pendientes.get(id_producto, 0) + delta
+                self.pulsaciones += 1
+                if self._desde is None:
+                    self._desde = time.monotonic()
+                    self._lock.notify()
+            return self._pendientes.get(id_producto, 0) + self._en_vuelo.get(id_producto, 0)
+
+    def pendiente(self, id_producto: int) -> int:
+        """Lo que falta por confirmar en la BD para un producto (acumulado más en vuelo)."""
+        with self._lock:
+            return self._pendientes.get(id_producto, 0) + self._en_vuelo.get(id_producto, 0)
+
+    def pendientes(self) -> Dict[int, int]:
+        """Copia de lo pendiente por producto (solo distinto de 0), para superponerlo a las cantidades leídas."""
+        with self._lock:
+            total = dict(self._pendientes)
+            _sumar(total, self._en_vuelo)
+        return {i: d for i, d in total.items() if d}
+
+    # --- Hilo escritor ---
+
+    def _bucle(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pendientes and not self._detener:
+                    self._lock.wait()
+                if not self._pendientes: return # Cerrando y sin nada pendiente
+                # La ventana cuenta desde la primera pulsación: el resto del acumulado viaja en el mismo lote
+                restante = self._desde + self.ventana - time.monotonic()
+                while restante > 0 and not self._detener:
+                    self._lock.wait(restante)
+                    restante = self._desde + self.ventana - time.monotonic()
+                self._en_vuelo, self._pendientes, self._desde = self._pendientes, {}, None
+                lote = {i: d for i, d in self._en_vuelo.items() if d} # +1 y -1 seguidos no llegan a la BD
+                referencia = f"{PREFIJO_REFERENCIA}-{uuid.uuid4().hex[:12]}"
+                if self._diario is not None and lote: self._diario.lote(referencia)
+            productos, errores, resto = self._escribir(referencia, lote)
+            with self._lock:
+                if productos: # Réplica al día antes de soltar el lote: la tabla nunca suma un delta dos veces
+                    ProductoController.register_deltas(productos, lote, TIPO, referencia)
+                _sumar(self._pendientes, resto)
+                if resto and self._desde is None: self._desde = time.monotonic()
+                self._en_vuelo = {}
+                if self._diario is not None:
+                    if lote: self._diario.fin(referencia, resto)
+                    if not self._pendientes: self._diario.vaciar()
+                self.escritos += 1 if productos else 0
+                detener = self._detener
+            if productos or errores:
+                self._despachar(lambda p=productos, e=errores: self._avisar(p, e)) # Sin capturar las variables del bucle
+            if resto: # La BD no responde: se reintenta todo lo acumulado más tarde
+                if detener:
+                    logger.warning(f"Ajustes: {len(resto)} productos sin escribir al cerrar"
+                                   + (", quedan en el diario." if self._diario is not None else ", se pierden."))
+                    return
+                with self._lock:
+                    self._lock.wait(ESPERA_REINTENTO)
+
+    def _escribir(self, referencia: str, lote: Dict[int, int]) -> Tuple[List[Producto], List[str], Dict[int, int]]:
+        """
+        Escribe el lote: (productos escritos, errores, resto sin escribir por fallo de BD).
+        Si algún ajuste no es válido la transacción no aplica ninguno: se reintenta producto a producto
+        para que un +1 a un producto borrado no tumbe los demás (los inválidos se descartan y se avisan).
+        """
+        if not lote: return [], [], {}
+        try:
+            return ProductoDao.add_quantities(lote, TIPO, referencia), [], {}
+        except ValueError as e:
+            logger.warning(f"Ajustes: el lote {referencia} no se pudo aplicar entero, producto a producto: {e}")
+        except Exception as e: # DatabaseError, sin conexión o cualquier otro: el lote se conserva
+            logger.warning(f"Ajustes: no se pudo escribir el lote {referencia} ({len(lote)} productos), se reintentará: {e}")
+            return [], [], lote
+        productos: List[Producto] = []
+        errores: List[str] = []
+        resto: Dict[int, int] = {}
+        for id_producto, delta in sorted(lote.items()):
+            if resto: # La BD dejó de responder: no seguir probando
+                resto[id_producto] = delta
+                continue
+            try:
+                productos += ProductoDao.add_quantities({id_producto: delta}, TIPO, referencia) # Misma referencia: ver _recuperar
+            except ValueError as e:
+                logger.warning(f"Ajustes: descartado el ajuste {delta:+d} al producto {id_producto}: {e}")
+                errores.append(f"Producto {id_producto} ({delta:+d}): {e}")
+            except Exception as e:
+                logger.warning(f"Ajustes: no se pudo escribir el ajuste del producto {id_producto}, se reintentará: {e}")
+                resto[id_producto] = delta
+        return productos, errores, resto
+
+    def _avisar(self, productos: List[Producto], errores: List[str]) -> None:
+        """En el hilo de 'despachar': eventos del bus (la tabla parchea sus filas) y aviso de errores."""
+        for producto in productos:
+            publicar(ProductoActualizado(producto, producto.id_productos))
+        if self.al_confirmar is not None:
+            self.al_confirmar(productos, errores)
+
+    def cerrar(self, espera: float = 10.0) -> None:
+        """Escribe lo pendiente sin esperar la ventana y detiene el hilo (como mucho 'espera' segundos)."""
+        with self._lock:
+            self._detener = True
+            self._lock.notify_all()
+        self._hilo.join(espera)
+        if self._hilo.is_alive():
+            logger.warning(f"Ajustes: el escritor no terminó a tiempo, {len(self.pendientes())} productos pendientes.")
+        elif self._diario is not None:
+            self._diario.cerrar()
+
+
+# --- Instancia global (mismo esquema que la réplica y la auditoría) ---
+
+cola: Optional[ColaAjustes] = None
+_lock_cola = threading.Lock()
+
+def create_cola_ajustes(**opciones) -> ColaAjustes:
+    """Crea la cola si no existe (con el pool de conexiones ya creado: la recuperación del diario consulta la BD)."""
+    global cola
+    if cola is None:
+        with _lock_cola:
+            if cola is None:
+                cola = ColaAjustes(**opciones)
+    return cola
+
+def get_cola_ajustes() -> Optional[ColaAjustes]:
+    return cola
+
+def close_cola_ajustes() -> None:
+    """Escribe lo pendiente y detiene la cola (antes de cerrar la auditoría y el pool)."""
+    global cola
+    with _lock_cola:
+        actual, cola = cola, None
+    if actual is not None:
+        actual.cerrar()
+        logger.info(f"Cola de ajustes cerrada: {actual.pulsaciones} pulsaciones en {actual.escritos} lotes.")
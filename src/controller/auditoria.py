@@ -0,0 +1,31 @@
+# src/controller/auditoria.py
+# Consulta del registro de auditoría (quién cambió qué). La escritura la hacen los demás
+# controladores con src.model.auditoria.registrar, en segundo plano.
+import logging
+from typing import List
+
+# Asegúrate que src.model.* está accesible
+from src.model.auditoria import AuditoriaDao, RegistroAuditoria, get_auditoria
+from src.model.producto import DatabaseError
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+ENTIDADES = ("producto", "categoria")
+
+
+class AuditoriaController:
+    """Controlador para el historial de cambios."""
+
+    @staticmethod
+    def history(entidad: str, id_entidad: int, limite: int = 100) -> List[RegistroAuditoria]:
+        """Últimos cambios de un producto o categoría. Incluye lo que aún estaba en la cola de este proceso."""
+        if entidad not in ENTIDADES:
+            raise ValueError(f"Entidad no válida: '{entidad}' (use {' o '.join(ENTIDADES)})")
+        escritor = get_auditoria()
+        if escritor is not None: escritor.vaciar_ahora() # Que lo recién hecho aquí ya se vea
+        try:
+            return AuditoriaDao.read_by_entity(entidad, id_entidad, limite)
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD al leer la auditoría de {entidad} {id_entidad}: {e}")
+            raise # Relanzar para la vista
@@ -4,6 +4,10 @@ import logging
 # Importar modelo y excepciones
 # Asegúrate que src.model.producto está accesible
 from src.model.producto import Categoria, CategoriaDao, DatabaseError, ProductoDao
+from src.model.replica import get_replica
+from src.model import auditoria
+from src.model.auditoria import valores_categoria
+from src.utils.eventos import publicar, CategoriaCreada, CategoriaActualizada, CategoriaEliminada
 
 # Configuración del logging
 logger = logging.getLogger(__name__)
@@ -15,6 +19,9 @@ class CategoriaController:
     def get_all() -> List[Categoria]:
         """Obtiene todas las categorías."""
         try:
+            # La réplica local (si está cargada) ya tiene las categorías: sin ida y vuelta a la BD
+            replica = get_replica()
+            if replica: return replica.categorias()
             categorias = CategoriaDao.read_all()
             logger.info(f"Controlador: Recuperadas {len(categorias)} categorías")
             return categorias
@@ -51,7 +58,12 @@ class CategoriaController:
             categoria = Categoria(id_categoria=1, nombre=nombre_limpio, descripcion=descripcion)
             # Llamar al DAO
             new_id = CategoriaDao.create(categoria)
+            replica = get_replica()
+            creada = Categoria(new_id, categoria.nombre, categoria.descripcion) if new_id else None
+            if creada: auditoria.registrar("categoria", new_id, "alta", None, valores_categoria(creada)) # Solo encola
+            if replica and creada: replica.aplicar_categoria(creada)
             logger.info(f"Controlador: Categoría '{nombre_limpio}' creada con ID {new_id}.")
+            if creada: publicar(CategoriaCreada(creada))
             return new_id
         except (ValueError, DatabaseError) as e:
             # Errores esperados (nombre vacío, nombre duplicado, error DB)
@@ -62,17 +74,30 @@ class CategoriaController:
             raise ValueError(f"Error inesperado al crear categoría: {e}") from e
 
     @staticmethod
-    def update(id_categoria: int, nombre: str, descripcion: Optional[str] = None) -> None:
-        """Actualiza una categoría existente."""
+    def update(id_categoria: int, nombre: str, descripcion: Optional[str] = None,
+               anterior: Optional[Categoria] = None) -> None:
+        """
+        Actualiza una categoría existente.
+        'anterior' es la categoría tal como se cargó en la vista: si otro usuario la cambió, el DAO rechaza la escritura.
+        """
         try:
             nombre_limpio = nombre.strip() if nombre else ""
             if not nombre_limpio:
                  raise ValueError("El nombre de la categoría no puede estar vacío.")
             # Crear objeto con los datos a actualizar
             categoria = Categoria(id_categoria=id_categoria, nombre=nombre_limpio, descripcion=descripcion)
+            # Nombre anterior para que las vistas sepan qué filas renombrar
+            replica = get_replica()
+            cargada = anterior # Lo que vio el usuario: control de concurrencia en el DAO
+            if anterior is None:
+                anterior = replica.obtener_categoria(id_categoria) if replica else CategoriaDao.read_one(id_categoria)
             # Llamar al DAO (valida si existe y maneja error de nombre duplicado)
-            CategoriaDao.update(categoria)
+            CategoriaDao.update(categoria, anterior=cargada)
+            if anterior is not None: categoria.stock_minimo = anterior.stock_minimo # No se edita aquí (ver set_threshold)
+            auditoria.registrar("categoria", id_categoria, "modificacion", valores_categoria(anterior), valores_categoria(categoria))
+            if replica: replica.aplicar_categoria(categoria)
             logger.info(f"Controlador: Categoría ID {id_categoria} actualizada.")
+            publicar(CategoriaActualizada(categoria, anterior.nombre if anterior else None))
         except (ValueError, DatabaseError) as e:
             logger.warning(f"Controlador: Error al actualizar categoría ID {id_categoria}: {e}")
             raise # Relanzar para la vista
@@ -80,6 +105,26 @@ class CategoriaController:
             logger.error(f"Controlador: Error inesperado al actualizar categoría ID {id_categoria}: {e}", exc_info=True)
             raise ValueError(f"Error inesperado al actualizar categoría: {e}") from e
 
+    @staticmethod
+    def set_threshold(id_categoria: int, stock_minimo: Optional[int]) -> None:
+        """Fija el stock mínimo por defecto de la categoría (None lo quita). Solo afecta a productos sin umbral propio."""
+        if stock_minimo is not None and stock_minimo < 0:
+            raise ValueError("El stock mínimo no puede ser negativo.")
+        try:
+            CategoriaDao.update_threshold(id_categoria, stock_minimo)
+            replica = get_replica()
+            actual = replica.obtener_categoria(id_categoria) if replica else None
+            auditoria.registrar("categoria", id_categoria, "umbral", {"stock_minimo": actual.stock_minimo} if actual else None,
+                                {"stock_minimo": stock_minimo})
+            if replica: replica.fijar_umbral_categoria(id_categoria, stock_minimo)
+            logger.info(f"Controlador: Stock mínimo de la categoría ID {id_categoria} fijado en {stock_minimo}.")
+        except (ValueError, DatabaseError) as e:
+            logger.warning(f"Controlador: Error al fijar el stock mínimo de la categoría ID {id_categoria}: {e}")
+            raise # Relanzar para la vista
+        except Exception as e:
+            logger.error(f"Controlador: Error inesperado al fijar el stock mínimo de la categoría ID {id_categoria}: {e}", exc_info=True)
+            raise ValueError(f"Error inesperado al fijar el stock mínimo: {e}") from e
+
     @staticmethod
     def delete(id_categoria: int) -> None:
         """Elimina una categoría."""
@@ -91,7 +136,13 @@ class CategoriaController:
         try:
             # El DAO maneja la lógica de FK constraint y si la categoría existe
             CategoriaDao.delete(id_categoria)
+            replica = get_replica()
+            # Valores anteriores solo si están en memoria: la baja no paga una lectura más
+            auditoria.registrar("categoria", id_categoria, "baja",
+                                valores_categoria(replica.obtener_categoria(id_categoria)) if replica else None, None)
+            if replica: replica.eliminar_categoria(id_categoria)
             logger.info(f"Controlador: Categoría ID {id_categoria} eliminada.")
+            publicar(CategoriaEliminada(id_categoria, id_destino=1)) # Sus productos pasan a 'Sin Categoría'
         except (ValueError, DatabaseError) as e:
             # Errores esperados: no existe, tiene productos asociados, error DB
             logger.warning(f"Controlador: Error al eliminar categoría ID {id_categoria}: {e}")
@@ -0,0 +1,160 @@
+# src/controller/conteo.py
+# Conciliación de un conteo físico de inventario (archivo id, cantidad contada) con la BD:
+# lectura en bloque de las cantidades actuales, informe de diferencias con su impacto en valor
+# y aplicación de los ajustes aceptados en una sola transacción.
+import csv
+import logging
+from typing import Dict, List, Tuple
+
+# Asegúrate que src.model.producto está accesible
+from src.model.producto import Producto, ProductoDao, DatabaseError
+from src.model.replica import get_replica
+from src.model import auditoria
+from src.utils.eventos import publicar, ProductoActualizado
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+
+class Diferencia:
+    """Una línea del informe: producto cuya cantidad contada no coincide con la registrada."""
+    __slots__ = ("id_productos", "nombre", "valor_unidad", "registrada", "contada", "leido_en", "aceptada")
+
+    def __init__(self, id_productos: int, nombre: str, valor_unidad: float, registrada: int, contada: int, leido_en) -> None:
+        self.id_productos = id_productos
+        self.nombre = nombre
+        self.valor_unidad = valor_unidad
+        self.registrada = registrada
+        self.contada = contada
+        self.leido_en = leido_en # Marca de cambio leída: si el producto cambia antes de aplicar, no se pisa
+        self.aceptada = True
+
+    @property
+    def diferencia(self) -> int:
+        return self.contada - self.registrada
+
+    @property
+    def impacto(self) -> float:
+        """Valor de la diferencia (negativo = faltante)."""
+        return self.diferencia * self.valor_unidad
+
+
+class InformeConteo:
+    """Resultado de comparar un archivo de conteo con la BD."""
+    def __init__(self) -> None:
+        self.diferencias: List[Diferencia] = []
+        self.coincidentes = 0                                   # Productos contados sin diferencia
+        self.desconocidos: List[Tuple[int, int]] = []           # (línea, ID) que no existen en la BD
+        self.invalidas: List[Tuple[int, str]] = []              # (línea, motivo)
+
+    @property
+    def impacto_neto(self) -> float:
+        return sum(d.impacto for d in self.diferencias if d.aceptada)
+
+    @property
+    def impacto_bruto(self) -> float:
+        return sum(abs(d.impacto) for d in self.diferencias if d.aceptada)
+
+
+class ConteoController:
+    """Controlador para la conciliación de conteos físicos."""
+
+    @staticmethod
+    def leer_conteo(ruta: str) -> Tuple[Dict[int, Tuple[int, int]], List[Tuple[int, str]]]:
+        """
+        Lee el archivo de conteo: dos columnas (ID, cantidad contada), separadas por coma, punto y coma
+        o tabulador, con o sin cabecera. Un ID contado en varias líneas (varias estanterías) se suma.
+        Devuelve ({id: (primera línea, cantidad)}, [(línea, motivo) de las líneas inválidas]).
+        """
+        conteo: Dict[int, Tuple[int, int]] = {}
+        invalidas: List[Tuple[int, str]] = []
+        try:
+            with open(ruta, newline="", encoding="utf-8-sig") as archivo:
+                # Separador: el más frecuente en la primera línea (csv.Sniffer falla con solo dos columnas)
+                primera_linea = archivo.readline(); archivo.seek(0)
+                separador = max(",;\t", key=primera_linea.count)
+                lector = csv.reader(archivo, delimiter=separador)
+                for valores in lector:
+                    linea = lector.line_num
+                    if not any(v.strip() for v in valores): continue
+                    if len(valores) < 2:
+                        invalidas.append((linea, "Se esperaban dos columnas: ID y cantidad contada")); continue
+                    id_texto, cantidad_texto = valores[0].strip(), valores[1].strip()
+                    if linea == 1 and not id_texto.isdigit(): continue # Cabecera
+                    if not id_texto.isdigit():
+                        invalidas.append((linea, f"ID inválido: '{id_texto}'")); continue
+                    if not cantidad_texto.isdigit():
+                        invalidas.append((linea, f"Cantidad inválida: '{cantidad_texto}'")); continue
+                    primera, acumulada = conteo.get(int(id_texto), (linea, 0))
+                    conteo[int(id_texto)] = (primera, acumulada + int(cantidad_texto))
+        except OSError as e:
+            raise ValueError(f"No se pudo leer el archivo de conteo {ruta}: {e}") from e
+        return conteo, invalidas
+
+    @staticmethod
+    def comparar(ruta: str) -> InformeConteo:
+        """Compara el conteo con las cantidades actuales (leídas en bloque) y arma el informe de diferencias."""
+        conteo, invalidas = ConteoController.leer_conteo(ruta)
+        informe = InformeConteo()
+        informe.invalidas = invalidas
+        try:
+            productos = ProductoDao.read_many(list(conteo))
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD al leer cantidades para el conteo: {e}")
+            raise # Relanzar para la vista
+        for id_producto, (linea, contada) in conteo.items():
+            producto = productos.get(id_producto)
+            if producto is None:
+                informe.desconocidos.append((linea, id_producto))
+            elif producto.cantidad == contada:
+                informe.coincidentes += 1
+            else:
+                informe.diferencias.append(Diferencia(id_producto, producto.nombre, producto.valor_unidad,
+                                                      producto.cantidad, contada, producto.actualizado_en))
+        logger.info(f"Conteo {ruta}: {len(conteo)} productos contados, {len(informe.diferencias)} con diferencia, "
+                    f"{len(informe.desconocidos)} desconocidos, {len(invalidas)} líneas inválidas.")
+        return informe
+
+    @staticmethod
+    def aplicar(diferencias: List[Diferencia]) -> Tuple[int, List[int], List[Producto]]:
+        """
+        Aplica en una transacción las diferencias aceptadas. Devuelve (aplicadas, IDs en conflicto, productos
+        ajustados ya releídos): los productos modificados desde la comparación se omiten para no pisar ese cambio.
+        Corre en un hilo de trabajo: los eventos los publica avisar() desde el de la interfaz.
+        """
+        aceptadas = [d for d in diferencias if d.aceptada]
+        try:
+            conflictos = ProductoDao.update_quantities([(d.id_productos, d.contada, d.leido_en) for d in aceptadas])
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD al aplicar el conteo: {e}")
+            raise # Relanzar para la vista
+        en_conflicto = set(conflictos)
+        aplicadas = [d.id_productos for d in aceptadas if d.id_productos not in en_conflicto]
+        for d in aceptadas:
+            if d.id_productos not in en_conflicto:
+                auditoria.registrar("producto", d.id_productos, "conteo", {"cantidad": d.registrada}, {"cantidad": d.contada})
+        return len(aplicadas), conflictos, ConteoController._releer(aplicadas)
+
+    @staticmethod
+    def _releer(ids: List[int]) -> List[Producto]:
+        """Productos ajustados con su cantidad y marca nuevas: de la réplica recién sincronizada o de la BD en bloque."""
+        if not ids: return []
+        replica = get_replica()
+        if replica is not None:
+            try:
+                replica.sincronizar() # Que búsquedas y vistas vean las cantidades nuevas sin esperar al próximo sondeo
+                return [p for p in map(replica.obtener, ids) if p is not None]
+            except (DatabaseError, Exception) as e:
+                logger.warning(f"No se pudo sincronizar la réplica tras el conteo: {e}")
+        try:
+            productos = ProductoDao.read_many(ids)
+            return [productos[i] for i in ids if i in productos]
+        except (DatabaseError, Exception) as e: # Ya están escritos: solo falta refrescar la tabla
+            logger.warning(f"No se pudieron releer los productos ajustados por el conteo: {e}")
+            return []
+
+    @staticmethod
+    def avisar(productos: List[Producto]) -> None:
+        """En el hilo de la interfaz: un ProductoActualizado por producto ajustado (la tabla parchea sus filas)."""
+        for producto in productos:
+            publicar(ProductoActualizado(producto, producto.id_productos))
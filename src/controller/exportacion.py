@@ -0,0 +1,138 @@
+# src/controller/exportacion.py
+# Exportación del inventario a CSV o JSON Lines (opcionalmente .gz) con memoria constante:
+# las filas van del cursor sin buffer de la BD directamente al archivo, lote a lote.
+# Uso desde la línea de comandos:  python -m src.controller.exportacion inventario.csv.gz [--buscar pan]
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, IO, List, Optional
+
+# Asegúrate que src.model.producto está accesible
+from src.model.producto import DatabaseError
+from src.controller.producto import ProductoController
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+FORMATOS = ("csv", "jsonl")
+# Mismo orden que las tuplas de ProductoController.iter_products; la cabecera CSV sirve también para importar
+COLUMNAS = ("id_productos", "nombre", "cantidad", "valor_unidad", "id_categoria", "categoria", "actualizado_en", "stock_minimo")
+AVISO_CADA = 10000 # Filas entre avisos de avance
+
+
+class ResultadoExportacion:
+    """Resumen de una exportación; también se entrega como avance."""
+    def __init__(self, ruta: str) -> None:
+        self.ruta = ruta
+        self.filas = 0
+        self._inicio = time.perf_counter()
+        self.segundos = 0.0
+
+    def marcar_tiempo(self) -> None:
+        self.segundos = time.perf_counter() - self._inicio
+
+    @property
+    def filas_por_segundo(self) -> float:
+        return self.filas / self.segundos if self.segundos > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.filas} productos exportados a {self.ruta} en {self.segundos:.1f} s ({self.filas_por_segundo:,.0f} filas/s)"
+
+
+def formato_de(ruta: str) -> str:
+    """Deduce el formato por la extensión (ignorando .gz): .jsonl/.json -> jsonl, el resto csv."""
+    base = ruta[:-3] if ruta.lower().endswith(".gz") else ruta
+    return "jsonl" if base.lower().endswith((".jsonl", ".json")) else "csv"
+
+
+def _abrir(ruta: str, comprimir: bool) -> IO[str]:
+    if comprimir:
+        return io.TextIOWrapper(gzip.open(ruta, "wb", compresslevel=6), encoding="utf-8", newline="")
+    return open(ruta, "w", encoding="utf-8", newline="")
+
+
+def _json(valor):
+    """Valores de la BD que json no serializa por sí solo."""
+    if isinstance(valor, datetime): return valor.isoformat(sep=" ")
+    if isinstance(valor, Decimal): return float(valor)
+    return valor
+
+
+class ExportacionController:
+    """Controlador para la exportación del inventario."""
+
+    @staticmethod
+    def exportar(ruta: str, search_term: Optional[str] = None, category_id: Optional[int] = None,
+                 formato: Optional[str] = None, comprimir: Optional[bool] = None,
+                 on_progress: Optional[Callable[[ResultadoExportacion], None]] = None) -> ResultadoExportacion:
+        """
+        Exporta los productos que cumplen los filtros (mismo criterio que la búsqueda en BD).
+        Formato y compresión se deducen de la extensión si no se indican (.csv, .jsonl, .gz).
+        Se escribe en un temporal y se renombra al terminar: un error no deja un archivo a medias.
+        """
+        formato = formato or formato_de(ruta)
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de exportación no soportado: {formato} (use {' o '.join(FORMATOS)})")
+        comprimir = ruta.lower().endswith(".gz") if comprimir is None else comprimir
+        resultado = ResultadoExportacion(ruta)
+
+        temporal = ruta + ".tmp"
+        try:
+            with _abrir(temporal, comprimir) as salida:
+                if formato == "csv":
+                    escritor = csv.writer(salida)
+                    escritor.writerow(COLUMNAS)
+                    escribir = escritor.writerow
+                else:
+                    def escribir(fila: tuple) -> None:
+                        salida.write(json.dumps(dict(zip(COLUMNAS, map(_json, fila))), ensure_ascii=False))
+                        salida.write("\n")
+                # Los filtros se normalizan en el controlador, igual que en la búsqueda de la tabla
+                for fila in ProductoController.iter_products(search_term, category_id):
+                    escribir(fila)
+                    resultado.filas += 1
+                    if on_progress and resultado.filas % AVISO_CADA == 0:
+                        resultado.marcar_tiempo(); on_progress(resultado)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            raise ValueError(f"No se pudo escribir el archivo {ruta}: {e}") from e
+        finally:
+            if os.path.exists(temporal): os.remove(temporal)
+        resultado.marcar_tiempo()
+        logger.info(f"Exportación (término='{search_term}', categoría={category_id}): {resultado}")
+        return resultado
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Exportación desde la línea de comandos."""
+    import argparse
+    from database import create_connection_pool, ConnectionError as DBConnectionError
+
+    parser = argparse.ArgumentParser(description="Exporta el inventario a CSV o JSON Lines.")
+    parser.add_argument("archivo", help="Destino: .csv, .jsonl (añadir .gz para comprimir)")
+    parser.add_argument("--buscar", help="Solo productos cuyo nombre contiene este texto")
+    parser.add_argument("--categoria", type=int, help="Solo productos de esta categoría (ID)")
+    parser.add_argument("--formato", choices=FORMATOS, help="Forzar el formato (por defecto, según la extensión)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+    def avance(resultado: ResultadoExportacion) -> None:
+        print(f"\r{resultado.filas} filas ({resultado.filas_por_segundo:,.0f} filas/s)", end="", file=sys.stderr, flush=True)
+    try:
+        create_connection_pool()
+        resultado = ExportacionController.exportar(args.archivo, args.buscar, args.categoria, args.formato, on_progress=avance)
+    except (ValueError, DatabaseError, DBConnectionError) as e:
+        print(f"\nError: {e}", file=sys.stderr)
+        return 1
+    print(f"\n{resultado}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+# src/controller/importacion.py
+# Importación de catálogos de proveedor desde CSV.
+#
+# Flujo (memoria acotada, sin importar el tamaño del archivo):
+#   lectura por lotes -> validación en procesos (mismas reglas que Producto.validate_data)
+#   -> escritura por lotes, una transacción por lote -> archivo de rechazos con el motivo por fila.
+# Uso desde la línea de comandos:  python -m src.controller.importacion catalogo.csv [--actualizar]
+import csv
+import multiprocessing
+import os
+import sys
+import time
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+# Asegúrate que src.model.producto está accesible
+from src.model.producto import Producto, ProductoDao, DatabaseError
+from src.model.replica import get_replica
+from src.model import auditoria
+from src.model.auditoria import valores_producto
+from src.controller.categoria import CategoriaController
+from src.utils.indices import normalizar_texto
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+LOTE_VALIDACION = 2000  # Filas por tarea enviada a los procesos de validación
+LOTE_ESCRITURA = 1000   # Filas por transacción (una sentencia INSERT multi-fila)
+PROCESOS_MAX = 4        # Validar es barato: más procesos solo suman costo de envío entre procesos
+ID_SIN_CATEGORIA = 1
+
+# Nombres de columna aceptados (ya normalizados) para cada campo
+COLUMNAS = {
+    "id_productos": ("id_productos", "id_producto", "id"),
+    "nombre": ("nombre",),
+    "cantidad": ("cantidad", "stock"),
+    "valor_unidad": ("valor_unidad", "valor", "precio"),
+    "categoria": ("categoria", "nombre_categoria", "id_categoria"),
+}
+OBLIGATORIAS = ("id_productos", "nombre", "cantidad", "valor_unidad")
+
+Fila = Tuple[int, List[str]] # (línea del archivo, valores tal como vienen)
+
+
+class ResultadoImportacion:
+    """Resumen de una importación; también se entrega como avance tras cada lote escrito."""
+    def __init__(self, ruta_rechazos: str) -> None:
+        self.ruta_rechazos = ruta_rechazos
+        self.leidas = 0
+        self.creadas = 0
+        self.actualizadas = 0
+        self.rechazadas = 0
+        self._inicio = time.perf_counter()
+        self.segundos = 0.0
+
+    def marcar_tiempo(self) -> None:
+        self.segundos = time.perf_counter() - self._inicio
+
+    @property
+    def procesadas(self) -> int:
+        return self.creadas + self.actualizadas + self.rechazadas
+
+    @property
+    def filas_por_segundo(self) -> float:
+        return self.procesadas / self.segundos if self.segundos > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.leidas} filas leídas: {self.creadas} creadas, {self.actualizadas} actualizadas, "
+                f"{self.rechazadas} rechazadas en {self.segundos:.1f} s ({self.filas_por_segundo:,.0f} filas/s)")
+
+
+# --- Validación (corre en los procesos de trabajo: funciones de módulo para poder enviarlas) ---
+
+_categorias_por_nombre: Dict[str, int] = {}
+_ids_categorias: Set[int] = set()
+
+def _iniciar_validador(por_nombre: Dict[str, int], ids: Set[int]) -> None:
+    """Cada proceso recibe una vez el mapa de categorías (no con cada lote)."""
+    global _categorias_por_nombre, _ids_categorias
+    _categorias_por_nombre, _ids_categorias = por_nombre, ids
+
+def _resolver_categoria(valor: str) -> int:
+    valor = valor.strip()
+    if not valor: return ID_SIN_CATEGORIA
+    if valor.isdigit():
+        if int(valor) in _ids_categorias: return int(valor)
+        raise ValueError(f"La categoría con ID {valor} no existe")
+    id_categoria = _categorias_por_nombre.get(normalizar_texto(valor))
+    if id_categoria is None: raise ValueError(f"La categoría '{valor}' no existe")
+    return id_categoria
+
+def _entero(valor: str, campo: str) -> int:
+    try:
+        return int(valor.strip())
+    except ValueError:
+        raise ValueError(f"{campo} debe ser un número entero (se leyó '{valor}')") from None
+
+def _decimal(valor: str, campo: str) -> float:
+    texto = valor.strip()
+    if "," in texto and "." not in texto: texto = texto.replace(",", ".") # Coma decimal
+    try:
+        return float(texto)
+    except ValueError:
+        raise ValueError(f"{campo} debe ser un número (se leyó '{valor}')") from None
+
+def _validar_lote(lote: List[Fila], columnas: Dict[str, int]) -> Tuple[List[Tuple[Fila, Producto]], List[Tuple[Fila, str]]]:
+    """Convierte y valida un lote. Devuelve (productos válidos con su fila, filas rechazadas con el motivo)."""
+    validos: List[Tuple[Fila, Producto]] = []
+    rechazados: List[Tuple[Fila, str]] = []
+    i_cat = columnas.get("categoria")
+    ultima = max(columnas[campo] for campo in OBLIGATORIAS) # La categoría es opcional: puede faltar al final
+    for fila in lote:
+        valores = fila[1]
+        try:
+            if len(valores) <= ultima:
+                raise ValueError("Faltan columnas en la fila")
+            # El constructor aplica Producto.validate_data
+            producto = Producto(
+                id_productos=_entero(valores[columnas["id_productos"]], "El ID"),
+                nombre=valores[columnas["nombre"]],
+                cantidad=_entero(valores[columnas["cantidad"]], "La cantidad"),
+                valor_unidad=_decimal(valores[columnas["valor_unidad"]], "El valor unitario"),
+                id_categoria=_resolver_categoria(valores[i_cat] if i_cat < len(valores) else "")
+                             if i_cat is not None else ID_SIN_CATEGORIA,
+            )
+            validos.append((fila, producto))
+        except ValueError as e:
+            rechazados.append((fila, str(e)))
+    return validos, rechazados
+
+
+# --- Lectura ---
+
+def _mapear_columnas(cabecera: List[str]) -> Dict[str, int]:
+    """Campo -> posición en la fila, según la cabecera del archivo."""
+    posiciones = {normalizar_texto(nombre): i for i, nombre in enumerate(cabecera)}
+    columnas: Dict[str, int] = {}
+    for campo, alias in COLUMNAS.items():
+        for nombre in alias:
+            if nombre in posiciones:
+                columnas[campo] = posiciones[nombre]; break
+    faltan = [campo for campo in OBLIGATORIAS if campo not in columnas]
+    if faltan:
+        raise ValueError(f"Faltan columnas obligatorias en la cabecera: {', '.join(faltan)}")
+    return columnas
+
+def _leer_lotes(lector: "csv.reader", tamano: int) -> Iterator[List[Fila]]:
+    lote: List[Fila] = []
+    for valores in lector:
+        if not any(v.strip() for v in valores): continue # Líneas en blanco
+        lote.append((lector.line_num, valores))
+        if len(lote) >= tamano:
+            yield lote; lote = []
+    if lote: yield lote
+
+
+class ImportacionController:
+    """Controlador para la importación masiva de productos."""
+
+    @staticmethod
+    def importar_csv(ruta: str, ruta_rechazos: Optional[str] = None, actualizar: bool = False,
+                     delimitador: str = ",", procesos: Optional[int] = None,
+                     on_progress: Optional[Callable[[ResultadoImportacion], None]] = None) -> ResultadoImportacion:
+        """
+        Importa los productos del CSV 'ruta' (con cabecera). Las filas inválidas, con ID repetido
+        o (sin 'actualizar') ya existente van a 'ruta_rechazos' con su línea y motivo.
+        Lanza ValueError si el archivo no se puede usar y DatabaseError si falla la BD
+        (los lotes ya confirmados quedan guardados).
+        """
+        ruta_rechazos = ruta_rechazos or os.path.splitext(ruta)[0] + ".rechazos.csv"
+        procesos = procesos or min(PROCESOS_MAX, os.cpu_count() or 1)
+        resultado = ResultadoImportacion(ruta_rechazos)
+
+        # Una sola consulta de categorías para todo el archivo (en memoria si hay réplica)
+        categorias = CategoriaController.get_all()
+        por_nombre = {normalizar_texto(c.nombre): c.id_categoria for c in categorias}
+        ids_categorias = {c.id_categoria for c in categorias}
+
+        try:
+            entrada = open(ruta, newline="", encoding="utf-8-sig")
+        except OSError as e:
+            raise ValueError(f"No se pudo abrir el archivo {ruta}: {e}") from e
+        with entrada:
+            lector = csv.reader(entrada, delimiter=delimitador)
+            cabecera = next(lector, None)
+            if not cabecera: raise ValueError(f"El archivo {ruta} está vacío")
+            columnas = _mapear_columnas(cabecera) # Antes de crear los rechazos: con otra cabecera no queda uno vacío
+            with open(ruta_rechazos, "w", newline="", encoding="utf-8") as salida:
+                rechazos = csv.writer(salida)
+                rechazos.writerow(["linea", "motivo"] + cabecera)
+                pendientes: List[Tuple[Fila, Producto]] = [] # Válidos aún sin escribir (como mucho un lote)
+                vistos: Dict[int, int] = {} # ID -> línea donde apareció por primera vez
+
+                def rechazar(fila: Fila, motivo: str) -> None:
+                    linea, valores = fila
+                    rechazos.writerow([linea, motivo] + valores)
+                    resultado.rechazadas += 1
+
+                def escribir_pendientes() -> None:
+                    lote = pendientes[:LOTE_ESCRITURA]
+                    del pendientes[:LOTE_ESCRITURA]
+                    # IDs repetidos en todo el archivo: se queda el primero (con 'actualizar', uno de un lote
+                    # posterior pisaría al ya escrito y contaría como actualizado)
+                    por_id: Dict[int, Tuple[Fila, Producto]] = {}
+                    for fila, producto in lote:
+                        primera = vistos.setdefault(producto.id_productos, fila[0])
+                        if primera != fila[0]:
+                            rechazar(fila, f"ID {producto.id_productos} repetido en el archivo (línea {primera})")
+                        else:
+                            por_id[producto.id_productos] = (fila, producto)
+                    try:
+                        creadas, anteriores, fallidos = ProductoDao.create_many([p for _, p in por_id.values()], actualizar=actualizar)
+                    except ValueError as e: # Ej. una categoría borrada durante la importación: el lote entero se rechaza
+                        creadas, anteriores, fallidos = 0, [], [(p, str(e)) for _, p in por_id.values()]
+                    for producto, motivo in fallidos:
+                        rechazar(por_id[producto.id_productos][0], motivo)
+                    # Lo que se sobrescribió se audita producto a producto, con el antes y el después
+                    for anterior in anteriores:
+                        producto = por_id[anterior.id_productos][1]
+                        producto.stock_minimo = anterior.stock_minimo # La importación no lo toca
+                        auditoria.registrar("producto", anterior.id_productos, "importacion",
+                                            valores_producto(anterior), valores_producto(producto))
+                    resultado.creadas += creadas; resultado.actualizadas += len(anteriores)
+                    resultado.marcar_tiempo()
+                    if on_progress: on_progress(resultado)
+
+                def recibir(validos: List[Tuple[Fila, Producto]], invalidos: List[Tuple[Fila, str]]) -> None:
+                    for fila, motivo in invalidos:
+                        rechazar(fila, motivo)
+                    pendientes.extend(validos)
+                    while len(pendientes) >= LOTE_ESCRITURA:
+                        escribir_pendientes()
+
+                lotes = _leer_lotes(lector, LOTE_VALIDACION)
+                if procesos <= 1:
+                    _iniciar_validador(por_nombre, ids_categorias)
+                    for lote in lotes:
+                        resultado.leidas += len(lote)
+                        recibir(*_validar_lote(lote, columnas))
+                else:
+                    # Como mucho 2 lotes por proceso en vuelo: la lectura no se adelanta a la escritura
+                    en_vuelo: Deque[Future] = deque()
+                    # 'spawn': la interfaz importa desde un hilo de un proceso con Tk, réplica, auditoría y cola de
+                    # ajustes corriendo; un fork heredaría sus locks (p. ej. los del logging) y podría bloquearse
+                    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_iniciar_validador, initargs=(por_nombre, ids_categorias)) as pool:
+                        for lote in lotes:
+                            resultado.leidas += len(lote)
+                            en_vuelo.append(pool.submit(_validar_lote, lote, columnas))
+                            if len(en_vuelo) >= 2 * procesos:
+                                recibir(*en_vuelo.popleft().result()) # En orden de lectura
+                        while en_vuelo:
+                            recibir(*en_vuelo.popleft().result())
+                while pendientes:
+                    escribir_pendientes()
+
+        resultado.marcar_tiempo()
+        if resultado.rechazadas == 0:
+            os.remove(ruta_rechazos) # Nada que revisar
+        logger.info(f"Importación de {ruta}: {resultado}")
+        if resultado.creadas:
+            # Las altas van en un solo registro por importación (no había un 'antes' que perder):
+            # un catálogo nuevo y grande no llena la cola de auditoría
+            auditoria.registrar("producto", None, "importacion", None,
+                                {"archivo": os.path.basename(ruta), "creados": resultado.creadas,
+                                 "rechazados": resultado.rechazadas})
+        if resultado.creadas or resultado.actualizadas:
+            # Que búsquedas y vistas vean lo importado sin esperar al próximo sondeo
+            replica = get_replica()
+            if replica is not None:
+                try: replica.sincronizar()
+                except (DatabaseError, Exception) as e: logger.warning(f"No se pudo sincronizar la réplica tras importar: {e}")
+        return resultado
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Importación desde la línea de comandos."""
+    import argparse
+    from database import create_connection_pool, ConnectionError as DBConnectionError
+
+    parser = argparse.ArgumentParser(description="Importa un catálogo de productos desde CSV.")
+    parser.add_argument("archivo", help="CSV con cabecera: id_productos, nombre, cantidad, valor_unidad[, categoria]")
+    parser.add_argument("--rechazos", help="Archivo de rechazos (por defecto <archivo>.rechazos.csv)")
+    parser.add_argument("--actualizar", action="store_true", help="Actualizar los productos que ya existen en vez de rechazarlos")
+    parser.add_argument("--delimitador", default=",", help="Separador de columnas (por defecto ',')")
+    parser.add_argument("--procesos", type=int, default=None, help=f"Procesos de validación (por defecto, hasta {PROCESOS_MAX})")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+    def avance(resultado: ResultadoImportacion) -> None:
+        print(f"\r{resultado.procesadas} filas ({resultado.filas_por_segundo:,.0f} filas/s)", end="", file=sys.stderr, flush=True)
+    try:
+        create_connection_pool()
+        resultado = ImportacionController.importar_csv(args.archivo, args.rechazos, args.actualizar,
+                                                        args.delimitador, args.procesos, on_progress=avance)
+    except (ValueError, DatabaseError, DBConnectionError) as e:
+        print(f"\nError: {e}", file=sys.stderr)
+        return 1
+    print(f"\n{resultado}")
+    if resultado.rechazadas:
+        print(f"Rechazos en: {resultado.ruta_rechazos}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
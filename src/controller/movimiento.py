@@ -0,0 +1,56 @@
+# src/controller/movimiento.py
+# Consultas sobre el libro de movimientos de stock (kardex) y cierres periódicos.
+# Los cierres deben crearse con regularidad (p. ej. cada noche desde cron: python -m src.cli cierre)
+# para que el stock a una fecha lea un cierre y una cola corta de movimientos.
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Asegúrate que src.model.* está accesible
+from src.model.movimiento import Movimiento, MovimientoDao
+from src.model.producto import DatabaseError
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+
+class MovimientoController:
+    """Controlador para el historial de stock."""
+
+    @staticmethod
+    def kardex(id_producto: int, desde: Optional[datetime] = None, hasta: Optional[datetime] = None,
+               limite: Optional[int] = None) -> Tuple[int, List[Tuple[Movimiento, int]]]:
+        """
+        Historial de un producto: (saldo al inicio del periodo, [(movimiento, saldo tras él)]).
+        El saldo inicial sale del último cierre anterior a 'desde', sin recorrer el libro entero.
+        """
+        try:
+            saldo = MovimientoDao.stock_at(desde, id_producto).get(id_producto, 0) if desde else 0
+            movimientos = MovimientoDao.read_by_product(id_producto, desde, hasta, limite)
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD al leer el historial del producto {id_producto}: {e}")
+            raise # Relanzar para la vista
+        saldo_inicial = saldo
+        historial = []
+        for movimiento in movimientos:
+            saldo += movimiento.cantidad
+            historial.append((movimiento, saldo))
+        return saldo_inicial, historial
+
+    @staticmethod
+    def stock_at(fecha: datetime, id_producto: Optional[int] = None) -> Dict[int, int]:
+        """Stock de todos los productos (o de uno) a una fecha pasada. Los que tenían 0 no aparecen."""
+        try:
+            return MovimientoDao.stock_at(fecha, id_producto)
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD al calcular el stock al {fecha}: {e}")
+            raise # Relanzar para la vista
+
+    @staticmethod
+    def create_snapshot() -> Optional[Tuple[int, datetime, int]]:
+        """Crea un cierre con los movimientos nuevos. Devuelve (id_cierre, hasta, productos) o None si no había nada."""
+        try:
+            return MovimientoDao.create_snapshot()
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD al crear el cierre de stock: {e}")
+            raise # Relanzar para la vista
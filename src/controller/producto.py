@@ -1,9 +1,16 @@
 # src/controller/producto.py
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime
 import logging
 # Asegurarse que se importa ProductoDao y DatabaseError
 # Asume que src.model.producto está accesible
-from src.model.producto import Producto, ProductoDao, DatabaseError
+from src.model.producto import Producto, ProductoDao, DatabaseError, StaleDataError
+from src.model.replica import get_replica, MARGEN_DELTA
+from src.model.resumen import ResumenDao
+from src.model import auditoria
+from src.model.auditoria import valores_producto
+from src.utils.eventos import publicar, ProductoCreado, ProductoActualizado, ProductoEliminado
+from src.utils.indices import normalizar_texto
 
 # Configuración del logging
 logger = logging.getLogger(__name__)
@@ -12,8 +19,9 @@ class ProductoController:
     """Controlador para la gestión de productos"""
 
     @staticmethod
-    def new(id_producto: int, nombre: str, cantidad: int, valor_unidad: float, id_categoria: Optional[int] = 1) -> None:
-        """Crea un nuevo producto."""
+    def new(id_producto: int, nombre: str, cantidad: int, valor_unidad: float, id_categoria: Optional[int] = 1,
+            nombre_categoria: Optional[str] = None) -> None:
+        """Crea un nuevo producto ('nombre_categoria', si la vista lo tiene cargado, va en el evento)."""
         try:
             # Crear y validar el nuevo producto (ahora incluye id_categoria)
             # El constructor de Producto asigna 1 si id_categoria es None
@@ -21,7 +29,12 @@ class ProductoController:
 
             # Guardar en la base de datos (DAO maneja errores de duplicado, FK)
             ProductoDao.create(new_product)
+            auditoria.registrar("producto", id_producto, "alta", None, valores_producto(new_product)) # Solo encola
+            # Reflejar en la réplica local (si está activa) sin esperar al próximo delta
+            replica = get_replica()
+            if replica: replica.aplicar_producto(new_product)
             logger.info(f"Controlador: Producto creado exitosamente: ID {id_producto}")
+            publicar(ProductoCreado(ProductoController._guardado(new_product, nombre_categoria)))
 
         except (ValueError, DatabaseError) as e:
             logger.warning(f"Controlador: Error al crear producto ID {id_producto}: {e}")
@@ -32,8 +45,14 @@ class ProductoController:
 
     @staticmethod
     def modify(id_producto_original: int, nuevo_id: int, nombre: str,
-               cantidad: int, valor_unidad: float, id_categoria: Optional[int] = 1) -> None:
-        """Modifica un producto existente."""
+               cantidad: int, valor_unidad: float, id_categoria: Optional[int] = 1,
+               actualizado_en: Optional[datetime] = None, nombre_categoria: Optional[str] = None) -> None:
+        """
+        Modifica un producto existente.
+        'actualizado_en' es la marca del producto tal como se cargó en la vista: si otro
+        usuario lo cambió después, el DAO rechaza la escritura (ValueError).
+        'nombre_categoria', si la vista lo tiene cargado, va en el evento.
+        """
         try:
             # Si el ID va a cambiar, verificar que el nuevo ID no esté ya en uso por OTRO producto
             if id_producto_original != nuevo_id:
@@ -47,8 +66,16 @@ class ProductoController:
             producto_modificado = Producto(nuevo_id, nombre, cantidad, valor_unidad, id_categoria)
 
             # Actualizar en la base de datos (DAO verifica si el original existe y maneja FK)
-            ProductoDao.update(producto_modificado)
+            anterior = ProductoDao.update(producto_modificado, id_original=id_producto_original, actualizado_en=actualizado_en)
+            if anterior is not None: producto_modificado.stock_minimo = anterior.stock_minimo # El formulario no lo edita
+            auditoria.registrar("producto", id_producto_original, "modificacion", valores_producto(anterior),
+                                valores_producto(producto_modificado))
+            replica = get_replica()
+            if replica:
+                if id_producto_original != nuevo_id: replica.eliminar_producto(id_producto_original)
+                replica.aplicar_producto(producto_modificado)
             logger.info(f"Controlador: Producto ID {id_producto_original} modificado (nuevo ID: {nuevo_id}).")
+            publicar(ProductoActualizado(ProductoController._guardado(producto_modificado, nombre_categoria), id_producto_original))
 
         except (ValueError, DatabaseError) as e:
             logger.warning(f"Controlador: Error al modificar producto ID {id_producto_original}: {e}")
@@ -58,12 +85,16 @@ class ProductoController:
             raise ValueError(f"Error inesperado al modificar producto: {e}") from e
 
     @staticmethod
-    def delete(id_producto: int) -> None:
-        """Elimina un producto."""
+    def delete(id_producto: int, actualizado_en: Optional[datetime] = None) -> None:
+        """Elimina un producto (con 'actualizado_en', solo si nadie lo cambió desde que se cargó)."""
         try:
             # Intentar eliminar el producto (DAO verifica si existe)
-            ProductoDao.delete(id_producto)
+            anterior = ProductoDao.delete(id_producto, actualizado_en=actualizado_en)
+            auditoria.registrar("producto", id_producto, "baja", valores_producto(anterior), None)
+            replica = get_replica()
+            if replica: replica.eliminar_producto(id_producto)
             logger.info(f"Controlador: Producto ID {id_producto} eliminado.")
+            publicar(ProductoEliminado(id_producto))
 
         except (ValueError, DatabaseError) as e:
             logger.warning(f"Controlador: Error al eliminar producto ID {id_producto}: {e}")
@@ -72,6 +103,29 @@ class ProductoController:
             logger.error(f"Controlador: Error inesperado al eliminar producto ID {id_producto}: {e}", exc_info=True)
             raise ValueError(f"Error inesperado al eliminar producto: {e}") from e
 
+    @staticmethod
+    def _guardado(producto: Producto, nombre_categoria: Optional[str] = None) -> Producto:
+        """
+        El producto recién escrito para los eventos: el de la réplica o, sin ella, con el nombre de
+        categoría que pasó la vista (de su lista ya cargada; sin otra consulta a la BD).
+        """
+        replica = get_replica()
+        guardado = replica.obtener(producto.id_productos) if replica else None
+        if guardado is None and nombre_categoria is not None: producto.nombre_categoria = nombre_categoria
+        return guardado or producto
+
+    @staticmethod
+    def matches_filters(producto: Producto, search_term: Optional[str] = None, category_id: Optional[int] = None) -> bool:
+        """
+        Indica si el producto entra en una búsqueda (mismo criterio que search_products:
+        el nombre contiene el término sin distinguir mayúsculas ni tildes). Para parchear vistas filtradas.
+        """
+        cat_id = category_id if isinstance(category_id, int) and category_id > 0 else None
+        if cat_id is not None and producto.id_categoria != cat_id:
+            return False
+        term = normalizar_texto(search_term) if search_term else ""
+        return not term or term in normalizar_texto(producto.nombre)
+
     @staticmethod
     def get_all() -> List[Producto]:
         """Obtiene todos los productos (con nombre de categoría)."""
@@ -88,6 +142,21 @@ class ProductoController:
             raise ValueError(f"Error inesperado al obtener productos: {e}") from e
 
 
+    @staticmethod
+    def get_changes_since(desde: Optional[datetime]) -> Tuple[List[Producto], List[int], datetime]:
+        """
+        Productos cambiados e IDs eliminados desde la marca 'desde' (None = todos), más la
+        hora del servidor a usar como próxima marca. Incluye un margen de solape: reaplicar es inocuo.
+        """
+        try:
+            return ProductoDao.read_changes_since(desde - MARGEN_DELTA if desde is not None else None)
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD al leer cambios de productos: {e}")
+            raise # Relanzar para la vista
+        except Exception as e:
+            logger.error(f"Controlador: Error inesperado al leer cambios de productos: {e}", exc_info=True)
+            raise ValueError(f"Error inesperado al leer cambios de productos: {e}") from e
+
     @staticmethod
     def get_one(id_producto: int) -> Optional[Producto]:
         """Obtiene un producto por ID (con nombre de categoría)."""
@@ -104,6 +173,22 @@ class ProductoController:
             raise ValueError(f"Error inesperado al obtener producto: {e}") from e
 
     # --- NUEVO MÉTODO ---
+    @staticmethod
+    def get_many(ids: List[int]) -> Dict[int, Producto]:
+        """Obtiene varios productos por ID de una vez (réplica o una consulta IN por lote). Los que no existen no aparecen."""
+        replica = get_replica()
+        if replica:
+            productos = (replica.obtener(i) for i in ids)
+            return {p.id_productos: p for p in productos if p is not None}
+        try:
+            return ProductoDao.read_many(ids)
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD al obtener {len(ids)} productos: {e}")
+            raise # Relanzar para la vista
+        except Exception as e:
+            logger.error(f"Controlador: Error inesperado al obtener productos: {e}", exc_info=True)
+            raise ValueError(f"Error inesperado al obtener productos: {e}") from e
+
     @staticmethod
     def search_products(search_term: Optional[str] = None, category_id: Optional[int] = None) -> List[Producto]:
         """Busca productos por término de búsqueda y/o ID de categoría."""
@@ -113,6 +198,12 @@ class ProductoController:
             # Validar category_id (None o > 0)
             cat_id = category_id if isinstance(category_id, int) and category_id > 0 else None
 
+            # Con réplica local activa la búsqueda se resuelve en memoria (sin ida y vuelta a la BD)
+            replica = get_replica()
+            # Los índices de nombre pueden estar construyéndose aún (arranque desde instantánea)
+            if replica and (replica.indices_listos or not term):
+                return replica.buscar(term, cat_id)
+
             productos = ProductoDao.search(search_term=term, category_id=cat_id)
             logger.info(f"Controlador: Encontrados {len(productos)} productos para búsqueda='{term}', categoría={cat_id}")
             return productos
@@ -123,3 +214,201 @@ class ProductoController:
             logger.error(f"Controlador: Error inesperado al buscar productos: {e}", exc_info=True)
             raise ValueError(f"Error inesperado al buscar productos: {e}") from e
 
+    @staticmethod
+    def fuzzy_search(search_term: str, category_id: Optional[int] = None, max_distancia: int = 2) -> List[Producto]:
+        """
+        Búsqueda tolerante a errores de tipeo ('azucar morena' encuentra 'Azúcar Moreno'),
+        de más a menos parecido. Requiere la réplica en memoria; sin ella se usa la búsqueda normal.
+        """
+        try:
+            term = search_term.strip() if search_term else None
+            cat_id = category_id if isinstance(category_id, int) and category_id > 0 else None
+            replica = get_replica()
+            if not term or not replica or not replica.indices_listos:
+                return ProductoController.search_products(term, cat_id)
+            productos = replica.buscar_aproximado(term, cat_id, max_distancia)
+            logger.info(f"Controlador: {len(productos)} productos aproximados para '{term}' (distancia <= {max_distancia})")
+            return productos
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD en búsqueda aproximada: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Controlador: Error inesperado en búsqueda aproximada: {e}", exc_info=True)
+            raise ValueError(f"Error inesperado en búsqueda aproximada: {e}") from e
+
+    @staticmethod
+    def iter_products(search_term: Optional[str] = None, category_id: Optional[int] = None,
+                      limite: Optional[int] = None) -> Iterator[tuple]:
+        """
+        Recorre los productos filtrados como tuplas (id, nombre, cantidad, valor, id_categoria, categoría,
+        actualizado_en, stock_minimo) sin cargarlos todos en memoria (exportaciones, línea de comandos).
+        Con 'limite' solo los primeros (LIMIT en la consulta).
+        """
+        term = search_term.strip() if search_term else None
+        cat_id = category_id if isinstance(category_id, int) and category_id > 0 else None
+        return ProductoDao.iter_search(term, cat_id, limite=limite)
+
+    @staticmethod
+    def get_stats() -> List[Dict[str, Any]]:
+        """Totales por categoría: productos, unidades, valor del stock y productos sin stock (del resumen)."""
+        try:
+            return ResumenDao.read_all()
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD al obtener totales: {e}")
+            raise # Relanzar para la vista
+        except Exception as e:
+            logger.error(f"Controlador: Error inesperado al obtener totales: {e}", exc_info=True)
+            raise ValueError(f"Error inesperado al obtener totales: {e}") from e
+
+    @staticmethod
+    def verify_stats() -> List[Tuple[int, Optional[tuple], Optional[tuple]]]:
+        """
+        Compara el resumen por categoría con los totales recalculados sobre todo el catálogo.
+        Devuelve las diferencias: (id_categoria, (productos, unidades, valor, sin_stock) del resumen, recalculados).
+        """
+        def _totales(grupos: List[Dict[str, Any]]) -> Dict[int, tuple]:
+            return {g["id_categoria"]: (int(g["productos"]), int(g["unidades"]), round(float(g["valor"]), 2), int(g["sin_stock"] or 0))
+                    for g in grupos if int(g["productos"])}
+        try:
+            resumen = _totales(ResumenDao.read_all())
+            calculado = _totales(ProductoDao.read_stats())
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD al verificar el resumen por categoría: {e}")
+            raise # Relanzar para la vista
+        return [(id_categoria, resumen.get(id_categoria), calculado.get(id_categoria))
+                for id_categoria in sorted(resumen.keys() | calculado.keys())
+                if resumen.get(id_categoria) != calculado.get(id_categoria)]
+
+    @staticmethod
+    def rebuild_stats() -> int:
+        """Reconstruye el resumen por categoría desde productos. Devuelve cuántas categorías tiene."""
+        try:
+            return ResumenDao.rebuild()
+        except DatabaseError as e:
+            logger.error(f"Controlador: Error de BD al reconstruir el resumen por categoría: {e}")
+            raise # Relanzar para la vista
+
+    @staticmethod
+    def adjust_stock(id_producto: int, delta: Optional[int] = None, cantidad: Optional[int] = None,
+                     intentos: int = 3) -> Producto:
+        """
+        Ajusta la cantidad de un producto sumando 'delta' o fijando 'cantidad'.
+        El delta se suma en la BD (apply_deltas: atómico, sin conflictos entre puestos). Fijar una cantidad
+        usa la marca de cambio leída: si otro puesto lo modificó entremedio, se relee y se reintenta.
+        """
+        if (delta is None) == (cantidad is None):
+            raise ValueError("Indique un ajuste (delta) o una cantidad nueva, no ambos.")
+        if delta is not None:
+            return ProductoController.apply_deltas([(id_producto, delta)], "ajuste")[0]
+        if cantidad < 0:
+            raise ValueError(f"La cantidad no puede quedar negativa ({cantidad})")
+        intento = 0
+        while True:
+            producto = ProductoController.get_one(id_producto)
+            if producto is None:
+                raise ValueError(f"No existe un producto con el ID {id_producto}")
+            try:
+                ProductoController.modify(id_producto, id_producto, producto.nombre, cantidad, producto.valor_unidad,
+                                          producto.id_categoria, actualizado_en=producto.actualizado_en,
+                                          nombre_categoria=producto.nombre_categoria)
+                producto.cantidad = cantidad
+                return producto
+            except StaleDataError:
+                intento += 1
+                if intento >= intentos: raise
+                logger.info(f"Producto {id_producto} modificado por otro puesto; reintentando el ajuste.")
+
+    @staticmethod
+    def apply_deltas(ajustes: List[Tuple[int, int]], tipo: str = "ajuste", referencia: Optional[str] = None) -> List[Producto]:
+        """
+        Aplica de una vez varios ajustes relativos (id, delta): una venta de TPV son deltas negativos.
+        Todo o nada; los IDs repetidos se suman. Quedan en el libro de movimientos con 'tipo' y 'referencia'.
+        Devuelve los productos con la cantidad nueva.
+        """
+        deltas: Dict[int, int] = {}
+        for id_producto, delta in ajustes:
+            deltas[id_producto] = deltas.get(id_producto, 0) + delta
+        try:
+            productos = ProductoDao.add_quantities(deltas, tipo, referencia)
+        except (ValueError, DatabaseError) as e:
+            logger.warning(f"Controlador: Error al ajustar cantidades de {len(deltas)} productos: {e}")
+            raise # Relanzar para la vista / API
+        except Exception as e:
+            logger.error(f"Controlador: Error inesperado al ajustar cantidades: {e}", exc_info=True)
+            raise ValueError(f"Error inesperado al ajustar cantidades: {e}") from e
+        ProductoController.register_deltas(productos, deltas, tipo, referencia)
+        for producto in productos:
+            publicar(ProductoActualizado(producto, producto.id_productos))
+        return productos
+
+    @staticmethod
+    def register_deltas(productos: List[Producto], deltas: Dict[int, int], tipo: str, referencia: Optional[str]) -> None:
+        """
+        Tras sumar cantidades en la BD: réplica y auditoría (sin eventos). Segura desde cualquier hilo;
+        la cola de ajustes la usa desde su hilo y publica los eventos en el de la interfaz.
+        """
+        replica = get_replica()
+        for producto in productos:
+            auditoria.registrar("producto", producto.id_productos, tipo, {"cantidad": producto.cantidad - deltas[producto.id_productos]},
+                                {"cantidad": producto.cantidad, "referencia": referencia})
+            if replica: replica.aplicar_producto(producto)
+
+    @staticmethod
+    def set_threshold(id_producto: int, stock_minimo: Optional[int]) -> None:
+        """Fija el stock mínimo propio del producto (None: usar el de su categoría)."""
+        if stock_minimo is not None and stock_minimo < 0:
+            raise ValueError("El stock mínimo no puede ser negativo.")
+        try:
+            marca = ProductoDao.update_threshold(id_producto, stock_minimo)
+            replica = get_replica()
+            actual = replica.obtener(id_producto) if replica else None # Umbral anterior solo si está en memoria
+            auditoria.registrar("producto", id_producto, "umbral", {"stock_minimo": actual.stock_minimo} if actual else None,
+                                {"stock_minimo": stock_minimo})
+            if replica: replica.fijar_umbral(id_producto, stock_minimo, marca)
+            logger.info(f"Controlador: Stock mínimo del producto ID {id_producto} fijado en {stock_minimo}.")
+        except (ValueError, DatabaseError) as e:
+            logger.warning(f"Controlador: Error al fijar el stock mínimo del producto ID {id_producto}: {e}")
+            raise # Relanzar para la vista
+        except Exception as e:
+            logger.error(f"Controlador: Error inesperado al fijar el stock mínimo del producto ID {id_producto}: {e}", exc_info=True)
+            raise ValueError(f"Error inesperado al fijar el stock mínimo: {e}") from e
+
+    @staticmethod
+    def low_stock(category_id: Optional[int] = None) -> List[Producto]:
+        """
+        Productos en o por debajo de su stock mínimo. Con réplica sale del conjunto que mantiene
+        al día (sin recorrer el catálogo); sin ella, una consulta a la BD.
+        """
+        cat_id = category_id if isinstance(category_id, int) and category_id > 0 else None
+        try:
+            replica = get_replica()
+            if replica and replica.cargada: return replica.bajo_minimo(cat_id)
+            return ProductoDao.read_low_stock(cat_id)
+        except DatabaseError as e:
+            logger.warning(f"Controlador: Error al leer productos bajo mínimo: {e}")
+            raise # Relanzar para la vista
+        except Exception as e:
+            logger.error(f"Controlador: Error inesperado al leer productos bajo mínimo: {e}", exc_info=True)
+            raise ValueError(f"Error inesperado al leer productos bajo mínimo: {e}") from e
+
+    @staticmethod
+    def is_low_stock(id_producto: int) -> Optional[bool]:
+        """¿Está el producto bajo mínimo? Solo con réplica cargada (O(1)); None si no se puede saber sin la BD."""
+        replica = get_replica()
+        if not replica or not replica.cargada: return None
+        return id_producto in replica.alertas
+
+    @staticmethod
+    def autocomplete(prefijo: str, limite: int = 10) -> List[Producto]:
+        """
+        Sugerencias para el buscador (nombre o ID que empieza por el prefijo).
+        Solo usa la réplica en memoria: sin réplica no hay sugerencias (nunca consulta la BD por tecla).
+        """
+        replica = get_replica()
+        if not replica or not replica.indices_listos or not prefijo or not prefijo.strip():
+            return []
+        try:
+            return replica.completar(prefijo, limite)
+        except Exception as e:
+            logger.error(f"Controlador: Error inesperado al autocompletar '{prefijo}': {e}", exc_info=True)
+            return [] # Las sugerencias no son críticas
@@ -0,0 +1,62 @@
+# src/model/alertas.py
+# Alertas de stock bajo evaluadas de forma incremental.
+# La réplica llama a evaluar()/quitar() cada vez que indexa o quita un producto (escrituras propias,
+# deltas de otros puestos, ventas del TPV...), así el conjunto de productos bajo mínimo está siempre
+# al día sin recorrer el catálogo: O(1) por cambio. Solo un cambio del umbral de una categoría
+# obliga a reevaluar los productos de esa categoría.
+from typing import Dict, Iterable, Optional, Set
+
+# Asegúrate que src.model.producto está accesible
+from src.model.producto import Producto
+
+
+class AlertasStock:
+    """
+    Conjunto vivo de IDs de productos en o por debajo de su stock mínimo.
+    No tiene lock propio: la réplica lo usa siempre con el suyo tomado.
+    """
+    def __init__(self) -> None:
+        self._umbral_categoria: Dict[int, int] = {} # id_categoria -> stock mínimo por defecto
+        self._bajo_minimo: Set[int] = set()
+        self.version = 0 # Cambia solo cuando entra o sale un producto del conjunto
+
+    def umbral(self, producto: Producto) -> Optional[int]:
+        """Umbral efectivo: el del producto o, si no tiene, el de su categoría."""
+        if producto.stock_minimo is not None: return producto.stock_minimo
+        return self._umbral_categoria.get(producto.id_categoria)
+
+    def evaluar(self, producto: Producto) -> None:
+        """Reevalúa un producto tras un cambio de cantidad, umbral o categoría."""
+        umbral = self.umbral(producto)
+        if umbral is not None and producto.cantidad <= umbral:
+            if producto.id_productos not in self._bajo_minimo:
+                self._bajo_minimo.add(producto.id_productos); self.version += 1
+        else:
+            self.quitar(producto.id_productos)
+
+    def quitar(self, id_producto: int) -> None:
+        if id_producto in self._bajo_minimo:
+            self._bajo_minimo.discard(id_producto); self.version += 1
+
+    def fijar_umbrales_categoria(self, umbrales: Dict[int, Optional[int]]) -> Set[int]:
+        """Reemplaza los umbrales por categoría. Devuelve las categorías cuyo umbral cambió (a reevaluar)."""
+        nuevos = {id_categoria: umbral for id_categoria, umbral in umbrales.items() if umbral is not None}
+        cambiadas = {c for c in nuevos.keys() | self._umbral_categoria.keys()
+                     if nuevos.get(c) != self._umbral_categoria.get(c)}
+        self._umbral_categoria = nuevos
+        return cambiadas
+
+    def limpiar(self) -> None:
+        """Antes de una carga completa (la versión sigue creciendo para quien la vigile)."""
+        self._bajo_minimo.clear(); self._umbral_categoria.clear()
+        self.version += 1
+
+    def __len__(self) -> int:
+        return len(self._bajo_minimo)
+
+    def __contains__(self, id_producto: int) -> bool:
+        return id_producto in self._bajo_minimo
+
+    def ids(self, entre: Optional[Iterable[int]] = None) -> Set[int]:
+        """Copia del conjunto (opcionalmente, solo los que están en 'entre')."""
+        return self._bajo_minimo & set(entre) if entre is not None else set(self._bajo_minimo)
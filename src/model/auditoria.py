@@ -0,0 +1,282 @@
+# src/model/auditoria.py
+# Registro de auditoría (quién cambió qué) escrito en segundo plano (sql/005_auditoria.sql).
+#
+# Los controladores anotan cada cambio con registrar(): solo arma el registro y lo deja en una cola
+# en memoria, sin tocar la BD. Un hilo escritor la vacía por lotes (un INSERT multi-fila por lote),
+# así la escritura del usuario no paga la auditoría. La cola es acotada: si la BD no da abasto quien
+# registra espera un poco (contrapresión) y, si aun así no hay sitio, el registro va al log como error.
+# Al salir (close_auditoria, también vía atexit) se escribe lo pendiente.
+import atexit
+import getpass
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from mysql.connector import Error
+# Asegúrate que database.py está accesible
+from database import get_database_connection, ConnectionError as DBConnectionError
+
+# Asegúrate que src.model.producto está accesible
+from src.model.producto import Producto, Categoria, DatabaseError
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+TAMANO_COLA = 10000    # Registros pendientes como máximo
+TAMANO_LOTE = 500      # Registros por INSERT
+INTERVALO_ESCRITURA = 1.0 # Segundos: lo que tarda como mucho un registro suelto en llegar a la BD
+ESPERA_COLA = 2.0      # Con la cola llena, lo que espera quien registra antes de descartar
+ESPERA_REINTENTO = 5.0 # Tras un fallo de BD, antes de reintentar el mismo lote
+
+SQL_AUDITORIA = ("INSERT INTO auditoria (entidad, id_entidad, accion, antes, despues, usuario, creado_en) "
+                 "VALUES (%s, %s, %s, %s, %s, %s, %s)")
+
+
+class RegistroAuditoria:
+    """Un cambio: entidad e ID, acción, valores antes y después (dict o None), usuario y hora del cambio."""
+    __slots__ = ("entidad", "id_entidad", "accion", "antes", "despues", "usuario", "creado_en")
+
+    def __init__(self, entidad: str, id_entidad: Optional[int], accion: str, antes: Optional[Dict[str, Any]],
+                 despues: Optional[Dict[str, Any]], usuario: str, creado_en: datetime) -> None:
+        self.entidad = entidad
+        self.id_entidad = id_entidad
+        self.accion = accion
+        self.antes = antes
+        self.despues = despues
+        self.usuario = usuario
+        self.creado_en = creado_en
+
+    def fila(self) -> tuple:
+        """Parámetros del INSERT (el JSON se arma aquí, en el hilo escritor)."""
+        return (self.entidad, self.id_entidad, self.accion,
+                json.dumps(self.antes, ensure_ascii=False, default=str) if self.antes is not None else None,
+                json.dumps(self.despues, ensure_ascii=False, default=str) if self.despues is not None else None,
+                self.usuario, self.creado_en)
+
+    def __repr__(self) -> str:
+        return (f"RegistroAuditoria({self.entidad} {self.id_entidad} {self.accion} por {self.usuario} "
+                f"el {self.creado_en}: {self.antes} -> {self.despues})")
+
+
+# --- Quién ---
+
+_usuario_por_defecto: Optional[str] = None
+_local = threading.local()
+
+def usuario_actual() -> str:
+    """Usuario del cambio: el fijado con como_usuario() en este hilo, o INVENTARIO_USUARIO, o usuario@equipo."""
+    global _usuario_por_defecto
+    usuario = getattr(_local, "usuario", None)
+    if usuario: return usuario
+    if _usuario_por_defecto is None:
+        try:
+            _usuario_por_defecto = os.getenv("INVENTARIO_USUARIO") or f"{getpass.getuser()}@{socket.gethostname()}"
+        except Exception: # getuser() falla sin variables de entorno ni entrada en passwd
+            _usuario_por_defecto = f"desconocido@{socket.gethostname()}"
+    return _usuario_por_defecto
+
+@contextmanager
+def como_usuario(usuario: Optional[str]) -> Iterator[None]:
+    """Atribuye los cambios hechos en este hilo a 'usuario' (p. ej. el TPV que llama al servicio HTTP)."""
+    anterior = getattr(_local, "usuario", None)
+    _local.usuario = usuario
+    try:
+        yield
+    finally:
+        _local.usuario = anterior
+
+
+# --- Qué ---
+
+def valores_producto(producto: Optional[Producto]) -> Optional[Dict[str, Any]]:
+    """Copia de los campos editables (los objetos de la réplica cambian después)."""
+    if producto is None: return None
+    return {"id_productos": producto.id_productos, "nombre": producto.nombre, "cantidad": producto.cantidad,
+            "valor_unidad": producto.valor_unidad, "id_categoria": producto.id_categoria,
+            "stock_minimo": producto.stock_minimo}
+
+def valores_categoria(categoria: Optional[Categoria]) -> Optional[Dict[str, Any]]:
+    if categoria is None: return None
+    return {"id_categoria": categoria.id_categoria, "nombre": categoria.nombre, "descripcion": categoria.descripcion,
+            "stock_minimo": categoria.stock_minimo}
+
+
+class AuditoriaDao:
+    """Objeto de Acceso a Datos para la tabla auditoria."""
+
+    @staticmethod
+    def create_many(registros: List[RegistroAuditoria]) -> None:
+        """Inserta un lote de registros en una transacción (executemany: una sentencia multi-fila)."""
+        if not registros: return
+        conn = None
+        try:
+            conn = get_database_connection()
+            with conn.cursor() as cur:
+                cur.executemany(SQL_AUDITORIA, [r.fila() for r in registros])
+                conn.commit()
+        except Error as e:
+            if conn: conn.rollback()
+            logger.error(f"Error de BD ({e.errno}) al escribir {len(registros)} registros de auditoría: {e.msg}")
+            raise DatabaseError(f"Error al escribir la auditoría: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def read_by_entity(entidad: str, id_entidad: int, limite: int = 100) -> List[RegistroAuditoria]:
+        """Últimos cambios de un producto o categoría, del más reciente al más antiguo."""
+        conn = None
+        sql = ("SELECT entidad, id_entidad, accion, antes, despues, usuario, creado_en FROM auditoria "
+               "WHERE entidad = %s AND id_entidad = %s ORDER BY creado_en DESC, id_auditoria DESC LIMIT %s")
+        try:
+            conn = get_database_connection()
+            with conn.cursor(dictionary=True) as cur:
+                cur.execute(sql, (entidad, id_entidad, limite))
+                registros = []
+                for row in cur.fetchall():
+                    for campo in ("antes", "despues"):
+                        if isinstance(row[campo], (str, bytes)): row[campo] = json.loads(row[campo])
+                    registros.append(RegistroAuditoria(**row))
+                return registros
+        except Error as e:
+            logger.error(f"Error de BD ({e.errno}) al leer la auditoría de {entidad} {id_entidad}: {e.msg}")
+            raise DatabaseError(f"Error al leer la auditoría: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+
+class EscritorAuditoria:
+    """Cola acotada de registros y el hilo que los escribe por lotes."""
+    def __init__(self, tamano_cola: int = TAMANO_COLA, tamano_lote: int = TAMANO_LOTE,
+                 intervalo: float = INTERVALO_ESCRITURA) -> None:
+        self._cola: "queue.Queue[RegistroAuditoria]" = queue.Queue(maxsize=tamano_cola)
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+        self.escritos = 0
+        self.descartados = 0 # Cola llena más allá de ESPERA_COLA (quedan en el log)
+        self.reintentando = False # El último lote falló: la BD no responde y el hilo espera ESPERA_REINTENTO
+        self._hilo = threading.Thread(target=self._bucle, name="auditoria", daemon=True)
+        self._hilo.start()
+
+    def registrar(self, registro: RegistroAuditoria) -> None:
+        """Encola el registro; solo espera si la cola está llena (la BD no da abasto o no responde)."""
+        try:
+            self._cola.put(registro, timeout=ESPERA_COLA)
+        except queue.Full:
+            self.descartados += 1
+            logger.error(f"Cola de auditoría llena: registro descartado {registro}")
+
+    def pendientes(self) -> int:
+        return self._cola.qsize()
+
+    def vaciar_ahora(self, espera: float = 2.0) -> bool:
+        """
+        Espera (como mucho 'espera' segundos) a que lo encolado hasta ahora llegue a la BD.
+        Sin BD no espera: el escritor está en pausa hasta el próximo reintento.
+        """
+        limite = time.monotonic() + espera
+        while self._cola.unfinished_tasks: # Incluye el lote que se está escribiendo
+            if self.reintentando or time.monotonic() >= limite: return False
+            time.sleep(0.02)
+        return True
+
+    def _tomar_lote(self, espera: float) -> List[RegistroAuditoria]:
+        """Espera el primer registro hasta 'espera' segundos y junta los que ya estén en cola (hasta un lote)."""
+        try:
+            lote = [self._cola.get(timeout=espera)]
+        except queue.Empty:
+            return []
+        while len(lote) < self.tamano_lote:
+            try: lote.append(self._cola.get_nowait())
+            except queue.Empty: break
+        return lote
+
+    def _bucle(self) -> None:
+        lote: List[RegistroAuditoria] = []
+        while not self._detener.is_set():
+            if not lote: lote = self._tomar_lote(self.intervalo)
+            if lote and self._escribir(lote):
+                lote = []; self.reintentando = False
+            elif lote: # La BD no responde: reintentar el mismo lote (sin perderlo) más tarde
+                self.reintentando = True
+                self._detener.wait(ESPERA_REINTENTO)
+        # Al cerrar: último intento con el lote retenido y con lo que quede en la cola
+        if lote and not self._escribir(lote): self._descartar(lote)
+        self._vaciar()
+
+    def _escribir(self, lote: List[RegistroAuditoria]) -> bool:
+        try:
+            AuditoriaDao.create_many(lote)
+            self.escritos += len(lote)
+            self._terminados(lote)
+            return True
+        except Exception as e: # DatabaseError, sin conexión o cualquier otro: el lote se reintenta
+            logger.warning(f"Auditoría: no se pudieron escribir {len(lote)} registros, se reintentará: {e}")
+            return False
+
+    def _vaciar(self) -> None:
+        """Al cerrar: un intento por lote con lo que quede; lo que no se pueda escribir va al log."""
+        while True:
+            lote = self._tomar_lote(0)
+            if not lote: return
+            if not self._escribir(lote):
+                self._descartar(lote)
+
+    def _descartar(self, lote: List[RegistroAuditoria]) -> None:
+        self.descartados += len(lote)
+        for registro in lote:
+            logger.error(f"Registro de auditoría no escrito: {registro}")
+        self._terminados(lote)
+
+    def _terminados(self, lote: List[RegistroAuditoria]) -> None:
+        for _ in lote: self._cola.task_done()
+
+    def cerrar(self, espera: float = 10.0) -> None:
+        """Detiene el hilo tras escribir lo pendiente (como mucho 'espera' segundos)."""
+        self._detener.set()
+        self._hilo.join(espera)
+        if self._hilo.is_alive():
+            logger.warning(f"Auditoría: el escritor no terminó a tiempo, {self.pendientes()} registros pendientes.")
+
+
+# --- Instancia global (mismo esquema que la réplica) ---
+
+escritor: Optional[EscritorAuditoria] = None
+_lock_escritor = threading.Lock()
+
+def create_auditoria() -> EscritorAuditoria:
+    """Crea el escritor si no existe; se cierra solo al salir del proceso (atexit)."""
+    global escritor
+    if escritor is None:
+        with _lock_escritor:
+            if escritor is None:
+                escritor = EscritorAuditoria()
+                atexit.register(close_auditoria)
+    return escritor
+
+def get_auditoria() -> Optional[EscritorAuditoria]:
+    return escritor
+
+def close_auditoria() -> None:
+    """Escribe lo pendiente y detiene el escritor (llamar antes de cerrar el pool de conexiones)."""
+    global escritor
+    with _lock_escritor:
+        actual, escritor = escritor, None
+    if actual is not None:
+        actual.cerrar()
+        logger.info(f"Auditoría cerrada: {actual.escritos} registros escritos, {actual.descartados} descartados.")
+
+def registrar(entidad: str, id_entidad: Optional[int], accion: str, antes: Optional[Dict[str, Any]] = None,
+              despues: Optional[Dict[str, Any]] = None) -> None:
+    """Anota un cambio ya confirmado en la BD. No hace E/S: solo encola (crea el escritor la primera vez)."""
+    create_auditoria().registrar(RegistroAuditoria(entidad, id_entidad, accion, antes, despues,
+                                                   usuario_actual(), datetime.now()))
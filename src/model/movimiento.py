@@ -0,0 +1,173 @@
+# src/model/movimiento.py
+# Lectura del libro de movimientos de stock (kardex) y cierres periódicos (sql/002_movimientos.sql).
+# Las escrituras del libro las hace ProductoDao en la misma transacción que cambia 'cantidad'.
+from mysql.connector import Error
+# Asegúrate que database.py está accesible
+from database import get_database_connection, ConnectionError as DBConnectionError
+from typing import Optional, List, Dict, Set, Tuple
+from datetime import datetime
+import logging
+
+# Asegúrate que src.model.producto está accesible
+from src.model.producto import DatabaseError
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+# Un cierre solo incluye movimientos con al menos esta antigüedad (segundos): una transacción
+# que empezó antes pero aún no confirmó no puede quedar fuera de un cierre ya calculado.
+MARGEN_CIERRE = 60
+
+
+class Movimiento:
+    """Una fila del libro: cambio con signo de la cantidad de un producto."""
+    __slots__ = ("id_movimiento", "id_productos", "tipo", "cantidad", "referencia", "creado_en")
+
+    def __init__(self, id_movimiento: int, id_productos: int, tipo: str, cantidad: int,
+                 referencia: Optional[str], creado_en: datetime) -> None:
+        self.id_movimiento = id_movimiento
+        self.id_productos = id_productos
+        self.tipo = tipo
+        self.cantidad = cantidad
+        self.referencia = referencia
+        self.creado_en = creado_en
+
+    def __repr__(self) -> str:
+        return f"Movimiento({self.id_movimiento}, producto={self.id_productos}, {self.tipo} {self.cantidad:+d}, {self.creado_en})"
+
+
+class MovimientoDao:
+    """Objeto de Acceso a Datos para el libro de movimientos y sus cierres."""
+
+    @staticmethod
+    def read_by_product(id_productos: int, desde: Optional[datetime] = None, hasta: Optional[datetime] = None,
+                        limite: Optional[int] = None) -> List[Movimiento]:
+        """Movimientos de un producto en [desde, hasta), en orden cronológico (índice producto + fecha)."""
+        conn = None
+        sql = ("SELECT id_movimiento, id_productos, tipo, cantidad, referencia, creado_en FROM movimientos "
+               "WHERE id_productos = %s")
+        params: Tuple = (id_productos,)
+        if desde is not None: sql += " AND creado_en >= %s"; params += (desde,)
+        if hasta is not None: sql += " AND creado_en < %s"; params += (hasta,)
+        sql += " ORDER BY creado_en, id_movimiento"
+        if limite: sql += " LIMIT %s"; params += (limite,)
+        try:
+            conn = get_database_connection()
+            with conn.cursor(dictionary=True) as cur:
+                cur.execute(sql, params)
+                return [Movimiento(**row) for row in cur.fetchall()]
+        except Error as e:
+            logger.error(f"Error de BD ({e.errno}) al leer movimientos del producto {id_productos}: {e.msg}")
+            raise DatabaseError(f"Error al leer los movimientos: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def read_ids_by_reference(referencia: str, desde: datetime) -> Set[int]:
+        """IDs de los productos con movimientos de 'referencia' desde 'desde' (acotado por el índice de fecha)."""
+        conn = None
+        sql = "SELECT DISTINCT id_productos FROM movimientos WHERE creado_en >= %s AND referencia = %s"
+        try:
+            conn = get_database_connection()
+            with conn.cursor() as cur:
+                cur.execute(sql, (desde, referencia))
+                return {row[0] for row in cur.fetchall()}
+        except Error as e:
+            logger.error(f"Error de BD ({e.errno}) al buscar movimientos con referencia {referencia}: {e.msg}")
+            raise DatabaseError(f"Error al leer los movimientos: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def stock_at(fecha: datetime, id_productos: Optional[int] = None) -> Dict[int, int]:
+        """
+        Stock de cada producto (o de uno) al instante 'fecha': el último cierre anterior más los
+        movimientos desde ese cierre. Los productos sin stock no aparecen.
+        """
+        conn = None
+        filtro = " AND id_productos = %s" if id_productos is not None else ""
+        filtro_params: Tuple = (id_productos,) if id_productos is not None else ()
+        try:
+            conn = get_database_connection()
+            with conn.cursor() as cur:
+                cur.execute("SELECT id_cierre, hasta FROM cierres_stock WHERE hasta <= %s ORDER BY hasta DESC LIMIT 1", (fecha,))
+                cierre = cur.fetchone()
+                if cierre is None: # Sin cierre previo: todo el libro hasta la fecha
+                    cur.execute(f"""
+                        SELECT id_productos, SUM(cantidad) FROM movimientos
+                        WHERE creado_en < %s{filtro}
+                        GROUP BY id_productos HAVING SUM(cantidad) <> 0""", (fecha,) + filtro_params)
+                else:
+                    id_cierre, hasta = cierre
+                    cur.execute(f"""
+                        SELECT id_productos, SUM(cantidad) FROM (
+                            SELECT id_productos, cantidad FROM cierres_stock_detalle WHERE id_cierre = %s{filtro}
+                            UNION ALL
+                            SELECT id_productos, cantidad FROM movimientos WHERE creado_en >= %s AND creado_en < %s{filtro}
+                        ) t
+                        GROUP BY id_productos HAVING SUM(cantidad) <> 0""",
+                        (id_cierre,) + filtro_params + (hasta, fecha) + filtro_params)
+                return {row[0]: int(row[1]) for row in cur.fetchall()}
+        except Error as e:
+            logger.error(f"Error de BD ({e.errno}) al calcular el stock al {fecha}: {e.msg}")
+            raise DatabaseError(f"Error al calcular el stock histórico: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def create_snapshot(margen: int = MARGEN_CIERRE) -> Optional[Tuple[int, datetime, int]]:
+        """
+        Crea un cierre hasta (ahora - margen) a partir del cierre anterior y los movimientos intermedios,
+        con un INSERT ... SELECT dentro de la BD. Devuelve (id_cierre, hasta, productos) o None si no
+        hay nada posterior al último cierre.
+        """
+        conn = None
+        try:
+            conn = get_database_connection()
+            with conn.cursor() as cur:
+                conn.start_transaction()
+                cur.execute("SELECT NOW(6) - INTERVAL %s SECOND", (margen,))
+                hasta = cur.fetchone()[0]
+                # FOR UPDATE: dos cierres simultáneos no parten del mismo anterior
+                cur.execute("SELECT id_cierre, hasta FROM cierres_stock ORDER BY hasta DESC LIMIT 1 FOR UPDATE")
+                anterior = cur.fetchone()
+                desde = anterior[1] if anterior else None
+                hay_movimientos = False
+                if desde is None or desde < hasta:
+                    # ¿Algo nuevo desde el último cierre? Si no, el nuevo sería una copia
+                    cur.execute("SELECT 1 FROM movimientos WHERE creado_en < %s" + (" AND creado_en >= %s" if desde else "") + " LIMIT 1",
+                                (hasta, desde) if desde else (hasta,))
+                    hay_movimientos = cur.fetchone() is not None
+                if not hay_movimientos:
+                    conn.rollback()
+                    return None
+                cur.execute("INSERT INTO cierres_stock (hasta) VALUES (%s)", (hasta,))
+                id_cierre = cur.lastrowid
+                if anterior is None:
+                    cur.execute("""
+                        INSERT INTO cierres_stock_detalle (id_cierre, id_productos, cantidad)
+                        SELECT %s, id_productos, SUM(cantidad) FROM movimientos WHERE creado_en < %s
+                        GROUP BY id_productos HAVING SUM(cantidad) <> 0""", (id_cierre, hasta))
+                else:
+                    cur.execute("""
+                        INSERT INTO cierres_stock_detalle (id_cierre, id_productos, cantidad)
+                        SELECT %s, id_productos, SUM(cantidad) FROM (
+                            SELECT id_productos, cantidad FROM cierres_stock_detalle WHERE id_cierre = %s
+                            UNION ALL
+                            SELECT id_productos, cantidad FROM movimientos WHERE creado_en >= %s AND creado_en < %s
+                        ) t
+                        GROUP BY id_productos HAVING SUM(cantidad) <> 0""", (id_cierre, anterior[0], desde, hasta))
+                productos = cur.rowcount
+                conn.commit()
+                logger.info(f"Cierre de stock {id_cierre} hasta {hasta}: {productos} productos con stock.")
+                return id_cierre, hasta, productos
+        except Error as e:
+            if conn: conn.rollback()
+            logger.error(f"Error de BD ({e.errno}) al crear el cierre de stock: {e.msg}")
+            raise DatabaseError(f"Error al crear el cierre de stock: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
@@ -1,21 +1,40 @@
 # src/model/producto.py
 from mysql.connector import Error, cursor
 # Asegúrate que database.py está accesible
-from database import get_database_connection, ConnectionError as DBConnectionError # Importar error específico también
-from typing import Optional, List, Dict, Any
+from database import get_database_connection, discard_connection, ConnectionError as DBConnectionError # Importar error específico también
+from typing import Optional, List, Dict, Any, Tuple, Iterator, Iterable
+from datetime import datetime
 import logging
 
 # Configuración del logging
 logger = logging.getLogger(__name__) # Obtener logger para este módulo
 
+# Libro de movimientos de stock (ver sql/002_movimientos.sql): todo cambio de 'cantidad' deja su fila
+# en la misma transacción que lo aplica. La cantidad va con signo (venta = negativa).
+TIPOS_MOVIMIENTO = ("alta", "venta", "compra", "ajuste", "traspaso", "baja")
+SQL_MOVIMIENTO = "INSERT INTO movimientos (id_productos, tipo, cantidad, referencia) VALUES (%s, %s, %s, %s)"
+
+# Resumen por categoría (ver sql/004_resumen_categorias.sql): cada escritura de productos suma aquí su
+# efecto (con signo) en la misma transacción, así los totales se leen sin agregar todo el catálogo.
+SQL_RESUMEN = ("INSERT INTO resumen_categorias (id_categoria, productos, unidades, valor, sin_stock) VALUES (%s, %s, %s, %s, %s) "
+               "ON DUPLICATE KEY UPDATE productos = productos + VALUES(productos), unidades = unidades + VALUES(unidades), "
+               "valor = valor + VALUES(valor), sin_stock = sin_stock + VALUES(sin_stock)")
+# (id_categoria, cantidad, valor_unidad) de un producto antes o después de un cambio; None = no existe
+EstadoResumen = Tuple[int, int, Any]
+
 class DatabaseError(Exception):
     """Excepción personalizada para errores de base de datos"""
     pass
 
+class StaleDataError(ValueError):
+    """El registro cambió en la BD desde que la vista lo cargó (otro usuario lo modificó)."""
+    pass
+
 # --- Clase Categoria ---
 class Categoria:
     """Representa una categoría de producto."""
-    def __init__(self, id_categoria: int, nombre: str, descripcion: Optional[str] = None) -> None:
+    def __init__(self, id_categoria: int, nombre: str, descripcion: Optional[str] = None,
+                 stock_minimo: Optional[int] = None) -> None:
         # Validación básica
         if not isinstance(nombre, str) or not nombre.strip():
             raise ValueError("El nombre de la categoría no puede estar vacío")
@@ -26,6 +45,7 @@ class Categoria:
         self.id_categoria = id_categoria
         self.nombre = nombre.strip() # Guardar sin espacios extra
         self.descripcion = descripcion.strip() if descripcion else None
+        self.stock_minimo = stock_minimo # Umbral por defecto de sus productos (None = sin alerta)
 
     def __repr__(self) -> str:
         return f"Categoria(id_categoria={self.id_categoria}, nombre='{self.nombre}')"
@@ -64,7 +84,7 @@ class CategoriaDao:
     def read_all() -> List[Categoria]:
         """Lee todas las categorías ordenadas por nombre."""
         conn = None
-        sql = "SELECT id_categoria, nombre, descripcion FROM categorias ORDER BY nombre"
+        sql = "SELECT id_categoria, nombre, descripcion, stock_minimo FROM categorias ORDER BY nombre"
         try:
             conn = get_database_connection()
             with conn.cursor(dictionary=True) as cur:
@@ -83,7 +103,7 @@ class CategoriaDao:
     def read_one(id_categoria: int) -> Optional[Categoria]:
         """Lee una categoría específica por su ID."""
         conn = None
-        sql = "SELECT id_categoria, nombre, descripcion FROM categorias WHERE id_categoria = %s"
+        sql = "SELECT id_categoria, nombre, descripcion, stock_minimo FROM categorias WHERE id_categoria = %s"
         try:
             conn = get_database_connection()
             with conn.cursor(dictionary=True) as cur:
@@ -101,17 +121,33 @@ class CategoriaDao:
             if conn and conn.is_connected(): conn.close()
 
     @staticmethod
-    def update(categoria: Categoria) -> None:
-        """Actualiza una categoría existente."""
+    def update(categoria: Categoria, anterior: Optional[Categoria] = None) -> None:
+        """
+        Actualiza una categoría existente.
+        Con 'anterior' (la categoría tal como se cargó) solo actualiza si sigue igual en la BD:
+        la tabla no tiene marca de cambio, así que se comparan nombre y descripción en el propio UPDATE.
+        """
         conn = None
         sql = "UPDATE categorias SET nombre = %s, descripcion = %s WHERE id_categoria = %s"
+        params: Tuple = (categoria.nombre, categoria.descripcion, categoria.id_categoria)
+        if anterior is not None:
+            sql += " AND nombre = %s AND descripcion <=> %s" # <=>: comparación que admite NULL
+            params += (anterior.nombre, anterior.descripcion)
         try:
             conn = get_database_connection()
             with conn.cursor() as cur:
                 conn.start_transaction()
-                cur.execute(sql, (categoria.nombre, categoria.descripcion, categoria.id_categoria))
+                cur.execute(sql, params)
                 if cur.rowcount == 0:
                     conn.rollback() # Importante deshacer si no se encontró
+                    if anterior is not None:
+                        cur.execute("SELECT nombre, descripcion FROM categorias WHERE id_categoria = %s", (categoria.id_categoria,))
+                        actual = cur.fetchone()
+                        if actual is not None and tuple(actual) == (categoria.nombre, categoria.descripcion):
+                            return # Ya tenía esos datos: nada que hacer
+                        if actual is not None:
+                            raise StaleDataError(f"La categoría ID {categoria.id_categoria} fue modificada por otro usuario desde que se cargó. "
+                                             "Vuelva a seleccionarla para ver los datos actuales.")
                     raise ValueError(f"No se encontró la categoría con ID {categoria.id_categoria} para actualizar")
                 conn.commit()
                 logger.info(f"Categoría actualizada: {categoria}")
@@ -129,6 +165,29 @@ class CategoriaDao:
         finally:
             if conn and conn.is_connected(): conn.close()
 
+    @staticmethod
+    def update_threshold(id_categoria: int, stock_minimo: Optional[int]) -> None:
+        """Fija (o quita, con None) el stock mínimo por defecto de los productos de la categoría."""
+        conn = None
+        sql = "UPDATE categorias SET stock_minimo = %s WHERE id_categoria = %s"
+        try:
+            conn = get_database_connection()
+            with conn.cursor() as cur:
+                cur.execute(sql, (stock_minimo, id_categoria))
+                if cur.rowcount == 0:
+                    cur.execute("SELECT 1 FROM categorias WHERE id_categoria = %s", (id_categoria,))
+                    if cur.fetchone() is None: # rowcount 0 también si ya tenía ese valor
+                        raise ValueError(f"No se encontró la categoría con ID {id_categoria}")
+                conn.commit()
+                logger.info(f"Stock mínimo de la categoría {id_categoria}: {stock_minimo}")
+        except Error as e:
+            if conn: conn.rollback()
+            logger.error(f"Error de BD ({e.errno}) al fijar el stock mínimo de la categoría {id_categoria}: {e.msg}")
+            raise DatabaseError(f"Error al fijar el stock mínimo: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
     @staticmethod
     def delete(id_categoria: int) -> None:
         """Elimina una categoría por su ID."""
@@ -147,6 +206,14 @@ class CategoriaDao:
                 if cur.rowcount == 0:
                     conn.rollback()
                     raise ValueError(f"No existe una categoría con ID {id_categoria} para eliminar")
+                # Sus productos pasan a 'Sin Categoría': sus totales también (resumen_categorias)
+                cur.execute("""
+                    INSERT INTO resumen_categorias (id_categoria, productos, unidades, valor, sin_stock)
+                    SELECT 1, productos, unidades, valor, sin_stock FROM resumen_categorias WHERE id_categoria = %s
+                    ON DUPLICATE KEY UPDATE productos = resumen_categorias.productos + VALUES(productos),
+                        unidades = resumen_categorias.unidades + VALUES(unidades), valor = resumen_categorias.valor + VALUES(valor),
+                        sin_stock = resumen_categorias.sin_stock + VALUES(sin_stock)""", (id_categoria,))
+                cur.execute("DELETE FROM resumen_categorias WHERE id_categoria = %s", (id_categoria,))
                 conn.commit()
                 logger.info(f"Categoría eliminada: ID {id_categoria}")
         except Error as e:
@@ -168,7 +235,8 @@ class CategoriaDao:
 # --- Clase Producto ---
 class Producto:
     """Representa un producto del inventario."""
-    def __init__(self, id_productos: int, nombre: str, cantidad: int, valor_unidad: float, id_categoria: Optional[int] = 1, nombre_categoria: Optional[str] = None) -> None:
+    def __init__(self, id_productos: int, nombre: str, cantidad: int, valor_unidad: float, id_categoria: Optional[int] = 1, nombre_categoria: Optional[str] = None,
+                 actualizado_en: Optional[datetime] = None, stock_minimo: Optional[int] = None) -> None:
         # Asignar id_categoria por defecto si es None
         processed_id_categoria = id_categoria if id_categoria is not None else 1
         # Validar datos
@@ -181,6 +249,8 @@ class Producto:
         self.valor_unidad = float(valor_unidad) # Asegurar que sea float
         self.id_categoria = processed_id_categoria
         self.nombre_categoria = nombre_categoria # Solo para lectura desde JOIN
+        self.actualizado_en = actualizado_en # Marca de cambio leída de la BD (control de concurrencia al guardar)
+        self.stock_minimo = stock_minimo # Umbral de reposición propio (None = el de su categoría)
 
     @staticmethod
     def validate_data(id_productos: int, nombre: str, cantidad: int, valor_unidad: float, id_categoria: int) -> None:
@@ -218,6 +288,9 @@ class ProductoDao:
             with conn.cursor() as cur:
                 conn.start_transaction()
                 cur.execute(sql, params)
+                ProductoDao._registrar_movimientos(cur, [(producto.id_productos, "alta", producto.cantidad, None)])
+                ProductoDao._actualizar_resumen(cur, [(None, ProductoDao._estado(producto))])
+                producto.actualizado_en = ProductoDao._leer_marca(cur, producto.id_productos)
                 conn.commit()
                 logger.info(f"Producto creado: {producto}")
         except Error as e:
@@ -230,13 +303,60 @@ class ProductoDao:
         finally:
             if conn and conn.is_connected(): conn.close()
 
+    @staticmethod
+    def create_many(productos: List[Producto], actualizar: bool = False) -> Tuple[int, List[Producto], List[Tuple[Producto, str]]]:
+        """
+        Inserta un lote de productos en UNA transacción (executemany: una sentencia multi-fila).
+        Los IDs que ya existen se rechazan, o se actualizan si 'actualizar'.
+        Devuelve (creados, estado anterior de los actualizados, rechazados con su motivo).
+        """
+        if not productos: return 0, [], []
+        conn = None
+        sql = "INSERT INTO productos (id_productos, nombre, cantidad, valor_unidad, id_categoria) VALUES (%s, %s, %s, %s, %s)"
+        if actualizar:
+            sql += (" ON DUPLICATE KEY UPDATE nombre = VALUES(nombre), cantidad = VALUES(cantidad),"
+                    " valor_unidad = VALUES(valor_unidad), id_categoria = VALUES(id_categoria)")
+        ids = [p.id_productos for p in productos]
+        sql_existentes = f"SELECT id_productos, nombre, cantidad, valor_unidad, id_categoria, stock_minimo FROM productos WHERE id_productos IN ({', '.join(['%s'] * len(ids))}) FOR UPDATE"
+        try:
+            conn = get_database_connection()
+            with conn.cursor() as cur:
+                conn.start_transaction()
+                # Una sola consulta para saber qué IDs ya existen (y bloquearlos hasta el commit)
+                cur.execute(sql_existentes, ids)
+                anteriores = {row[0]: Producto(*row[:5], stock_minimo=row[5]) for row in cur.fetchall()}
+                rechazados: List[Tuple[Producto, str]] = []
+                if not actualizar:
+                    rechazados = [(p, f"Ya existe un producto con el ID {p.id_productos}") for p in productos if p.id_productos in anteriores]
+                    productos = [p for p in productos if p.id_productos not in anteriores]
+                if productos:
+                    cur.executemany(sql, [(p.id_productos, p.nombre, p.cantidad, p.valor_unidad, p.id_categoria) for p in productos])
+                    ProductoDao._registrar_movimientos(cur, [
+                        (p.id_productos, "ajuste", p.cantidad - anteriores[p.id_productos].cantidad, "importación")
+                        if p.id_productos in anteriores else (p.id_productos, "alta", p.cantidad, "importación")
+                        for p in productos])
+                    ProductoDao._actualizar_resumen(cur, [(ProductoDao._estado(anteriores.get(p.id_productos)), ProductoDao._estado(p))
+                                                          for p in productos])
+                conn.commit()
+                actualizados = [anteriores[p.id_productos] for p in productos if p.id_productos in anteriores]
+                logger.info(f"Lote de productos guardado: {len(productos) - len(actualizados)} creados, {len(actualizados)} actualizados, {len(rechazados)} rechazados.")
+                return len(productos) - len(actualizados), actualizados, rechazados
+        except Error as e:
+            if conn: conn.rollback()
+            if e.errno == 1452: raise ValueError("El lote hace referencia a una categoría que no existe.") from e
+            logger.error(f"Error de BD ({e.errno}) al crear lote de productos: {e.msg}")
+            raise DatabaseError(f"Error al crear el lote de productos: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
     @staticmethod
     def read_all() -> List[Producto]:
         """Lee todos los productos uniendo con categorías."""
         conn = None
         sql = """
             SELECT p.id_productos, p.nombre, p.cantidad, p.valor_unidad, p.id_categoria,
-                   c.nombre as nombre_categoria
+                   c.nombre as nombre_categoria, p.actualizado_en, p.stock_minimo
             FROM productos p
             LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
             ORDER BY p.id_productos
@@ -261,7 +381,7 @@ class ProductoDao:
         conn = None
         sql = """
             SELECT p.id_productos, p.nombre, p.cantidad, p.valor_unidad, p.id_categoria,
-                   c.nombre as nombre_categoria
+                   c.nombre as nombre_categoria, p.actualizado_en, p.stock_minimo
             FROM productos p
             LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
             WHERE p.id_productos = %s
@@ -283,24 +403,259 @@ class ProductoDao:
             if conn and conn.is_connected(): conn.close()
 
     @staticmethod
-    def update(producto: Producto) -> None:
-        """Actualiza un producto existente."""
+    def read_many(ids: List[int], tamano_lote: int = 1000) -> Dict[int, Producto]:
+        """Lee varios productos por ID con una consulta IN por lote y una sola conexión. Los que no existen no aparecen."""
+        conn = None
+        sql = """
+            SELECT p.id_productos, p.nombre, p.cantidad, p.valor_unidad, p.id_categoria,
+                   c.nombre as nombre_categoria, p.actualizado_en, p.stock_minimo
+            FROM productos p
+            LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
+            WHERE p.id_productos IN ({})
+        """
+        productos: Dict[int, Producto] = {}
+        if not ids: return productos
+        try:
+            conn = get_database_connection()
+            with conn.cursor(dictionary=True) as cur:
+                for inicio in range(0, len(ids), tamano_lote):
+                    lote = ids[inicio:inicio + tamano_lote]
+                    cur.execute(sql.format(", ".join(["%s"] * len(lote))), lote)
+                    for row in cur.fetchall():
+                        productos[row["id_productos"]] = Producto(**row)
+                return productos
+        except Error as e:
+            logger.error(f"Error de BD ({e.errno}) al leer {len(ids)} productos: {e.msg}")
+            raise DatabaseError(f"Error al leer los productos: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def update_quantities(ajustes: List[Tuple[int, int, datetime]]) -> List[int]:
+        """
+        Fija la cantidad de muchos productos en UNA transacción: los ajustes (id, cantidad, actualizado_en leído)
+        se cargan en una tabla temporal con un INSERT multi-fila y se aplican con un solo UPDATE ... JOIN.
+        Los productos que cambiaron (o se borraron) desde la lectura no se tocan; se devuelven sus IDs.
+        """
+        if not ajustes: return []
         conn = None
-        sql = "UPDATE productos SET nombre = %s, cantidad = %s, valor_unidad = %s, id_categoria = %s WHERE id_productos = %s"
-        params = (producto.nombre, producto.cantidad, producto.valor_unidad, producto.id_categoria, producto.id_productos)
         try:
             conn = get_database_connection()
             with conn.cursor() as cur:
+                # Las tablas temporales no cierran la transacción; se crean antes por claridad
+                cur.execute("DROP TEMPORARY TABLE IF EXISTS ajustes_cantidad")
+                cur.execute("""
+                    CREATE TEMPORARY TABLE ajustes_cantidad (
+                        id_productos INT NOT NULL PRIMARY KEY,
+                        cantidad INT NOT NULL,
+                        leido_en TIMESTAMP(6) NOT NULL
+                    )""")
+                conn.start_transaction()
+                cur.executemany("INSERT INTO ajustes_cantidad (id_productos, cantidad, leido_en) VALUES (%s, %s, %s)", ajustes)
+                # Bloquear las filas afectadas: los conflictos no cambian hasta el commit. En orden de ID,
+                # como add_quantities: sin ese orden un conteo y una venta podrían interbloquearse
+                cur.execute("SELECT p.id_productos, p.id_categoria, p.cantidad, p.valor_unidad FROM productos p "
+                            "JOIN ajustes_cantidad a ON p.id_productos = a.id_productos "
+                            "ORDER BY p.id_productos FOR UPDATE")
+                anteriores = {row[0]: tuple(row[1:]) for row in cur.fetchall()} # id -> estado anterior
+                cur.execute("""
+                    SELECT a.id_productos FROM ajustes_cantidad a
+                    LEFT JOIN productos p ON p.id_productos = a.id_productos AND p.actualizado_en = a.leido_en
+                    WHERE p.id_productos IS NULL""")
+                conflictos = [row[0] for row in cur.fetchall()]
+                cur.execute("""
+                    UPDATE productos p JOIN ajustes_cantidad a
+                        ON p.id_productos = a.id_productos AND p.actualizado_en = a.leido_en
+                    SET p.cantidad = a.cantidad""")
+                en_conflicto = set(conflictos)
+                aplicados = [(id_producto, cantidad) for id_producto, cantidad, _ in ajustes if id_producto not in en_conflicto]
+                ProductoDao._registrar_movimientos(cur, [(id_producto, "ajuste", cantidad - anteriores[id_producto][1], "conteo")
+                                                         for id_producto, cantidad in aplicados])
+                ProductoDao._actualizar_resumen(cur, [(anteriores[id_producto], (anteriores[id_producto][0], cantidad, anteriores[id_producto][2]))
+                                                      for id_producto, cantidad in aplicados])
+                conn.commit()
+                cur.execute("DROP TEMPORARY TABLE IF EXISTS ajustes_cantidad")
+                logger.info(f"Cantidades ajustadas: {len(ajustes) - len(conflictos)} productos, {len(conflictos)} en conflicto.")
+                return conflictos
+        except Error as e:
+            if conn: conn.rollback()
+            logger.error(f"Error de BD ({e.errno}) al ajustar cantidades de {len(ajustes)} productos: {e.msg}")
+            raise DatabaseError(f"Error al ajustar las cantidades: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def add_quantities(deltas: Dict[int, int], tipo: str = "ajuste", referencia: Optional[str] = None) -> List[Producto]:
+        """
+        Suma (o resta) cantidades a varios productos en UNA transacción, todo o nada: si algún producto
+        no existe o quedaría con cantidad negativa no se aplica ninguno (ValueError). No depende de la
+        marca leída (el cálculo lo hace la BD sobre la fila bloqueada): apto para ventas concurrentes.
+        Cada delta queda en el libro de movimientos con 'tipo' (venta, compra...) y 'referencia' (n.º de ticket...).
+        Devuelve los productos con la cantidad y la marca nuevas.
+        """
+        if not deltas: return []
+        if tipo not in TIPOS_MOVIMIENTO: raise ValueError(f"Tipo de movimiento no válido: '{tipo}'")
+        conn = None
+        ids = sorted(deltas) # Mismo orden de bloqueo en todas las transacciones: sin interbloqueos entre TPV
+        marcadores = ", ".join(["%s"] * len(ids))
+        try:
+            conn = get_database_connection()
+            with conn.cursor(dictionary=True) as cur:
                 conn.start_transaction()
+                cur.execute(f"SELECT id_productos, id_categoria, cantidad, valor_unidad FROM productos WHERE id_productos IN ({marcadores}) "
+                            "ORDER BY id_productos FOR UPDATE", ids)
+                filas = cur.fetchall()
+                actuales = {row["id_productos"]: row["cantidad"] for row in filas}
+                faltan = [i for i in ids if i not in actuales]
+                insuficientes = [f"ID {i} (hay {actuales[i]}, ajuste {deltas[i]:+d})"
+                                 for i in ids if i in actuales and actuales[i] + deltas[i] < 0]
+                if faltan or insuficientes:
+                    conn.rollback()
+                    motivos = []
+                    if faltan: motivos.append(f"no existen los productos {', '.join(map(str, faltan))}")
+                    if insuficientes: motivos.append(f"stock insuficiente: {'; '.join(insuficientes)}")
+                    raise ValueError("No se aplicó ningún ajuste: " + " y ".join(motivos))
+                cur.executemany("UPDATE productos SET cantidad = cantidad + %s WHERE id_productos = %s",
+                                [(deltas[i], i) for i in ids if deltas[i]])
+                ProductoDao._registrar_movimientos(cur, [(i, tipo, deltas[i], referencia) for i in ids])
+                ProductoDao._actualizar_resumen(cur, [((row["id_categoria"], row["cantidad"], row["valor_unidad"]),
+                                                       (row["id_categoria"], row["cantidad"] + deltas[row["id_productos"]], row["valor_unidad"]))
+                                                      for row in filas])
+                cur.execute(f"""
+                    SELECT p.id_productos, p.nombre, p.cantidad, p.valor_unidad, p.id_categoria,
+                           c.nombre as nombre_categoria, p.actualizado_en, p.stock_minimo
+                    FROM productos p
+                    LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
+                    WHERE p.id_productos IN ({marcadores})""", ids)
+                productos = [Producto(**row) for row in cur.fetchall()]
+                conn.commit()
+                logger.info(f"Cantidades sumadas a {len(ids)} productos.")
+                return productos
+        except Error as e:
+            if conn: conn.rollback()
+            logger.error(f"Error de BD ({e.errno}) al sumar cantidades de {len(deltas)} productos: {e.msg}")
+            raise DatabaseError(f"Error al ajustar las cantidades: {e.msg}") from e
+        except ValueError as ve:
+            logger.warning(ve)
+            raise
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def _registrar_movimientos(cur: Any, movimientos: List[Tuple[int, str, int, Optional[str]]]) -> None:
+        """Anota (id_productos, tipo, cantidad con signo, referencia) en el libro con un INSERT multi-fila; omite los ceros."""
+        filas = [m for m in movimientos if m[2]]
+        if filas: cur.executemany(SQL_MOVIMIENTO, filas)
+
+    @staticmethod
+    def _actualizar_resumen(cur: Any, cambios: Iterable[Tuple[Optional[EstadoResumen], Optional[EstadoResumen]]]) -> None:
+        """
+        Suma a resumen_categorias el efecto de unos cambios (estado anterior, estado nuevo) de productos.
+        Un INSERT ... ON DUPLICATE KEY multi-fila, en orden de categoría: todas las transacciones bloquean
+        las filas del resumen en el mismo orden (y siempre después de las de productos), sin interbloqueos.
+        """
+        deltas: Dict[int, List[Any]] = {} # id_categoria -> [productos, unidades, valor, sin_stock]
+        for anterior, nuevo in cambios:
+            for estado, signo in ((anterior, -1), (nuevo, 1)):
+                if estado is None: continue
+                id_categoria, cantidad, valor_unidad = estado
+                d = deltas.setdefault(id_categoria, [0, 0, 0.0, 0])
+                d[0] += signo; d[1] += signo * cantidad; d[2] += signo * cantidad * float(valor_unidad)
+                if cantidad == 0: d[3] += signo
+        # valor con 4 decimales, como la columna: la suma de floats no arrastra error al DECIMAL
+        filas = [(id_categoria, d[0], d[1], round(d[2], 4), d[3]) for id_categoria, d in sorted(deltas.items())]
+        filas = [f for f in filas if any(f[1:])] # Un cambio de nombre no toca el resumen
+        if filas: cur.executemany(SQL_RESUMEN, filas)
+
+    @staticmethod
+    def _estado(producto: Optional["Producto"]) -> Optional[EstadoResumen]:
+        if producto is None: return None
+        return producto.id_categoria, producto.cantidad, producto.valor_unidad
+
+    @staticmethod
+    def _leer_anterior(cur: Any, id_productos: int) -> Optional["Producto"]:
+        """
+        El producto tal como está antes de cambiarlo, bloqueando la fila hasta el fin de la transacción.
+        Una sola lectura sirve al libro de movimientos, al resumen y a la auditoría (valor devuelto).
+        """
+        cur.execute("SELECT id_productos, nombre, cantidad, valor_unidad, id_categoria, stock_minimo "
+                    "FROM productos WHERE id_productos = %s FOR UPDATE", (id_productos,))
+        row = cur.fetchone()
+        if row is None: return None
+        if not isinstance(row, dict):
+            row = dict(zip(("id_productos", "nombre", "cantidad", "valor_unidad", "id_categoria", "stock_minimo"), row))
+        return Producto(**row)
+
+    @staticmethod
+    def _leer_marca(cur: Any, id_productos: int) -> Optional[datetime]:
+        """Marca de cambio actual de un producto (dentro de la transacción en curso)."""
+        cur.execute("SELECT actualizado_en FROM productos WHERE id_productos = %s", (id_productos,))
+        row = cur.fetchone()
+        if row is None: return None
+        return row["actualizado_en"] if isinstance(row, dict) else row[0]
+
+    @staticmethod
+    def _verificar_marca(cur: Any, id_productos: int, esperada: datetime) -> None:
+        """
+        Tras un UPDATE/DELETE condicionado a la marca que no afectó filas: distingue
+        'no existe' (ValueError) y 'otro usuario lo cambió' (StaleDataError) de 'sin cambios' (no hace nada).
+        """
+        actual = ProductoDao._leer_marca(cur, id_productos)
+        if actual is None:
+            raise ValueError(f"No se encontró el producto con ID {id_productos}")
+        if actual != esperada:
+            raise StaleDataError(f"El producto ID {id_productos} fue modificado por otro usuario desde que se cargó. "
+                             "Vuelva a seleccionarlo para ver los datos actuales.")
+
+    @staticmethod
+    def update(producto: Producto, id_original: Optional[int] = None, actualizado_en: Optional[datetime] = None) -> Optional["Producto"]:
+        """
+        Actualiza un producto existente (id_original permite cambiar el ID).
+        Con 'actualizado_en' (la marca leída al cargarlo) solo actualiza si nadie lo cambió
+        entretanto: el control va en el propio UPDATE, sin consulta previa.
+        Devuelve el producto como estaba antes del cambio (para la auditoría).
+        """
+        conn = None
+        id_where = producto.id_productos if id_original is None else id_original
+        sql = "UPDATE productos SET id_productos = %s, nombre = %s, cantidad = %s, valor_unidad = %s, id_categoria = %s WHERE id_productos = %s"
+        params: Tuple = (producto.id_productos, producto.nombre, producto.cantidad, producto.valor_unidad, producto.id_categoria, id_where)
+        if actualizado_en is not None:
+            sql += " AND actualizado_en = %s"
+            params += (actualizado_en,)
+        try:
+            conn = get_database_connection()
+            with conn.cursor() as cur:
+                conn.start_transaction()
+                anterior = ProductoDao._leer_anterior(cur, id_where) # Para el libro de movimientos, el resumen y la auditoría
                 cur.execute(sql, params)
                 if cur.rowcount == 0:
-                     conn.rollback()
-                     raise ValueError(f"No se encontró o no se modificó el producto con ID {producto.id_productos}")
+                    if actualizado_en is None:
+                        conn.rollback()
+                        raise ValueError(f"No se encontró o no se modificó el producto con ID {id_where}")
+                    try:
+                        ProductoDao._verificar_marca(cur, id_where, actualizado_en) # Sin cambios: seguir
+                    except ValueError:
+                        conn.rollback()
+                        raise
+                if id_where != producto.id_productos: # Cambio de ID: para las réplicas, el ID viejo desaparece
+                    cur.execute("INSERT INTO productos_eliminados (id_productos) VALUES (%s)", (id_where,))
+                    # El stock pasa del ID viejo al nuevo (y el cambio de cantidad, si lo hay, va con él)
+                    ProductoDao._registrar_movimientos(cur, [(id_where, "traspaso", -(anterior.cantidad if anterior else 0), f"a ID {producto.id_productos}"),
+                                                             (producto.id_productos, "traspaso", producto.cantidad, f"de ID {id_where}")])
+                elif anterior is not None:
+                    ProductoDao._registrar_movimientos(cur, [(id_where, "ajuste", producto.cantidad - anterior.cantidad, None)])
+                ProductoDao._actualizar_resumen(cur, [(ProductoDao._estado(anterior), ProductoDao._estado(producto))]) # Incluye cambios de categoría
+                producto.actualizado_en = ProductoDao._leer_marca(cur, producto.id_productos)
                 conn.commit()
                 logger.info(f"Producto actualizado: {producto}")
+                return anterior
         except Error as e:
             if conn: conn.rollback()
             if e.errno == 1452: raise ValueError(f"La categoría seleccionada (ID: {producto.id_categoria}) no existe.") from e
+            if e.errno == 1062: raise ValueError(f"Ya existe otro producto con el ID {producto.id_productos}") from e
             logger.error(f"Error de BD ({e.errno}) al actualizar producto: {e.msg}")
             raise DatabaseError(f"Error al actualizar el producto: {e.msg}") from e
         except ValueError as ve: # Capturar el ValueError de rowcount 0
@@ -311,20 +666,36 @@ class ProductoDao:
             if conn and conn.is_connected(): conn.close()
 
     @staticmethod
-    def delete(id_productos: int) -> None:
-        """Elimina un producto por su ID."""
+    def delete(id_productos: int, actualizado_en: Optional[datetime] = None) -> Optional["Producto"]:
+        """
+        Elimina un producto por su ID (con 'actualizado_en', solo si nadie lo cambió desde que se cargó).
+        Devuelve el producto eliminado (para la auditoría).
+        """
         conn = None
         sql = "DELETE FROM productos WHERE id_productos = %s"
+        params: Tuple = (id_productos,)
+        if actualizado_en is not None:
+            sql += " AND actualizado_en = %s"
+            params += (actualizado_en,)
+        # Registro de eliminación para la sincronización incremental (ver sql/001_cambios_productos.sql)
+        sql_eliminado = "INSERT INTO productos_eliminados (id_productos) VALUES (%s)"
         try:
             conn = get_database_connection()
             with conn.cursor() as cur:
                 conn.start_transaction()
-                cur.execute(sql, (id_productos,))
+                anterior = ProductoDao._leer_anterior(cur, id_productos) # Para el libro de movimientos, el resumen y la auditoría
+                cur.execute(sql, params)
                 if cur.rowcount == 0:
                     conn.rollback()
+                    if actualizado_en is not None: # ¿No existe o lo cambió otro usuario?
+                        ProductoDao._verificar_marca(cur, id_productos, actualizado_en)
                     raise ValueError(f"No existe un producto con ID {id_productos} para eliminar")
+                cur.execute(sql_eliminado, (id_productos,))
+                ProductoDao._registrar_movimientos(cur, [(id_productos, "baja", -(anterior.cantidad if anterior else 0), None)])
+                ProductoDao._actualizar_resumen(cur, [(ProductoDao._estado(anterior), None)])
                 conn.commit()
                 logger.info(f"Producto eliminado: ID {id_productos}")
+                return anterior
         except Error as e:
             if conn: conn.rollback()
             logger.error(f"Error de BD ({e.errno}) al eliminar producto {id_productos}: {e.msg}")
@@ -336,6 +707,166 @@ class ProductoDao:
         finally:
             if conn and conn.is_connected(): conn.close()
 
+    @staticmethod
+    def read_changes_since(desde: Optional[datetime]) -> Tuple[List[Producto], List[int], datetime]:
+        """
+        Lee los productos creados/modificados y los IDs eliminados desde la marca 'desde'.
+        Si 'desde' es None devuelve todos los productos (carga completa) y ninguna eliminación.
+        Devuelve también la hora del servidor al iniciar la lectura, a usar como próxima marca.
+        """
+        conn = None
+        sql_productos = """
+            SELECT p.id_productos, p.nombre, p.cantidad, p.valor_unidad, p.id_categoria,
+                   c.nombre as nombre_categoria, p.actualizado_en, p.stock_minimo
+            FROM productos p
+            LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
+        """
+        sql_eliminados = "SELECT DISTINCT id_productos FROM productos_eliminados WHERE eliminado_en >= %s"
+        try:
+            conn = get_database_connection()
+            with conn.cursor(dictionary=True) as cur:
+                # Marca tomada ANTES de leer: lo que cambie durante la lectura se verá en el siguiente delta
+                cur.execute("SELECT NOW(6) AS ahora")
+                ahora = cur.fetchone()["ahora"]
+                if desde is None:
+                    cur.execute(sql_productos)
+                else:
+                    cur.execute(sql_productos + " WHERE p.actualizado_en >= %s", (desde,))
+                productos = [Producto(**row) for row in cur.fetchall()]
+                eliminados: List[int] = []
+                if desde is not None:
+                    cur.execute(sql_eliminados, (desde,))
+                    eliminados = [row["id_productos"] for row in cur.fetchall()]
+                return productos, eliminados, ahora
+        except Error as e:
+            logger.error(f"Error de BD ({e.errno}) al leer cambios de productos desde {desde}: {e.msg}")
+            raise DatabaseError(f"Error al leer cambios de productos: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def read_stats() -> List[Dict[str, Any]]:
+        """
+        Totales por categoría (productos, unidades, valor del stock, productos sin stock) agregando todo el
+        catálogo. Los paneles leen ResumenDao.read_all; esta consulta sirve para verificar el resumen.
+        """
+        conn = None
+        sql = """
+            SELECT p.id_categoria, c.nombre AS nombre_categoria, COUNT(*) AS productos,
+                   COALESCE(SUM(p.cantidad), 0) AS unidades,
+                   COALESCE(SUM(p.cantidad * p.valor_unidad), 0) AS valor,
+                   SUM(p.cantidad = 0) AS sin_stock
+            FROM productos p
+            LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
+            GROUP BY p.id_categoria, c.nombre
+            ORDER BY c.nombre
+        """
+        try:
+            conn = get_database_connection()
+            with conn.cursor(dictionary=True) as cur:
+                cur.execute(sql)
+                return cur.fetchall()
+        except Error as e:
+            logger.error(f"Error de BD ({e.errno}) al leer totales de productos: {e.msg}")
+            raise DatabaseError(f"Error al leer los totales de productos: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def update_threshold(id_productos: int, stock_minimo: Optional[int]) -> Optional[datetime]:
+        """
+        Fija (o quita, con None: se usa el de la categoría) el stock mínimo de un producto.
+        Cambia su marca, así las réplicas reciben el umbral nuevo en el próximo delta. Devuelve la marca nueva.
+        """
+        conn = None
+        sql = "UPDATE productos SET stock_minimo = %s WHERE id_productos = %s"
+        try:
+            conn = get_database_connection()
+            with conn.cursor() as cur:
+                conn.start_transaction()
+                cur.execute(sql, (stock_minimo, id_productos))
+                marca = ProductoDao._leer_marca(cur, id_productos)
+                if marca is None:
+                    conn.rollback()
+                    raise ValueError(f"No se encontró el producto con ID {id_productos}")
+                conn.commit()
+                logger.info(f"Stock mínimo del producto {id_productos}: {stock_minimo}")
+                return marca
+        except Error as e:
+            if conn: conn.rollback()
+            logger.error(f"Error de BD ({e.errno}) al fijar el stock mínimo del producto {id_productos}: {e.msg}")
+            raise DatabaseError(f"Error al fijar el stock mínimo: {e.msg}") from e
+        except ValueError as ve:
+            logger.warning(ve)
+            raise
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def read_low_stock(category_id: Optional[int] = None) -> List[Producto]:
+        """Productos en o por debajo de su stock mínimo (el propio o, si no tiene, el de su categoría)."""
+        conn = None
+        sql = """
+            SELECT p.id_productos, p.nombre, p.cantidad, p.valor_unidad, p.id_categoria,
+                   c.nombre as nombre_categoria, p.actualizado_en, p.stock_minimo
+            FROM productos p
+            LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
+            WHERE p.cantidad <= COALESCE(p.stock_minimo, c.stock_minimo)
+        """
+        params: Tuple = ()
+        if category_id is not None:
+            sql += " AND p.id_categoria = %s"; params = (category_id,)
+        sql += " ORDER BY p.id_productos"
+        try:
+            conn = get_database_connection()
+            with conn.cursor(dictionary=True) as cur:
+                cur.execute(sql, params)
+                return [Producto(**row) for row in cur.fetchall()]
+        except Error as e:
+            logger.error(f"Error de BD ({e.errno}) al leer productos bajo mínimo: {e.msg}")
+            raise DatabaseError(f"Error al leer los productos bajo mínimo: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def _sql_busqueda(search_term: Optional[str], category_id: Optional[int],
+                      limite: Optional[int] = None) -> Tuple[str, tuple]:
+        """SQL y parámetros de la búsqueda por término (en nombre) y/o ID de categoría, hasta 'limite' filas."""
+        sql = """
+            SELECT p.id_productos, p.nombre, p.cantidad, p.valor_unidad, p.id_categoria,
+                   c.nombre as nombre_categoria, p.actualizado_en, p.stock_minimo
+            FROM productos p
+            LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
+        """
+        params = []
+        conditions = []
+
+        if search_term:
+            conditions.append("p.nombre LIKE %s")
+            # Añadir wildcards para búsqueda parcial ('contiene')
+            params.append(f"%{search_term}%")
+
+        if category_id is not None:
+            # Validar que sea un entero positivo
+            if not isinstance(category_id, int) or category_id <= 0:
+                 logger.warning(f"ID de categoría inválido recibido en DAO.search: {category_id}. Ignorando filtro.")
+            else:
+                 conditions.append("p.id_categoria = %s")
+                 params.append(category_id)
+
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        sql += " ORDER BY p.id_productos" # O por p.nombre, etc.
+        if limite:
+            sql += " LIMIT %s"
+            params.append(limite)
+        return sql, tuple(params)
+
     # --- Método search ---
     @staticmethod
     def search(search_term: Optional[str] = None, category_id: Optional[int] = None) -> List[Producto]:
@@ -344,35 +875,9 @@ class ProductoDao:
         try:
             conn = get_database_connection()
             with conn.cursor(dictionary=True) as cur:
-                sql = """
-                    SELECT p.id_productos, p.nombre, p.cantidad, p.valor_unidad, p.id_categoria,
-                           c.nombre as nombre_categoria
-                    FROM productos p
-                    LEFT JOIN categorias c ON p.id_categoria = c.id_categoria
-                """
-                params = []
-                conditions = []
-
-                if search_term:
-                    conditions.append("p.nombre LIKE %s")
-                    # Añadir wildcards para búsqueda parcial ('contiene')
-                    params.append(f"%{search_term}%")
-
-                if category_id is not None:
-                    # Validar que sea un entero positivo
-                    if not isinstance(category_id, int) or category_id <= 0:
-                         logger.warning(f"ID de categoría inválido recibido en DAO.search: {category_id}. Ignorando filtro.")
-                    else:
-                         conditions.append("p.id_categoria = %s")
-                         params.append(category_id)
-
-                if conditions:
-                    sql += " WHERE " + " AND ".join(conditions)
-
-                sql += " ORDER BY p.id_productos" # O por p.nombre, etc.
-
-                # logger.debug(f"DAO Search SQL: {sql} PARAMS: {tuple(params)}") # Log para depuración
-                cur.execute(sql, tuple(params))
+                sql, params = ProductoDao._sql_busqueda(search_term, category_id)
+                # logger.debug(f"DAO Search SQL: {sql} PARAMS: {params}") # Log para depuración
+                cur.execute(sql, params)
                 result = cur.fetchall()
                 productos = [Producto(**row) for row in result]
                 return productos
@@ -384,3 +889,39 @@ class ProductoDao:
         finally:
             if conn and conn.is_connected(): conn.close()
 
+    @staticmethod
+    def iter_search(search_term: Optional[str] = None, category_id: Optional[int] = None,
+                    tamano_lote: int = 5000, limite: Optional[int] = None) -> Iterator[tuple]:
+        """
+        Igual que search, pero entrega tuplas (id_productos, nombre, cantidad, valor_unidad, id_categoria,
+        nombre_categoria, actualizado_en, stock_minimo) desde un cursor sin buffer: el servidor envía el resultado a
+        medida que se lee, así la memoria no crece con la tabla. La conexión queda ocupada hasta agotar
+        o cerrar el generador. Con 'limite' el corte lo hace el servidor (LIMIT): no envía el resto.
+        """
+        conn = None
+        cur = None
+        agotado = False
+        try:
+            conn = get_database_connection()
+            cur = conn.cursor(buffered=False)
+            cur.execute(*ProductoDao._sql_busqueda(search_term, category_id, limite))
+            while True:
+                filas = cur.fetchmany(tamano_lote)
+                if not filas: break
+                yield from filas
+            agotado = True
+        except Error as e:
+            logger.error(f"Error de BD ({e.errno}) al recorrer productos (term='{search_term}', cat={category_id}): {e.msg}")
+            raise DatabaseError(f"Error al recorrer productos: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and not agotado:
+                # Cortado a medias: leer lo que queda (consume_results) traería el resto de la tabla
+                # por la red; se corta la conexión y el pool la reconecta al reutilizarla
+                discard_connection(conn)
+            elif conn and conn.is_connected():
+                try:
+                    if cur is not None: cur.close()
+                except Error as e:
+                    logger.warning(f"Error al cerrar cursor de recorrido de productos: {e}")
+                conn.close()
@@ -0,0 +1,512 @@
+# src/model/replica.py
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Set, Iterable
+
+# Asegúrate que src.model.producto está accesible
+from src.model.producto import Producto, ProductoDao, Categoria, CategoriaDao, DatabaseError
+from src.model.snapshot import guardar_snapshot, leer_snapshot, huella_bd
+from src.model.alertas import AlertasStock
+from src.utils.indices import IndiceTrigramas, IndicePrefijos, IndiceDifuso
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+# Margen de solape al pedir deltas: cubre transacciones que confirmaron
+# con una marca anterior a la última lectura (aplicar dos veces es inocuo).
+MARGEN_DELTA = timedelta(seconds=5)
+
+# Coincidencias de una búsqueda que se ordenan por calidad; las demás siguen por ID.
+# La tabla muestra una ventana: ordenar miles de coincidencias en cada tecla no aporta.
+ORDEN_MAXIMO = 200
+
+
+class InventarioReplica:
+    """
+    Réplica en memoria de la tabla productos para búsquedas sin ida y vuelta a la BD.
+
+    La BD sigue siendo la fuente de verdad para las escrituras: la réplica se carga
+    una vez, se mantiene al día con deltas periódicos (ProductoDao.read_changes_since)
+    y los controladores le aplican sus propias escrituras para leer lo recién escrito.
+    """
+    def __init__(self, intervalo_sondeo: float = 15.0) -> None:
+        self.intervalo_sondeo = intervalo_sondeo
+        self._lock = threading.RLock()
+        self._productos: Dict[int, Producto] = {}         # id_productos -> Producto
+        self._por_categoria: Dict[int, Set[int]] = {}     # id_categoria -> ids
+        self._bits_categoria: Dict[int, int] = {}         # id_categoria -> sus ids como mapa de bits de _por_nombre (bajo demanda)
+        self._por_nombre = IndiceTrigramas()              # trigramas del nombre normalizado -> ids
+        self._por_prefijo = IndicePrefijos()              # autocompletado de nombres e IDs
+        self._difuso = IndiceDifuso()                     # palabras del nombre, tolerante a errores
+        self._categorias: Dict[int, Categoria] = {}       # id_categoria -> Categoria
+        self.alertas = AlertasStock()                     # Productos bajo mínimo, al día con cada cambio
+        self._ids_ordenados: Optional[List[int]] = None   # Caché del listado completo
+        self._marca: Optional[datetime] = None            # Hora del servidor del último delta
+        self.version = 0                                  # Se incrementa con cada cambio aplicado
+        self.version_remota = 0                           # Solo cambios no hechos por esta app (cargas, deltas, índices);
+                                                          # los propios llegan a las vistas por el bus de eventos
+        # Los índices de nombre pueden construirse en segundo plano tras cargar una instantánea;
+        # mientras tanto los IDs tocados se anotan para repasarlos al terminar
+        self.indices_listos = True
+        self._pendientes: Set[int] = set()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    # --- Carga y sincronización ---
+
+    @property
+    def cargada(self) -> bool:
+        return self._marca is not None
+
+    def cargar(self) -> None:
+        """Carga completa de categorías y productos desde la BD."""
+        # Las dos consultas a la vez, cada una con su propia conexión del pool
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="replica-carga") as executor:
+            futuro_categorias = executor.submit(CategoriaDao.read_all)
+            productos, _, ahora = ProductoDao.read_changes_since(None)
+            categorias = futuro_categorias.result()
+        self._cargar_datos(categorias, productos, ahora)
+        logger.info(f"Réplica cargada: {len(productos)} productos, {len(categorias)} categorías.")
+
+    def cargar_snapshot(self, ruta: str) -> bool:
+        """
+        Carga la réplica desde la instantánea en disco (sin tocar la BD).
+        El siguiente sincronizar() trae solo los cambios posteriores a su marca.
+        """
+        datos = leer_snapshot(ruta, huella_bd())
+        if datos is None: return False
+        categorias, productos, marca = datos
+        # Solo mapas por ID y categoría: la tabla se puede mostrar ya; los índices de
+        # nombre (varios segundos en catálogos grandes) los construye el hilo de sondeo
+        self._cargar_datos(categorias, productos, marca, indices=False)
+        logger.info(f"Réplica cargada desde instantánea ({marca:%Y-%m-%d %H:%M:%S}): {len(productos)} productos.")
+        return True
+
+    def guardar_snapshot(self, ruta: str) -> None:
+        """Guarda el estado actual para el próximo arranque."""
+        with self._lock:
+            if self._marca is None: return
+            categorias = list(self._categorias.values())
+            productos = [self._productos[i] for i in sorted(self._productos)]
+            marca = self._marca
+        guardar_snapshot(ruta, categorias, productos, marca, huella_bd())
+
+    def _cargar_datos(self, categorias: List[Categoria], productos: List[Producto], marca: datetime,
+                      indices: bool = True) -> None:
+        with self._lock:
+            self._productos.clear(); self._por_categoria.clear(); self._bits_categoria.clear()
+            self._por_nombre = IndiceTrigramas()
+            self._difuso = IndiceDifuso()
+            self._por_prefijo = IndicePrefijos()
+            self.indices_listos = False # Los índices de nombre se construyen en bloque, no uno a uno
+            self._categorias = {c.id_categoria: c for c in categorias}
+            self.alertas.limpiar()
+            self.alertas.fijar_umbrales_categoria({c.id_categoria: c.stock_minimo for c in categorias})
+            for producto in productos:
+                self._indexar(producto)
+            if indices:
+                self._por_nombre, self._difuso, self._por_prefijo = self._nuevos_indices(productos)
+                self.indices_listos = True
+            self._pendientes.clear() # Carga completa: nada que repasar
+            self._ids_ordenados = None
+            self._marca = marca
+            self.version += 1
+            self.version_remota += 1
+
+    @classmethod
+    def _nuevos_indices(cls, productos: List[Producto]):
+        """Índices de nombre para una carga completa (con su construcción masiva, no producto a producto)."""
+        por_nombre, difuso, por_prefijo = IndiceTrigramas(), IndiceDifuso(), IndicePrefijos()
+        por_nombre.reconstruir((p.id_productos, p.nombre) for p in productos)
+        difuso.reconstruir((p.id_productos, p.nombre) for p in productos)
+        por_prefijo.reconstruir(cls._claves_prefijo(p) for p in productos)
+        return por_nombre, difuso, por_prefijo
+
+    def construir_indices(self) -> None:
+        """
+        Construye los índices de nombre sin bloquear las lecturas por ID/categoría.
+        Los cambios aplicados durante la construcción se repasan al final.
+        """
+        if self.indices_listos: return
+        with self._lock:
+            productos = list(self._productos.values())
+            self._pendientes.clear()
+        por_nombre, difuso, por_prefijo = self._nuevos_indices(productos)
+        with self._lock:
+            for id_producto in self._pendientes:
+                por_nombre.quitar(id_producto); difuso.quitar(id_producto); por_prefijo.quitar(id_producto)
+                producto = self._productos.get(id_producto)
+                if producto is not None:
+                    por_nombre.agregar(id_producto, producto.nombre)
+                    difuso.agregar(id_producto, producto.nombre)
+                    por_prefijo.agregar(*self._claves_prefijo(producto))
+            self._pendientes.clear()
+            self._por_nombre, self._difuso, self._por_prefijo = por_nombre, difuso, por_prefijo
+            self._bits_categoria.clear() # Van por los números del índice anterior
+            self.indices_listos = True
+            self.version += 1
+            self.version_remota += 1
+        logger.info(f"Réplica: índices de nombre listos ({len(productos)} productos).")
+
+    def sincronizar(self) -> int:
+        """Aplica los cambios ocurridos en la BD desde el último delta. Devuelve cuántos aplicó."""
+        if self._marca is None:
+            self.cargar()
+            return len(self._productos)
+        categorias = CategoriaDao.read_all() # Tabla pequeña: se relee entera
+        productos, eliminados, ahora = ProductoDao.read_changes_since(self._marca - MARGEN_DELTA)
+        with self._lock:
+            cambio_categorias = self._actualizar_categorias({c.id_categoria: c for c in categorias})
+            # Primero eliminaciones, luego altas: un ID borrado y recreado queda presente
+            eliminados = [i for i in eliminados if i in self._productos]
+            for id_producto in eliminados:
+                self._desindexar(id_producto)
+            # El margen del delta (y las escrituras propias, ya aplicadas) traen filas sin cambios: omitirlas
+            productos = [p for p in productos if not self._es_igual(p)]
+            for producto in productos:
+                self._indexar(producto)
+            if eliminados or productos:
+                self._ids_ordenados = None
+            if eliminados or productos or cambio_categorias:
+                self.version += 1
+                self.version_remota += 1
+            self._marca = ahora
+        if eliminados or productos:
+            logger.debug(f"Réplica: delta con {len(productos)} cambios y {len(eliminados)} eliminaciones.")
+        return len(productos) + len(eliminados)
+
+    def _es_igual(self, producto: Producto) -> bool:
+        """
+        Indica si la réplica ya tiene este producto con los mismos datos y la misma marca (llamar con el lock tomado).
+        La marca cuenta: una fila que cambió y volvió a su valor entre dos sondeos trae marca nueva, y quien
+        escriba con la vieja (PUT de la API) chocaría siempre con StaleDataError.
+        """
+        actual = self._productos.get(producto.id_productos)
+        return (actual is not None and actual.nombre == producto.nombre and actual.cantidad == producto.cantidad
+                and actual.valor_unidad == producto.valor_unidad and actual.id_categoria == producto.id_categoria
+                and actual.stock_minimo == producto.stock_minimo and actual.actualizado_en == producto.actualizado_en)
+
+    def iniciar_sondeo(self, inmediato: bool = False) -> None:
+        """
+        Arranca el hilo que pide deltas cada 'intervalo_sondeo' segundos.
+        Con 'inmediato' pide el primero enseguida (conciliar una instantánea recién cargada).
+        """
+        if self._hilo and self._hilo.is_alive(): return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle_sondeo, args=(inmediato,), name="replica-sondeo", daemon=True)
+        self._hilo.start()
+
+    def detener_sondeo(self) -> None:
+        self._detener.set()
+
+    def _bucle_sondeo(self, inmediato: bool = False) -> None:
+        espera = 0 if inmediato else self.intervalo_sondeo
+        while not self._detener.wait(espera):
+            espera = self.intervalo_sondeo
+            try:
+                self.sincronizar()
+            except Exception as e: # La BD puede caerse: seguir sirviendo lo que hay
+                logger.warning(f"Réplica: fallo al sincronizar, se reintentará: {e}")
+            if not self.indices_listos:
+                self.construir_indices() # Tras la primera conciliación de una instantánea
+
+    # --- Escrituras locales (llamadas por los controladores tras confirmar en BD) ---
+
+    def aplicar_producto(self, producto: Producto) -> None:
+        """Inserta o reemplaza un producto recién escrito en la BD."""
+        with self._lock:
+            # Los formularios no editan el umbral (ver fijar_umbral): conservar el que ya tenía
+            actual = self._productos.get(producto.id_productos)
+            if producto.stock_minimo is None and actual is not None:
+                producto.stock_minimo = actual.stock_minimo
+            self._indexar(producto)
+            self._ids_ordenados = None
+            self.version += 1
+
+    def eliminar_producto(self, id_producto: int) -> None:
+        with self._lock:
+            if id_producto in self._productos:
+                self._desindexar(id_producto)
+                self._ids_ordenados = None
+                self.version += 1
+
+    def aplicar_categoria(self, categoria: Categoria) -> None:
+        """Registra una categoría creada o modificada."""
+        with self._lock:
+            actual = self._categorias.get(categoria.id_categoria)
+            if categoria.stock_minimo is None and actual is not None:
+                categoria.stock_minimo = actual.stock_minimo # Igual que en aplicar_producto
+            nuevas = dict(self._categorias); nuevas[categoria.id_categoria] = categoria
+            self._actualizar_categorias(nuevas)
+            self.version += 1
+
+    def eliminar_categoria(self, id_categoria: int, id_destino: int = 1) -> None:
+        """Quita una categoría y mueve sus productos a 'id_destino' (como hace la BD)."""
+        with self._lock:
+            for id_producto in list(self._por_categoria.get(id_categoria, ())):
+                producto = self._productos[id_producto]
+                producto.id_categoria = id_destino
+                destino = self._categorias.get(id_destino)
+                producto.nombre_categoria = destino.nombre if destino else None
+                self._por_categoria[id_categoria].discard(id_producto)
+                self._por_categoria.setdefault(id_destino, set()).add(id_producto)
+                self._bits_categoria.pop(id_destino, None)
+                self.alertas.evaluar(producto) # Puede heredar otro umbral de categoría
+            self._por_categoria.pop(id_categoria, None)
+            self._bits_categoria.pop(id_categoria, None)
+            self._categorias.pop(id_categoria, None)
+            self.version += 1
+
+    def fijar_umbral(self, id_producto: int, stock_minimo: Optional[int], marca: Optional[datetime] = None) -> None:
+        """Registra un stock mínimo recién escrito en la BD (None = usar el de la categoría)."""
+        with self._lock:
+            producto = self._productos.get(id_producto)
+            if producto is None: return
+            producto.stock_minimo = stock_minimo
+            if marca is not None: producto.actualizado_en = marca
+            self.alertas.evaluar(producto)
+            self.version += 1
+
+    def fijar_umbral_categoria(self, id_categoria: int, stock_minimo: Optional[int]) -> None:
+        """Registra el stock mínimo por defecto de una categoría y reevalúa solo sus productos."""
+        with self._lock:
+            categoria = self._categorias.get(id_categoria)
+            if categoria is None: return
+            categoria.stock_minimo = stock_minimo
+            self._reevaluar_categorias(self.alertas.fijar_umbrales_categoria(
+                {c.id_categoria: c.stock_minimo for c in self._categorias.values()}))
+            self.version += 1
+
+    # --- Consultas ---
+
+    def __len__(self) -> int:
+        return len(self._productos)
+
+    def obtener(self, id_producto: int) -> Optional[Producto]:
+        return self._productos.get(id_producto)
+
+    def obtener_categoria(self, id_categoria: int) -> Optional[Categoria]:
+        return self._categorias.get(id_categoria)
+
+    def categorias(self) -> List[Categoria]:
+        """Categorías ordenadas por nombre (como CategoriaDao.read_all)."""
+        with self._lock:
+            return sorted(self._categorias.values(), key=lambda c: c.nombre)
+
+    def bajo_minimo(self, id_categoria: Optional[int] = None) -> List[Producto]:
+        """Productos en o por debajo de su stock mínimo, por ID (sin recorrer el catálogo)."""
+        with self._lock:
+            ids = self.alertas.ids(self._por_categoria.get(id_categoria, ()) if id_categoria is not None else None)
+            return [self._productos[i] for i in sorted(ids)]
+
+    def completar(self, prefijo: str, limite: int = 10) -> List[Producto]:
+        """Sugerencias de autocompletado: productos cuyo nombre (o palabra del nombre) o ID empieza por el prefijo."""
+        with self._lock:
+            return [self._productos[i] for i in self._por_prefijo.completar(prefijo, limite)]
+
+    def buscar_aproximado(self, termino: str, id_categoria: Optional[int] = None,
+                          max_distancia: int = 2) -> List[Producto]:
+        """Productos cuyo nombre se parece al término (errores de tipeo), del más al menos parecido."""
+        with self._lock:
+            entre = self._por_categoria.get(id_categoria, set()) if id_categoria is not None else None
+            return [self._productos[i] for i, _ in self._difuso.buscar(termino, max_distancia, entre)]
+
+    def buscar(self, termino: Optional[str] = None, id_categoria: Optional[int] = None) -> List[Producto]:
+        """
+        Equivalente en memoria de ProductoDao.search: 'contiene' en el nombre sin
+        distinguir mayúsculas ni tildes, filtro opcional de categoría.
+        Con término, los ORDEN_MAXIMO mejores por calidad de coincidencia y el resto por ID;
+        sin término, por ID.
+        """
+        with self._lock:
+            if termino and termino.strip():
+                # La categoría entra como mapa de bits, antes de ordenar
+                mascara = self._mascara_categoria(id_categoria) if id_categoria is not None else None
+                ids_rankeados = self._por_nombre.buscar(termino, entre=mascara, limite=ORDEN_MAXIMO)
+                return list(map(self._productos.__getitem__, ids_rankeados))
+            candidatos: Optional[Set[int]] = None
+            if id_categoria is not None:
+                candidatos = self._por_categoria.get(id_categoria, set())
+            if candidatos is None:
+                if self._ids_ordenados is None:
+                    self._ids_ordenados = sorted(self._productos)
+                ids: Iterable[int] = self._ids_ordenados
+            else:
+                ids = sorted(candidatos)
+            return [self._productos[i] for i in ids]
+
+    # --- Índices internos (llamar con el lock tomado) ---
+
+    def _mascara_categoria(self, id_categoria: int) -> int:
+        """
+        Productos de la categoría como mapa de bits sobre los números de _por_nombre (no sobre el ID,
+        que puede llegar a 2^31): se arma al primer uso y luego se mantiene al día.
+        """
+        bits = self._bits_categoria.get(id_categoria)
+        if bits is None:
+            bits = self._bits_categoria[id_categoria] = self._por_nombre.mascara(self._por_categoria.get(id_categoria, ()))
+        return bits
+
+    @staticmethod
+    def _claves_prefijo(producto: Producto):
+        return (producto.id_productos, producto.nombre, (str(producto.id_productos),))
+
+    def _indexar(self, producto: Producto) -> None:
+        if producto.id_productos in self._productos:
+            self._desindexar(producto.id_productos)
+        categoria = self._categorias.get(producto.id_categoria)
+        if categoria: producto.nombre_categoria = categoria.nombre
+        self._productos[producto.id_productos] = producto
+        self._por_categoria.setdefault(producto.id_categoria, set()).add(producto.id_productos)
+        self.alertas.evaluar(producto)
+        if not self.indices_listos:
+            self._bits_categoria.pop(producto.id_categoria, None) # Sin número en el índice todavía
+            self._pendientes.add(producto.id_productos)
+            return
+        self._por_nombre.agregar(producto.id_productos, producto.nombre)
+        bits = self._bits_categoria.get(producto.id_categoria)
+        if bits is not None:
+            self._bits_categoria[producto.id_categoria] = bits | (1 << self._por_nombre.numero(producto.id_productos))
+        self._por_prefijo.agregar(*self._claves_prefijo(producto))
+        self._difuso.agregar(producto.id_productos, producto.nombre)
+
+    def _desindexar(self, id_producto: int) -> None:
+        producto = self._productos.pop(id_producto)
+        ids_categoria = self._por_categoria.get(producto.id_categoria)
+        if ids_categoria is not None:
+            ids_categoria.discard(id_producto)
+        self.alertas.quitar(id_producto)
+        if not self.indices_listos:
+            self._bits_categoria.pop(producto.id_categoria, None)
+            self._pendientes.add(id_producto)
+            return
+        bits = self._bits_categoria.get(producto.id_categoria)
+        numero = self._por_nombre.numero(id_producto)
+        if bits is not None and numero is not None:
+            self._bits_categoria[producto.id_categoria] = bits & ~(1 << numero) # Antes de que el índice libere el número
+        self._por_nombre.quitar(id_producto)
+        self._por_prefijo.quitar(id_producto)
+        self._difuso.quitar(id_producto)
+
+    def _actualizar_categorias(self, categorias: Dict[int, Categoria]) -> bool:
+        """Propaga renombres de categoría a los productos afectados (vía índice por categoría)."""
+        hubo_cambios = categorias.keys() != self._categorias.keys()
+        for id_categoria, categoria in categorias.items():
+            anterior = self._categorias.get(id_categoria)
+            if (anterior is None or anterior.nombre != categoria.nombre or anterior.descripcion != categoria.descripcion
+                    or anterior.stock_minimo != categoria.stock_minimo):
+                hubo_cambios = True
+            if anterior is None or anterior.nombre != categoria.nombre:
+                for id_producto in self._por_categoria.get(id_categoria, ()):
+                    self._productos[id_producto].nombre_categoria = categoria.nombre
+        self._categorias = categorias
+        self._reevaluar_categorias(self.alertas.fijar_umbrales_categoria({c.id_categoria: c.stock_minimo for c in categorias.values()}))
+        return hubo_cambios
+
+    def _reevaluar_categorias(self, ids_categoria: Iterable[int]) -> None:
+        """Tras cambiar el umbral por defecto de unas categorías: reevaluar solo sus productos."""
+        for id_categoria in ids_categoria:
+            for id_producto in self._por_categoria.get(id_categoria, ()):
+                self.alertas.evaluar(self._productos[id_producto])
+
+
+# --- Instancia única (mismo esquema que el pool de database.py) ---
+
+replica: Optional[InventarioReplica] = None
+ruta_snapshot: Optional[str] = None
+
+def load_replica_snapshot(intervalo_sondeo: float = 15.0, ruta: Optional[str] = None) -> Optional[InventarioReplica]:
+    """
+    Carga la réplica solo desde la instantánea en disco, sin tocar la BD: la tabla se puede pintar
+    antes de crear el pool. No sondea todavía (create_replica, ya con el pool, la pone a conciliar).
+    Devuelve None si no hay instantánea válida.
+    """
+    global replica, ruta_snapshot
+    if replica is not None: return replica
+    if not ruta: return None
+    nueva = InventarioReplica(intervalo_sondeo)
+    if not nueva.cargar_snapshot(ruta): return None
+    ruta_snapshot = ruta
+    replica = nueva
+    return replica
+
+def create_replica(intervalo_sondeo: float = 15.0, ruta: Optional[str] = None) -> InventarioReplica:
+    """
+    Crea, carga y pone a sondear la réplica si no existe.
+    Con 'ruta', arranca desde la instantánea en disco (si es válida, o la ya cargada con
+    load_replica_snapshot) y concilia con la BD en segundo plano; si no hay instantánea,
+    carga de la BD y la guarda para la próxima vez.
+    """
+    global replica, ruta_snapshot
+    if replica is None: load_replica_snapshot(intervalo_sondeo, ruta)
+    if replica is not None:
+        replica.iniciar_sondeo(inmediato=True) # Conciliar ya, solo con las diferencias (nada si ya sondea)
+        return replica
+    nueva = InventarioReplica(intervalo_sondeo)
+    ruta_snapshot = ruta
+    try:
+        nueva.cargar()
+    except (DatabaseError, Exception) as e:
+        logger.error(f"No se pudo cargar la réplica local: {e}")
+        raise
+    if ruta:
+        try: nueva.guardar_snapshot(ruta)
+        except OSError as e: logger.warning(f"No se pudo guardar la instantánea en {ruta}: {e}")
+    nueva.iniciar_sondeo()
+    replica = nueva
+    return replica
+
+def get_replica() -> Optional[InventarioReplica]:
+    """Devuelve la réplica si está cargada (None si está desactivada o falló)."""
+    return replica if replica is not None and replica.cargada else None
+
+def close_replica() -> None:
+    """Detiene el sondeo y guarda la instantánea para el próximo arranque."""
+    global replica
+    if replica is not None:
+        replica.detener_sondeo()
+        if ruta_snapshot:
+            try: replica.guardar_snapshot(ruta_snapshot)
+            except OSError as e: logger.warning(f"No se pudo guardar la instantánea en {ruta_snapshot}: {e}")
+        replica = None
+
+
+# --- Medición (python -m src.model.replica [productos ...]) ---
+
+def _benchmark_busqueda(n_productos: int, objetivo_ms: float = 1.0, repeticiones: int = 50) -> bool:
+    """
+    Mide buscar() sobre el catálogo sintético de src/api/simulado.py, sin BD.
+    Devuelve si todas las búsquedas con término y categoría quedan por debajo de 'objetivo_ms'.
+    """
+    import time
+    from src.api.simulado import AlmacenSimulado
+    almacen = AlmacenSimulado(n_productos)
+    replica = InventarioReplica()
+    replica._cargar_datos(almacen.leer_categorias(), list(almacen.productos.values()), datetime.now())
+    consultas = [("harina", None), ("a", None), ("pan 12", None),
+                 ("harina", 5), ("ma", 7), ("a", 2), ("pan", 2), ("magdalena", 3), ("azúcar moreno", 6), ("café 12", 8)]
+    cumple = True
+    print(f"{n_productos} productos (objetivo con categoría: {objetivo_ms} ms)")
+    for termino, id_categoria in consultas:
+        inicio = time.perf_counter()
+        replica.buscar(termino, id_categoria) # Primera vez: los términos de 1-2 letras arman su mapa
+        primera = (time.perf_counter() - inicio) * 1000
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = replica.buscar(termino, id_categoria)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        mediana = sorted(tiempos)[len(tiempos) // 2]
+        dentro = id_categoria is None or mediana < objetivo_ms
+        cumple = cumple and dentro
+        print(f"  {termino!r:16} categoría {str(id_categoria):4} {len(resultado):>7} resultados "
+              f"{mediana:8.3f} ms (primera {primera:7.1f} ms){'' if dentro else '  SUPERA EL OBJETIVO'}")
+    return cumple
+
+if __name__ == "__main__":
+    import sys
+    tamanos = [int(arg) for arg in sys.argv[1:]] or [100000]
+    resultados = [_benchmark_busqueda(tamano) for tamano in tamanos]
+    sys.exit(0 if all(resultados) else 1)
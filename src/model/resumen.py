@@ -0,0 +1,77 @@
+# src/model/resumen.py
+# Lectura y reconstrucción de resumen_categorias (sql/004_resumen_categorias.sql).
+# Las actualizaciones incrementales las hace ProductoDao en la misma transacción que cada escritura.
+from mysql.connector import Error
+# Asegúrate que database.py está accesible
+from database import get_database_connection, ConnectionError as DBConnectionError
+from typing import Any, Dict, List
+import logging
+
+# Asegúrate que src.model.producto está accesible
+from src.model.producto import DatabaseError
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+
+class ResumenDao:
+    """Objeto de Acceso a Datos para los totales por categoría."""
+
+    @staticmethod
+    def read_all() -> List[Dict[str, Any]]:
+        """
+        Totales por categoría (mismas claves que ProductoDao.read_stats) leídos del resumen:
+        una fila por categoría, sin importar el tamaño del catálogo.
+        """
+        conn = None
+        sql = """
+            SELECT r.id_categoria, c.nombre AS nombre_categoria, r.productos, r.unidades, r.valor, r.sin_stock
+            FROM resumen_categorias r
+            LEFT JOIN categorias c ON r.id_categoria = c.id_categoria
+            WHERE r.productos > 0
+            ORDER BY c.nombre
+        """
+        try:
+            conn = get_database_connection()
+            with conn.cursor(dictionary=True) as cur:
+                cur.execute(sql)
+                return cur.fetchall()
+        except Error as e:
+            logger.error(f"Error de BD ({e.errno}) al leer el resumen por categoría: {e.msg}")
+            raise DatabaseError(f"Error al leer el resumen por categoría: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
+
+    @staticmethod
+    def rebuild() -> int:
+        """
+        Recalcula el resumen entero desde productos en una transacción. Devuelve cuántas categorías escribió.
+        Primero bloquea (en modo compartido) los productos y después el resumen, en el mismo orden que las
+        escrituras: las que lleguen mientras tanto esperan al commit en lugar de interbloquearse.
+        """
+        conn = None
+        try:
+            conn = get_database_connection()
+            with conn.cursor() as cur:
+                conn.start_transaction()
+                cur.execute("""
+                    SELECT id_categoria, COUNT(*), SUM(cantidad), SUM(cantidad * valor_unidad), SUM(cantidad = 0)
+                    FROM productos
+                    GROUP BY id_categoria
+                    LOCK IN SHARE MODE""")
+                filas = cur.fetchall()
+                cur.execute("DELETE FROM resumen_categorias")
+                if filas:
+                    cur.executemany("INSERT INTO resumen_categorias (id_categoria, productos, unidades, valor, sin_stock) "
+                                    "VALUES (%s, %s, %s, %s, %s)", filas)
+                conn.commit()
+                logger.info(f"Resumen por categoría reconstruido: {len(filas)} categorías.")
+                return len(filas)
+        except Error as e:
+            if conn: conn.rollback()
+            logger.error(f"Error de BD ({e.errno}) al reconstruir el resumen por categoría: {e.msg}")
+            raise DatabaseError(f"Error al reconstruir el resumen por categoría: {e.msg}") from e
+        except DBConnectionError as ce: raise ce
+        finally:
+            if conn and conn.is_connected(): conn.close()
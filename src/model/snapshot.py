@@ -0,0 +1,115 @@
+# src/model/snapshot.py
+# Instantánea binaria del inventario (categorías + productos) para arrancar sin esperar a la BD.
+#
+# Formato (little-endian), pensado para leerse con mmap sin copiar el archivo:
+#   Cabecera: magic(8s) version(H) reservado(H) marca(d) n_categorias(I) n_productos(I) inicio_textos(Q) huella(16s)
+#   huella: de qué BD salió (host, puerto y nombre, ver huella_bd); con otra BD la instantánea se ignora
+#   Categorías: n_categorias registros fijos (id, off_nombre, len_nombre, off_desc, len_desc, stock_minimo)
+#   Productos:  n_productos registros fijos (id, cantidad, id_categoria, valor, off_nombre, len_nombre, actualizado_en, stock_minimo)
+#   stock_minimo = -1 si no tiene umbral propio (None)
+#   Textos: bloque UTF-8 al que apuntan los offsets (relativos a inicio_textos)
+import hashlib
+import mmap
+import os
+import struct
+import logging
+from datetime import datetime
+from typing import Optional, List, Tuple
+
+# Asegúrate que database.py y src.model.producto están accesibles
+from database import DB_CONFIG
+from src.model.producto import Producto, Categoria
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TAHONAIN"
+VERSION_ESQUEMA = 4 # Subir si cambia el formato: las instantáneas viejas se ignoran
+
+_CABECERA = struct.Struct("<8sHHdIIQ16s")
+_CATEGORIA = struct.Struct("<iIIIIi")
+_PRODUCTO = struct.Struct("<iqidIIdi") # actualizado_en como timestamp (0 = desconocido)
+_SIN_UMBRAL = -1
+
+
+def ruta_por_defecto() -> str:
+    """Ruta de la instantánea: INVENTARIO_SNAPSHOT o ~/.inventario_tahona.snap."""
+    return os.getenv("INVENTARIO_SNAPSHOT") or os.path.join(os.path.expanduser("~"), ".inventario_tahona.snap")
+
+
+def huella_bd() -> bytes:
+    """Identifica la BD configurada (host, puerto y nombre) para no cargar la instantánea de otra."""
+    origen = f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+    return hashlib.blake2b(origen.encode("utf-8"), digest_size=16).digest()
+
+
+def guardar_snapshot(ruta: str, categorias: List[Categoria], productos: List[Producto], marca: datetime,
+                     huella: bytes) -> None:
+    """Escribe la instantánea de forma atómica (archivo temporal + os.replace)."""
+    textos = bytearray()
+    def _texto(valor: Optional[str]) -> Tuple[int, int]:
+        if not valor: return 0, 0
+        datos = valor.encode("utf-8")
+        offset = len(textos); textos.extend(datos)
+        return offset, len(datos)
+
+    registros_cat = bytearray()
+    for cat in categorias:
+        registros_cat += _CATEGORIA.pack(cat.id_categoria, *_texto(cat.nombre), *_texto(cat.descripcion),
+                                         _SIN_UMBRAL if cat.stock_minimo is None else cat.stock_minimo)
+    registros_prod = bytearray()
+    for p in productos:
+        registros_prod += _PRODUCTO.pack(p.id_productos, p.cantidad, p.id_categoria, p.valor_unidad, *_texto(p.nombre),
+                                          p.actualizado_en.timestamp() if p.actualizado_en else 0.0,
+                                          _SIN_UMBRAL if p.stock_minimo is None else p.stock_minimo)
+
+    inicio_textos = _CABECERA.size + len(registros_cat) + len(registros_prod)
+    cabecera = _CABECERA.pack(MAGIC, VERSION_ESQUEMA, 0, marca.timestamp(), len(categorias), len(productos), inicio_textos,
+                              huella)
+    temporal = ruta + ".tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(temporal, "wb") as f:
+        f.write(cabecera); f.write(registros_cat); f.write(registros_prod); f.write(textos)
+    os.replace(temporal, ruta)
+    logger.info(f"Instantánea guardada en {ruta}: {len(productos)} productos, {len(categorias)} categorías.")
+
+
+def leer_snapshot(ruta: str, huella: bytes) -> Optional[Tuple[List[Categoria], List[Producto], datetime]]:
+    """
+    Lee la instantánea con mmap. Devuelve None si no existe, está corrupta, es de otra versión
+    o salió de otra BD (su huella no es 'huella'): los deltas nunca borrarían sus filas.
+    """
+    if not os.path.exists(ruta): return None
+    try:
+        with open(ruta, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+            magic, version, _, marca, n_cat, n_prod, inicio_textos, origen = _CABECERA.unpack_from(datos, 0)
+            if magic != MAGIC or version != VERSION_ESQUEMA:
+                logger.warning(f"Instantánea {ruta} ignorada (formato/versión {version} no compatible).")
+                return None
+            if origen != huella:
+                logger.warning(f"Instantánea {ruta} ignorada: es de otra base de datos.")
+                return None
+            vista = memoryview(datos)
+            try:
+                def _texto(offset: int, largo: int) -> Optional[str]:
+                    if not largo: return None
+                    inicio = inicio_textos + offset
+                    return str(vista[inicio:inicio + largo], "utf-8")
+
+                inicio = _CABECERA.size
+                fin = inicio + n_cat * _CATEGORIA.size
+                categorias = [Categoria(id_cat, _texto(o_nom, l_nom), _texto(o_desc, l_desc),
+                                        None if minimo == _SIN_UMBRAL else minimo)
+                              for id_cat, o_nom, l_nom, o_desc, l_desc, minimo in _CATEGORIA.iter_unpack(vista[inicio:fin])]
+                nombres_cat = {c.id_categoria: c.nombre for c in categorias}
+                inicio, fin = fin, fin + n_prod * _PRODUCTO.size
+                productos = [Producto(id_prod, _texto(o_nom, l_nom), cantidad, valor, id_cat, nombres_cat.get(id_cat),
+                                      datetime.fromtimestamp(marca_prod) if marca_prod else None,
+                                      None if minimo == _SIN_UMBRAL else minimo)
+                             for id_prod, cantidad, id_cat, valor, o_nom, l_nom, marca_prod, minimo in _PRODUCTO.iter_unpack(vista[inicio:fin])]
+            finally:
+                vista.release() # Necesario antes de cerrar el mmap
+        return categorias, productos, datetime.fromtimestamp(marca)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"No se pudo leer la instantánea {ruta}: {e}")
+        return None
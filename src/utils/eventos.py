@@ -0,0 +1,96 @@
+# src/utils/eventos.py
+# Bus de eventos de dominio (patrón Observer) entre controladores y vistas.
+# Los controladores publican qué cambió después de escribir en la BD; las vistas
+# suscritas parchean solo las filas afectadas en lugar de recargar todo el catálogo.
+# No depende de Tk: los suscriptores se ejecutan en el hilo que publica (hoy siempre
+# el hilo de Tk, porque las vistas llaman a los controladores desde sus callbacks).
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Type
+
+# Asegúrate que src.model.producto está accesible
+from src.model.producto import Producto, Categoria
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+
+class Evento:
+    """Base de todos los eventos de dominio."""
+    pass
+
+class EventoProducto(Evento):
+    """Base de los eventos de productos (suscribirse a esta clase recibe todos)."""
+    pass
+
+class ProductoCreado(EventoProducto):
+    def __init__(self, producto: Producto) -> None:
+        self.producto = producto # Con nombre_categoria ya resuelto
+
+class ProductoActualizado(EventoProducto):
+    def __init__(self, producto: Producto, id_anterior: int) -> None:
+        self.producto = producto
+        self.id_anterior = id_anterior # Distinto de producto.id_productos si cambió el ID
+
+class ProductoEliminado(EventoProducto):
+    def __init__(self, id_producto: int) -> None:
+        self.id_producto = id_producto
+
+class EventoCategoria(Evento):
+    """Base de los eventos de categorías."""
+    pass
+
+class CategoriaCreada(EventoCategoria):
+    def __init__(self, categoria: Categoria) -> None:
+        self.categoria = categoria
+
+class CategoriaActualizada(EventoCategoria):
+    def __init__(self, categoria: Categoria, nombre_anterior: Optional[str]) -> None:
+        self.categoria = categoria
+        self.nombre_anterior = nombre_anterior
+
+    @property
+    def renombrada(self) -> bool:
+        return self.nombre_anterior is not None and self.nombre_anterior != self.categoria.nombre
+
+class CategoriaEliminada(EventoCategoria):
+    def __init__(self, id_categoria: int, id_destino: int = 1) -> None:
+        self.id_categoria = id_categoria
+        self.id_destino = id_destino # Categoría a la que pasaron sus productos
+
+
+class BusEventos:
+    """Registro de suscriptores por tipo de evento (incluye subclases)."""
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._suscriptores: Dict[Type[Evento], List[Callable[[Evento], None]]] = {}
+
+    def suscribir(self, tipo: Type[Evento], callback: Callable[[Evento], None]) -> Callable[[], None]:
+        """Registra 'callback' para 'tipo' y sus subclases. Devuelve la función para desuscribirse."""
+        with self._lock:
+            self._suscriptores.setdefault(tipo, []).append(callback)
+        def desuscribir() -> None:
+            with self._lock:
+                callbacks = self._suscriptores.get(tipo, [])
+                if callback in callbacks: callbacks.remove(callback)
+        return desuscribir
+
+    def publicar(self, evento: Evento) -> None:
+        """Entrega el evento a los suscriptores. Un suscriptor que falla no afecta a los demás ni al que publica."""
+        with self._lock:
+            callbacks = [cb for tipo in type(evento).__mro__ for cb in self._suscriptores.get(tipo, ())]
+        for callback in callbacks:
+            try:
+                callback(evento)
+            except Exception as e:
+                logger.error(f"Error en suscriptor de {type(evento).__name__}: {e}", exc_info=True)
+
+
+# Bus único de la aplicación
+bus = BusEventos()
+
+def suscribir(tipo: Type[Evento], callback: Callable[[Evento], None]) -> Callable[[], None]:
+    return bus.suscribir(tipo, callback)
+
+def publicar(evento: Evento) -> None:
+    bus.publicar(evento)
@@ -0,0 +1,666 @@
+# src/utils/indices.py
+# Estructuras de búsqueda en memoria para nombres de productos.
+# Sin dependencias de tkinter ni de la BD: las usa la réplica (src/model/replica.py).
+import bisect
+import heapq
+import operator
+import unicodedata
+from itertools import accumulate, chain, compress, filterfalse, islice, repeat
+from typing import Dict, Set, List, Optional, Tuple, Iterable, Iterator, Union
+
+
+# Tabla para str.translate que borra los diacríticos combinables (U+0300-U+036F) tras NFKD
+_SIN_DIACRITICOS = dict.fromkeys(range(0x300, 0x370))
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas, sin tildes/diéresis y con espacios simples ('Pan de Maíz ' -> 'pan de maiz')."""
+    texto = texto.casefold()
+    if not texto.isascii(): # Camino rápido: la mayoría de nombres no llevan tildes
+        texto = unicodedata.normalize("NFKD", texto).translate(_SIN_DIACRITICOS)
+    return " ".join(texto.split())
+
+
+def _trigramas(texto: str) -> Set[str]:
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+# --- Listas de IDs ---
+# Los índices guardan sus listas de IDs como tuplas ordenadas de enteros o, las muy pobladas, como
+# mapas de bits (un int de Python con el bit i encendido por el ID i). A diferencia de set, ni unas
+# ni otros son contenedores que recorra el recolector de basura (las tuplas de enteros dejan de
+# seguirse en cuanto el GC las examina): cientos de miles de IDs indexados no encarecen las colecciones.
+# Los 'IDs' de estas listas son números consecutivos (ver _Ordinales), no id_productos: un mapa de
+# bits ocupa tanto como su mayor número, e id_productos puede llegar a 2^31.
+
+ListaIds = Union[Tuple[int, ...], int]
+
+_MIN_MAPA = 64 # Listas más cortas: siempre tupla
+
+def bits_de(ids: Iterable[int]) -> int:
+    """Mapa de bits con el bit i encendido por cada ID i (IDs no negativos)."""
+    ids = list(ids)
+    mapa = bytearray(max(ids, default=0) // 8 + 1)
+    for id_item in ids:
+        mapa[id_item >> 3] |= 1 << (id_item & 7)
+    return int.from_bytes(mapa, "little")
+
+
+def ids_de(bits: int) -> List[int]:
+    """IDs de un mapa de bits, de menor a mayor."""
+    # Los tramos de ceros entre unos dan la distancia entre IDs consecutivos (todo en C, sin bucle por bit)
+    tramos = format(bits, "b")[::-1].split("1")
+    tramos.pop()
+    return list(islice(accumulate(map(operator.add, map(len, tramos), repeat(1)), initial=-1), 1, None))
+
+
+def _lista_ids(ids: List[int]) -> ListaIds:
+    """
+    Representación más compacta de una lista ordenada de IDs: tupla (una referencia de 64 bits
+    por ID) o, si hay más de un ID por cada 64 posibles, mapa de bits (un bit por ID posible).
+    """
+    if len(ids) >= _MIN_MAPA and len(ids) * 64 > ids[-1]:
+        return bits_de(ids)
+    return tuple(ids)
+
+
+def _con_id(ids: ListaIds, id_item: int) -> ListaIds:
+    """La lista con 'id_item' añadido (las tuplas se copian: son cortas por construcción)."""
+    if isinstance(ids, int):
+        return ids | (1 << id_item)
+    posicion = bisect.bisect_left(ids, id_item)
+    if posicion < len(ids) and ids[posicion] == id_item: return ids
+    ids = ids[:posicion] + (id_item,) + ids[posicion:]
+    if len(ids) >= _MIN_MAPA and len(ids) * 64 > ids[-1]:
+        return bits_de(ids)
+    return ids
+
+
+def _sin_id(ids: ListaIds, id_item: int) -> ListaIds:
+    """La lista sin 'id_item' (vacía si era el último)."""
+    if isinstance(ids, int):
+        ids &= ~(1 << id_item)
+        # Vuelve a tupla a la mitad de la densidad que la hizo mapa (sin alternar en el umbral)
+        cuenta = bin(ids).count("1")
+        if cuenta < _MIN_MAPA // 2 or cuenta * 128 < ids.bit_length():
+            return tuple(ids_de(ids))
+        return ids
+    posicion = bisect.bisect_left(ids, id_item)
+    if posicion < len(ids) and ids[posicion] == id_item:
+        return ids[:posicion] + ids[posicion + 1:]
+    return ids
+
+
+def _iterar_ids(ids: ListaIds) -> Iterable[int]:
+    return ids_de(ids) if isinstance(ids, int) else ids
+
+
+class _Ordinales:
+    """
+    Números consecutivos (0, 1, 2...) para los IDs indexados, sobre los que se arman las listas y
+    mapas de bits: su tamaño sigue a cuántos IDs hay y no al mayor. Un ID conserva su número
+    mientras está indexado; los que quedan libres se reutilizan, empezando por el menor.
+    """
+    def __init__(self, ids: Iterable[int] = ()) -> None:
+        self._ids: Dict[int, int] = dict(enumerate(sorted(ids))) # número -> id
+        self._numeros: Dict[int, int] = {id_item: numero for numero, id_item in self._ids.items()} # id -> número
+        self._libres: List[int] = [] # Montículo de números libres
+
+    def __len__(self) -> int:
+        return len(self._numeros)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._numeros)
+
+    def numero(self, id_item: int) -> Optional[int]:
+        return self._numeros.get(id_item)
+
+    def asignar(self, id_item: int) -> int:
+        numero = self._numeros.get(id_item)
+        if numero is None:
+            numero = heapq.heappop(self._libres) if self._libres else len(self._ids)
+            self._ids[numero] = id_item; self._numeros[id_item] = numero
+        return numero
+
+    def liberar(self, id_item: int) -> Optional[int]:
+        numero = self._numeros.pop(id_item, None)
+        if numero is not None:
+            del self._ids[numero]
+            heapq.heappush(self._libres, numero)
+        return numero
+
+    def ids(self, numeros: Iterable[int]) -> List[int]:
+        return list(map(self._ids.__getitem__, numeros))
+
+    def mascara(self, ids: Iterable[int]) -> int:
+        """Mapa de bits de los números de 'ids' (los que no están indexados se ignoran)."""
+        return bits_de(numero for numero in map(self._numeros.get, ids) if numero is not None)
+
+
+class IndiceTrigramas:
+    """
+    Índice invertido de trigramas sobre nombres normalizados.
+
+    Responde búsquedas 'contiene' intersectando las listas de los trigramas del
+    término y verificando los candidatos. Las listas guardan el número de cada ID
+    (ver _Ordinales) y cada una es una tupla ordenada o,
+    para los trigramas frecuentes, un mapa de bits (ver _lista_ids): los mapas se
+    intersectan con un solo '&'. Dos tablas más, por las tres primeras letras del
+    texto y de cada palabra siguiente, dan ya separados los niveles de puntuar()
+    (prefijo, inicio de palabra) sin examinar cada coincidencia.
+    Se mantiene incrementalmente con agregar()/quitar(); para cargas masivas usar reconstruir().
+    """
+    MAX_CORTOS = 512 # Patrones de 1-2 letras cuyo resultado se guarda
+
+    def __init__(self) -> None:
+        self._ordinales = _Ordinales()           # id -> número en las listas y mapas de bits
+        self._postings: Dict[str, ListaIds] = {} # trigrama -> números (tupla ordenada o mapa de bits)
+        self._inicios: Dict[str, ListaIds] = {}  # tres primeras letras del texto -> números
+        self._palabras: Dict[str, ListaIds] = {} # tres primeras letras de cada palabra salvo la primera -> números
+        self._textos: Dict[int, str] = {}        # id -> texto normalizado
+        self._cortos: Set[int] = set()           # ids con texto de menos de 3 caracteres
+        self._por_longitud: Dict[int, int] = {}  # longitud del texto -> mapa de bits
+        self._por_corto: Dict[str, int] = {}     # patrón de 1-2 letras -> mapa de bits (ver _bits_corto)
+
+    def __len__(self) -> int:
+        return len(self._textos)
+
+    def texto(self, id_item: int) -> Optional[str]:
+        return self._textos.get(id_item)
+
+    def numero(self, id_item: int) -> Optional[int]:
+        """Número del ID en los mapas de bits del índice (ver mascara); lo conserva mientras está indexado."""
+        return self._ordinales.numero(id_item)
+
+    def mascara(self, ids: Iterable[int]) -> int:
+        """Mapa de bits de unos IDs, para restringir buscar() con 'entre'."""
+        return self._ordinales.mascara(ids)
+
+    def _ids_de(self, bits: int) -> List[int]:
+        """IDs de un mapa de bits de números, sin orden."""
+        return self._ordinales.ids(ids_de(bits))
+
+    @staticmethod
+    def _claves(normalizado: str) -> Tuple[Set[str], Set[str], Set[str]]:
+        """Trigramas, inicio del texto e inicios de las palabras siguientes bajo los que se indexa un texto."""
+        palabras = normalizado.split(" ")
+        inicio = {normalizado[:3]} if normalizado else set()
+        return _trigramas(normalizado), inicio, {palabra[:3] for palabra in palabras[1:]}
+
+    def _tablas(self) -> Tuple[Dict[str, ListaIds], Dict[str, ListaIds], Dict[str, ListaIds]]:
+        return self._postings, self._inicios, self._palabras
+
+    def reconstruir(self, items: Iterable[Tuple[int, str]]) -> None:
+        """Carga masiva desde (id, texto): agrupa por clave y elige la representación de cada lista una vez."""
+        self._textos = {id_item: normalizar_texto(texto) for id_item, texto in items}
+        self._ordinales = _Ordinales(self._textos) # Por orden de ID
+        self._cortos = {id_item for id_item, texto in self._textos.items() if len(texto) < 3}
+        self._por_corto = {}
+        por_longitud: Dict[int, List[int]] = {}
+        listas: Tuple[Dict[str, List[int]], ...] = ({}, {}, {})
+        for numero, id_item in enumerate(sorted(self._textos)):
+            texto = self._textos[id_item]
+            por_longitud.setdefault(len(texto), []).append(numero)
+            for grupos, claves in zip(listas, self._claves(texto)):
+                for clave in claves:
+                    grupos.setdefault(clave, []).append(numero)
+        self._por_longitud = {longitud: bits_de(numeros) for longitud, numeros in por_longitud.items()}
+        self._postings, self._inicios, self._palabras = (
+            {clave: _lista_ids(ids) for clave, ids in grupos.items()} for grupos in listas)
+
+    def agregar(self, id_item: int, texto: str) -> None:
+        """Indexa (o reindexa) un texto para el ID dado."""
+        if id_item in self._textos:
+            self.quitar(id_item)
+        normalizado = normalizar_texto(texto)
+        self._textos[id_item] = normalizado
+        numero = self._ordinales.asignar(id_item)
+        if len(normalizado) < 3:
+            self._cortos.add(id_item)
+        for tabla, claves in zip(self._tablas(), self._claves(normalizado)):
+            for clave in claves:
+                tabla[clave] = _con_id(tabla.get(clave, ()), numero)
+        self._por_longitud[len(normalizado)] = self._por_longitud.get(len(normalizado), 0) | (1 << numero)
+        marcado = "\n" + normalizado
+        for patron, bits in self._por_corto.items():
+            if patron in marcado: self._por_corto[patron] = bits | (1 << numero)
+
+    def quitar(self, id_item: int) -> None:
+        normalizado = self._textos.pop(id_item, None)
+        if normalizado is None: return
+        numero = self._ordinales.liberar(id_item)
+        self._cortos.discard(id_item)
+        for tabla, claves in zip(self._tablas(), self._claves(normalizado)):
+            for clave in claves:
+                ids = tabla.get(clave)
+                if ids is None: continue
+                ids = _sin_id(ids, numero)
+                if ids: tabla[clave] = ids
+                else: del tabla[clave]
+        bits = self._por_longitud[len(normalizado)] & ~(1 << numero)
+        if bits: self._por_longitud[len(normalizado)] = bits
+        else: del self._por_longitud[len(normalizado)]
+        marcado = "\n" + normalizado
+        for patron, bits in self._por_corto.items():
+            if patron in marcado: self._por_corto[patron] = bits & ~(1 << numero)
+
+    def _bits_corto(self, patron: str) -> int:
+        """
+        Mapa de bits de un patrón de 1-2 letras: 'ma' (contiene), '\nma' (el texto empieza así) o
+        ' ma' (una palabra siguiente empieza así); es lo que se busca en '\n' + texto.
+        Se calcula la primera vez y luego agregar()/quitar() lo mantienen al día.
+        """
+        bits = self._por_corto.get(patron)
+        if bits is not None: return bits
+        termino_n = patron.lstrip("\n ")
+        if patron == termino_n:
+            # Unir las listas de los trigramas que lo contienen (el vocabulario de trigramas
+            # es mucho menor que el catálogo), más los textos demasiado cortos para tener trigramas
+            bits = self._ordinales.mascara(i for i in self._cortos if termino_n in self._textos[i])
+            tabla = self._postings
+        else:
+            bits = 0
+            tabla = self._inicios if patron[0] == "\n" else self._palabras
+        for clave, ids in tabla.items():
+            if (termino_n in clave) if tabla is self._postings else clave.startswith(termino_n):
+                bits |= ids if isinstance(ids, int) else bits_de(ids)
+        if len(self._por_corto) >= self.MAX_CORTOS: self._por_corto.clear()
+        self._por_corto[patron] = bits
+        return bits
+
+    def _bits_inicio(self, marca: str, termino_n: str) -> int:
+        """Números cuyo texto ('\n') o alguna palabra siguiente (' ') empieza por las tres primeras letras del término."""
+        if len(termino_n) < 3:
+            return self._bits_corto(marca + termino_n)
+        ids = (self._inicios if marca == "\n" else self._palabras).get(termino_n[:3], ())
+        return ids if isinstance(ids, int) else bits_de(ids)
+
+    def _bits_candidatos(self, termino_n: str, mascara: Optional[int] = None) -> int:
+        """
+        Mapa de bits de los números (dentro de 'mascara') que tienen todos los trigramas del término
+        (ya normalizado y no vacío). Con más de 3 letras falta verificar que estén contiguos.
+        """
+        if len(termino_n) < 3:
+            bits = self._bits_corto(termino_n)
+            return bits if mascara is None else bits & mascara
+        bits = -1 if mascara is None else mascara # -1: todos los bits encendidos
+        arreglos: List[Tuple[int, ...]] = []
+        for trigrama in _trigramas(termino_n):
+            ids = self._postings.get(trigrama)
+            if ids is None: return 0
+            if isinstance(ids, int): bits &= ids
+            else: arreglos.append(ids)
+        if arreglos:
+            # Las tuplas son las listas cortas: intersectar desde la más corta y pasar a mapa
+            arreglos.sort(key=len)
+            comunes = set(arreglos[0])
+            for ids in arreglos[1:]:
+                comunes.intersection_update(ids)
+                if not comunes: return 0
+            bits &= bits_de(comunes)
+        return bits
+
+    def _filtrar(self, ids: List[int], patron: str) -> List[int]:
+        """Los IDs cuyo '\n' + texto contiene el patrón (comparaciones en C, sin bucle de Python)."""
+        textos = map(operator.add, repeat("\n"), map(self._textos.__getitem__, ids))
+        return list(compress(ids, map(operator.contains, textos, repeat(patron))))
+
+    def _coincidencias(self, termino_n: str, mascara: Optional[int] = None) -> List[int]:
+        """IDs, de menor a mayor, cuyo texto contiene el término (ya normalizado y no vacío), dentro de 'mascara'."""
+        resultado = sorted(self._ids_de(self._bits_candidatos(termino_n, mascara)))
+        if len(termino_n) <= 3:
+            return resultado # El término es su único trigrama (o menos): no hace falta verificar
+        # Tener todos los trigramas no garantiza que estén contiguos: verificar
+        return self._filtrar(resultado, termino_n)
+
+    def candidatos(self, termino: str, entre: Optional[Set[int]] = None) -> Set[int]:
+        """IDs (opcionalmente dentro de 'entre') cuyo texto contiene el término, sin orden."""
+        termino_n = normalizar_texto(termino)
+        if not termino_n:
+            return set(self._textos) if entre is None else set(entre)
+        ids = self._coincidencias(termino_n)
+        return set(ids) if entre is None else entre.intersection(ids)
+
+    def puntuar(self, id_item: int, termino_n: str) -> Tuple[int, int, int]:
+        """
+        Clave de orden por calidad de coincidencia (menor es mejor):
+        exacta, prefijo, inicio de palabra, en medio; después posición y longitud.
+        """
+        texto = self._textos[id_item]
+        if texto.startswith(termino_n):
+            return (0 if texto == termino_n else 1, 0, len(texto))
+        palabra = texto.find(" " + termino_n)
+        if palabra >= 0:
+            return (2, palabra + 1, len(texto))
+        return (3, texto.find(termino_n), len(texto))
+
+    def _mejores(self, bits: int, ids: List[int], termino_n: str, limite: int) -> List[int]:
+        """
+        Los 'limite' primeros de 'ids' (las coincidencias, con 'bits' sus candidatos) en el orden de puntuar()
+        y luego por ID. Los niveles salen de las tablas de inicios; el de prefijo se recorre por longitud
+        y en los otros heapq.nsmallest elige, solo si el cupo llega hasta ellos.
+        """
+        textos = self._textos.__getitem__
+        # Exacta o prefijo: clave (longitud, id), la exacta es la más corta. Recorrer las longitudes
+        # de menor a mayor y ordenar cada tramo por ID evita armar claves
+        mejores: List[int] = []
+        restantes = bits & self._bits_inicio("\n", termino_n)
+        for longitud in sorted(self._por_longitud):
+            if not restantes: break
+            if longitud < len(termino_n): continue
+            tramo = restantes & self._por_longitud[longitud]
+            if not tramo: continue
+            restantes &= ~tramo
+            mejores += sorted(self._filtrar(self._ids_de(tramo), "\n" + termino_n))[:limite - len(mejores)]
+            if len(mejores) >= limite: return mejores
+        # Inicio de una palabra siguiente: clave (posición de la palabra, longitud, id)
+        vistos = set(mejores)
+        nivel = self._filtrar(list(filterfalse(vistos.__contains__, self._ids_de(bits & self._bits_inicio(" ", termino_n)))),
+                              " " + termino_n)
+        posiciones = map(str.find, map(textos, nivel), repeat(" " + termino_n))
+        mejores += [i for _, _, i in heapq.nsmallest(limite - len(mejores), zip(posiciones, map(len, map(textos, nivel)), nivel))]
+        if len(mejores) >= limite: return mejores
+        # En medio de una palabra: clave (posición, longitud, id)
+        vistos.update(mejores)
+        nivel = list(filterfalse(vistos.__contains__, ids))
+        posiciones = map(str.find, map(textos, nivel), repeat(termino_n))
+        mejores += [i for _, _, i in heapq.nsmallest(limite - len(mejores), zip(posiciones, map(len, map(textos, nivel)), nivel))]
+        return mejores
+
+    def buscar(self, termino: str, entre: Union[Set[int], int, None] = None, limite: Optional[int] = None) -> List[int]:
+        """
+        IDs que contienen el término, ordenados por calidad de coincidencia (y luego por ID).
+        'entre' restringe a un conjunto de IDs o a su mapa de bits (ver mascara) antes de ordenar.
+        Con 'limite', solo los 'limite' mejores van en ese orden y el resto sigue por ID: una tabla
+        muestra una ventana, y puntuar miles de coincidencias en cada tecla no cabe en un milisegundo.
+        """
+        termino_n = normalizar_texto(termino)
+        mascara = entre if entre is None or isinstance(entre, int) else self.mascara(entre)
+        if not termino_n:
+            return sorted(self._textos) if mascara is None else sorted(self._ids_de(mascara))
+        bits = self._bits_candidatos(termino_n, mascara)
+        ids = sorted(self._ids_de(bits))
+        if len(termino_n) > 3: ids = self._filtrar(ids, termino_n)
+        if limite is None or len(ids) <= limite:
+            return sorted(ids, key=lambda i: self.puntuar(i, termino_n)) # Estable: los empates quedan por ID
+        mejores = self._mejores(bits, ids, termino_n, limite)
+        elegidos = set(mejores)
+        return mejores + list(filterfalse(elegidos.__contains__, ids))
+
+
+class _EntradasOrdenadas:
+    """
+    Lista ordenada de (clave, id) guardada en bloques (tuplas) de hasta 2 * BLOQUE entradas.
+    El GC solo recorre la lista de bloques, no cada entrada; insertar o borrar copia un bloque.
+    """
+    BLOQUE = 512
+
+    def __init__(self, entradas: Iterable[Tuple[str, int]] = ()) -> None:
+        entradas = sorted(entradas)
+        self._bloques: List[Tuple[Tuple[str, int], ...]] = [
+            tuple(entradas[i:i + self.BLOQUE]) for i in range(0, len(entradas), self.BLOQUE)]
+        self._primeras: List[Tuple[str, int]] = [bloque[0] for bloque in self._bloques] # Para bisect entre bloques
+
+    def _bloque_de(self, entrada: Tuple[str, int]) -> int:
+        return max(bisect.bisect_right(self._primeras, entrada) - 1, 0)
+
+    def insertar(self, entrada: Tuple[str, int]) -> None:
+        if not self._bloques:
+            self._bloques.append((entrada,)); self._primeras.append(entrada)
+            return
+        n = self._bloque_de(entrada)
+        bloque = self._bloques[n]
+        posicion = bisect.bisect_left(bloque, entrada)
+        bloque = bloque[:posicion] + (entrada,) + bloque[posicion:]
+        if len(bloque) > 2 * self.BLOQUE:
+            mitad = len(bloque) // 2
+            self._bloques[n:n + 1] = [bloque[:mitad], bloque[mitad:]]
+            self._primeras[n:n + 1] = [bloque[0], bloque[mitad]]
+        else:
+            self._bloques[n] = bloque; self._primeras[n] = bloque[0]
+
+    def quitar(self, entrada: Tuple[str, int]) -> None:
+        if not self._bloques: return
+        n = self._bloque_de(entrada)
+        bloque = self._bloques[n]
+        posicion = bisect.bisect_left(bloque, entrada)
+        if posicion == len(bloque) or bloque[posicion] != entrada: return
+        bloque = bloque[:posicion] + bloque[posicion + 1:]
+        if bloque:
+            self._bloques[n] = bloque; self._primeras[n] = bloque[0]
+        else:
+            del self._bloques[n]; del self._primeras[n]
+
+    def desde(self, entrada: Tuple[str, int]) -> Iterator[Tuple[str, int]]:
+        """Entradas >= 'entrada', en orden."""
+        if not self._bloques: return iter(())
+        n = self._bloque_de(entrada)
+        bloque = self._bloques[n]
+        primero = bloque[bisect.bisect_left(bloque, entrada):]
+        return chain(primero, chain.from_iterable(islice(self._bloques, n + 1, None)))
+
+
+class IndicePrefijos:
+    """
+    Autocompletado por prefijo: lista ordenada de (clave, id) consultada con bisect.
+
+    Cada ID aporta su texto normalizado completo, cada sufijo que empieza en una
+    palabra ('maiz' para 'pan de maiz') y, si se indica, claves extra (p. ej. el ID
+    como texto). Altas y bajas sueltas son inserciones con bisect; para cargas
+    masivas usar reconstruir(), que ordena una sola vez.
+    """
+    def __init__(self) -> None:
+        self._entradas = _EntradasOrdenadas()
+        self._claves: Dict[int, Tuple[str, ...]] = {} # id -> claves que aporta
+        self._textos: Dict[int, str] = {}        # id -> texto normalizado completo
+
+    def __len__(self) -> int:
+        return len(self._claves)
+
+    @staticmethod
+    def _claves_de(normalizado: str, extras: Tuple[str, ...]) -> Tuple[str, ...]:
+        palabras = normalizado.split(" ")
+        claves = {" ".join(palabras[i:]) for i in range(len(palabras))}
+        claves.update(normalizar_texto(extra) for extra in extras)
+        claves.discard("")
+        return tuple(sorted(claves))
+
+    def reconstruir(self, items: Iterable[Tuple[int, str, Tuple[str, ...]]]) -> None:
+        """Carga masiva desde (id, texto, claves_extra)."""
+        items = list(items)
+        self._textos = {id_item: normalizar_texto(texto) for id_item, texto, _ in items}
+        self._claves = {id_item: self._claves_de(self._textos[id_item], extras) for id_item, _, extras in items}
+        self._entradas = _EntradasOrdenadas((clave, id_item) for id_item, claves in self._claves.items() for clave in claves)
+
+    def agregar(self, id_item: int, texto: str, extras: Tuple[str, ...] = ()) -> None:
+        if id_item in self._claves:
+            self.quitar(id_item)
+        self._textos[id_item] = normalizar_texto(texto)
+        claves = self._claves_de(self._textos[id_item], extras)
+        self._claves[id_item] = claves
+        for clave in claves:
+            self._entradas.insertar((clave, id_item))
+
+    def quitar(self, id_item: int) -> None:
+        self._textos.pop(id_item, None)
+        for clave in self._claves.pop(id_item, ()):
+            self._entradas.quitar((clave, id_item))
+
+    def completar(self, prefijo: str, limite: int = 10) -> List[int]:
+        """
+        Hasta 'limite' IDs cuya clave empieza por el prefijo, sin repetir.
+        Primero las coincidencias exactas y al inicio del texto; luego el resto en orden alfabético.
+        """
+        prefijo_n = normalizar_texto(prefijo)
+        if not prefijo_n or limite <= 0: return []
+        exactos: List[int] = []
+        iniciales: List[int] = []
+        otros: List[int] = []
+        vistos: Set[int] = set()
+        # Se examina una ventana acotada: el coste no depende del tamaño del catálogo
+        maximo = limite * 8
+        for clave, id_item in islice(self._entradas.desde((prefijo_n, -1)), maximo):
+            if not clave.startswith(prefijo_n): break
+            if id_item in vistos: continue
+            vistos.add(id_item)
+            texto = self._textos[id_item]
+            es_sufijo = clave != texto and texto.endswith(" " + clave)
+            if clave == prefijo_n and not es_sufijo: exactos.append(id_item) # Texto o ID exacto
+            elif clave == texto: iniciales.append(id_item)
+            else: otros.append(id_item)
+        return (exactos + iniciales + otros)[:limite]
+
+
+def distancia_edicion(a: str, b: str, limite: Optional[int] = None) -> int:
+    """
+    Distancia de Levenshtein entre a y b. Con 'limite', corta en cuanto se sabe
+    que la distancia lo supera y devuelve limite + 1.
+    """
+    if a == b: return 0
+    if len(a) < len(b): a, b = b, a
+    if limite is not None and len(a) - len(b) > limite: return limite + 1
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        if limite is not None and min(actual) > limite: return limite + 1
+        anterior = actual
+    return anterior[-1]
+
+
+class DiccionarioBorrados:
+    """
+    Diccionario de borrados al estilo SymSpell sobre un vocabulario de palabras.
+
+    Cada palabra se registra bajo todas sus variantes con hasta 'max_distancia'
+    letras borradas. Dos palabras a distancia de Levenshtein <= d comparten alguna
+    variante, así que una búsqueda solo verifica las palabras que salen de las
+    variantes del término, en lugar de recorrer todo el vocabulario.
+    Las palabras se numeran por orden de llegada y cada variante guarda una lista
+    de esos números (ver _lista_ids). Solo admite inserciones.
+    """
+    def __init__(self, max_distancia: int = 2) -> None:
+        self.max_distancia = max_distancia
+        self._borrados: Dict[str, ListaIds] = {} # variante -> números de las palabras que la generan
+        self._palabras: Dict[str, int] = {}      # palabra -> número
+        self._lista: List[str] = []              # número -> palabra
+
+    def __len__(self) -> int:
+        return len(self._palabras)
+
+    @staticmethod
+    def _variantes(palabra: str, distancia: int) -> Set[str]:
+        variantes = {palabra}
+        frontera = {palabra}
+        for _ in range(distancia):
+            frontera = {v[:i] + v[i + 1:] for v in frontera for i in range(len(v))}
+            variantes |= frontera
+        return variantes
+
+    def reconstruir(self, palabras: Iterable[str]) -> None:
+        """Carga masiva del vocabulario: agrupa por variante y elige la representación de cada lista una vez."""
+        self._lista = list(dict.fromkeys(palabras))
+        self._palabras = {palabra: numero for numero, palabra in enumerate(self._lista)}
+        grupos: Dict[str, List[int]] = {}
+        for numero, palabra in enumerate(self._lista):
+            for variante in self._variantes(palabra, self.max_distancia):
+                grupos.setdefault(variante, []).append(numero)
+        self._borrados = {variante: _lista_ids(numeros) for variante, numeros in grupos.items()}
+
+    def agregar(self, palabra: str) -> None:
+        if palabra in self._palabras: return
+        numero = self._palabras[palabra] = len(self._lista)
+        self._lista.append(palabra)
+        for variante in self._variantes(palabra, self.max_distancia):
+            self._borrados[variante] = _con_id(self._borrados.get(variante, ()), numero)
+
+    def buscar(self, palabra: str, tolerancia: int) -> List[Tuple[str, int]]:
+        """Palabras a distancia <= tolerancia, como (palabra, distancia)."""
+        tolerancia = min(tolerancia, self.max_distancia)
+        numeros: Set[int] = set()
+        for variante in self._variantes(palabra, tolerancia):
+            numeros.update(_iterar_ids(self._borrados.get(variante, ())))
+        encontradas = []
+        for candidata in map(self._lista.__getitem__, numeros):
+            distancia = distancia_edicion(palabra, candidata, tolerancia)
+            if distancia <= tolerancia:
+                encontradas.append((candidata, distancia))
+        return encontradas
+
+
+class IndiceDifuso:
+    """
+    Búsqueda tolerante a errores de tipeo por palabras ('azucar morena' -> 'Azúcar Moreno').
+
+    Cada palabra del término se corrige contra el vocabulario de nombres con un
+    DiccionarioBorrados; un producto coincide si contiene una palabra cercana para cada palabra
+    del término y la suma de distancias no supera el presupuesto.
+    """
+    def __init__(self, max_distancia: int = 2) -> None:
+        self._vocabulario = DiccionarioBorrados(max_distancia)
+        self._ordinales = _Ordinales()               # id -> número en las listas
+        self._por_palabra: Dict[str, ListaIds] = {} # palabra -> números (vacía = palabra retirada)
+        self._textos: Dict[int, str] = {}            # id -> texto normalizado
+
+    def __len__(self) -> int:
+        return len(self._textos)
+
+    def reconstruir(self, items: Iterable[Tuple[int, str]]) -> None:
+        """Carga masiva desde (id, texto)."""
+        self._textos = {id_item: normalizar_texto(texto) for id_item, texto in items}
+        self._ordinales = _Ordinales(self._textos)
+        grupos: Dict[str, List[int]] = {}
+        for numero, id_item in enumerate(sorted(self._textos)):
+            for palabra in set(self._textos[id_item].split()):
+                grupos.setdefault(palabra, []).append(numero)
+        self._vocabulario = DiccionarioBorrados(self._vocabulario.max_distancia)
+        self._vocabulario.reconstruir(grupos)
+        self._por_palabra = {palabra: _lista_ids(ids) for palabra, ids in grupos.items()}
+
+    def agregar(self, id_item: int, texto: str) -> None:
+        if id_item in self._textos:
+            self.quitar(id_item)
+        normalizado = normalizar_texto(texto)
+        self._textos[id_item] = normalizado
+        numero = self._ordinales.asignar(id_item)
+        for palabra in set(normalizado.split()):
+            ids = self._por_palabra.get(palabra)
+            if ids is None:
+                ids = ()
+                self._vocabulario.agregar(palabra)
+            self._por_palabra[palabra] = _con_id(ids, numero)
+
+    def quitar(self, id_item: int) -> None:
+        # Las palabras que quedan sin productos siguen en el vocabulario (no admite borrado),
+        # pero sus conjuntos vacíos no aportan resultados
+        numero = self._ordinales.liberar(id_item)
+        if numero is None: return
+        for palabra in set(self._textos.pop(id_item).split()):
+            ids = self._por_palabra.get(palabra)
+            if ids is not None: self._por_palabra[palabra] = _sin_id(ids, numero)
+
+    @staticmethod
+    def tolerancia_palabra(palabra: str, max_distancia: int) -> int:
+        """Errores admitidos por palabra: ninguno en palabras muy cortas, uno cada 3 letras."""
+        return min(max_distancia, len(palabra) // 3)
+
+    def buscar(self, termino: str, max_distancia: int = 2, entre: Optional[Set[int]] = None) -> List[Tuple[int, int]]:
+        """(id, distancia total) de los productos dentro del presupuesto, de más a menos parecido."""
+        palabras = normalizar_texto(termino).split()
+        if not palabras: return []
+        total: Optional[Dict[int, int]] = None
+        for palabra in palabras:
+            tolerancia = self.tolerancia_palabra(palabra, max_distancia)
+            mejores: Dict[int, int] = {} # id -> menor distancia para esta palabra
+            for cercana, distancia in self._vocabulario.buscar(palabra, tolerancia):
+                for id_item in self._ordinales.ids(_iterar_ids(self._por_palabra.get(cercana, ()))):
+                    if distancia < mejores.get(id_item, tolerancia + 1):
+                        mejores[id_item] = distancia
+            if total is None:
+                total = mejores if entre is None else {i: d for i, d in mejores.items() if i in entre}
+            else:
+                total = {i: d + mejores[i] for i, d in total.items() if i in mejores}
+            total = {i: d for i, d in total.items() if d <= max_distancia}
+            if not total: return []
+        return sorted(total.items(), key=lambda par: (par[1], len(self._textos[par[0]]), par[0]))
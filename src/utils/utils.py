@@ -1,8 +1,10 @@
 # src/utils/utils.py
 import tkinter as tk
 from tkinter import ttk, messagebox
+import locale
 import logging
-from typing import Optional, List, Dict, Any # Asegurarse que List está importado
+import time
+from typing import Optional, List, Dict, Any, Callable, Tuple # Asegurarse que List está importado
 # Importar Producto para type hinting
 # Necesitamos saber la estructura del objeto Producto que recibimos
 # Asume que src.model.producto está accesible
@@ -20,8 +22,12 @@ def populate_treeview(tree: ttk.Treeview, productos: List[Producto]) -> None:
         tree: El widget ttk.Treeview a llenar.
         productos: Una lista de objetos Producto (que deben tener el atributo nombre_categoria).
     """
-    # Limpiar primero
-    clear_treeview(tree)
+    # Grilla virtual: guardar las filas y pintar solo la parte visible
+    virtual_grid = getattr(tree, "virtual_grid", None)
+    if virtual_grid is not None:
+        keys, rows = product_rows(productos)
+        virtual_grid.set_rows(rows, keys, reset_scroll=False)
+        return
 
     try:
         if not isinstance(tree, ttk.Treeview):
@@ -29,46 +35,19 @@ def populate_treeview(tree: ttk.Treeview, productos: List[Producto]) -> None:
             logger.error("populate_treeview recibió algo que no es un Treeview.")
             return
 
-        # Verificar si hay productos
-        if not productos:
-            # logger.info("No hay productos para mostrar en el Treeview") # Puede ser muy verboso
+        # Columnas esperadas: ('id_productos', 'nombre', 'cantidad', 'categoria')
+        columns = tree['columns']
+        if len(columns) != 4:
+            logger.error(f"Discrepancia entre valores (4) y columnas ({len(columns)}) del Treeview. Columnas: {columns}")
             return
 
-        # Insertar los productos en el Treeview
-        for i, producto in enumerate(productos): # Usar enumerate para alternar filas
-            # Obtener el nombre de la categoría, usar 'Sin Categoría' si es None o vacío
-            # El DAO ya debería devolver 'Sin Categoría' si id=1, o el nombre correcto.
-            # Si nombre_categoria es None (por un LEFT JOIN fallido o dato inconsistente), mostrar algo.
-            categoria_nombre = producto.nombre_categoria if producto.nombre_categoria else "N/A"
-
-            # Obtener las columnas definidas en el Treeview para asegurar el orden correcto
-            columns = tree['columns']
-            # Crear tupla de valores en el orden de las columnas
-            # Asumiendo columnas: ('id_productos', 'nombre', 'cantidad', 'categoria')
-            # Ajustar si el orden o nombres de columnas en el Treeview son diferentes
-            values_tuple = (
-                producto.id_productos,
-                producto.nombre,
-                producto.cantidad,
-                categoria_nombre # Asegurarse que esta es la 4ta columna definida
-            )
-
-            # Verificar si el número de valores coincide con las columnas
-            if len(values_tuple) != len(columns):
-                 logger.error(f"Discrepancia entre valores ({len(values_tuple)}) y columnas ({len(columns)}) del Treeview. Columnas: {columns}")
-                 # Podríamos omitir esta fila o detenernos
-                 continue # Omitir esta fila
-
-            # Añadir tags para estilo de filas alternas (opcional)
-            tag = 'oddrow' if i % 2 else 'evenrow'
-            tree.insert("", tk.END, values=values_tuple, tags=(tag,))
-
-        # Configurar estilo de filas alternas (hacerlo una vez después del bucle)
+        # Reconciliar con lo que ya está en pantalla en vez de borrar y reinsertar todo
+        reconcile_treeview(tree, *apply_sort(tree, *product_rows(productos)))
+
+        # Configurar estilo de filas alternas
         tree.tag_configure('oddrow', background='#f0f0f0') # Gris claro
         tree.tag_configure('evenrow', background='#ffffff') # Blanco
 
-        # logger.info(f"Treeview actualizado con {len(productos)} productos") # Log verboso
-
     except AttributeError as ae:
          # Error si el objeto Producto no tiene alguno de los atributos esperados
          logger.error(f"Error de atributo al poblar Treeview (¿falta atributo en Producto?): {ae}", exc_info=True)
@@ -77,24 +56,466 @@ def populate_treeview(tree: ttk.Treeview, productos: List[Producto]) -> None:
         logger.error(f"Error general al actualizar Treeview: {e}", exc_info=True)
         # No mostrar messagebox aquí, la función que llama debería manejar errores de carga
 
+def product_rows(productos: List[Producto], pendientes: Optional[Dict[int, int]] = None) -> Tuple[List[int], List[tuple]]:
+    """
+    Claves y filas de la tabla principal: (id, nombre, cantidad, categoría).
+    'pendientes' son los ajustes aún sin escribir en la BD (cola de ajustes): se suman a la cantidad
+    para que la tabla muestre lo que el usuario ya tocó. No toca Tk, así que puede calcularse en un hilo de trabajo.
+    """
+    pendientes = pendientes or {}
+    keys = [p.id_productos for p in productos]
+    rows = [(p.id_productos, p.nombre, p.cantidad + pendientes.get(p.id_productos, 0),
+             p.nombre_categoria if p.nombre_categoria else "N/A")
+            for p in productos]
+    return keys, rows
+
 def clear_treeview(tree: ttk.Treeview) -> None:
    """Limpia todos los items de un Treeview de forma segura."""
+   virtual_grid = getattr(tree, "virtual_grid", None)
+   if virtual_grid is not None:
+       virtual_grid.set_rows([], [])
+       return
+   if tree is not None and getattr(tree, "reconcile_state", None) is not None:
+       tree.reconcile_state = None # Lo que reconcile_treeview recordaba ya no está
    if tree and isinstance(tree, ttk.Treeview): # Verificar que es un Treeview válido
-       # Obtener los items antes de iterar, ya que la lista cambia durante el borrado
        items_to_delete = tree.get_children()
        if items_to_delete:
-           # logger.debug(f"Limpiando {len(items_to_delete)} items del Treeview...")
-           for item in items_to_delete:
-               try:
-                   if tree.exists(item): # Verificar si el item aún existe antes de borrar
-                       tree.delete(item)
-               except tk.TclError as e:
-                   # Puede ocurrir si el item ya fue borrado o el treeview está siendo destruido
-                   logger.warning(f"Error menor al limpiar treeview (item {item}): {e}")
-                   pass # Intentar continuar limpiando el resto
-           # logger.debug("Treeview limpiado.")
-   # else:
-   #      logger.warning("clear_treeview recibió un objeto None o inválido.")
+           try:
+               tree.delete(*items_to_delete) # Una sola llamada a Tcl para todos los items
+           except tk.TclError as e:
+               # Puede ocurrir si algún item ya fue borrado o el treeview está siendo destruido
+               logger.warning(f"Error menor al limpiar treeview: {e}")
+               for item in items_to_delete: # Caer al borrado uno a uno de lo que quede
+                   if tree.exists(item): tree.delete(item)
+
+
+# --- Inserción por lotes ---
+
+INSERT_CHUNK_ROWS = 2000 # Filas por llamada a Tcl (evita listas gigantes de una sola vez)
+
+# Procedimiento Tcl que inserta una lista de filas {valores tag} en un solo viaje
+_INSERT_ROWS_PROC = "::tahona_insert_rows"
+_INSERT_ROWS_TCL = """
+proc ::tahona_insert_rows {w index rows} {
+    set ids {}
+    foreach row $rows {
+        lappend ids [$w insert {} $index -values [lindex $row 0] -tags [lindex $row 1]]
+        if {$index ne "end"} {incr index}
+    }
+    return $ids
+}
+"""
+
+def insert_rows(tree: ttk.Treeview, rows: List[tuple], tags: Optional[List[str]] = None,
+                index: Any = tk.END, chunk_size: int = INSERT_CHUNK_ROWS) -> List[str]:
+    """
+    Inserta muchas filas con pocas llamadas a Tcl (una por bloque de chunk_size).
+
+    Args:
+        rows: Valores de cada fila, en el orden de las columnas del Treeview.
+        tags: Tag de cada fila; por defecto 'evenrow'/'oddrow' alternados según la posición.
+        index: Posición de la primera fila (entero o tk.END).
+    Returns:
+        Los IDs de item creados, en el mismo orden que rows.
+    """
+    root = tree._root()
+    if not getattr(root, "_insert_rows_ready", False): # Definir el proc una vez por intérprete
+        tree.tk.eval(_INSERT_ROWS_TCL)
+        root._insert_rows_ready = True
+    if tags is None:
+        first = 0 if index == tk.END else int(index)
+        tags = ['oddrow' if (first + i) % 2 else 'evenrow' for i in range(len(rows))]
+    items: List[str] = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = [(values, tag) for values, tag in zip(rows[start:start + chunk_size], tags[start:start + chunk_size])]
+        position = index if index == tk.END else int(index) + start
+        items.extend(tree.tk.splitlist(tree.tk.call(_INSERT_ROWS_PROC, tree._w, position, chunk)))
+    return items
+
+class _ReconcileState:
+    """Lo que populate dejó en pantalla: orden de claves, clave -> item y clave -> (valores, tag)."""
+    __slots__ = ("order", "items", "shown")
+    def __init__(self) -> None:
+        self.order: List[Any] = []
+        self.items: Dict[Any, str] = {}
+        self.shown: Dict[Any, tuple] = {}
+
+def reconcile_treeview(tree: ttk.Treeview, keys: List[Any], rows: List[tuple]) -> Dict[Any, str]:
+    """
+    Lleva el Treeview al resultado (keys, rows) tocando solo lo que cambió.
+
+    Borra las filas que ya no están (en una sola llamada), actualiza los valores
+    distintos, inserta las nuevas en su posición y solo mueve items si el orden
+    relativo de las filas que se mantienen cambió. Así se conservan el desplazamiento
+    y la selección. Devuelve el mapa clave -> item resultante.
+    """
+    state: Optional[_ReconcileState] = getattr(tree, "reconcile_state", None)
+    # Si alguien manipuló los items por fuera, el estado ya no es fiable: empezar de cero
+    if state is None or len(state.order) != len(tree.get_children()):
+        clear_treeview(tree)
+        state = tree.reconcile_state = _ReconcileState()
+    try:
+        return _apply_reconcile(tree, state, keys, rows)
+    except tk.TclError as e:
+        # Un item recordado fue borrado por fuera: reconstruir desde cero
+        logger.warning(f"Estado de reconciliación inválido ({e}); se reconstruye el Treeview.")
+        clear_treeview(tree)
+        state = tree.reconcile_state = _ReconcileState()
+        return _apply_reconcile(tree, state, keys, rows)
+
+def _apply_reconcile(tree: ttk.Treeview, state: _ReconcileState, keys: List[Any], rows: List[tuple]) -> Dict[Any, str]:
+    new_index = {key: i for i, key in enumerate(keys)}
+    stale = [state.items[key] for key in state.order if key not in new_index]
+    if stale:
+        tree.delete(*stale)
+    for key in state.order:
+        if key not in new_index:
+            del state.items[key]; del state.shown[key]
+
+    survivors = [key for key in state.order if key in new_index]
+    reorder = survivors != [key for key in keys if key in state.items]
+
+    run_start = None # Inicio del tramo actual de filas nuevas (se insertan juntas)
+    for i, (key, values) in enumerate(zip(keys, rows)):
+        shown = (values, 'oddrow' if i % 2 else 'evenrow')
+        item = state.items.get(key)
+        if item is None:
+            if run_start is None: run_start = i
+        else:
+            if run_start is not None:
+                _insert_run(tree, state, keys, rows, run_start, i)
+                run_start = None
+            if reorder:
+                tree.move(item, "", i)
+            if state.shown[key] != shown:
+                tree.item(item, values=values, tags=(shown[1],))
+        state.shown[key] = shown
+    if run_start is not None:
+        _insert_run(tree, state, keys, rows, run_start, len(keys))
+    state.order = list(keys)
+    return state.items
+
+def _insert_run(tree: ttk.Treeview, state: _ReconcileState, keys: List[Any], rows: List[tuple], start: int, end: int) -> None:
+    """Inserta en bloque las filas nuevas keys[start:end] a partir de la posición start."""
+    items = insert_rows(tree, rows[start:end], index=start) # Los tags alternos se calculan desde start
+    for key, item in zip(keys[start:end], items):
+        state.items[key] = item
+
+
+def _remember_rows(tree: ttk.Treeview, keys: List[Any], rows: List[tuple], items: List[str]) -> None:
+    """Deja el estado de reconciliación como si reconcile_treeview hubiera insertado estas filas."""
+    state = tree.reconcile_state = _ReconcileState()
+    state.order = list(keys)
+    state.items = dict(zip(keys, items))
+    state.shown = {key: (values, 'oddrow' if i % 2 else 'evenrow') for i, (key, values) in enumerate(zip(keys, rows))}
+
+
+# --- Pintado progresivo ---
+
+RENDER_SLICE_MS = 12     # Tiempo máximo de inserción por tramo antes de devolver el control a Tk
+RENDER_FIRST_ROWS = 200  # Filas que se muestran de inmediato (y umbral para pintar todo de una vez)
+
+class ProgressiveRenderer:
+    """
+    Llena un Treeview grande por tramos programados con after_idle, para no congelar la ventana.
+
+    Las primeras filas se muestran en el acto; el resto se inserta en tramos de como
+    mucho RENDER_SLICE_MS ms (el tamaño del lote se ajusta a la velocidad medida).
+    Un nuevo start() cancela el pintado en curso. on_progress(hechas, total) permite
+    mostrar el avance; si se pasa un Progressbar, se muestra y oculta solo (grid/grid_remove).
+    Con grilla virtual o resultados pequeños no hace falta trocear: se aplica directamente.
+    """
+    def __init__(self, tree: ttk.Treeview, progressbar: Optional[ttk.Progressbar] = None,
+                 on_progress: Optional[Callable[[int, int], None]] = None):
+        self.tree = tree
+        self.progressbar = progressbar
+        self.on_progress = on_progress
+        self._after_id: Optional[str] = None
+        self._keys: List[Any] = []
+        self._rows: List[tuple] = []
+        self._items: List[str] = []
+        self._batch = RENDER_FIRST_ROWS
+
+    @property
+    def running(self) -> bool:
+        return self._after_id is not None
+
+    def start(self, keys: List[Any], rows: List[tuple]) -> None:
+        """Muestra (keys, rows) en el Treeview, cancelando cualquier pintado anterior."""
+        self.cancel()
+        virtual_grid = getattr(self.tree, "virtual_grid", None)
+        if virtual_grid is not None:
+            virtual_grid.set_rows(rows, keys, reset_scroll=False) # Solo pinta lo visible
+            self._report(len(rows), len(rows))
+            return
+        keys, rows = apply_sort(self.tree, keys, rows)
+        state: Optional[_ReconcileState] = getattr(self.tree, "reconcile_state", None)
+        new_rows = len(rows) if state is None else sum(1 for key in keys if key not in state.items)
+        if new_rows <= RENDER_FIRST_ROWS:
+            reconcile_treeview(self.tree, keys, rows) # Pocas filas nuevas: más barato reconciliar
+            self._report(len(rows), len(rows))
+            return
+        clear_treeview(self.tree)
+        self._keys, self._rows, self._items = list(keys), list(rows), []
+        self._batch = RENDER_FIRST_ROWS
+        self._insert_slice() # Primeras filas ya, el resto por tramos
+        if len(self._items) < len(self._rows):
+            self._after_id = self.tree.after_idle(self._step)
+
+    def cancel(self) -> None:
+        """Detiene el pintado en curso (lo ya insertado queda; la siguiente carga reconcilia o limpia)."""
+        if self._after_id is not None:
+            self.tree.after_cancel(self._after_id)
+            self._after_id = None
+            self._keys, self._rows, self._items = [], [], []
+            self._hide_progress()
+
+    def _step(self) -> None:
+        self._after_id = None
+        try:
+            started = time.perf_counter()
+            while len(self._items) < len(self._rows):
+                t0 = time.perf_counter()
+                self._insert_slice()
+                # Ajustar el lote para que un lote ocupe ~1/3 del tramo
+                per_row = (time.perf_counter() - t0) / max(1, self._batch)
+                self._batch = max(50, int((RENDER_SLICE_MS / 3000) / per_row)) if per_row else self._batch * 2
+                if (time.perf_counter() - started) * 1000 >= RENDER_SLICE_MS:
+                    break
+        except tk.TclError as e: # El Treeview se destruyó mientras se pintaba
+            logger.warning(f"Pintado progresivo interrumpido: {e}")
+            self._keys, self._rows, self._items = [], [], []
+            return
+        if len(self._items) < len(self._rows):
+            self._after_id = self.tree.after_idle(self._step)
+
+    def _insert_slice(self) -> None:
+        done, total = len(self._items), len(self._rows)
+        self._items.extend(insert_rows(self.tree, self._rows[done:done + self._batch], index=done))
+        done = len(self._items)
+        if done >= total:
+            _remember_rows(self.tree, self._keys, self._rows, self._items) # Lo siguiente podrá reconciliar
+            self._keys, self._rows, self._items = [], [], []
+        self._report(done, total)
+
+    def _report(self, done: int, total: int) -> None:
+        if self.progressbar is not None:
+            if done < total:
+                self.progressbar.configure(maximum=total, value=done)
+                self.progressbar.grid()
+            else:
+                self._hide_progress()
+        if self.on_progress is not None:
+            self.on_progress(done, total)
+
+    def _hide_progress(self) -> None:
+        if self.progressbar is not None:
+            self.progressbar.grid_remove()
+
+
+# --- Grilla virtual ---
+
+# Evento que genera VirtualTreeview cuando cambia la fila (lógica) seleccionada.
+# Usarlo en lugar de <<TreeviewSelect>>: los items se reciclan al desplazarse.
+VIRTUAL_SELECT_EVENT = "<<VirtualGridSelect>>"
+
+class VirtualTreeview:
+    """
+    Modo de grilla virtual para un ttk.Treeview.
+
+    Guarda el resultado completo como listas de tuplas (filas) y claves (IDs), y solo
+    materializa las filas visibles más un pequeño margen. Al desplazarse se reutilizan
+    los mismos items cambiando sus valores, así que el tiempo de pintado y la memoria
+    no dependen del tamaño del resultado. El desplazamiento (scrollbar, rueda, teclado)
+    y la selección se gestionan sobre índices lógicos.
+    """
+    def __init__(self, tree: ttk.Treeview, vscrollbar: ttk.Scrollbar, buffer_rows: int = 5):
+        self.tree = tree
+        self.vscrollbar = vscrollbar
+        self.buffer_rows = buffer_rows
+        self.rows: List[tuple] = []           # Valores de todas las filas del resultado
+        self.keys: List[Any] = []             # Clave (ID) de cada fila, mismo orden
+        self._index: Dict[Any, int] = {}      # clave -> posición en rows
+        self.offset = 0                       # Primera fila lógica mostrada
+        self.selected_key: Any = None
+        self._pool: List[str] = []            # Items del Treeview reutilizados
+        self._item_keys: Dict[str, Any] = {}  # item -> clave que muestra ahora
+        self._item_shown: Dict[str, tuple] = {} # item -> (valores, tag) pintados, para no repintar iguales
+        self._visible_rows = 20
+        style_height = ttk.Style().lookup("Treeview", "rowheight")
+        self._row_height = int(style_height) if style_height else 20
+
+        tree.virtual_grid = self # populate_treeview/clear_treeview delegan en la grilla
+        tree.configure(yscrollcommand="") # El scrollbar refleja la posición lógica, no la del widget
+        vscrollbar.configure(command=self.yview)
+        tree.bind("<Configure>", self._on_configure, add="+")
+        tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        tree.bind("<MouseWheel>", self._on_mousewheel)
+        tree.bind("<Button-4>", lambda e: self._scroll(-3))
+        tree.bind("<Button-5>", lambda e: self._scroll(3))
+        tree.bind("<Up>", lambda e: self._move_selection(-1))
+        tree.bind("<Down>", lambda e: self._move_selection(1))
+        tree.bind("<Prior>", lambda e: self._move_selection(-self._visible_rows))
+        tree.bind("<Next>", lambda e: self._move_selection(self._visible_rows))
+        tree.bind("<Home>", lambda e: self._move_selection(-len(self.rows)))
+        tree.bind("<End>", lambda e: self._move_selection(len(self.rows)))
+
+    # --- Datos ---
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._index
+
+    def set_rows(self, rows: List[tuple], keys: List[Any], reset_scroll: bool = True) -> None:
+        """
+        Reemplaza el resultado completo (sin crear un item por fila).
+        Con reset_scroll=False se mantiene anclada la primera fila visible si sigue en el resultado.
+        """
+        top_key = self.keys[self.offset] if self.offset < len(self.keys) else None
+        self.keys, self.rows = apply_sort(self.tree, list(keys), list(rows)) # Orden elegido en los encabezados
+        self._index = {key: i for i, key in enumerate(self.keys)}
+        if reset_scroll:
+            self.offset = 0
+        elif top_key in self._index:
+            self.offset = self._index[top_key]
+        if self.selected_key not in self._index:
+            self._set_selected(None)
+        self.render()
+
+    def upsert(self, key: Any, values: tuple, select: bool = False, position: Optional[int] = None) -> None:
+        """Actualiza la fila de 'key' o la añade (al final o en 'position')."""
+        if key in self._index:
+            self.rows[self._index[key]] = values
+        elif position is None or position >= len(self.rows):
+            self._index[key] = len(self.rows)
+            self.rows.append(values); self.keys.append(key)
+        else:
+            self.rows.insert(position, values); self.keys.insert(position, key)
+            for i in range(position, len(self.keys)): # Reindexar solo las posteriores
+                self._index[self.keys[i]] = i
+        sorter = getattr(self.tree, "sorter", None)
+        if sorter is not None and sorter.spec: # Con orden de usuario activo, la fila va a su lugar
+            self.keys, self.rows = sorter.sort(self.keys, self.rows)
+            self._index = {k: i for i, k in enumerate(self.keys)}
+        if select:
+            self._set_selected(key)
+            self.see(key)
+        self.render()
+
+    def delete(self, key: Any) -> bool:
+        """Quita la fila de 'key'. Devuelve False si no estaba."""
+        position = self._index.pop(key, None)
+        if position is None: return False
+        del self.rows[position]; del self.keys[position]
+        for i in range(position, len(self.keys)): # Reindexar solo las posteriores
+            self._index[self.keys[i]] = i
+        sorter = getattr(self.tree, "sorter", None)
+        if sorter is not None: sorter.forget(key)
+        if key == self.selected_key: self._set_selected(None)
+        self.render()
+        return True
+
+    def clear_selection(self) -> None:
+        self._set_selected(None)
+        self.render()
+
+    def values(self, key: Any) -> Optional[tuple]:
+        position = self._index.get(key)
+        return None if position is None else self.rows[position]
+
+    # --- Pintado ---
+
+    def render(self) -> None:
+        """Materializa la ventana visible reutilizando los items existentes."""
+        total = len(self.rows)
+        self.offset = max(0, min(self.offset, total - self._visible_rows))
+        needed = min(total - self.offset, self._visible_rows + self.buffer_rows)
+        if len(self._pool) < needed:
+            missing = needed - len(self._pool)
+            self._pool.extend(insert_rows(self.tree, [()] * missing, tags=['evenrow'] * missing))
+        if len(self._pool) > needed:
+            extra = self._pool[needed:]
+            self.tree.delete(*extra)
+            del self._pool[needed:]
+            for item in extra: self._item_shown.pop(item, None)
+        self._item_keys.clear()
+        selected_item = None
+        for i, item in enumerate(self._pool):
+            row = self.offset + i
+            shown = (self.rows[row], 'oddrow' if row % 2 else 'evenrow')
+            if self._item_shown.get(item) != shown: # Solo llamar a Tcl si cambió lo que muestra
+                self.tree.item(item, values=shown[0], tags=(shown[1],))
+                self._item_shown[item] = shown
+            self._item_keys[item] = self.keys[row]
+            if self.keys[row] == self.selected_key: selected_item = item
+        self.tree.yview_moveto(0) # La ventana lógica siempre empieza arriba
+        current = self.tree.selection()
+        if selected_item is None:
+            if current: self.tree.selection_remove(*current)
+        elif tuple(current) != (selected_item,):
+            self.tree.selection_set(selected_item)
+        if total:
+            self.vscrollbar.set(self.offset / total, min(1.0, (self.offset + self._visible_rows) / total))
+        else:
+            self.vscrollbar.set(0.0, 1.0)
+
+    def see(self, key: Any) -> None:
+        """Ajusta el desplazamiento para que la fila de 'key' sea visible."""
+        position = self._index.get(key)
+        if position is None: return
+        if position < self.offset:
+            self.offset = position
+        elif position >= self.offset + self._visible_rows:
+            self.offset = position - self._visible_rows + 1
+
+    # --- Desplazamiento y selección ---
+
+    def yview(self, *args) -> None:
+        """Comando del scrollbar ('moveto f' o 'scroll n units|pages')."""
+        if not args: return
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.rows))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.offset += step * (self._visible_rows if args[2] == "pages" else 1)
+        self.render()
+
+    def _scroll(self, units: int) -> str:
+        self.offset += units
+        self.render()
+        return "break"
+
+    def _on_mousewheel(self, event) -> str:
+        return self._scroll(-3 if event.delta > 0 else 3)
+
+    def _on_configure(self, event=None) -> None:
+        heading_height = self._row_height + 4
+        visible = max(1, (self.tree.winfo_height() - heading_height) // self._row_height)
+        if visible != self._visible_rows:
+            self._visible_rows = visible
+            self.render()
+
+    def _set_selected(self, key: Any) -> None:
+        if key != self.selected_key:
+            self.selected_key = key
+            self.tree.event_generate(VIRTUAL_SELECT_EVENT)
+
+    def _on_select(self, event=None) -> None:
+        """Traduce la selección física (item) a la clave lógica."""
+        selection = self.tree.selection()
+        if selection and selection[0] in self._item_keys:
+            self._set_selected(self._item_keys[selection[0]])
+
+    def _move_selection(self, delta: int) -> str:
+        if not self.rows: return "break"
+        position = self._index.get(self.selected_key, -1 if delta > 0 else len(self.rows))
+        position = max(0, min(len(self.rows) - 1, position + delta))
+        self._set_selected(self.keys[position])
+        self.see(self.selected_key)
+        self.render()
+        return "break"
 
 
 # --- Otras funciones de utils (si las hubiera) ---
@@ -116,3 +537,238 @@ def clear_treeview(tree: ttk.Treeview) -> None:
 #             stretch=config.get("stretch", tk.YES)
 #         )
 
+
+
+# --- Ordenación por encabezados ---
+
+SORT_ARROWS = {False: " ▲", True: " ▼"}
+
+def apply_sort(tree: ttk.Treeview, keys: List[Any], rows: List[tuple]) -> Tuple[List[Any], List[tuple]]:
+    """Aplica el orden elegido por el usuario en los encabezados (si hay) a un resultado nuevo."""
+    sorter = getattr(tree, "sorter", None)
+    if sorter is None or not sorter.spec:
+        return keys, rows
+    return sorter.sort(keys, rows)
+
+class TreeviewSorter:
+    """
+    Ordena en memoria las filas ya cargadas al hacer clic en un encabezado.
+
+    Clic: ordena por esa columna (otro clic invierte el sentido). Mayús+clic: la añade
+    como clave secundaria (o invierte la suya). Las claves de orden se calculan una vez
+    por fila y valor (cotejo del locale para textos, números para columnas numéricas)
+    y se reutilizan entre ordenaciones; solo se conservan las de las filas cargadas. Con grilla virtual se reordenan las listas y
+    se repinta lo visible; sin ella los items se recolocan con move (vía reconcile_treeview),
+    sin volver a consultar la BD.
+
+    Args:
+        numeric_columns: Columnas que se comparan como números (el resto, como texto).
+    """
+    def __init__(self, tree: ttk.Treeview, numeric_columns: Tuple[str, ...] = ()):
+        self.tree = tree
+        self.columns: Tuple[str, ...] = tuple(tree['columns'])
+        self.numeric_columns = set(numeric_columns)
+        self.spec: List[Tuple[str, bool]] = [] # (columna, descendente), de más a menos prioritaria
+        self._titles = {col: tree.heading(col, "text") for col in self.columns}
+        self._cache: Dict[str, Dict[Any, Tuple[Any, Any]]] = {col: {} for col in self.columns} # col -> clave -> (valor, clave de orden)
+        tree.sorter = self # ProgressiveRenderer, populate y la grilla virtual respetan este orden
+        tree.bind("<ButtonRelease-1>", self._on_click, add="+")
+
+    def _on_click(self, event) -> None:
+        if self.tree.identify_region(event.x, event.y) != "heading": return
+        column_ref = self.tree.identify_column(event.x) # '#n' según las columnas mostradas
+        try:
+            display = self.tree['displaycolumns']
+            display = self.columns if display in ("#all", ("#all",)) else tuple(display)
+            column = display[int(column_ref[1:]) - 1]
+        except (ValueError, IndexError):
+            return
+        self.toggle(column, add=bool(event.state & 0x0001)) # 0x0001: Mayús pulsada
+
+    def toggle(self, column: str, add: bool = False) -> None:
+        """Clic en el encabezado de 'column' (add=True para clave secundaria)."""
+        current = dict(self.spec)
+        if add:
+            if column in current:
+                self.spec = [(col, not desc if col == column else desc) for col, desc in self.spec]
+            else:
+                self.spec.append((column, False))
+        elif self.spec and self.spec[0][0] == column and len(self.spec) == 1:
+            self.spec = [(column, not self.spec[0][1])]
+        else:
+            self.spec = [(column, False)]
+        self._update_headings()
+        self.apply()
+
+    def clear(self) -> None:
+        """Vuelve al orden del resultado (no reordena lo ya mostrado)."""
+        self.spec = []
+        self._update_headings()
+        for cache in self._cache.values(): cache.clear() # Sin orden no se consultan
+
+    def forget(self, key: Any) -> None:
+        """La fila 'key' ya no está cargada: soltar sus claves de orden."""
+        for cache in self._cache.values(): cache.pop(key, None)
+
+    def _update_headings(self) -> None:
+        for col in self.columns:
+            title = self._titles[col]
+            for priority, (spec_col, desc) in enumerate(self.spec):
+                if spec_col == col:
+                    title += SORT_ARROWS[desc] + (str(priority + 1) if len(self.spec) > 1 else "")
+            self.tree.heading(col, text=title)
+
+    def _sort_key(self, column: str, key: Any, value: Any) -> Any:
+        cache = self._cache[column]
+        cached = cache.get(key)
+        if cached is not None and cached[0] == value:
+            return cached[1]
+        if column in self.numeric_columns:
+            try:
+                sort_key = (0, float(value))
+            except (TypeError, ValueError):
+                sort_key = None # Vacíos y no numéricos: al final en ambos sentidos (ver sort)
+        else:
+            sort_key = locale.strxfrm(str(value).casefold()) if value is not None else ""
+        cache[key] = (value, sort_key)
+        return sort_key
+
+    def sort(self, keys: List[Any], rows: List[tuple]) -> Tuple[List[Any], List[tuple]]:
+        """Devuelve (keys, rows) ordenados según spec (ordenación estable por pasadas)."""
+        order = list(range(len(keys)))
+        for column, descending in reversed(self.spec):
+            index = self.columns.index(column)
+            missing = (-1, 0.0) if descending else (1, 0.0)
+            sort_keys = [self._sort_key(column, key, row[index]) for key, row in zip(keys, rows)]
+            if column in self.numeric_columns:
+                sort_keys = [missing if k is None else k for k in sort_keys]
+            order.sort(key=sort_keys.__getitem__, reverse=descending)
+        self._prune(keys)
+        return [keys[i] for i in order], [rows[i] for i in order]
+
+    def _prune(self, keys: List[Any]) -> None:
+        """'keys' es todo lo cargado: las filas de resultados anteriores (otro filtro, bajas) no se acumulan."""
+        sorted_by = dict(self.spec)
+        loaded = None
+        for column, cache in self._cache.items():
+            # Las columnas del orden ya tienen todas las cargadas: con el mismo tamaño no sobra ninguna
+            if not cache or (column in sorted_by and len(cache) == len(keys)): continue
+            loaded = set(keys) if loaded is None else loaded
+            self._cache[column] = {key: cached for key, cached in cache.items() if key in loaded}
+
+    def apply(self) -> None:
+        """Reordena lo que ya está cargado en el Treeview."""
+        virtual_grid = getattr(self.tree, "virtual_grid", None)
+        if virtual_grid is not None:
+            virtual_grid.set_rows(virtual_grid.rows, virtual_grid.keys) # set_rows aplica el orden
+            if virtual_grid.selected_key is not None:
+                virtual_grid.see(virtual_grid.selected_key); virtual_grid.render()
+            return
+        renderer_state: Optional[_ReconcileState] = getattr(self.tree, "reconcile_state", None)
+        items = self.tree.get_children()
+        if renderer_state is not None and len(renderer_state.order) == len(items):
+            keys = list(renderer_state.order)
+            rows = [renderer_state.shown[key][0] for key in keys]
+        else:
+            # Items añadidos por fuera de reconcile: leerlos (la clave es el primer valor)
+            rows = [tuple(self.tree.item(item, "values")) for item in items]
+            keys = [int(values[0]) if str(values[0]).isdigit() else values[0] for values in rows]
+            _remember_rows(self.tree, keys, rows, list(items))
+        reconcile_treeview(self.tree, *self.sort(keys, rows)) # Solo move y tags: no se recrean items
+
+
+# --- Benchmarks: python -m src.utils.utils [filas ...] ---
+
+class _TclCallCounter:
+    """Envuelve el intérprete de un widget para contar las llamadas a Tcl."""
+    def __init__(self, tk_app) -> None:
+        self._tk = tk_app
+        self.calls = 0
+    def call(self, *args):
+        self.calls += 1
+        return self._tk.call(*args)
+    def __getattr__(self, name):
+        return getattr(self._tk, name)
+
+def _benchmark_populate(n_rows: int = 10000) -> None:
+    """Compara borrar+reinsertar contra reconcile_treeview en transiciones típicas de filtro."""
+    import random
+    root = tk.Tk(); root.withdraw()
+    tree = ttk.Treeview(root, columns=("id_productos", "nombre", "cantidad", "categoria"), show="headings")
+    counter = _TclCallCounter(tree.tk)
+    tree.tk = counter
+    rng = random.Random(7)
+    full = [(i, f"Producto {i:06d}", rng.randint(0, 500), f"Categoria {i % 12}") for i in range(1, n_rows + 1)]
+    edited = list(full); edited[n_rows // 2] = edited[n_rows // 2][:2] + (999,) + edited[n_rows // 2][3:]
+    transitions = [
+        ("carga inicial", full),
+        ("filtro 'Producto 00' (escribir)", [r for r in full if r[1].startswith("Producto 00")]),
+        ("filtro 'Producto 000' (una letra más)", [r for r in full if r[1].startswith("Producto 000")]),
+        ("borrar filtro", full),
+        ("editar una cantidad", edited),
+        ("filtrar categoría", [r for r in edited if r[3] == "Categoria 3"]),
+        ("orden inverso", list(reversed(edited))),
+    ]
+
+    def clear_and_insert(rows: List[tuple]) -> None:
+        for item in tree.get_children():
+            if tree.exists(item): tree.delete(item)
+        for i, values in enumerate(rows):
+            tree.insert("", tk.END, values=values, tags=('oddrow' if i % 2 else 'evenrow',))
+
+    def reconcile(rows: List[tuple]) -> None:
+        reconcile_treeview(tree, [r[0] for r in rows], rows)
+
+    print(f"{n_rows} filas")
+    print(f"{'transición':40} {'borrar+insertar':>24} {'reconciliar':>24}")
+    results: Dict[str, List[str]] = {name: [] for name, _ in transitions}
+    for strategy in (clear_and_insert, reconcile):
+        clear_treeview(tree)
+        for name, rows in transitions:
+            counter.calls = 0
+            start = time.perf_counter()
+            strategy(rows)
+            root.update_idletasks()
+            elapsed = (time.perf_counter() - start) * 1000
+            results[name].append(f"{counter.calls:>8} llamadas {elapsed:8.1f} ms")
+    for name, _ in transitions:
+        print(f"{name:40} {results[name][0]:>24} {results[name][1]:>24}")
+    root.destroy()
+
+def _benchmark_bulk(n_rows: int) -> None:
+    """Compara el borrado/inserción fila a fila contra clear_treeview/insert_rows."""
+    root = tk.Tk(); root.withdraw()
+    tree = ttk.Treeview(root, columns=("id_productos", "nombre", "cantidad", "categoria"), show="headings")
+    counter = _TclCallCounter(tree.tk)
+    tree.tk = counter
+    rows = [(i, f"Producto {i:06d}", i % 500, f"Categoria {i % 12}") for i in range(1, n_rows + 1)]
+
+    def insert_one_by_one() -> None:
+        for i, values in enumerate(rows):
+            if len(values) != len(tree['columns']): continue # Lo que hacía populate por fila
+            tree.insert("", tk.END, values=values, tags=('oddrow' if i % 2 else 'evenrow',))
+
+    def delete_one_by_one() -> None:
+        for item in tree.get_children():
+            if tree.exists(item): tree.delete(item)
+
+    def measure(action) -> str:
+        counter.calls = 0
+        start = time.perf_counter()
+        action()
+        root.update_idletasks()
+        return f"{counter.calls:>8} llamadas {(time.perf_counter() - start) * 1000:9.1f} ms"
+
+    print(f"{n_rows} filas")
+    print(f"  insertar fila a fila   {measure(insert_one_by_one)}")
+    print(f"  borrar fila a fila     {measure(delete_one_by_one)}")
+    print(f"  insert_rows            {measure(lambda: insert_rows(tree, rows))}")
+    print(f"  clear_treeview         {measure(lambda: clear_treeview(tree))}")
+    root.destroy()
+
+if __name__ == "__main__":
+    import sys
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        _benchmark_bulk(size)
+        _benchmark_populate(size)
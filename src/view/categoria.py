@@ -6,9 +6,10 @@ import logging
 # Asegúrate que src.controller.categoria está accesible
 from src.controller.categoria import CategoriaController # Usar el controlador de categorías
 # Asegúrate que src.model.producto está accesible
-from src.model.producto import Categoria, DatabaseError # Importar modelo y excepción
-# Importar utils para clear_treeview
-from src.utils.utils import clear_treeview
+from src.model.producto import Categoria, DatabaseError, StaleDataError # Importar modelo y excepciones
+# Importar utils para clear_treeview y el pintado progresivo
+from src.utils.utils import clear_treeview, ProgressiveRenderer, TreeviewSorter
+from src.utils.eventos import suscribir, CategoriaCreada, CategoriaActualizada, CategoriaEliminada
 
 # Configuración del logging
 logger = logging.getLogger(__name__)
@@ -119,7 +120,16 @@ class CategoryList(ttk.Frame):
         super().__init__(parent)
         self.tree: Optional[ttk.Treeview] = None
         self.category_item_map: Dict[int, str] = {} # id_categoria -> item_id
+        self.categories: Dict[int, Categoria] = {} # Objetos cargados por ID: llenan el formulario sin consultar la BD
+        self.renderer: Optional[ProgressiveRenderer] = None # Pintado por tramos de listas grandes
         self.setup_treeview()
+        # Mantenerse al día con las ediciones de categorías hechas desde cualquier ventana
+        self._unsubscribe = [
+            suscribir(CategoriaCreada, lambda e: self.add_item(e.categoria)),
+            suscribir(CategoriaActualizada, lambda e: self.update_item(e.categoria)),
+            suscribir(CategoriaEliminada, lambda e: self.delete_item(e.id_categoria)),
+        ]
+        self.bind("<Destroy>", self._on_destroy, add="+")
 
     def setup_treeview(self) -> None:
         """Configura el Treeview."""
@@ -143,6 +153,13 @@ class CategoryList(ttk.Frame):
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
 
+        # Barra de avance del pintado progresivo (oculta salvo mientras se pinta)
+        progress = ttk.Progressbar(self, mode="determinate")
+        progress.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(2, 0))
+        progress.grid_remove()
+        self.renderer = ProgressiveRenderer(self.tree, progressbar=progress, on_progress=self._on_render_progress)
+        TreeviewSorter(self.tree, numeric_columns=("id",)) # Ordenar por encabezado sin recargar
+
         # Configurar estilo de filas alternas (hacerlo una vez)
         self.tree.tag_configure('oddrow', background='#f0f0f0') # Gris claro
         self.tree.tag_configure('evenrow', background='#ffffff') # Blanco
@@ -155,23 +172,50 @@ class CategoryList(ttk.Frame):
     def refresh(self) -> None:
         """Recarga todas las categorías en el Treeview."""
         if not self.tree: return
-        # Limpiar vista y mapa
-        clear_treeview(self.tree) # Usar función de utils
-        self.category_item_map.clear()
         try:
             categorias = CategoriaController.get_all()
-            for i, cat in enumerate(categorias): # Usar enumerate para tags
-                values = self._get_category_values(cat)
-                tag = 'oddrow' if i % 2 else 'evenrow'
-                item_id = self.tree.insert("", tk.END, values=values, tags=(tag,))
-                self.category_item_map[cat.id_categoria] = item_id
+            self.categories = {cat.id_categoria: cat for cat in categorias}
+            # Reconcilia con lo mostrado o, si hay muchas filas nuevas, pinta por tramos
+            self.category_item_map.clear()
+            self.renderer.start([cat.id_categoria for cat in categorias],
+                                [self._get_category_values(cat) for cat in categorias])
         except (DatabaseError, ValueError, Exception) as e:
             logger.error(f"Error al refrescar lista de categorías: {e}")
+            self.renderer.cancel()
+            clear_treeview(self.tree) # Usar función de utils
+            self.category_item_map.clear()
             messagebox.showerror("Error", "No se pudieron cargar las categorías.")
 
+    def apply_changes(self) -> None:
+        """
+        Al reabrir la ventana: las categorías no tienen marca de cambio, pero son pocas
+        (y con la réplica están en memoria). Se releen y solo si algo difiere se reconcilia,
+        lo que toca únicamente las filas cambiadas.
+        """
+        if not self.tree: return
+        try:
+            categorias = CategoriaController.get_all()
+        except (DatabaseError, ValueError) as e:
+            logger.error(f"Error al traer cambios de categorías: {e}")
+            return
+        actuales = {cat.id_categoria: self._get_category_values(cat) for cat in categorias}
+        mostradas = {cat_id: self._get_category_values(cat) for cat_id, cat in self.categories.items()}
+        if actuales != mostradas:
+            self.refresh()
+
+    def _on_render_progress(self, done: int, total: int) -> None:
+        """Al terminar el pintado, el mapa id -> item queda disponible para las ediciones."""
+        if done >= total:
+            self.category_item_map = dict(self.tree.reconcile_state.items)
+
+    def get_category(self, category_id: int) -> Optional[Categoria]:
+        """La categoría tal como se cargó (o como llegó en el último evento)."""
+        return self.categories.get(category_id)
+
     def add_item(self, categoria: Categoria) -> None:
         """Añade una categoría al Treeview."""
         if not self.tree or categoria.id_categoria in self.category_item_map: return
+        self.categories[categoria.id_categoria] = categoria
         values = self._get_category_values(categoria)
         # Añadir con tag de estilo apropiado
         tag = 'oddrow' if len(self.category_item_map) % 2 else 'evenrow'
@@ -183,6 +227,7 @@ class CategoryList(ttk.Frame):
     def update_item(self, categoria: Categoria) -> None:
         """Actualiza una categoría en el Treeview."""
         if not self.tree or categoria.id_categoria not in self.category_item_map: return
+        self.categories[categoria.id_categoria] = categoria
         item_id = self.category_item_map[categoria.id_categoria]
         values = self._get_category_values(categoria)
         self.tree.item(item_id, values=values) # Actualizar valores (tags se mantienen)
@@ -198,6 +243,7 @@ class CategoryList(ttk.Frame):
              # messagebox.showwarning("Acción no permitida", "La categoría 'Sin Categoría' no se puede eliminar.")
              return False
 
+        self.categories.pop(category_id, None)
         try:
             item_id = self.category_item_map[category_id]
             if self.tree.exists(item_id): # Verificar si existe antes de borrar
@@ -212,6 +258,11 @@ class CategoryList(ttk.Frame):
              logger.error(f"Error al eliminar item (Cat ID: {category_id}) del Treeview: {e}")
              return False # Falló la eliminación del widget
 
+    def _on_destroy(self, event) -> None:
+        if event.widget is not self: return # <Destroy> también llega por cada hijo
+        for unsubscribe in self._unsubscribe: unsubscribe()
+        self._unsubscribe = []
+
     def get_selected_id(self) -> Optional[int]:
         """Obtiene el ID de la categoría seleccionada."""
         if not self.tree: return None
@@ -231,7 +282,10 @@ class CategoryList(ttk.Frame):
 
 
 class CategoryWindow:
-    """Ventana Toplevel para gestionar categorías."""
+    """
+    Ventana Toplevel para gestionar categorías. Se crea una sola vez (ver menu_categorias):
+    al cerrarla se oculta y al reabrirla solo se aplican los cambios ocurridos mientras tanto.
+    """
     # Añadir parámetro callback
     def __init__(self, parent_update_callback: Optional[Callable] = None):
         self.parent_update_callback = parent_update_callback # Guardar callback
@@ -256,6 +310,18 @@ class CategoryWindow:
              logger.warning("No se pudo hacer la ventana modal (grab_set falló).")
 
 
+    def show(self) -> None:
+        """Vuelve a mostrar la ventana oculta con los cambios ocurridos desde que se ocultó."""
+        logger.info("Mostrando ventana de gestión de categorías.")
+        self.window.deiconify()
+        self.window.lift()
+        try:
+             self.window.grab_set() # Modal otra vez (se liberó al ocultarla)
+        except tk.TclError:
+             logger.warning("No se pudo hacer la ventana modal (grab_set falló).")
+        if self.category_list: self.category_list.apply_changes()
+        if self.form: self.form.widget_map["nombre"].focus()
+
     def create_widgets(self) -> None:
         """Crea los widgets."""
         main_frame = ttk.Frame(self.window, padding="10")
@@ -318,7 +384,8 @@ class CategoryWindow:
              # self.form.clear()
              return
         try:
-            categoria = CategoriaController.get_one(selected_id)
+            # El objeto ya cargado por la lista (sin consultar la BD); la frescura se verifica al guardar
+            categoria = self.category_list.get_category(selected_id) or CategoriaController.get_one(selected_id)
             if categoria:
                 self.form.set_data(categoria)
             else:
@@ -357,17 +424,9 @@ class CategoryWindow:
             data = self.form.get_data() # Puede lanzar ValueError si nombre vacío
             new_id = CategoriaController.create(data["nombre"], data["descripcion"]) # Puede lanzar ValueError (duplicado), DatabaseError
             if new_id:
-                # Obtener la categoría recién creada para añadirla a la lista
-                new_category = CategoriaController.get_one(new_id)
-                if new_category:
-                    self.category_list.add_item(new_category)
-                    self._handle_successful_update() # Limpiar, llamar callback
-                    messagebox.showinfo("Éxito", f"Categoría '{new_category.nombre}' agregada.", parent=self.window)
-                else:
-                    # Si no se encontró después de crear (muy raro), refrescar todo
-                    self.category_list.refresh()
-                    self._handle_successful_update()
-                    messagebox.showinfo("Éxito", "Categoría agregada (recargando lista).", parent=self.window)
+                # La lista ya la añadió al recibir el evento CategoriaCreada
+                self._handle_successful_update() # Limpiar, llamar callback
+                messagebox.showinfo("Éxito", f"Categoría '{data['nombre']}' agregada.", parent=self.window)
             # else: # Controlador lanza excepción si falla, no debería llegar aquí sin ID
 
         except (ValueError, DatabaseError) as e:
@@ -397,18 +456,18 @@ class CategoryWindow:
                  return
 
             # Llamar al controlador (puede lanzar ValueError, DatabaseError)
-            CategoriaController.update(selected_id, data["nombre"], data["descripcion"])
-            # Obtener datos actualizados para el treeview
-            updated_category = CategoriaController.get_one(selected_id)
-            if updated_category:
-                self.category_list.update_item(updated_category)
-                self._handle_successful_update()
-                messagebox.showinfo("Éxito", f"Categoría '{updated_category.nombre}' modificada.", parent=self.window)
-            else:
-                # Si no se encontró después de modificar (raro), refrescar todo
-                self.category_list.refresh()
-                self._handle_successful_update()
-                messagebox.showinfo("Éxito", "Categoría modificada (recargando lista).", parent=self.window)
+            CategoriaController.update(selected_id, data["nombre"], data["descripcion"],
+                                       anterior=self.category_list.get_category(selected_id))
+            # La fila ya se actualizó al recibir el evento CategoriaActualizada
+            self._handle_successful_update()
+            messagebox.showinfo("Éxito", f"Categoría '{data['nombre']}' modificada.", parent=self.window)
+        except StaleDataError as e:
+            messagebox.showwarning("Datos desactualizados", str(e), parent=self.window)
+            # Traer la versión actual a la lista y al formulario
+            actual = CategoriaController.get_one(selected_id)
+            if actual:
+                self.category_list.update_item(actual)
+                self.form.set_data(actual)
 
         except (ValueError, DatabaseError) as e:
             messagebox.showerror("Error al Modificar", str(e), parent=self.window)
@@ -428,8 +487,8 @@ class CategoryWindow:
              messagebox.showwarning("Acción no permitida", "La categoría 'Sin Categoría' no se puede eliminar.", parent=self.window)
              return
 
-        # Obtener nombre para el mensaje de confirmación
-        cat_to_delete = CategoriaController.get_one(selected_id)
+        # Obtener nombre para el mensaje de confirmación (del objeto ya cargado)
+        cat_to_delete = self.category_list.get_category(selected_id)
         cat_name = f"ID {selected_id}" if not cat_to_delete else f"'{cat_to_delete.nombre}' (ID {selected_id})"
 
         if not messagebox.askyesno("Confirmar Eliminación",
@@ -439,12 +498,9 @@ class CategoryWindow:
         try:
             # Llamar al controlador (puede lanzar ValueError, DatabaseError)
             CategoriaController.delete(selected_id)
-            # Eliminar del treeview localmente
-            deleted_from_view = self.category_list.delete_item(selected_id)
-            if deleted_from_view:
-                 self._handle_successful_update()
-                 messagebox.showinfo("Éxito", f"Categoría {cat_name} eliminada.", parent=self.window)
-            # else: # Si delete_item devolvió False (ej. ID 1), no hacer nada más
+            # La fila ya se quitó al recibir el evento CategoriaEliminada
+            self._handle_successful_update()
+            messagebox.showinfo("Éxito", f"Categoría {cat_name} eliminada.", parent=self.window)
 
         except (ValueError, DatabaseError) as e:
             # Mostrar error específico (ej. si tiene productos y no se pudo SET DEFAULT/NULL)
@@ -454,23 +510,32 @@ class CategoryWindow:
             messagebox.showerror("Error Inesperado", "Ocurrió un error al eliminar la categoría.", parent=self.window)
 
     def on_close(self):
-        """Acción al cerrar la ventana."""
-        logger.info("Cerrando ventana de gestión de categorías.")
-        # Liberar grab si existe antes de destruir
+        """Acción al cerrar la ventana: se oculta (la lista sigue al día por eventos) en lugar de destruirse."""
+        logger.info("Ocultando ventana de gestión de categorías.")
+        # Liberar grab antes de ocultar
         try:
              self.window.grab_release()
         except tk.TclError:
              pass # Ignorar si grab_release falla (ej. ventana ya no existe)
-        self.window.destroy()
+        self.clear_form_and_selection()
+        self.window.withdraw()
+
 
+# Instancia única: se construye la primera vez y luego se reutiliza
+category_window: Optional[CategoryWindow] = None
 
 # Función de entrada para esta ventana
 # Aceptar el callback como argumento
 def menu_categorias(parent_update_callback: Optional[Callable] = None) -> None:
-    """Muestra la ventana de gestión de categorías."""
+    """Muestra la ventana de gestión de categorías (la crea la primera vez, luego la reutiliza)."""
+    global category_window
     try:
-        # Pasar el callback a la ventana
-        CategoryWindow(parent_update_callback)
+        if category_window is not None and category_window.window.winfo_exists():
+            category_window.parent_update_callback = parent_update_callback
+            category_window.show()
+        else:
+            # Pasar el callback a la ventana
+            category_window = CategoryWindow(parent_update_callback)
     except Exception as e:
         logger.error(f"Error al abrir ventana de categorías: {e}", exc_info=True)
         messagebox.showerror("Error", "No se pudo abrir la gestión de categorías.")
@@ -0,0 +1,240 @@
+# src/view/conteo.py
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from typing import Optional, Dict, Any, Callable, List
+import logging
+import os
+import queue
+import threading
+
+# Controladores
+# Asegúrate que src.controller.* están accesibles
+from src.controller.conteo import ConteoController, InformeConteo, Diferencia
+
+# Modelo y Excepciones
+# Asegúrate que src.model.producto está accesible
+from src.model.producto import DatabaseError
+
+# Utils
+# Asegúrate que src.utils.utils está accesible
+from src.utils.utils import VirtualTreeview, TreeviewSorter
+
+# Configuración del logging
+logger = logging.getLogger(__name__)
+
+POLL_MS = 50 # Frecuencia de revisión del hilo de trabajo
+MAX_PROBLEMS_SHOWN = 15 # Líneas problemáticas listadas en el aviso tras cargar
+
+
+class CountWindow:
+    """Ventana Toplevel para conciliar un conteo físico: informe de diferencias y ajuste en bloque."""
+    def __init__(self):
+        self.window = tk.Toplevel()
+        self.tree: Optional[ttk.Treeview] = None
+        self.virtual: Optional[VirtualTreeview] = None
+        self.report: Optional[InformeConteo] = None
+        self.differences: Dict[int, Diferencia] = {} # id_producto -> línea del informe
+        self.file_var = tk.StringVar(value="Ningún archivo cargado")
+        self.summary_var = tk.StringVar(value="")
+        self.buttons: List[ttk.Button] = []
+        self._results: "queue.Queue" = queue.Queue()
+        self.setup_window()
+        self.create_widgets()
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def setup_window(self) -> None:
+        """Configura la ventana."""
+        self.window.title("Conteo de Inventario")
+        self.window.geometry("950x600")
+        self.window.minsize(700, 400)
+        try:
+             self.window.grab_set() # Modal
+             self.window.transient()
+        except tk.TclError:
+             logger.warning("No se pudo hacer la ventana modal (grab_set falló).")
+
+    def create_widgets(self) -> None:
+        """Crea los widgets de la ventana."""
+        main_frame = ttk.Frame(self.window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        main_frame.rowconfigure(2, weight=1); main_frame.columnconfigure(0, weight=1)
+
+        ttk.Label(main_frame, text="Conteo de Inventario", font=("Arial", 16, "bold")).grid(row=0, column=0, pady=10, sticky="ew")
+
+        # Archivo y acciones
+        top_frame = ttk.Frame(main_frame)
+        top_frame.grid(row=1, column=0, pady=5, sticky="ew")
+        top_frame.columnconfigure(1, weight=1)
+        load_btn = ttk.Button(top_frame, text="Cargar conteo…", command=self.load_count)
+        load_btn.grid(row=0, column=0, padx=(0, 10))
+        ttk.Label(top_frame, textvariable=self.file_var).grid(row=0, column=1, sticky="w")
+        toggle_btn = ttk.Button(top_frame, text="Incluir/Excluir", command=self.toggle_selected)
+        toggle_btn.grid(row=0, column=2, padx=5)
+        apply_btn = ttk.Button(top_frame, text="Aplicar ajustes", command=self.apply_adjustments)
+        apply_btn.grid(row=0, column=3, padx=(5, 0))
+        self.buttons = [load_btn, toggle_btn, apply_btn]
+
+        # Informe de diferencias
+        list_frame = ttk.Frame(main_frame)
+        list_frame.grid(row=2, column=0, pady=(10, 5), sticky="nsew")
+        list_frame.rowconfigure(0, weight=1); list_frame.columnconfigure(0, weight=1)
+        columns = ("id_producto", "nombre", "registrada", "contada", "diferencia", "valor_unidad", "impacto", "aplicar")
+        self.tree = ttk.Treeview(list_frame, columns=columns, show="headings", selectmode="browse")
+        for column, text, width, anchor in (("id_producto", "ID", 70, tk.CENTER), ("nombre", "Nombre", 260, tk.W),
+                                            ("registrada", "Registrada", 90, tk.E), ("contada", "Contada", 90, tk.E),
+                                            ("diferencia", "Diferencia", 90, tk.E), ("valor_unidad", "Valor Unit.", 90, tk.E),
+                                            ("impacto", "Impacto", 110, tk.E), ("aplicar", "Aplicar", 80, tk.CENTER)):
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, anchor=anchor, stretch=(column == "nombre"))
+        vsb = ttk.Scrollbar(list_frame, orient="vertical", command=self.tree.yview)
+        hsb = ttk.Scrollbar(list_frame, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.tree.grid(row=0, column=0, sticky="nsew"); vsb.grid(row=0, column=1, sticky="ns"); hsb.grid(row=1, column=0, sticky="ew")
+        self.tree.tag_configure('oddrow', background='#f0f0f0'); self.tree.tag_configure('evenrow', background='#ffffff')
+        self.virtual = VirtualTreeview(self.tree, vsb)
+        # Ordenar por impacto, diferencia, etc. con clic en el encabezado
+        TreeviewSorter(self.tree, numeric_columns=("id_producto", "registrada", "contada", "diferencia", "valor_unidad", "impacto"))
+        self.tree.bind("<Double-Button-1>", lambda e: self.toggle_selected())
+        self.tree.bind("<space>", lambda e: self.toggle_selected())
+
+        ttk.Label(main_frame, textvariable=self.summary_var, anchor="w").grid(row=3, column=0, sticky="ew")
+
+    @staticmethod
+    def _row(diferencia: Diferencia) -> tuple:
+        # Importes sin separador de miles: TreeviewSorter ordena esas columnas como números
+        return (diferencia.id_productos, diferencia.nombre, diferencia.registrada, diferencia.contada,
+                f"{diferencia.diferencia:+d}", f"{diferencia.valor_unidad:.2f}", f"{diferencia.impacto:+.2f}",
+                "Sí" if diferencia.aceptada else "No")
+
+    def _update_summary(self) -> None:
+        if not self.report: return
+        accepted = sum(1 for d in self.report.diferencias if d.aceptada)
+        self.summary_var.set(
+            f"{len(self.report.diferencias)} con diferencia ({accepted} a aplicar) · "
+            f"Impacto neto: {self.report.impacto_neto:+,.2f} · Bruto: {self.report.impacto_bruto:,.2f} · "
+            f"{self.report.coincidentes} sin diferencia · {len(self.report.desconocidos)} IDs desconocidos · "
+            f"{len(self.report.invalidas)} líneas inválidas")
+
+    # --- Trabajo en segundo plano (comparar y aplicar pueden tardar unos segundos) ---
+
+    def _run_in_background(self, status: str, work: Callable[[], Any], on_done: Callable[[Any, Optional[Exception]], None]) -> None:
+        for button in self.buttons:
+            button.configure(state=tk.DISABLED)
+        self.summary_var.set(status)
+        def run():
+            try:
+                self._results.put((work(), None))
+            except (DatabaseError, ValueError, Exception) as e:
+                self._results.put((None, e))
+        threading.Thread(target=run, name="conteo", daemon=True).start()
+        self.window.after(POLL_MS, self._poll, on_done)
+
+    def _poll(self, on_done: Callable[[Any, Optional[Exception]], None]) -> None:
+        try:
+            result, error = self._results.get_nowait()
+        except queue.Empty:
+            self.window.after(POLL_MS, self._poll, on_done)
+            return
+        if not self.window.winfo_exists(): return
+        for button in self.buttons:
+            button.configure(state=tk.NORMAL)
+        on_done(result, error)
+
+    # --- Acciones ---
+
+    def load_count(self) -> None:
+        """Carga un archivo de conteo y compara con las cantidades registradas."""
+        path = filedialog.askopenfilename(parent=self.window, title="Archivo de conteo (ID, cantidad contada)",
+                                          filetypes=[("CSV / texto", "*.csv *.txt *.tsv"), ("Todos los archivos", "*.*")])
+        if not path: return
+        self.file_var.set(os.path.basename(path))
+        self._run_in_background("Comparando con el inventario…", lambda: ConteoController.comparar(path), self._on_compared)
+
+    def _on_compared(self, report: Optional[InformeConteo], error: Optional[Exception]) -> None:
+        if error is not None:
+            logger.error(f"Error al comparar conteo: {error}")
+            self.summary_var.set("Error al comparar el conteo")
+            messagebox.showerror("Error", f"No se pudo comparar el conteo:\n{error}", parent=self.window)
+            return
+        self.report = report
+        self.differences = {d.id_productos: d for d in report.diferencias}
+        # Por defecto, los faltantes de mayor valor primero
+        ordered = sorted(report.diferencias, key=lambda d: d.impacto)
+        self.virtual.set_rows([self._row(d) for d in ordered], [d.id_productos for d in ordered])
+        self._update_summary()
+        problems = [f"Línea {line}: el producto ID {id_producto} no existe" for line, id_producto in report.desconocidos]
+        problems += [f"Línea {line}: {reason}" for line, reason in report.invalidas]
+        if problems:
+            more = f"\n… y {len(problems) - MAX_PROBLEMS_SHOWN} más" if len(problems) > MAX_PROBLEMS_SHOWN else ""
+            messagebox.showwarning("Líneas no aplicables", "\n".join(problems[:MAX_PROBLEMS_SHOWN]) + more, parent=self.window)
+
+    def toggle_selected(self) -> None:
+        """Incluye o excluye del ajuste la línea seleccionada."""
+        key = self.virtual.selected_key if self.virtual else None
+        diferencia = self.differences.get(key)
+        if diferencia is None: return
+        diferencia.aceptada = not diferencia.aceptada
+        self.virtual.upsert(key, self._row(diferencia))
+        self._update_summary()
+
+    def apply_adjustments(self) -> None:
+        """Aplica todas las diferencias aceptadas en una sola transacción."""
+        if not self.report: return
+        accepted = [d for d in self.report.diferencias if d.aceptada]
+        if not accepted:
+            messagebox.showinfo("Conteo", "No hay ajustes aceptados para aplicar.", parent=self.window); return
+        if not messagebox.askyesno("Confirmar Ajuste",
+                                   f"¿Ajustar la cantidad de {len(accepted)} productos?\n"
+                                   f"Impacto neto: {self.report.impacto_neto:+,.2f}", parent=self.window):
+            return
+        self._run_in_background("Aplicando ajustes…", lambda: ConteoController.aplicar(accepted), self._on_applied)
+
+    def _on_applied(self, result, error: Optional[Exception]) -> None:
+        if error is not None:
+            logger.error(f"Error al aplicar conteo: {error}")
+            self._update_summary()
+            messagebox.showerror("Error", f"No se aplicó ningún ajuste:\n{error}", parent=self.window)
+            return
+        applied, conflicts, products = result
+        ConteoController.avisar(products) # La tabla principal refleja las cantidades nuevas
+        conflicted = set(conflicts)
+        # Lo aplicado sale del informe; lo que cambió entretanto queda excluido para revisarlo.
+        # La tabla se rearma una sola vez: borrar fila a fila reindexa el resto en cada borrado (30k líneas)
+        remaining = []
+        changed_rows: Dict[int, tuple] = {}
+        for diferencia in self.report.diferencias:
+            if diferencia.aceptada and diferencia.id_productos in conflicted:
+                diferencia.aceptada = False
+                changed_rows[diferencia.id_productos] = self._row(diferencia)[:-1] + ("Conflicto",)
+            elif diferencia.aceptada:
+                self.differences.pop(diferencia.id_productos, None)
+                continue
+            remaining.append(diferencia)
+        self.report.diferencias = remaining
+        keys = [key for key in self.virtual.keys if key in self.differences]
+        rows = [changed_rows.get(key) or self.virtual.values(key) for key in keys]
+        self.virtual.set_rows(rows, keys, reset_scroll=False)
+        self._update_summary()
+        message = f"{applied} productos ajustados."
+        if conflicts:
+            message += (f"\n\n{len(conflicts)} productos cambiaron desde la comparación y no se tocaron "
+                        "(marcados como 'Conflicto'). Vuelva a cargar el conteo para revisarlos.")
+        messagebox.showinfo("Conteo aplicado", message, parent=self.window)
+
+    def on_close(self):
+        """Acción al cerrar la ventana."""
+        logger.info("Cerrando ventana de conteo de inventario.")
+        try:
+             self.window.grab_release()
+        except tk.TclError: pass
+        self.window.destroy()
+
+
+# Función de entrada
+def menu_conteo() -> None:
+    """Muestra la ventana de conteo de inventario."""
+    try:
+        CountWindow()
+    except Exception as e:
+        logger.error(f"Error al abrir ventana de conteo: {e}", exc_info=True)
+        messagebox.showerror("Error", "No se pudo abrir el conteo de inventario.")
@@ -1,47 +1,110 @@
 # src/view/principal.py
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import logging
-from typing import Optional, Dict, List, Callable # Añadir Callable
+import locale
+import os
+import queue
+import bisect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Optional, Dict, List, Set, Callable # Añadir Callable
 
 # Importar controladores
 # Asegúrate que src.controller.* están accesibles
 from src.controller.producto import ProductoController
 from src.controller.categoria import CategoriaController # Importar nuevo controlador
+from src.controller.importacion import ImportacionController, ResultadoImportacion
+from src.controller.exportacion import ExportacionController, ResultadoExportacion
+from src.controller.ajustes import create_cola_ajustes, get_cola_ajustes, close_cola_ajustes, ruta_diario
 
 # Importar la función de utilidad modificada
 # Asegúrate que src.utils.utils está accesible
-from src.utils.utils import populate_treeview, clear_treeview # Usar clear_treeview
+from src.utils.utils import clear_treeview, product_rows, VirtualTreeview, ProgressiveRenderer, TreeviewSorter
 
 # Importar las funciones para abrir las ventanas de gestión
 # Asegúrate que src.view.* están accesibles
 from src.view.producto import menu_productos
 from src.view.categoria import menu_categorias # Importar nueva función
+from src.view.conteo import menu_conteo
 
 # Importar excepciones y modelos para manejo de errores y type hinting
 # Asegúrate que src.model.producto está accesible
-from src.model.producto import DatabaseError, Categoria # Importar Categoria para type hinting
+from src.model.producto import DatabaseError, Categoria, Producto # Importar modelos para type hinting
+from src.model.replica import create_replica, load_replica_snapshot, close_replica, get_replica
+from src.model.auditoria import close_auditoria
+from src.model.snapshot import ruta_por_defecto
+# Asume que database.py está en el directorio raíz
+from database import create_connection_pool
+from src.utils.eventos import (suscribir, EventoCategoria, CategoriaActualizada, CategoriaEliminada,
+                               ProductoCreado, ProductoActualizado, ProductoEliminado)
 
 # Configuración del logging
 logger = logging.getLogger(__name__)
 
+SEARCH_DEBOUNCE_MS = 250 # Pausa de tecleo antes de buscar
+SEARCH_POLL_MS = 30      # Frecuencia de revisión de resultados del hilo de búsqueda
+STARTUP_BUDGET_MS = 500 # La ventana debe verse antes de esto: conexión y cargas van en segundo plano
+STARTUP_POLL_MS = 50    # Frecuencia de revisión de las cargas iniciales
+POOL_RETRY_S = 15       # En solo lectura (sin BD, con instantánea): cada cuánto se reintenta crear el pool
+LOADING_PLACEHOLDER = "Cargando…"
+ADJUST_POLL_MS = 100    # Frecuencia de revisión de los avisos de la cola de ajustes
+
 class MainWindow:
     """Clase principal de la aplicación."""
     def __init__(self):
         self.window = tk.Tk()
         self.tree: Optional[ttk.Treeview] = None
+        self.virtual_grid: Optional[VirtualTreeview] = None
+        self.renderer: Optional[ProgressiveRenderer] = None # Pinta los resultados sin congelar la ventana
         # Atributos para filtros
         self.search_entry: Optional[ttk.Entry] = None
         self.category_filter_combo: Optional[ttk.Combobox] = None
         self.category_map: Dict[str, Optional[int]] = {} # Mapa nombre categoría -> id_categoria
+        # Autocompletado del buscador
+        self.suggestion_list: Optional[tk.Listbox] = None
+        self.suggestions: List[Producto] = [] # Productos mostrados en la lista de sugerencias
+        self.fuzzy_var: Optional[tk.BooleanVar] = None # Búsqueda aproximada (tolerante a errores)
+        self.low_stock_var: Optional[tk.BooleanVar] = None # Solo productos bajo su stock mínimo
+        self.low_stock_label: Optional[ttk.Label] = None # Distintivo con el número de productos bajo mínimo
+        self._replica_version = -1 # Última versión de la réplica mostrada en la tabla
+        self._alerts_version = -1 # Última versión de las alertas de stock mostrada
+        # Búsqueda fuera del hilo de Tk: un solo hilo de trabajo y una cola de resultados
+        self._search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="busqueda")
+        self._search_results: "queue.Queue" = queue.Queue()
+        self._search_generation = 0 # Identifica la petición más reciente
+        self._search_after_id: Optional[str] = None # Búsqueda programada (debounce)
+        self._search_polling = False
+        self._active_filters = ("", None) # (término, id_categoria) de la última búsqueda lanzada
+        self._active_low_stock = False # La última búsqueda filtraba por bajo mínimo
+        self.status_var: Optional[tk.StringVar] = None
+        # Arranque en segundo plano: conexión, réplica y cargas iniciales
+        self._startup_results: "queue.Queue" = queue.Queue()
+        self._pending_loads: Set[str] = {"categorias", "productos"} # Cargas iniciales aún sin llegar
+        self._search_requested = False # Filtros tocados durante la carga: buscar al terminar
+        self.menu_buttons: List[ttk.Button] = [] # Se habilitan cuando hay conexión y datos
+        self._online = False    # Pool creado: se puede escribir en la BD
+        self._read_only = False # Sin BD pero con la instantánea en pantalla: solo consulta
+        self._closed = threading.Event() # Ventana cerrada: el arranque deja de reintentar la conexión
+        self._title = ""
+        # Tarea larga en curso (importación/exportación): avance y resultado por cola
+        self._task_results: "queue.Queue" = queue.Queue()
+        self._task_done: Optional[Callable[[Any, Optional[Exception]], None]] = None
+        # Avisos de la cola de ajustes (+1/-1): se ejecutan en el hilo de Tk (ver _poll_adjustments)
+        self._adjust_calls: "queue.Queue[Callable[[], None]]" = queue.Queue()
 
         self.setup_window()
         self.create_widgets()
+        self._subscribe_events()
+        self._watch_replica()
+        self._poll_adjustments()
         # self.initialize_db_pool() # Llamar aquí si se usa pool (ver main.py mejor)
 
     def setup_window(self):
         """Configura la ventana principal."""
-        self.window.title("Sistema Inventario Tahona v1.0") # Ejemplo título con versión
+        self._title = "Sistema Inventario Tahona v1.0" # Ejemplo título con versión
+        self.window.title(self._title)
         self.window.geometry("1280x720")
         # Centrar ventana (opcional)
         # self.center_window()
@@ -85,8 +148,12 @@ class MainWindow:
         menu_label = ttk.Label(self.left_frame, text="Menú Principal", font=("Arial", 24, "bold"), background="#f0f0f0")
         menu_label.pack(pady=(20, 40)) # Más espacio arriba
 
-        ttk.Button(self.left_frame, text="Gestión de Productos", style="Big.TButton", command=self.open_productos).pack(pady=15, fill=tk.X, padx=10)
-        ttk.Button(self.left_frame, text="Gestión de Categorías", style="Big.TButton", command=self.open_categorias).pack(pady=15, fill=tk.X, padx=10)
+        for text, command in (("Gestión de Productos", self.open_productos), ("Gestión de Categorías", self.open_categorias),
+                              ("Conteo de Inventario", self.open_conteo),
+                              ("Importar Catálogo (CSV)", self.import_catalogue), ("Exportar Productos", self.export_products)):
+            button = ttk.Button(self.left_frame, text=text, style="Big.TButton", command=command, state=tk.DISABLED)
+            button.pack(pady=15, fill=tk.X, padx=10)
+            self.menu_buttons.append(button)
 
         # Espaciador (opcional)
         ttk.Frame(self.left_frame, height=50, style="Left.TFrame").pack()
@@ -103,7 +170,10 @@ class MainWindow:
         ttk.Label(filter_frame, text="Buscar Nombre:").grid(row=0, column=0, padx=(0, 5), pady=5, sticky="w")
         self.search_entry = ttk.Entry(filter_frame, width=25)
         self.search_entry.grid(row=0, column=1, padx=5, pady=5) # No necesita expandirse tanto
-        self.search_entry.bind("<KeyRelease>", self.apply_filters) # Filtrar al escribir
+        self.search_entry.bind("<KeyRelease>", self.on_search_key) # Sugerir y filtrar al escribir
+        self.search_entry.bind("<Down>", self.focus_suggestions)
+        self.search_entry.bind("<Escape>", lambda e: self.hide_suggestions())
+        self.search_entry.bind("<FocusOut>", lambda e: self.window.after(150, self._hide_suggestions_if_unfocused))
 
         ttk.Label(filter_frame, text="Categoría:").grid(row=0, column=2, padx=(15, 5), pady=5, sticky="w")
         self.category_filter_combo = ttk.Combobox(filter_frame, state="readonly", width=25)
@@ -114,8 +184,24 @@ class MainWindow:
         clear_filter_btn = ttk.Button(filter_frame, text="Limpiar Filtros", command=self.clear_filters)
         clear_filter_btn.grid(row=0, column=4, padx=(10, 0), pady=5)
 
-        # Poblar el combobox de categorías
-        self.populate_category_filter()
+        # Búsqueda aproximada: tolera errores de tipeo en el nombre
+        self.fuzzy_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(filter_frame, text="Búsqueda aproximada", variable=self.fuzzy_var,
+                        command=self.apply_filters).grid(row=0, column=5, padx=(10, 0), pady=5)
+
+        # Alertas de stock: filtro y distintivo con el recuento (al día con la réplica, ver _watch_replica)
+        self.low_stock_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(filter_frame, text="Solo bajo mínimo", variable=self.low_stock_var,
+                        command=self.apply_filters).grid(row=0, column=6, padx=(10, 0), pady=5)
+        self.low_stock_label = ttk.Label(filter_frame, text="", foreground="#b00020")
+        self.low_stock_label.grid(row=0, column=7, padx=(10, 0), pady=5)
+
+        # Ajustes rápidos al producto seleccionado (también teclas + y - sobre la tabla)
+        ttk.Button(filter_frame, text="+1", width=3, command=lambda: self.adjust_selected(1)).grid(row=0, column=8, padx=(10, 0), pady=5)
+        ttk.Button(filter_frame, text="−1", width=3, command=lambda: self.adjust_selected(-1)).grid(row=0, column=9, padx=(2, 0), pady=5)
+
+        # El combo se llena cuando llegan las categorías (ver _poll_startup)
+        self.category_filter_combo.set(LOADING_PLACEHOLDER)
 
         # Frame para la Tabla Principal (Treeview)
         table_frame = ttk.Frame(self.right_frame)
@@ -137,20 +223,191 @@ class MainWindow:
         hsb = ttk.Scrollbar(table_frame, orient="horizontal", command=self.tree.xview)
         self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
         self.tree.grid(row=0, column=0, sticky="nsew"); vsb.grid(row=0, column=1, sticky="ns"); hsb.grid(row=1, column=0, sticky="ew")
+        self.tree.tag_configure('oddrow', background='#f0f0f0'); self.tree.tag_configure('evenrow', background='#ffffff')
+        # Grilla virtual: con 100k productos solo existen como items las filas visibles
+        self.virtual_grid = VirtualTreeview(self.tree, vsb)
+        self.renderer = ProgressiveRenderer(self.tree, on_progress=self._on_render_progress)
+        # Clic en un encabezado ordena lo cargado (Mayús+clic añade claves secundarias)
+        TreeviewSorter(self.tree, numeric_columns=("id_productos", "cantidad"))
+        for sequence, delta in (("<plus>", 1), ("<KP_Add>", 1), ("<minus>", -1), ("<KP_Subtract>", -1)):
+            self.tree.bind(sequence, lambda e, d=delta: self.adjust_selected(d))
+
+        # Lista desplegable de sugerencias (se crea después de la tabla para quedar encima)
+        self.suggestion_list = tk.Listbox(self.right_frame, height=8, activestyle="dotbox", exportselection=False)
+        self.suggestion_list.bind("<Return>", self.choose_suggestion)
+        self.suggestion_list.bind("<Double-Button-1>", self.choose_suggestion)
+        self.suggestion_list.bind("<Escape>", lambda e: (self.hide_suggestions(), self.search_entry.focus_set()))
+        self.suggestion_list.bind("<FocusOut>", lambda e: self.window.after(150, self._hide_suggestions_if_unfocused))
+
+        # Estado de la búsqueda ("Buscando…", nº de resultados)
+        self.status_var = tk.StringVar(value="Conectando con la base de datos…")
+        ttk.Label(self.right_frame, textvariable=self.status_var, anchor="w").grid(row=2, column=0, sticky="ew", padx=5, pady=(2, 0))
+        # Los datos iniciales no se cargan aquí: ver start_loading
+
+    # --- Arranque en segundo plano ---
+
+    def start_loading(self):
+        """Conecta y carga los datos iniciales en un hilo; la ventana se muestra ya con marcadores."""
+        threading.Thread(target=self._load_initial_data, name="arranque", daemon=True).start()
+        self.window.after(STARTUP_POLL_MS, self._poll_startup)
+
+    def _load_initial_data(self):
+        """
+        Hilo de arranque. Con instantánea en disco la tabla se pinta desde ella antes de crear el pool
+        (que abre sus POOL_SIZE conexiones una tras otra); luego la réplica concilia por deltas.
+        Sin BD pero con instantánea la app sigue en solo lectura. Solo deja resultados en la cola (sin tocar Tk).
+        """
+        results = self._startup_results
+        # Réplica local de productos (opcional): búsquedas en memoria, BD solo para escrituras
+        # Se desactiva con INVENTARIO_REPLICA=0 en el .env
+        use_replica = os.getenv("INVENTARIO_REPLICA", "1") != "0"
+        interval = float(os.getenv("REPLICA_INTERVALO", "15"))
+        snapshot = None
+        if use_replica:
+            try:
+                snapshot = load_replica_snapshot(intervalo_sondeo=interval, ruta=ruta_por_defecto())
+            except Exception as e_snapshot:
+                logger.warning(f"No se pudo cargar la instantánea local: {e_snapshot}")
+        if snapshot is not None:
+            self._replica_version = snapshot.version_remota # Lo que muestra esta carga (ver _watch_replica)
+            self._put_initial_loads() # En memoria: no espera a la BD
 
-        # Cargar datos iniciales aplicando filtros (vacíos al inicio)
-        self.apply_filters()
-
-
-    def populate_category_filter(self):
-        """Obtiene categorías y llena el Combobox de filtro."""
+        try:
+            create_connection_pool() # Incluye la conexión de prueba
+        except Exception as e: # DBConnectionError u otro error inesperado
+            results.put(("pool", snapshot is not None, e))
+            if snapshot is None: return
+            snapshot.construir_indices() # Sin sondeo que los construya: que la búsqueda por nombre funcione
+            if not self._wait_for_pool(): return
+        if snapshot is None:
+            results.put(("status", "Cargando categorías y productos…", None))
+
+        if use_replica:
+            try:
+                # Con instantánea ya cargada solo empieza a conciliar; sin ella, carga de la BD
+                create_replica(intervalo_sondeo=interval, ruta=ruta_por_defecto())
+            except Exception as e_replica:
+                # No es crítico: las búsquedas seguirán yendo a la BD
+                logger.warning(f"Réplica local no disponible, se consultará la BD: {e_replica}")
+        replica = get_replica()
+        if snapshot is None and replica is not None:
+            self._replica_version = replica.version_remota
+
+        # Cola de ajustes rápidos: repone lo que quedó en el diario si la app se cerró sin escribirlo
+        try:
+            create_cola_ajustes(diario=ruta_diario(), despachar=self._adjust_calls.put,
+                                al_confirmar=self._on_adjustments_written)
+        except Exception as e_ajustes:
+            logger.error(f"Cola de ajustes no disponible (el diario se conserva): {e_ajustes}")
+        results.put(("online", None, None))
+        if snapshot is None:
+            self._put_initial_loads()
+
+    def _wait_for_pool(self) -> bool:
+        """Solo lectura: reintenta crear el pool hasta lograrlo (True) o hasta que se cierre la ventana (False)."""
+        while not self._closed.wait(POOL_RETRY_S):
+            try:
+                create_connection_pool()
+                logger.info("Conexión con la base de datos recuperada.")
+                return True
+            except Exception as e:
+                logger.warning(f"Sigue sin conexión con la base de datos, se reintentará: {e}")
+        return False
+
+    def _put_initial_loads(self):
+        """Categorías y productos a la vez: sin réplica, cada consulta usa su propia conexión del pool."""
+        results = self._startup_results
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="arranque-carga") as executor:
+            loads = {executor.submit(CategoriaController.get_all): "categorias",
+                     executor.submit(lambda: product_rows(ProductoController.search_products(), self._pending_adjustments())): "productos"}
+            for future in as_completed(loads):
+                try:
+                    results.put((loads[future], future.result(), None))
+                except Exception as e:
+                    results.put((loads[future], None, e))
+
+    def _poll_startup(self):
+        """Aplica en el hilo de Tk cada carga inicial según llega (la otra puede seguir en curso)."""
+        while True:
+            try:
+                kind, value, error = self._startup_results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "pool":
+                if value: # La instantánea ya está en pantalla: seguir, solo para consultar
+                    self._on_read_only(error)
+                    continue
+                self._on_connection_failed(error)
+                return
+            if kind == "status":
+                self.status_var.set(value)
+                continue
+            if kind == "online":
+                self._online = True
+                if self._read_only: self._on_back_online()
+                self._enable_menus()
+                continue
+            self._pending_loads.discard(kind)
+            if kind == "categorias":
+                if error is not None:
+                    logger.error(f"Error al cargar categorías: {error}")
+                    value = []
+                self.populate_category_filter(value)
+            elif error is not None:
+                logger.error(f"Error al cargar productos: {error}")
+                self.status_var.set("Error al cargar productos")
+                messagebox.showerror("Error de Carga", f"No se pudieron obtener los productos:\n{error}")
+            elif not self._search_requested:
+                keys, rows = value
+                self.renderer.start(keys, rows)
+            if not self._pending_loads:
+                logger.info("Datos iniciales cargados.")
+                self._enable_menus()
+                if self._search_requested: # El usuario filtró mientras cargaba
+                    self.apply_filters()
+        if self._pending_loads or not self._online: # En solo lectura, hasta que vuelva la conexión
+            self.window.after(STARTUP_POLL_MS, self._poll_startup)
+
+    def _enable_menus(self):
+        """Los botones (todos escriben o leen la BD) se habilitan con los datos cargados y el pool creado."""
+        if self._pending_loads or not self._online: return
+        for button in self.menu_buttons:
+            button.configure(state=tk.NORMAL)
+
+    def _on_read_only(self, error: Exception):
+        """Sin BD pero con la instantánea en pantalla: se puede consultar; los botones siguen deshabilitados."""
+        logger.error(f"Fallo al inicializar pool de BD, se sigue con la instantánea: {error}")
+        self._read_only = True
+        self.window.title(f"{self._title} — solo lectura (sin conexión)")
+        self.status_var.set("Sin conexión con la base de datos: datos de la última sesión, solo lectura")
+        messagebox.showwarning("Sin conexión", f"No se pudo conectar a la base de datos:\n{error}\n\n"
+                               "Se muestran los datos guardados de la última sesión, solo para consultar; "
+                               "la conexión se reintentará en segundo plano.", parent=self.window)
+
+    def _on_back_online(self):
+        """Volvió la BD: la réplica ya concilia por deltas (ver _watch_replica) y se puede escribir."""
+        self._read_only = False
+        self.window.title(self._title)
+        self.status_var.set("Conexión con la base de datos recuperada")
+
+    def _on_connection_failed(self, error: Exception):
+        """Sin BD ni instantánea la aplicación no puede funcionar: avisar y cerrar."""
+        logger.critical(f"Fallo al inicializar pool de BD: {error}")
+        self.status_var.set("Sin conexión con la base de datos")
+        messagebox.showerror("Error Crítico de BD", f"No se pudo conectar a la base de datos:\n{error}\n\n"
+                             "Verifica la configuración (.env) y el servidor de base de datos.\nLa aplicación se cerrará.")
+        self.window.destroy()
+
+    def populate_category_filter(self, categorias: Optional[List[Categoria]] = None):
+        """Llena el Combobox de filtro con 'categorias' (ya cargadas) o las obtiene del controlador."""
         if not self.category_filter_combo: return
         logger.info("Poblando filtro de categorías...")
         current_selection = self.category_filter_combo.get() # Guardar selección actual
         self.category_map = {" [ Todas ] ": None}
         category_names = [" [ Todas ] "]
         try:
-            categorias: List[Categoria] = CategoriaController.get_all()
+            if categorias is None:
+                categorias = CategoriaController.get_all()
             for cat in sorted(categorias, key=lambda c: c.nombre): # Ordenar alfabéticamente
                 # Evitar duplicados en el nombre visible (aunque UNIQUE en BD)
                 if cat.nombre not in self.category_map:
@@ -168,36 +425,304 @@ class MainWindow:
              self.category_filter_combo.set(" [ Todas ] ")
 
 
+    # --- Autocompletado del buscador ---
+
+    def on_search_key(self, event=None):
+        """Actualiza las sugerencias y filtra la tabla al soltar una tecla en el buscador."""
+        if event is not None and event.keysym in ("Down", "Up", "Escape", "Return", "Tab"):
+            return # Teclas de navegación: no cambian el término
+        self.update_suggestions()
+        self.apply_filters(event)
+
+    def update_suggestions(self):
+        """Muestra hasta 8 productos cuyo nombre o ID empieza por lo escrito (en memoria, sin BD)."""
+        if not self.suggestion_list or not self.search_entry: return
+        prefix = self.search_entry.get()
+        self.suggestions = ProductoController.autocomplete(prefix, limite=8)
+        if not self.suggestions:
+            self.hide_suggestions(); return
+        self.suggestion_list.delete(0, tk.END)
+        self.suggestion_list.insert(tk.END, *(f"{p.id_productos} - {p.nombre}" for p in self.suggestions))
+        self.suggestion_list.configure(height=len(self.suggestions))
+        # Justo debajo del campo de búsqueda, por encima de la tabla
+        self.suggestion_list.place(in_=self.search_entry, relx=0, rely=1, relwidth=2, bordermode="outside")
+        self.suggestion_list.lift()
+
+    def hide_suggestions(self):
+        if self.suggestion_list: self.suggestion_list.place_forget()
+
+    def _hide_suggestions_if_unfocused(self):
+        focused = self.window.focus_get()
+        if focused is not self.search_entry and focused is not self.suggestion_list:
+            self.hide_suggestions()
+
+    def focus_suggestions(self, event=None):
+        """Flecha abajo desde el buscador: pasar a la lista de sugerencias."""
+        if not self.suggestion_list or not self.suggestions: return
+        self.suggestion_list.focus_set()
+        self.suggestion_list.selection_clear(0, tk.END)
+        self.suggestion_list.selection_set(0); self.suggestion_list.activate(0)
+        return "break"
+
+    def choose_suggestion(self, event=None):
+        """Copia el nombre de la sugerencia elegida al buscador y filtra por él."""
+        if not self.suggestion_list or not self.search_entry: return
+        selection = self.suggestion_list.curselection()
+        if not selection or selection[0] >= len(self.suggestions): return
+        producto = self.suggestions[selection[0]]
+        self.search_entry.delete(0, tk.END)
+        self.search_entry.insert(0, producto.nombre)
+        self.hide_suggestions()
+        self.search_entry.focus_set()
+        self.apply_filters()
+
     def apply_filters(self, event=None):
-        """Aplica los filtros actuales y refresca el Treeview."""
+        """
+        Programa la búsqueda con los filtros actuales. Al escribir se espera una pausa
+        (debounce) para no lanzar una consulta por tecla; la consulta corre en un hilo
+        y solo se pinta el resultado de la petición más reciente.
+        """
         if not self.tree or not self.search_entry or not self.category_filter_combo:
             logger.warning("Intentando aplicar filtros antes de que UI esté lista.")
             return
-
+        if self._pending_loads:
+            self._search_requested = True # Se busca al terminar la carga inicial
+            return
+        if self._search_after_id is not None:
+            self.window.after_cancel(self._search_after_id)
+        delay = SEARCH_DEBOUNCE_MS if event is not None and event.type == tk.EventType.KeyRelease else 0
+        self._search_after_id = self.window.after(delay, self._start_search)
+
+    def _start_search(self):
+        """Lee los filtros (en el hilo de Tk) y lanza la búsqueda en el hilo de trabajo."""
+        self._search_after_id = None
         search_term = self.search_entry.get()
         selected_category_name = self.category_filter_combo.get()
         category_id = self.category_map.get(selected_category_name, None)
+        fuzzy = self.fuzzy_var is not None and self.fuzzy_var.get()
+        low_stock = self.low_stock_var is not None and self.low_stock_var.get()
 
         logger.debug(f"Aplicando filtros: Término='{search_term}', Categoría='{selected_category_name}' (ID={category_id})")
+        self._active_filters = (search_term, category_id)
+        self._active_low_stock = low_stock
+        self._search_generation += 1 # Las peticiones anteriores quedan obsoletas
+        generation = self._search_generation
+        self.status_var.set("Buscando…")
+        self._search_executor.submit(self._run_search, generation, search_term, category_id, fuzzy, low_stock)
+        if not self._search_polling:
+            self._search_polling = True
+            self.window.after(SEARCH_POLL_MS, self._poll_search_results)
+
+    def _run_search(self, generation: int, search_term: str, category_id: Optional[int], fuzzy: bool,
+                    low_stock: bool = False):
+        """Hilo de trabajo: consulta al controlador y deja el resultado en la cola (sin tocar Tk)."""
+        if generation != self._search_generation:
+            return # Ya hay una petición más nueva: ni siquiera consultar
         try:
-            # Llamar al controlador con los filtros
-            filtered_products = ProductoController.search_products(
-                search_term=search_term,
-                category_id=category_id
-            )
-            # Poblar el treeview con los resultados filtrados
-            populate_treeview(self.tree, filtered_products) # Usar función de utils
-            # logger.info(f"Treeview actualizado con {len(filtered_products)} productos filtrados.") # Muy verboso
+            if fuzzy:
+                filtered_products = ProductoController.fuzzy_search(search_term, category_id)
+            else:
+                filtered_products = ProductoController.search_products(
+                    search_term=search_term,
+                    category_id=category_id
+                )
+                # Sin resultados exactos: probar tolerando errores de tipeo (ej. 'azucar morena')
+                if not filtered_products and len(search_term.strip()) >= 4:
+                    filtered_products = ProductoController.fuzzy_search(search_term, category_id)
+            if low_stock:
+                low_ids = {p.id_productos for p in ProductoController.low_stock(category_id)}
+                filtered_products = [p for p in filtered_products if p.id_productos in low_ids]
+            # Las filas de la tabla también se arman aquí, fuera del hilo de Tk
+            self._search_results.put((generation, product_rows(filtered_products, self._pending_adjustments()), None))
         except (DatabaseError, ValueError, Exception) as e:
-             logger.error(f"Error al aplicar filtros y refrescar Treeview: {e}")
-             messagebox.showerror("Error de Búsqueda/Filtro", f"No se pudieron obtener los productos filtrados:\n{e}")
-             clear_treeview(self.tree) # Limpiar tabla en caso de error
+            self._search_results.put((generation, None, e))
+
+    def _poll_search_results(self):
+        """Recoge en el hilo de Tk los resultados listos; descarta los de peticiones superadas."""
+        while True:
+            try:
+                generation, result_rows, error = self._search_results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._search_generation:
+                continue # Resultado obsoleto: el usuario siguió escribiendo
+            self._search_polling = False
+            if error is not None:
+                logger.error(f"Error al aplicar filtros y refrescar Treeview: {error}")
+                self.status_var.set("Error en la búsqueda")
+                self.renderer.cancel()
+                clear_treeview(self.tree) # Limpiar tabla en caso de error
+                messagebox.showerror("Error de Búsqueda/Filtro", f"No se pudieron obtener los productos filtrados:\n{error}")
+                return
+            # Poblar el treeview con los resultados filtrados (cancela un pintado anterior en curso)
+            keys, rows = result_rows
+            self.renderer.start(keys, rows)
+            return
+        self.window.after(SEARCH_POLL_MS, self._poll_search_results) # Aún pendiente
+
+    def _on_render_progress(self, done: int, total: int):
+        """Muestra el avance del pintado progresivo en la barra de estado."""
+        if done < total:
+            self.status_var.set(f"Mostrando {done} de {total} productos…")
+        else:
+            self.status_var.set(f"{total} productos")
+
+    # --- Actualización incremental por eventos de dominio ---
+
+    def _subscribe_events(self):
+        """Las ediciones hechas en esta app llegan por el bus: se parchean solo las filas afectadas."""
+        suscribir(ProductoCreado, self._on_product_saved)
+        suscribir(ProductoActualizado, self._on_product_saved)
+        suscribir(ProductoEliminado, self._on_product_deleted)
+        suscribir(EventoCategoria, self._on_category_event)
+
+    def _patch_allowed(self) -> bool:
+        """Con una búsqueda en curso su resultado podría ser anterior al cambio: mejor repetirla."""
+        if self._search_polling or self._search_after_id is not None:
+            self.apply_filters()
+            return False
+        return self.virtual_grid is not None
+
+    def _update_count(self):
+        if self.status_var is not None and self.virtual_grid is not None:
+            self.status_var.set(f"{len(self.virtual_grid)} productos")
+
+    def _on_product_saved(self, evento):
+        """Alta o modificación: insertar, actualizar o quitar la fila según los filtros activos."""
+        if not self._patch_allowed(): return
+        producto: Producto = evento.producto
+        key = producto.id_productos
+        if isinstance(evento, ProductoActualizado) and evento.id_anterior != key:
+            self.virtual_grid.delete(evento.id_anterior)
+        search_term, category_id = self._active_filters
+        _, rows = product_rows([producto], self._pending_adjustments())
+        shown = self.virtual_grid.values(key)
+        matches = ProductoController.matches_filters(producto, search_term, category_id)
+        if not matches and shown is not None and shown[1] == producto.nombre:
+            # Ya visible por la búsqueda aproximada y sin cambio de nombre: sigue entrando si la categoría coincide
+            matches = ProductoController.matches_filters(producto, None, category_id)
+        if matches and self._active_low_stock:
+            low = ProductoController.is_low_stock(key)
+            if low is None: # Sin réplica no se sabe sin consultar: repetir la búsqueda
+                self.apply_filters()
+                return
+            matches = low
+        if not matches:
+            self.virtual_grid.delete(key)
+        elif shown is not None:
+            self.virtual_grid.upsert(key, rows[0])
+        else:
+            # Sin término el resultado va ordenado por ID; con término, al final (no hay puntuación aquí)
+            position = None if search_term and search_term.strip() else bisect.bisect_left(self.virtual_grid.keys, key)
+            self.virtual_grid.upsert(key, rows[0], position=position)
+        self._update_count()
+
+    # --- Ajustes rápidos (+1 / -1) ---
+
+    @staticmethod
+    def _pending_adjustments() -> Optional[Dict[int, int]]:
+        """Ajustes aún sin escribir, para mostrarlos ya sumados (seguro desde cualquier hilo)."""
+        cola = get_cola_ajustes()
+        return cola.pendientes() if cola is not None else None
+
+    def adjust_selected(self, delta: int):
+        """Suma 'delta' al producto seleccionado: la fila cambia al momento y la BD se escribe por lotes."""
+        key = self.virtual_grid.selected_key if self.virtual_grid else None
+        if key is None:
+            self.status_var.set("Seleccione un producto para ajustar su cantidad")
+            return "break"
+        cola = get_cola_ajustes()
+        row = self.virtual_grid.values(key)
+        if cola is None or row is None:
+            self.status_var.set("Los ajustes rápidos no están disponibles")
+            return "break"
+        if row[2] + delta < 0:
+            self.status_var.set(f"{row[1]}: sin stock para restar")
+            return "break"
+        pending = cola.sumar(key, delta)
+        self.virtual_grid.upsert(key, row[:2] + (row[2] + delta,) + row[3:]) # Lectura de lo propio
+        self.status_var.set(f"{row[1]}: {row[2] + delta} ({pending:+d} pendiente de guardar)" if pending else f"{row[1]}: {row[2] + delta}")
+        return "break" # Que Tk no procese la tecla además
+
+    def _poll_adjustments(self):
+        """Ejecuta en el hilo de Tk los avisos del escritor de ajustes (eventos del bus y errores)."""
+        while True:
+            try:
+                call = self._adjust_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                call()
+            except Exception as e:
+                logger.error(f"Error al aplicar un aviso de la cola de ajustes: {e}", exc_info=True)
+        self.window.after(ADJUST_POLL_MS, self._poll_adjustments)
+
+    def _on_adjustments_written(self, productos: List[Producto], errores: List[str]):
+        """Tras escribir un lote (hilo de Tk): las filas ya se parchearon por el bus; avisar de los descartados."""
+        if errores:
+            self.apply_filters() # La tabla mostraba ajustes que no se aplicaron
+            messagebox.showwarning("Ajustes no guardados", "Algunos ajustes no se pudieron aplicar:\n\n" + "\n".join(errores),
+                                   parent=self.window)
+
+    def _on_product_deleted(self, evento: ProductoEliminado):
+        if not self._patch_allowed(): return
+        self.virtual_grid.delete(evento.id_producto)
+        self._update_count()
+
+    def _on_category_event(self, evento):
+        """Renombres y bajas de categorías: actualizar el combo y la columna Categoría de las filas afectadas."""
+        names_by_id = {cat_id: name for name, cat_id in self.category_map.items() if cat_id is not None}
+        current_name = self.category_filter_combo.get() if self.category_filter_combo else None
+        self.populate_category_filter()
+        if isinstance(evento, CategoriaActualizada) and evento.renombrada:
+            if current_name == evento.nombre_anterior: # El filtro activo era la categoría renombrada
+                self.category_filter_combo.set(evento.categoria.nombre)
+            if self._patch_allowed():
+                self._rename_category_rows(evento.nombre_anterior, evento.categoria.nombre)
+        elif isinstance(evento, CategoriaEliminada):
+            if self._active_filters[1] == evento.id_categoria:
+                self.apply_filters() # El filtro ya no existe (el combo volvió a 'Todas')
+            elif self._patch_allowed():
+                self._rename_category_rows(names_by_id.get(evento.id_categoria),
+                                           names_by_id.get(evento.id_destino, "N/A"))
+
+    def _rename_category_rows(self, old_name: Optional[str], new_name: str):
+        if not old_name: return
+        rows = self.virtual_grid.rows
+        for i, row in enumerate(rows):
+            if row[3] == old_name:
+                rows[i] = row[:3] + (new_name,)
+        self.virtual_grid.render()
+
+    def _watch_replica(self):
+        """
+        Revisa cada segundo si la réplica cambió por fuera de esta app (conciliación de la
+        instantánea, deltas de otros puestos) y en ese caso vuelve a aplicar los filtros.
+        Los cambios propios ya se aplicaron fila a fila por el bus de eventos.
+        También actualiza el distintivo de productos bajo mínimo (lectura O(1) del conjunto de alertas).
+        """
+        replica = get_replica()
+        if replica is not None and not self._pending_loads: # Durante el arranque la carga inicial ya trae lo último
+            if self._replica_version == -1:
+                self._replica_version = replica.version_remota # Lo que ya se muestra al arrancar
+            elif replica.version_remota != self._replica_version:
+                self._replica_version = replica.version_remota
+                logger.debug("Réplica actualizada: refrescando filtros y tabla.")
+                self.populate_category_filter()
+                self.apply_filters()
+            if replica.alertas.version != self._alerts_version:
+                self._alerts_version = replica.alertas.version
+                low_count = len(replica.alertas)
+                self.low_stock_label.config(text=f"⚠ {low_count} bajo mínimo" if low_count else "")
+        self.window.after(1000, self._watch_replica)
 
     def clear_filters(self):
          """Limpia los campos de filtro y actualiza la tabla."""
          logger.info("Limpiando filtros...")
          if self.search_entry: self.search_entry.delete(0, tk.END)
+         self.hide_suggestions()
          if self.category_filter_combo: self.category_filter_combo.set(" [ Todas ] ")
+         if self.low_stock_var: self.low_stock_var.set(False)
          self.apply_filters() # Aplicar filtros vacíos para mostrar todo
 
     def refresh_treeview(self):
@@ -211,11 +736,8 @@ class MainWindow:
         """Abre la ventana de gestión de productos."""
         if not self.tree: return
         try:
-            # Pasar self.refresh_treeview como callback para que la ventana hija
-            # pueda refrescar esta tabla principal al hacer cambios.
-            # NOTA: Esto aún usa el refresh completo. La actualización eficiente
-            # requeriría un callback más complejo o un patrón Observer.
-            menu_productos(self.tree) # menu_productos ahora refresca el tree principal
+            # Los cambios vuelven a esta tabla como eventos de dominio (ver _subscribe_events)
+            menu_productos()
         except Exception as e:
             logger.error(f"Error al abrir menú de productos: {e}", exc_info=True)
             messagebox.showerror("Error", "No se pudo abrir el menú de productos")
@@ -225,14 +747,106 @@ class MainWindow:
         """Abre la ventana de gestión de categorías y pasa un callback."""
         logger.info("Abriendo gestión de categorías...")
         try:
-            # Pasar self.populate_category_filter como callback
-            # para que la ventana hija pueda actualizar el combo al cerrar o al hacer cambios.
-            menu_categorias(parent_update_callback=self.populate_category_filter)
+            # El combo y la tabla se actualizan con los eventos de categoría (ver _subscribe_events)
+            menu_categorias()
         except Exception as e:
             logger.error(f"Error al abrir la ventana de categorías: {e}", exc_info=True)
             messagebox.showerror("Error", "No se pudo abrir la gestión de categorías.")
 
 
+    def open_conteo(self):
+        """Abre la conciliación de un conteo físico (al aplicarlo, la tabla se parchea con los eventos de producto)."""
+        try:
+            menu_conteo()
+        except Exception as e:
+            logger.error(f"Error al abrir el conteo de inventario: {e}", exc_info=True)
+            messagebox.showerror("Error", "No se pudo abrir el conteo de inventario.")
+
+    # --- Tareas largas en segundo plano (importación, exportación) ---
+
+    def _start_task(self, status: str, work: Callable[[Callable[[str], None]], Any],
+                    on_done: Callable[[Any, Optional[Exception]], None]):
+        """
+        Corre work(progress) en un hilo con los botones del menú deshabilitados (una tarea a la vez).
+        'progress(texto)' se muestra en la barra de estado y on_done(resultado, error) corre en el hilo de Tk.
+        """
+        for button in self.menu_buttons:
+            button.configure(state=tk.DISABLED)
+        self.status_var.set(status)
+        self._task_done = on_done
+        def run():
+            try:
+                result = work(lambda text: self._task_results.put((False, text, None)))
+                self._task_results.put((True, result, None))
+            except (DatabaseError, ValueError, Exception) as e:
+                self._task_results.put((True, None, e))
+        threading.Thread(target=run, name="tarea", daemon=True).start()
+        self.window.after(STARTUP_POLL_MS, self._poll_task)
+
+    def _poll_task(self):
+        """Muestra el avance de la tarea en curso y, al terminar, entrega su resultado."""
+        while True:
+            try:
+                finished, value, error = self._task_results.get_nowait()
+            except queue.Empty:
+                self.window.after(STARTUP_POLL_MS, self._poll_task)
+                return
+            if not finished:
+                self.status_var.set(value)
+                continue
+            for button in self.menu_buttons:
+                button.configure(state=tk.NORMAL)
+            on_done, self._task_done = self._task_done, None
+            on_done(value, error)
+            return
+
+    def import_catalogue(self):
+        """Importa un CSV de proveedor en segundo plano, con el avance en la barra de estado."""
+        ruta = filedialog.askopenfilename(parent=self.window, title="Importar catálogo de productos",
+                                          filetypes=[("Archivos CSV", "*.csv"), ("Todos los archivos", "*.*")])
+        if not ruta: return
+        actualizar = messagebox.askyesno("Importar catálogo", "¿Actualizar los productos cuyo ID ya existe?\n\n"
+                                         "(Si responde No, esas filas van al archivo de rechazos.)", parent=self.window)
+        def work(progress: Callable[[str], None]) -> ResultadoImportacion:
+            return ImportacionController.importar_csv(ruta, actualizar=actualizar, on_progress=lambda r: progress(
+                f"Importando… {r.procesadas} filas ({r.filas_por_segundo:,.0f} filas/s)"))
+        self._start_task("Importando catálogo…", work, self._on_import_done)
+
+    def _on_import_done(self, resultado: Optional[ResultadoImportacion], error: Optional[Exception]):
+        if error is not None:
+            logger.error(f"Error al importar catálogo: {error}")
+            self.status_var.set("Error al importar catálogo")
+            messagebox.showerror("Error de Importación", f"No se pudo completar la importación:\n{error}", parent=self.window)
+        else:
+            self.status_var.set(str(resultado))
+            message = str(resultado)
+            if resultado.rechazadas:
+                message += f"\n\nFilas rechazadas y motivos en:\n{resultado.ruta_rechazos}"
+            messagebox.showinfo("Importación terminada", message, parent=self.window)
+        if get_replica() is None:
+            self.apply_filters() # Con réplica, la tabla se refresca sola al sincronizarla (ver _watch_replica)
+
+    def export_products(self):
+        """Exporta los productos que cumplen los filtros actuales a CSV o JSON Lines (.gz opcional)."""
+        ruta = filedialog.asksaveasfilename(parent=self.window, title="Exportar productos", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("CSV comprimido", "*.csv.gz"),
+                                                       ("JSON Lines", "*.jsonl"), ("JSON Lines comprimido", "*.jsonl.gz")])
+        if not ruta: return
+        search_term, category_id = self._active_filters # Lo que muestra la tabla (búsqueda exacta en BD)
+        def work(progress: Callable[[str], None]) -> ResultadoExportacion:
+            return ExportacionController.exportar(ruta, search_term, category_id, on_progress=lambda r: progress(
+                f"Exportando… {r.filas} filas ({r.filas_por_segundo:,.0f} filas/s)"))
+        self._start_task("Exportando productos…", work, self._on_export_done)
+
+    def _on_export_done(self, resultado: Optional[ResultadoExportacion], error: Optional[Exception]):
+        if error is not None:
+            logger.error(f"Error al exportar productos: {error}")
+            self.status_var.set("Error al exportar productos")
+            messagebox.showerror("Error de Exportación", f"No se pudo completar la exportación:\n{error}", parent=self.window)
+        else:
+            self.status_var.set(str(resultado))
+            messagebox.showinfo("Exportación terminada", str(resultado), parent=self.window)
+
     def run(self):
         """Inicia el bucle principal de la aplicación."""
         try:
@@ -241,6 +855,11 @@ class MainWindow:
             # self.center_window()
             self.window.mainloop()
             logger.info("Aplicación cerrada.")
+            self._closed.set()
+            self._search_executor.shutdown(wait=False, cancel_futures=True)
+            close_cola_ajustes() # Escribir los ajustes pendientes (usa la réplica y la auditoría)
+            close_replica() # Detener el sondeo de deltas
+            close_auditoria() # Escribir los registros de auditoría pendientes
         except Exception as e:
             # Capturar errores inesperados durante el mainloop (raro)
             logger.critical(f"Error crítico en el bucle principal: {e}", exc_info=True)
@@ -264,31 +883,28 @@ def setup_logging():
      # else:
      logger.info("Logging configurado.")
 
+def _report_startup_time(started: float):
+    """Registra cuánto tardó la ventana en mostrarse frente al presupuesto de arranque."""
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms > STARTUP_BUDGET_MS:
+        logger.warning(f"La ventana tardó {elapsed_ms:.0f} ms en mostrarse (presupuesto: {STARTUP_BUDGET_MS} ms).")
+    else:
+        logger.info(f"Ventana visible en {elapsed_ms:.0f} ms.")
+
 def main():
     """Función principal para lanzar la aplicación."""
     setup_logging() # Configurar logging al inicio
     try:
-        # Inicializar pool de BD si se usa
-        try:
-            # Asume que database.py está accesible
-            from database import create_connection_pool, ConnectionError as DBConnectionError
-            create_connection_pool()
-        except ImportError:
-             logger.warning("Módulo database o create_connection_pool no encontrado.")
-             # Decidir si la app puede continuar sin BD o debe salir
-             messagebox.showwarning("Advertencia", "No se encontró el módulo de base de datos.")
-             # return # O salir: sys.exit(1)
-        except DBConnectionError as ce:
-             logger.critical(f"Fallo al inicializar pool de BD: {ce}")
-             messagebox.showerror("Error Crítico de BD", f"No se pudo conectar a la base de datos:\n{ce}\nLa aplicación se cerrará.")
-             return # Salir si no hay BD
-        except Exception as e_pool:
-             logger.critical(f"Error inesperado al inicializar pool de BD: {e_pool}", exc_info=True)
-             messagebox.showerror("Error Crítico", f"Error inesperado al conectar a la BD:\n{e_pool}\nLa aplicación se cerrará.")
-             return # Salir
-
-        # Crear y correr la aplicación
+        # Cotejo de textos del sistema (ñ y tildes en su lugar al ordenar por nombre)
+        locale.setlocale(locale.LC_COLLATE, "")
+    except locale.Error as e:
+        logger.warning(f"No se pudo usar el locale del sistema para ordenar: {e}")
+    try:
+        # Crear la ventana sin esperar a la BD: la conexión y las cargas van en segundo plano
+        started = time.perf_counter()
         app = MainWindow()
+        app.start_loading()
+        app.window.after_idle(_report_startup_time, started)
         app.run()
     except Exception as e:
         # Captura errores muy críticos durante la inicialización de MainWindow o run()
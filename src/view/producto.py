@@ -3,6 +3,8 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from typing import Optional, Dict, Any, Tuple, List, Callable # Añadir List, Callable
 import logging
+import bisect
+from datetime import datetime
 
 # Controladores
 # Asegúrate que src.controller.* están accesibles
@@ -11,11 +13,12 @@ from src.controller.categoria import CategoriaController # Necesario para poblar
 
 # Modelo y Excepciones
 # Asegúrate que src.model.producto está accesible
-from src.model.producto import Producto, DatabaseError, Categoria
+from src.model.producto import Producto, DatabaseError, StaleDataError, Categoria
 
 # Utils
 # Asegúrate que src.utils.utils está accesible
-from src.utils.utils import populate_treeview, clear_treeview # Usar clear_treeview
+from src.utils.utils import clear_treeview, VirtualTreeview, ProgressiveRenderer, TreeviewSorter, VIRTUAL_SELECT_EVENT
+from src.utils.eventos import suscribir, ProductoCreado, ProductoActualizado, ProductoEliminado
 
 # Configuración del logging
 logger = logging.getLogger(__name__)
@@ -157,7 +160,8 @@ class ProductForm(ttk.Frame):
                 "nombre": nombre_str,
                 "cantidad": int(cantidad_str),
                 "valor_unidad": float(valor_str),
-                "id_categoria": id_categoria # Devolver el ID numérico
+                "id_categoria": id_categoria, # Devolver el ID numérico
+                "nombre_categoria": categoria_nombre_sel # Para el evento, sin releer el producto
             }
         except ValueError as e:
             # Mejorar mensajes de error de conversión
@@ -232,13 +236,23 @@ class ProductForm(ttk.Frame):
 
 
 class ProductList(ttk.Frame):
-    """Lista de productos usando ttk.Treeview (con actualización eficiente)."""
+    """Lista de productos usando ttk.Treeview en modo grilla virtual (solo filas visibles)."""
     # Esta lista no muestra la categoría, solo ID, Nombre, Cantidad, Valor
     def __init__(self, parent):
         super().__init__(parent)
         self.tree: Optional[ttk.Treeview] = None
-        self.product_item_map: Dict[int, str] = {} # id_producto -> item_id
+        self.virtual: Optional[VirtualTreeview] = None # Filas por id_producto
+        self.products: Dict[int, Producto] = {} # Objetos cargados por ID: llenan el formulario sin consultar la BD
+        self.renderer: Optional[ProgressiveRenderer] = None
+        self.stamp: Optional[datetime] = None # Hora del servidor de los datos mostrados (ver apply_changes)
         self.setup_treeview()
+        # Mantenerse al día con las ediciones de productos hechas desde cualquier ventana
+        self._unsubscribe = [
+            suscribir(ProductoCreado, lambda e: self.add_item(e.producto)),
+            suscribir(ProductoActualizado, self._on_product_updated),
+            suscribir(ProductoEliminado, lambda e: self.delete_item(e.id_producto)),
+        ]
+        self.bind("<Destroy>", self._on_destroy, add="+")
 
     def setup_treeview(self) -> None:
         """Configura el Treeview para la lista local."""
@@ -258,6 +272,13 @@ class ProductList(ttk.Frame):
         # Estilo filas
         self.tree.tag_configure('oddrow', background='#f0f0f0')
         self.tree.tag_configure('evenrow', background='#ffffff')
+        self.virtual = VirtualTreeview(self.tree, vsb)
+        # Barra de avance (con la grilla virtual el pintado es inmediato, pero se mantiene el mismo flujo)
+        progress = ttk.Progressbar(self, mode="determinate")
+        progress.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(2, 0))
+        progress.grid_remove()
+        self.renderer = ProgressiveRenderer(self.tree, progressbar=progress)
+        TreeviewSorter(self.tree, numeric_columns=("id_producto", "cantidad", "valor_unidad"))
 
     def _get_product_values(self, producto: Producto) -> Tuple:
         """Devuelve tupla SIN categoría para esta lista local."""
@@ -265,67 +286,109 @@ class ProductList(ttk.Frame):
 
     def refresh(self) -> None:
         """Recarga todos los productos en esta lista local."""
-        if not self.tree: return
-        clear_treeview(self.tree) # Usar función de utils
-        self.product_item_map.clear()
+        if not self.tree or not self.virtual: return
         try:
-            # Obtiene todos los productos (incluyen categoría, pero no la usamos aquí)
-            productos = ProductoController.get_all()
-            for i, producto in enumerate(productos):
-                values = self._get_product_values(producto) # Obtiene valores sin categoría
-                tag = 'oddrow' if i % 2 else 'evenrow'
-                item_id = self.tree.insert("", tk.END, values=values, tags=(tag,))
-                self.product_item_map[producto.id_productos] = item_id
+            # Obtiene todos los productos y la marca a partir de la cual pedir cambios al reabrir
+            productos, _, self.stamp = ProductoController.get_changes_since(None)
+            productos.sort(key=lambda p: p.id_productos)
+            self.products = {p.id_productos: p for p in productos}
+            # Solo se guardan las filas; la grilla crea items únicamente para las visibles
+            self.renderer.start([p.id_productos for p in productos],
+                                [self._get_product_values(p) for p in productos])
         except (DatabaseError, ValueError, Exception) as e:
             logger.error(f"Error al refrescar lista local de productos: {e}")
+            self.renderer.cancel()
+            clear_treeview(self.tree)
+            self.products.clear()
+            self.stamp = None
             messagebox.showerror("Error", "No se pudo cargar la lista de productos.")
 
+    def apply_changes(self) -> None:
+        """
+        Trae solo lo cambiado en la BD desde la última carga (otros puestos; lo propio ya
+        llegó por eventos) y parchea esas filas. Sin marca previa, carga completa.
+        """
+        if not self.virtual: return
+        if self.stamp is None:
+            self.refresh(); return
+        try:
+            productos, eliminados, stamp = ProductoController.get_changes_since(self.stamp)
+        except (DatabaseError, ValueError) as e:
+            logger.error(f"Error al traer cambios de productos: {e}")
+            return # Se queda con lo mostrado; se reintenta al volver a abrir
+        vigentes = {p.id_productos for p in productos} # Borrado y recreado dentro del delta: se queda
+        for product_id in eliminados:
+            if product_id not in vigentes and self.get_product(product_id) is not None:
+                self.delete_item(product_id)
+        for producto in productos:
+            self.products[producto.id_productos] = producto
+            values = self._get_product_values(producto)
+            if self.contains(producto.id_productos):
+                self.virtual.upsert(producto.id_productos, values)
+            else:
+                self.virtual.upsert(producto.id_productos, values,
+                                    position=bisect.bisect_left(self.virtual.keys, producto.id_productos))
+        self.stamp = stamp
+        if productos or eliminados:
+            logger.info(f"Lista de productos: {len(productos)} cambios y {len(eliminados)} eliminaciones aplicados.")
+
+    def contains(self, product_id: int) -> bool:
+        """Indica si el producto está en esta lista local."""
+        return bool(self.virtual) and product_id in self.virtual
+
+    def get_product(self, product_id: int) -> Optional[Producto]:
+        """El producto tal como se cargó (o como llegó en el último evento)."""
+        return self.products.get(product_id)
+
     def add_item(self, producto: Producto) -> None:
-        """Añade un producto a esta lista local."""
-        if not self.tree or producto.id_productos in self.product_item_map: return
-        values = self._get_product_values(producto)
-        tag = 'oddrow' if len(self.product_item_map) % 2 else 'evenrow'
-        item_id = self.tree.insert("", tk.END, values=values, tags=(tag,))
-        self.product_item_map[producto.id_productos] = item_id
-        self.tree.see(item_id) # Hacer visible
-        self.tree.selection_set(item_id) # Seleccionar
+        """Añade un producto a esta lista local (lo hace visible y lo selecciona)."""
+        if not self.virtual or self.contains(producto.id_productos): return
+        self.products[producto.id_productos] = producto
+        self.virtual.upsert(producto.id_productos, self._get_product_values(producto), select=True)
 
     def update_item(self, producto: Producto) -> None:
         """Actualiza un producto en esta lista local."""
-        if not self.tree or producto.id_productos not in self.product_item_map: return
-        item_id = self.product_item_map[producto.id_productos]
-        values = self._get_product_values(producto)
-        if self.tree.exists(item_id): # Verificar si existe
-             self.tree.item(item_id, values=values)
+        if not self.virtual or not self.contains(producto.id_productos): return
+        self.products[producto.id_productos] = producto
+        self.virtual.upsert(producto.id_productos, self._get_product_values(producto))
 
     def delete_item(self, product_id: int) -> None:
         """Elimina un producto de esta lista local."""
-        if not self.tree or product_id not in self.product_item_map: return
+        if not self.virtual: return
+        self.products.pop(product_id, None)
         try:
-            item_id = self.product_item_map[product_id]
-            if self.tree.exists(item_id):
-                 self.tree.delete(item_id)
-            del self.product_item_map[product_id]
+            self.virtual.delete(product_id)
         except Exception as e:
              logger.error(f"Error al eliminar item {product_id} del treeview local: {e}")
 
     def get_selected_id(self) -> Optional[int]:
         """Obtiene el ID del producto seleccionado en esta lista."""
-        if not self.tree: return None
-        selected_items = self.tree.selection()
-        if not selected_items: return None
-        item_id = selected_items[0]
-        if not self.tree.exists(item_id): return None # Verificar si existe
-        item_values = self.tree.item(item_id, 'values')
-        if not item_values: return None
-        try: return int(item_values[0]) # ID es el primer valor
-        except (ValueError, IndexError, TypeError): return None
+        if not self.virtual: return None
+        return self.virtual.selected_key
+
+    def _on_product_updated(self, evento: ProductoActualizado) -> None:
+        """Modificación (posible cambio de ID): reemplazar la fila vieja por la nueva."""
+        producto = evento.producto
+        if evento.id_anterior != producto.id_productos:
+            self.delete_item(evento.id_anterior)
+            self.add_item(producto)
+        elif self.contains(producto.id_productos):
+            self.update_item(producto)
+        else:
+            self.add_item(producto)
+
+    def _on_destroy(self, event) -> None:
+        if event.widget is not self: return # <Destroy> también llega por cada hijo
+        for unsubscribe in self._unsubscribe: unsubscribe()
+        self._unsubscribe = []
 
 
 class ProductWindow:
-    """Ventana Toplevel para gestionar productos."""
-    def __init__(self, tree_principal: ttk.Treeview):
-        self.tree_principal = tree_principal # Para refresco completo (aún)
+    """
+    Ventana Toplevel para gestionar productos. Se crea una sola vez (ver menu_productos):
+    al cerrarla se oculta y al reabrirla solo se aplican los cambios ocurridos mientras tanto.
+    """
+    def __init__(self):
         self.window = tk.Toplevel()
         self.form: Optional[ProductForm] = None
         self.product_list: Optional[ProductList] = None
@@ -344,6 +407,19 @@ class ProductWindow:
         except tk.TclError:
              logger.warning("No se pudo hacer la ventana modal (grab_set falló).")
 
+    def show(self) -> None:
+        """Vuelve a mostrar la ventana oculta con los cambios ocurridos desde que se ocultó."""
+        logger.info("Mostrando ventana de gestión de productos.")
+        self.window.deiconify()
+        self.window.lift()
+        try:
+             self.window.grab_set() # Modal otra vez (se liberó al ocultarla)
+        except tk.TclError:
+             logger.warning("No se pudo hacer la ventana modal (grab_set falló).")
+        if self.form: self.form.populate_category_combobox() # Pocas filas (y en memoria con la réplica)
+        if self.product_list: self.product_list.apply_changes()
+        if self.form: self.form.widget_map["id_producto"].focus()
+
 
     def create_widgets(self) -> None:
         """Crea los widgets de la ventana."""
@@ -388,7 +464,7 @@ class ProductWindow:
 
         # Binding para seleccionar producto y llenar formulario
         if self.product_list.tree:
-            self.product_list.tree.bind("<<TreeviewSelect>>", self.on_product_select)
+            self.product_list.tree.bind(VIRTUAL_SELECT_EVENT, self.on_product_select)
 
         # Foco inicial
         if self.form: self.form.widget_map["id_producto"].focus()
@@ -399,8 +475,8 @@ class ProductWindow:
         selected_id = self.product_list.get_selected_id()
         if selected_id is None: return # No hacer nada si no hay selección válida
         try:
-            # Usar get_one que ahora trae nombre_categoria
-            producto = ProductoController.get_one(selected_id)
+            # El objeto ya cargado por la lista (sin ida y vuelta a la BD); la frescura se verifica al guardar
+            producto = self.product_list.get_product(selected_id) or ProductoController.get_one(selected_id)
             if producto:
                 self.form.set_data(producto) # set_data ahora maneja la categoría
             else:
@@ -413,17 +489,28 @@ class ProductWindow:
             messagebox.showerror("Error", f"No se pudieron cargar los datos del producto ID: {selected_id}", parent=self.window)
             self.form.clear()
 
+    def _reload_product(self, product_id: int) -> None:
+        """Tras un conflicto al guardar: traer la versión actual de la BD a la lista y al formulario."""
+        try:
+            producto = ProductoController.get_one(product_id)
+        except (DatabaseError, ValueError) as e:
+            logger.error(f"Error al recargar producto {product_id}: {e}")
+            return
+        if producto is None:
+            self.product_list.delete_item(product_id); self.form.clear()
+            return
+        self.product_list.update_item(producto)
+        self.form.set_data(producto)
+
     def clear_form_and_selection(self) -> None:
         """Limpia formulario y deselecciona lista."""
         if self.form: self.form.clear()
-        if self.product_list and self.product_list.tree:
-            selection = self.product_list.tree.selection()
-            if selection: self.product_list.tree.selection_remove(selection)
+        if self.product_list and self.product_list.virtual:
+            self.product_list.virtual.clear_selection()
 
     def _handle_successful_update(self):
-        """Acciones comunes tras éxito: limpiar form y refrescar tabla principal."""
+        """Acciones comunes tras éxito: limpiar form (las tablas se actualizan con los eventos del controlador)."""
         self.clear_form_and_selection()
-        self.refresh_main_treeview() # Refrescar tabla principal (aún completo)
 
     def add_product(self) -> None:
         """Agrega un nuevo producto."""
@@ -434,13 +521,9 @@ class ProductWindow:
             # Llamar al controlador para crear
             ProductoController.new(
                 data["id_producto"], data["nombre"], data["cantidad"],
-                data["valor_unidad"], data["id_categoria"] # Pasar id_categoria
+                data["valor_unidad"], data["id_categoria"], # Pasar id_categoria
+                nombre_categoria=data["nombre_categoria"]
             )
-            # Actualizar lista local eficientemente si se creó bien
-            new_product = ProductoController.get_one(data["id_producto"])
-            if new_product: self.product_list.add_item(new_product)
-            else: self.product_list.refresh() # Fallback: recargar si no se encontró
-
             self._handle_successful_update() # Limpiar form, refrescar principal
             messagebox.showinfo("Éxito", "Producto agregado correctamente.", parent=self.window)
         except (ValueError, DatabaseError) as e:
@@ -466,28 +549,19 @@ class ProductWindow:
             if new_id != original_id:
                  if not messagebox.askyesno("Confirmar Cambio de ID", f"¿Seguro que desea cambiar ID {original_id} a {new_id}?", parent=self.window): return
 
-            # Llamar al controlador para modificar
+            # Llamar al controlador para modificar; la marca cargada detecta cambios de otros usuarios
+            loaded = self.product_list.get_product(original_id)
             ProductoController.modify(
                 original_id, new_id, data["nombre"], data["cantidad"],
-                data["valor_unidad"], data["id_categoria"] # Pasar id_categoria
+                data["valor_unidad"], data["id_categoria"], # Pasar id_categoria
+                actualizado_en=loaded.actualizado_en if loaded else None,
+                nombre_categoria=data["nombre_categoria"]
             )
-            # Actualizar lista local eficientemente
-            modified_product = ProductoController.get_one(new_id)
-            if modified_product:
-                 # Manejar cambio de ID en el mapa local
-                 if original_id != new_id and original_id in self.product_list.product_item_map:
-                      # Si ID cambió, el item viejo ya no existe con ese ID
-                      # Borrar mapeo viejo y actualizar/añadir el nuevo
-                      self.product_list.delete_item(original_id) # Intenta borrar item viejo
-                      self.product_list.add_item(modified_product) # Añade nuevo
-                 elif original_id in self.product_list.product_item_map: # Si ID no cambió
-                      self.product_list.update_item(modified_product)
-                 else: # Si el item original no estaba mapeado? Recargar
-                      self.product_list.refresh()
-            else: self.product_list.refresh() # Fallback
-
             self._handle_successful_update() # Limpiar form, refrescar principal
             messagebox.showinfo("Éxito", "Producto modificado correctamente.", parent=self.window)
+        except StaleDataError as e:
+             messagebox.showwarning("Datos desactualizados", str(e), parent=self.window)
+             self._reload_product(selected_id)
         except (ValueError, DatabaseError) as e:
              # Errores de validación, ID no encontrado, nuevo ID duplicado, FK inválida, DB error
              messagebox.showerror("Error al Modificar", str(e), parent=self.window)
@@ -501,8 +575,8 @@ class ProductWindow:
         selected_id = self.product_list.get_selected_id()
         if selected_id is None: messagebox.showwarning("Advertencia", "Seleccione producto a eliminar.", parent=self.window); return
 
-        # Obtener nombre para mensaje de confirmación
-        prod_to_delete = ProductoController.get_one(selected_id)
+        # Obtener nombre para mensaje de confirmación (del objeto ya cargado)
+        prod_to_delete = self.product_list.get_product(selected_id)
         prod_name = f"ID {selected_id}" if not prod_to_delete else f"'{prod_to_delete.nombre}' (ID {selected_id})"
 
         if not messagebox.askyesno("Confirmar Eliminación", f"¿Seguro de eliminar el producto {prod_name}?", parent=self.window): return
@@ -510,11 +584,13 @@ class ProductWindow:
         try:
             product_id_to_delete = selected_id
             # Llamar al controlador para eliminar
-            ProductoController.delete(product_id_to_delete)
-            # Actualizar lista local eficientemente
-            self.product_list.delete_item(product_id_to_delete)
+            ProductoController.delete(product_id_to_delete,
+                                      actualizado_en=prod_to_delete.actualizado_en if prod_to_delete else None)
             self._handle_successful_update() # Limpiar form, refrescar principal
             messagebox.showinfo("Éxito", f"Producto {prod_name} eliminado.", parent=self.window)
+        except StaleDataError as e:
+             messagebox.showwarning("Datos desactualizados", str(e), parent=self.window)
+             self._reload_product(selected_id)
         except (ValueError, DatabaseError) as e:
              # Errores: producto no encontrado, error DB
              messagebox.showerror("Error al Eliminar", str(e), parent=self.window)
@@ -522,34 +598,28 @@ class ProductWindow:
              logger.error(f"Error inesperado al eliminar producto {selected_id}: {e}", exc_info=True)
              messagebox.showerror("Error Inesperado", "Ocurrió un error al eliminar.", parent=self.window)
 
-    def refresh_main_treeview(self) -> None:
-        """Refresca el Treeview de la ventana principal (aún completo)."""
-        logger.debug("Refrescando Treeview principal...")
-        try:
-            # Obtener todos los productos (ya con categoría)
-            all_products = ProductoController.get_all()
-            # Poblar el treeview principal
-            populate_treeview(self.tree_principal, all_products)
-            logger.debug("Treeview principal refrescado.")
-        except Exception as e:
-             logger.error(f"Error al refrescar el Treeview principal: {e}")
-             # Podríamos limpiar el treeview principal en caso de error
-             # clear_treeview(self.tree_principal)
-
     def on_close(self):
-        """Acción al cerrar la ventana."""
-        logger.info("Cerrando ventana de gestión de productos.")
+        """Acción al cerrar la ventana: se oculta (la lista sigue al día por eventos) en lugar de destruirse."""
+        logger.info("Ocultando ventana de gestión de productos.")
         try:
              self.window.grab_release()
         except tk.TclError: pass
-        self.window.destroy()
+        self.clear_form_and_selection()
+        self.window.withdraw()
+
 
+# Instancia única: construirla (formulario, categorías, catálogo completo) solo la primera vez
+product_window: Optional[ProductWindow] = None
 
 # Función de entrada
-def menu_productos(tree_principal: ttk.Treeview) -> None:
-    """Muestra la ventana de gestión de productos."""
+def menu_productos() -> None:
+    """Muestra la ventana de gestión de productos (la crea la primera vez, luego la reutiliza)."""
+    global product_window
     try:
-        ProductWindow(tree_principal)
+        if product_window is not None and product_window.window.winfo_exists():
+            product_window.show()
+        else:
+            product_window = ProductWindow()
     except Exception as e:
         logger.error(f"Error al abrir ventana de productos: {e}", exc_info=True)
         messagebox.showerror("Error", "No se pudo abrir la gestión de productos.")
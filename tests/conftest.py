@@ -0,0 +1,7 @@
+# tests/conftest.py
+# Las pruebas importan los módulos como lo hace main.py (desde la raíz del repositorio).
+# No necesitan base de datos: cada prueba sustituye los DAO que usa con monkeypatch.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
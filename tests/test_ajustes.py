@@ -0,0 +1,191 @@
+# tests/test_ajustes.py
+# Cola de ajustes rápidos (src/controller/ajustes.py): agrupación por ventana, diario y recuperación.
+import json
+import time
+from typing import Callable, Dict, List
+
+import pytest
+
+from src.controller import ajustes
+from src.controller.ajustes import ColaAjustes, DiarioAjustes
+from src.model import auditoria
+from src.model.movimiento import MovimientoDao
+from src.model.producto import DatabaseError, Producto, ProductoDao
+
+
+class BDFalsa:
+    """Cantidades en memoria con las mismas reglas que ProductoDao.add_quantities (todo o nada)."""
+    def __init__(self, cantidades: Dict[int, int]) -> None:
+        self.cantidades = dict(cantidades)
+        self.llamadas: List[Dict[int, int]] = []
+        self.por_referencia: Dict[str, set] = {} # Lo que el libro de movimientos tendría
+        self.caidas = 0 # Próximas llamadas que fallan como si la BD no respondiera
+
+    def add_quantities(self, deltas: Dict[int, int], tipo: str = "ajuste", referencia=None) -> List[Producto]:
+        self.llamadas.append(dict(deltas))
+        if self.caidas:
+            self.caidas -= 1
+            raise DatabaseError("Error al ajustar las cantidades: conexión perdida")
+        faltan = [i for i in deltas if i not in self.cantidades]
+        insuficientes = [i for i in deltas if i in self.cantidades and self.cantidades[i] + deltas[i] < 0]
+        if faltan or insuficientes:
+            raise ValueError(f"No se aplicó ningún ajuste: {faltan} {insuficientes}")
+        productos = []
+        for id_producto, delta in deltas.items():
+            self.cantidades[id_producto] += delta
+            self.por_referencia.setdefault(referencia, set()).add(id_producto)
+            productos.append(Producto(id_producto, f"Producto {id_producto}", self.cantidades[id_producto], 1.0, 1))
+        return productos
+
+
+@pytest.fixture
+def bd(monkeypatch) -> BDFalsa:
+    falsa = BDFalsa({1: 10, 2: 5, 3: 0})
+    monkeypatch.setattr(ProductoDao, "add_quantities", staticmethod(falsa.add_quantities))
+    monkeypatch.setattr(MovimientoDao, "read_ids_by_reference",
+                        staticmethod(lambda referencia, desde: set(falsa.por_referencia.get(referencia, ()))))
+    monkeypatch.setattr(auditoria, "registrar", lambda *args, **kwargs: None) # Sin hilo escritor ni BD
+    monkeypatch.setattr(ajustes, "ESPERA_REINTENTO", 0.05)
+    return falsa
+
+
+@pytest.fixture
+def colas():
+    """Crea colas y las cierra al terminar la prueba (el hilo escritor no queda vivo)."""
+    creadas: List[ColaAjustes] = []
+    def crear(**opciones) -> ColaAjustes:
+        cola = ColaAjustes(**opciones)
+        creadas.append(cola)
+        return cola
+    yield crear
+    for cola in creadas:
+        cola.cerrar(espera=2)
+
+
+def esperar(condicion: Callable[[], bool], limite: float = 3.0) -> None:
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "la condición no se cumplió a tiempo"
+        time.sleep(0.01)
+
+
+def escribir_diario(ruta, lineas: List[str]) -> None:
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("".join(lineas))
+
+
+def test_agrupa_las_pulsaciones_de_la_ventana_en_una_escritura(bd, colas):
+    cola = colas(ventana=0.3)
+    for _ in range(10):
+        cola.sumar(1, 1)
+    cola.sumar(2, -2)
+    cola.sumar(3, 1); cola.sumar(3, -1) # Se anulan: no llegan a la BD
+    assert cola.pendientes() == {1: 10, 2: -2} # Lectura de lo propio antes de escribir
+    esperar(lambda: not cola.pendientes())
+    assert bd.llamadas == [{1: 10, 2: -2}]
+    assert bd.cantidades == {1: 20, 2: 3, 3: 0}
+
+
+def test_lo_pendiente_incluye_el_lote_en_vuelo(bd, colas, monkeypatch):
+    liberar = []
+    lenta = bd.add_quantities
+    def add_quantities(deltas, tipo="ajuste", referencia=None):
+        esperar(lambda: liberar)
+        return lenta(deltas, tipo, referencia)
+    monkeypatch.setattr(ProductoDao, "add_quantities", staticmethod(add_quantities))
+    cola = colas(ventana=0.01)
+    cola.sumar(1, 3)
+    esperar(lambda: cola._en_vuelo)
+    cola.sumar(1, 1)
+    assert cola.pendiente(1) == 4 # 3 en vuelo + 1 acumulado
+    liberar.append(True)
+    esperar(lambda: not cola.pendientes())
+    assert bd.cantidades[1] == 14
+
+
+def test_un_ajuste_invalido_no_tumba_el_lote(bd, colas):
+    avisos = []
+    cola = colas(ventana=0.2, al_confirmar=lambda productos, errores: avisos.append((productos, errores)))
+    cola.sumar(1, 1)
+    cola.sumar(3, -5) # Stock insuficiente
+    cola.sumar(99, 1) # No existe
+    esperar(lambda: avisos)
+    assert bd.llamadas[0] == {1: 1, 3: -5, 99: 1} # Todo o nada: falla entero
+    assert sorted(map(tuple, (d.items() for d in bd.llamadas[1:]))) == [((1, 1),), ((3, -5),), ((99, 1),)]
+    productos, errores = avisos[0]
+    assert [p.id_productos for p in productos] == [1]
+    assert len(errores) == 2
+    assert bd.cantidades == {1: 11, 2: 5, 3: 0}
+    assert cola.pendientes() == {} # Los inválidos se descartan, no se reintentan
+
+
+def test_sin_bd_lo_acumulado_se_reintenta_y_queda_en_el_diario(bd, colas, tmp_path):
+    ruta = tmp_path / "ajustes"
+    bd.caidas = 10 ** 6
+    cola = colas(ventana=0.01, diario=str(ruta))
+    cola.sumar(1, 2)
+    cola.sumar(2, -1)
+    esperar(lambda: len(bd.llamadas) >= 2) # Ya falló y volvió a intentarlo
+    assert cola.pendientes() == {1: 2, 2: -1}
+    # Si el proceso cayera ahora, el diario repone exactamente lo que falta ('resto' de cada lote)
+    acumulado, lotes = DiarioAjustes(str(ruta)).leer()
+    assert lotes == {}
+    assert acumulado == {1: 2, 2: -1}
+    bd.caidas = 0
+    esperar(lambda: not cola.pendientes())
+    assert bd.cantidades == {1: 12, 2: 4, 3: 0} # Aplicado una sola vez
+    assert ruta.read_text(encoding="utf-8") == "" # Nada pendiente: diario vacío
+
+
+def test_recupera_un_lote_sin_cerrar_consultando_el_libro(bd, colas, tmp_path):
+    ruta = tmp_path / "ajustes"
+    # Caída entre el commit y la línea 'fin': el libro ya tiene el producto 1 con esa referencia
+    bd.por_referencia["mostrador-abc"] = {1}
+    escribir_diario(ruta, [
+        json.dumps({"t": "d", "id": 1, "d": 2}) + "\n",
+        json.dumps({"t": "d", "id": 2, "d": 1}) + "\n",
+        json.dumps({"t": "lote", "ref": "mostrador-abc", "en": "2026-10-19T10:00:00"}) + "\n",
+        json.dumps({"t": "d", "id": 1, "d": 5}) + "\n", # Pulsación posterior al lote
+    ])
+    cola = colas(ventana=60, diario=str(ruta)) # Que no escriba sola: solo comprobar lo recuperado
+    assert cola.pendientes() == {1: 5, 2: 1} # El +2 del producto 1 ya estaba en la BD
+    cola.cerrar(espera=2) # Cerrar escribe lo pendiente sin esperar la ventana
+    assert bd.llamadas == [{1: 5, 2: 1}]
+    assert ruta.read_text(encoding="utf-8") == ""
+
+
+def test_un_lote_cerrado_con_resto_solo_repone_el_resto(bd, colas, tmp_path):
+    ruta = tmp_path / "ajustes"
+    escribir_diario(ruta, [
+        json.dumps({"t": "d", "id": 1, "d": 2}) + "\n",
+        json.dumps({"t": "d", "id": 2, "d": 1}) + "\n",
+        json.dumps({"t": "lote", "ref": "mostrador-abc", "en": "2026-10-19T10:00:00"}) + "\n",
+        json.dumps({"t": "fin", "ref": "mostrador-abc", "resto": {"2": 1}}) + "\n",
+    ])
+    cola = colas(ventana=60, diario=str(ruta))
+    assert cola.pendientes() == {2: 1}
+
+
+def test_una_ultima_linea_cortada_se_ignora(bd, colas, tmp_path):
+    ruta = tmp_path / "ajustes"
+    escribir_diario(ruta, [
+        json.dumps({"t": "d", "id": 1, "d": 1}) + "\n",
+        json.dumps({"t": "d", "id": 1, "d": 1}) + "\n",
+        '{"t": "d", "id": 2, "d', # Caída a mitad de escritura
+    ])
+    cola = colas(ventana=60, diario=str(ruta))
+    assert cola.pendientes() == {1: 2}
+    # El diario se reescribe limpio: lo que se anote después no se pega a la línea cortada
+    cola.sumar(2, 3)
+    assert DiarioAjustes(str(ruta)).leer() == ({1: 2, 2: 3}, {})
+
+
+def test_cerrar_escribe_lo_pendiente_sin_esperar_la_ventana(bd, colas):
+    cola = colas(ventana=60)
+    cola.sumar(1, -4)
+    inicio = time.monotonic()
+    cola.cerrar(espera=2)
+    assert time.monotonic() - inicio < 1
+    assert bd.cantidades[1] == 6
+    with pytest.raises(ValueError):
+        cola.sumar(1, 1)
@@ -0,0 +1,97 @@
+# tests/test_auditoria.py
+# Escritor de auditoría en segundo plano (src/model/auditoria.py): sin BD, consultar el historial
+# no espera a una cola que no se va a vaciar.
+import time
+from datetime import datetime
+
+import pytest
+
+from database import ConnectionError as DBConnectionError
+from src.controller.auditoria import AuditoriaController
+from src.model import auditoria
+from src.model.auditoria import AuditoriaDao, EscritorAuditoria, RegistroAuditoria
+
+
+class BDFalsa:
+    def __init__(self) -> None:
+        self.caida = True
+        self.escritos = []
+
+    def create_many(self, registros) -> None:
+        if self.caida: raise DBConnectionError("No se pudo obtener conexión del pool")
+        self.escritos += registros
+
+    def read_by_entity(self, entidad, id_entidad, limite=100):
+        if self.caida: raise DBConnectionError("No se pudo obtener conexión del pool")
+        return [r for r in self.escritos if (r.entidad, r.id_entidad) == (entidad, id_entidad)][:limite]
+
+
+@pytest.fixture
+def bd(monkeypatch) -> BDFalsa:
+    falsa = BDFalsa()
+    monkeypatch.setattr(AuditoriaDao, "create_many", staticmethod(falsa.create_many))
+    monkeypatch.setattr(AuditoriaDao, "read_by_entity", staticmethod(falsa.read_by_entity))
+    monkeypatch.setattr(auditoria, "ESPERA_REINTENTO", 0.05)
+    return falsa
+
+
+@pytest.fixture
+def escritor(monkeypatch):
+    escritor = EscritorAuditoria(intervalo=0.01)
+    monkeypatch.setattr(auditoria, "escritor", escritor) # El que ve get_auditoria()
+    yield escritor
+    escritor.cerrar(espera=2)
+
+
+def registro(id_entidad: int) -> RegistroAuditoria:
+    return RegistroAuditoria("producto", id_entidad, "venta", {"cantidad": 2}, {"cantidad": 1}, "prueba", datetime.now())
+
+
+def esperar(condicion, limite: float = 3.0) -> None:
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "la condición no se cumplió a tiempo"
+        time.sleep(0.01)
+
+
+def test_sin_bd_vaciar_no_espera(bd, escritor):
+    escritor.registrar(registro(1))
+    esperar(lambda: escritor.reintentando)
+    inicio = time.monotonic()
+    assert escritor.vaciar_ahora() is False
+    with pytest.raises(DBConnectionError):
+        AuditoriaController.history("producto", 1)
+    assert time.monotonic() - inicio < 0.5 # Antes: los 2 s enteros de vaciar_ahora
+
+
+def test_al_volver_la_bd_se_escribe_y_se_vuelve_a_esperar(bd, escritor):
+    escritor.registrar(registro(1))
+    esperar(lambda: escritor.reintentando)
+    bd.caida = False
+    esperar(lambda: not escritor.reintentando)
+    assert [r.id_entidad for r in bd.escritos] == [1]
+    escritor.registrar(registro(2))
+    assert [r.id_entidad for r in AuditoriaController.history("producto", 2)] == [2] # Lo recién encolado ya se ve
+
+
+def test_importar_con_actualizar_audita_cada_producto_sobrescrito(monkeypatch, tmp_path):
+    from src.controller import importacion
+    from src.model.producto import Categoria, Producto, ProductoDao
+    anotados = []
+    monkeypatch.setattr(auditoria, "registrar", lambda *args: anotados.append(args))
+    monkeypatch.setattr(importacion, "get_replica", lambda: None)
+    monkeypatch.setattr(importacion.CategoriaController, "get_all", staticmethod(lambda: [Categoria(1, "General")]))
+    anterior = Producto(5, "Harina", 10, 2.5, 1, stock_minimo=3)
+    monkeypatch.setattr(ProductoDao, "create_many", staticmethod(lambda productos, actualizar=False: (1, [anterior], [])))
+    ruta = tmp_path / "catalogo.csv"
+    ruta.write_text("id_productos,nombre,cantidad,valor_unidad\n5,Harina integral,12,2.75\n6,Azúcar,4,1.5\n", encoding="utf-8")
+
+    resultado = importacion.ImportacionController.importar_csv(str(ruta), actualizar=True, procesos=1)
+
+    assert (resultado.creadas, resultado.actualizadas) == (1, 1)
+    assert anotados == [
+        ("producto", 5, "importacion",
+         {"id_productos": 5, "nombre": "Harina", "cantidad": 10, "valor_unidad": 2.5, "id_categoria": 1, "stock_minimo": 3},
+         {"id_productos": 5, "nombre": "Harina integral", "cantidad": 12, "valor_unidad": 2.75, "id_categoria": 1, "stock_minimo": 3}),
+        ("producto", None, "importacion", None, {"archivo": "catalogo.csv", "creados": 1, "rechazados": 0}),
+    ]
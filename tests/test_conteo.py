@@ -0,0 +1,29 @@
+# tests/test_conteo.py
+# Aplicar un conteo (src/controller/conteo.py) sin réplica: la tabla principal se entera por eventos.
+from datetime import datetime
+
+from src.controller import conteo
+from src.controller.conteo import ConteoController, Diferencia
+from src.model.producto import Producto, ProductoDao
+from src.utils import eventos
+from src.utils.eventos import ProductoActualizado
+
+
+def test_aplicar_sin_replica_publica_los_productos_ajustados(monkeypatch):
+    leido = datetime(2026, 3, 1, 8, 0)
+    diferencias = [Diferencia(1, "Pan", 1.0, 10, 7, leido), Diferencia(2, "Bollo", 0.5, 4, 6, leido),
+                   Diferencia(3, "Tarta", 9.0, 1, 0, leido)]
+    diferencias[2].aceptada = False
+    monkeypatch.setattr(conteo, "get_replica", lambda: None)
+    monkeypatch.setattr(conteo.auditoria, "registrar", lambda *args: None)
+    monkeypatch.setattr(ProductoDao, "update_quantities", staticmethod(lambda ajustes: [2])) # El 2 cambió entretanto
+    monkeypatch.setattr(ProductoDao, "read_many", staticmethod(lambda ids: {i: Producto(i, "Pan", 7, 1.0, 1) for i in ids}))
+    publicados = []
+    monkeypatch.setattr(eventos, "bus", eventos.BusEventos())
+    eventos.suscribir(ProductoActualizado, publicados.append)
+
+    aplicadas, conflictos, productos = ConteoController.aplicar(diferencias)
+    assert (aplicadas, conflictos) == (1, [2])
+    assert publicados == [] # Desde el hilo de trabajo no se publica
+    ConteoController.avisar(productos)
+    assert [(e.producto.id_productos, e.producto.cantidad, e.id_anterior) for e in publicados] == [(1, 7, 1)]
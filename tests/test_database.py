@@ -0,0 +1,40 @@
+# tests/test_database.py
+# discard_connection (database.py): corta el socket de la conexión real antes de devolverla al pool,
+# y avisa si la del pool ya no tiene el atributo privado '_cnx' del que depende.
+import logging
+
+import database
+
+
+class ConexionFalsa:
+    def __init__(self, llamadas) -> None:
+        self.llamadas = llamadas
+
+    def disconnect(self) -> None:
+        self.llamadas.append("disconnect")
+
+
+class ConexionPoolFalsa:
+    """Imita PooledMySQLConnection: envuelve la conexión real en '_cnx' y close() la devuelve al pool."""
+    def __init__(self, con_cnx: bool = True) -> None:
+        self.llamadas = []
+        if con_cnx: self._cnx = ConexionFalsa(self.llamadas)
+
+    def close(self) -> None:
+        self.llamadas.append("close")
+
+
+def test_descartar_corta_el_socket_antes_de_devolverla(caplog):
+    conexion = ConexionPoolFalsa()
+    with caplog.at_level(logging.WARNING, logger="database"):
+        database.discard_connection(conexion)
+    assert conexion.llamadas == ["disconnect", "close"]
+    assert not caplog.records
+
+
+def test_descartar_sin_cnx_avisa_y_la_devuelve(caplog):
+    conexion = ConexionPoolFalsa(con_cnx=False)
+    with caplog.at_level(logging.WARNING, logger="database"):
+        database.discard_connection(conexion)
+    assert conexion.llamadas == ["close"]
+    assert "_cnx" in caplog.text
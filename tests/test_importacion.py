@@ -0,0 +1,46 @@
+# tests/test_importacion.py
+# Importación de catálogos (src/controller/importacion.py) sin BD: create_many sustituido por monkeypatch.
+import csv
+
+import pytest
+
+from src.controller import importacion
+from src.model.producto import Categoria, ProductoDao
+
+
+@pytest.fixture
+def escritos(monkeypatch):
+    """IDs enviados a create_many, lote a lote (todos se crean)."""
+    lotes = []
+    def create_many(productos, actualizar=False):
+        lotes.append([p.id_productos for p in productos])
+        return len(productos), [], []
+    monkeypatch.setattr(ProductoDao, "create_many", staticmethod(create_many))
+    monkeypatch.setattr(importacion.auditoria, "registrar", lambda *args: None)
+    monkeypatch.setattr(importacion, "get_replica", lambda: None)
+    monkeypatch.setattr(importacion.CategoriaController, "get_all", staticmethod(lambda: [Categoria(1, "General")]))
+    return lotes
+
+
+def test_id_repetido_en_otro_lote_va_a_rechazos(escritos, monkeypatch, tmp_path):
+    monkeypatch.setattr(importacion, "LOTE_ESCRITURA", 2)
+    ruta = tmp_path / "catalogo.csv"
+    ruta.write_text("id_productos,nombre,cantidad,valor_unidad\n"
+                    "1,Pan,1,1\n2,Bollo,1,1\n3,Tarta,1,1\n1,Pan otra vez,1,1\n", encoding="utf-8")
+
+    resultado = importacion.ImportacionController.importar_csv(str(ruta), actualizar=True, procesos=1)
+
+    assert escritos == [[1, 2], [3]]
+    assert (resultado.creadas, resultado.actualizadas, resultado.rechazadas) == (3, 0, 1)
+    with open(resultado.ruta_rechazos, newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f))[1][:2] == ["5", "ID 1 repetido en el archivo (línea 2)"]
+
+
+def test_cabecera_invalida_no_deja_archivo_de_rechazos(escritos, tmp_path):
+    ruta = tmp_path / "catalogo.csv"
+    ruta.write_text("codigo,descripcion\n1,Pan\n", encoding="utf-8")
+    rechazos = tmp_path / "rechazos.csv"
+    with pytest.raises(ValueError, match="Faltan columnas"):
+        importacion.ImportacionController.importar_csv(str(ruta), str(rechazos), procesos=1)
+    assert not rechazos.exists()
+    assert escritos == []
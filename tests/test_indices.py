@@ -0,0 +1,293 @@
+# tests/test_indices.py
+# Índices de búsqueda en memoria (src/utils/indices.py): los usa la réplica en lugar de la BD.
+import random
+
+import pytest
+
+from src.utils.indices import (normalizar_texto, distancia_edicion, bits_de, ids_de, IndiceTrigramas, IndicePrefijos,
+                               DiccionarioBorrados, IndiceDifuso, _EntradasOrdenadas)
+
+
+NOMBRES = {
+    1: "Pan",
+    2: "Pan de Maíz",
+    3: "Harina para pan",
+    4: "Empanada gallega",
+    5: "Azúcar Moreno",
+    6: "Azúcar Glas",
+    7: "Crema pastelera",
+    8: "Té",
+}
+
+
+def _indice(clase, nombres=NOMBRES):
+    indice = clase()
+    for id_item, nombre in nombres.items():
+        indice.agregar(id_item, nombre)
+    return indice
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("Pan de Maíz ", "pan de maiz"),
+    ("AZÚCAR  MORENO", "azucar moreno"),
+    ("Pingüino", "pinguino"),
+    ("  Crème\tbrûlée ", "creme brulee"),
+    ("Straße", "strasse"), # casefold, no solo lower
+    ("", ""),
+])
+def test_normalizar_texto(texto, esperado):
+    assert normalizar_texto(texto) == esperado
+
+
+# --- IndiceTrigramas ---
+
+def test_trigramas_ignora_tildes_y_mayusculas():
+    indice = _indice(IndiceTrigramas)
+    assert set(indice.buscar("MAIZ")) == {2}
+    assert set(indice.buscar("azucar")) == {5, 6}
+    assert set(indice.buscar("Azúcar")) == {5, 6}
+
+
+def test_trigramas_ordena_exacta_prefijo_palabra_y_en_medio():
+    indice = _indice(IndiceTrigramas)
+    # 'pan': exacta (1), prefijo (2), inicio de palabra (3), en medio de 'empanada' (4)
+    assert indice.buscar("pan") == [1, 2, 3, 4]
+
+
+def test_trigramas_terminos_cortos_y_vacios():
+    indice = _indice(IndiceTrigramas)
+    assert set(indice.buscar("te")) == {8, 7} # 'te' corto y 'pastelera'
+    assert indice.buscar("te")[0] == 8         # Exacta primero
+    assert set(indice.buscar("")) == set(NOMBRES)
+    assert indice.buscar("xyz") == []
+
+
+def test_trigramas_verifica_que_los_trigramas_esten_contiguos():
+    indice = IndiceTrigramas()
+    indice.agregar(1, "abcd bcde") # Tiene 'abc' y 'bcd' y 'cde', pero no 'abcde'
+    assert indice.buscar("abcde") == []
+    indice.agregar(2, "abcde")
+    assert indice.buscar("abcde") == [2]
+
+
+def test_trigramas_entre_restringe_los_candidatos():
+    indice = _indice(IndiceTrigramas)
+    assert indice.buscar("pan", entre={3, 4}) == [3, 4]
+
+
+def test_trigramas_entre_acepta_mapa_de_bits():
+    indice = _indice(IndiceTrigramas)
+    assert indice.buscar("pan", entre=indice.mascara({2, 4})) == [2, 4]
+    assert indice.buscar("pan", entre=0) == []
+    assert indice.buscar("", entre=indice.mascara({3, 5, 99})) == [3, 5] # 99 no está indexado
+
+
+def test_mapas_de_bits_no_crecen_con_el_mayor_id():
+    enorme = 400_000_000 # id_productos es INT: los mapas van por número de orden, no por ID
+    nombres = {i: f"pan {i}" for i in range(1, 101)}; nombres[enorme] = "pan de molde"
+    trigramas = _indice(IndiceTrigramas, nombres)
+    difuso = _indice(IndiceDifuso, nombres)
+    assert isinstance(trigramas._postings["pan"], int)
+    assert trigramas._postings["pan"].bit_length() <= len(nombres)
+    assert max(trigramas._por_longitud.values()).bit_length() <= len(nombres)
+    assert trigramas.mascara({enorme}).bit_length() <= len(nombres)
+    assert trigramas.buscar("molde") == [enorme]
+    assert trigramas.buscar("pan", limite=5)[-1] == enorme # El resto, por ID
+    assert difuso.buscar("molde")[0] == (enorme, 0)
+    trigramas.quitar(1); trigramas.agregar(enorme + 1, "pan rallado") # Reutiliza el número libre
+    assert trigramas.numero(enorme + 1) == 0
+    assert trigramas.buscar("rallado") == [enorme + 1]
+    assert 1 not in trigramas.buscar("pan")
+
+
+def test_trigramas_con_limite_ordena_los_mejores_y_deja_el_resto_por_id():
+    rng = random.Random(7)
+    palabras = ["pan", "empanada", "panecillo", "harina", "de", "maiz", "integral"]
+    nombres = {i: " ".join(rng.choice(palabras) for _ in range(rng.randint(1, 3))) for i in range(1, 400)}
+    indice = _indice(IndiceTrigramas, nombres)
+    for termino in ["pan", "pa", "de", "ana", "harina de"]:
+        completo = indice.buscar(termino)
+        for limite in (1, 5, 40):
+            con_limite = indice.buscar(termino, limite=limite)
+            assert con_limite[:limite] == completo[:limite]
+            assert con_limite[limite:] == sorted(completo[limite:])
+
+
+def test_trigramas_terminos_cortos_siguen_los_cambios():
+    indice = _indice(IndiceTrigramas)
+    assert set(indice.buscar("mo")) == {5}  # Calcula y guarda el resultado de 'mo'
+    indice.agregar(9, "Mostaza")
+    indice.quitar(5)
+    assert indice.buscar("mo") == [9]
+
+
+def test_trigramas_agregar_y_quitar_incremental():
+    indice = _indice(IndiceTrigramas)
+    indice.agregar(2, "Pan integral") # Reindexar con otro nombre
+    assert 2 not in indice.buscar("maiz")
+    assert 2 in indice.buscar("integral")
+    indice.quitar(1)
+    indice.quitar(1) # Quitar dos veces no falla
+    assert 1 not in indice.buscar("pan")
+    assert len(indice) == len(NOMBRES) - 1
+    assert indice.texto(1) is None
+
+
+def test_trigramas_coincide_con_busqueda_lineal():
+    rng = random.Random(3)
+    palabras = ["pan", "maiz", "harina", "azucar", "moreno", "glas", "crema", "te", "de", "integral"]
+    nombres = {i: " ".join(rng.choice(palabras) for _ in range(rng.randint(1, 3))) for i in range(1, 300)}
+    indice = _indice(IndiceTrigramas, nombres)
+    for i in rng.sample(sorted(nombres), 100): # Cambios incrementales
+        if rng.random() < 0.5:
+            indice.quitar(i); del nombres[i]
+        else:
+            nombres[i] = " ".join(rng.choice(palabras) for _ in range(2)); indice.agregar(i, nombres[i])
+    for termino in ["pan", "an", "a", "maiz de", "zuca", "crema te", "ral"]:
+        assert set(indice.buscar(termino)) == {i for i, n in nombres.items() if termino in n}
+
+
+def test_trigramas_listas_pasan_de_arreglo_a_mapa_de_bits_y_vuelven():
+    indice = IndiceTrigramas()
+    for i in range(1, 201):
+        indice.agregar(i, "pan" if i % 2 else f"sal {i}")
+    assert isinstance(indice._postings["pan"], int) # 100 IDs entre 200 posibles: mapa de bits
+    assert isinstance(indice._postings["sal"], int)
+    for i in range(1, 191, 2):
+        indice.quitar(i)
+    assert not isinstance(indice._postings["pan"], int) # Quedan 5: otra vez arreglo
+    assert indice.buscar("pan") == [191, 193, 195, 197, 199]
+    masivo = IndiceTrigramas()
+    masivo.reconstruir((i, indice.texto(i)) for i in range(1, 201) if indice.texto(i) is not None)
+    for termino in ["pan", "sal", "sal 1", "a", "l 2", "99"]:
+        assert indice.buscar(termino) == masivo.buscar(termino)
+
+
+def test_bits_de_e_ids_de_son_inversas():
+    ids = [0, 1, 7, 8, 63, 64, 1000, 99999]
+    assert ids_de(bits_de(ids)) == ids
+    assert ids_de(bits_de([])) == []
+
+
+# --- IndicePrefijos ---
+
+def test_prefijos_autocompleta_por_inicio_de_palabra_sin_tildes():
+    indice = IndicePrefijos()
+    indice.reconstruir((i, n, (str(i),)) for i, n in NOMBRES.items())
+    assert indice.completar("mai") == [2]   # 'maiz' empieza palabra en 'pan de maiz'
+    assert indice.completar("AZU") == [6, 5] # Alfabético: 'azucar glas' < 'azucar moreno'
+    assert indice.completar("ada") == []     # 'empanada' no tiene una palabra que empiece así
+
+
+def test_prefijos_ordena_exacto_inicio_y_resto():
+    indice = IndicePrefijos()
+    indice.reconstruir((i, n, (str(i),)) for i, n in NOMBRES.items())
+    # Exacto ('pan'), luego los que empiezan así, luego los que lo tienen en otra palabra
+    assert indice.completar("pan") == [1, 2, 3]
+    assert indice.completar("3") == [3] # Clave extra: el ID
+
+
+def test_prefijos_agregar_y_quitar_incremental_igual_que_reconstruir():
+    incremental = IndicePrefijos()
+    for i, n in NOMBRES.items():
+        incremental.agregar(i, n, (str(i),))
+    incremental.agregar(2, "Pan integral", ("2",))
+    incremental.quitar(4)
+    masivo = IndicePrefijos()
+    nombres = dict(NOMBRES); nombres[2] = "Pan integral"; del nombres[4]
+    masivo.reconstruir((i, n, (str(i),)) for i, n in nombres.items())
+    for prefijo in ["p", "pan", "in", "az", "e", "4", "2"]:
+        assert incremental.completar(prefijo) == masivo.completar(prefijo)
+    assert incremental.completar("mai") == []
+    assert len(incremental) == len(nombres)
+
+
+def test_entradas_ordenadas_en_bloques_igual_que_lista(monkeypatch):
+    monkeypatch.setattr(_EntradasOrdenadas, "BLOQUE", 4) # Bloques pequeños: se parten y vacían a menudo
+    rng = random.Random(5)
+    referencia = sorted({(rng.choice("abcde"), rng.randint(1, 50)) for _ in range(40)})
+    entradas = _EntradasOrdenadas(referencia)
+    for _ in range(300):
+        entrada = (rng.choice("abcdef"), rng.randint(1, 50))
+        if entrada in referencia:
+            referencia.remove(entrada); entradas.quitar(entrada)
+        else:
+            referencia.append(entrada); referencia.sort(); entradas.insertar(entrada)
+        clave = (rng.choice("abcdef"), -1)
+        assert list(entradas.desde(clave)) == [e for e in referencia if e >= clave]
+
+
+def test_prefijos_respeta_el_limite():
+    indice = IndicePrefijos()
+    indice.reconstruir((i, f"Producto {i:03d}", ()) for i in range(200))
+    assert len(indice.completar("producto", limite=10)) == 10
+    assert indice.completar("producto", limite=0) == []
+    assert indice.completar("") == []
+
+
+# --- Distancia y búsqueda difusa ---
+
+@pytest.mark.parametrize("a, b, d", [("azucar", "azucar", 0), ("morena", "moreno", 1), ("pan", "pna", 2),
+                                     ("harina", "arina", 1), ("", "abc", 3)])
+def test_distancia_edicion(a, b, d):
+    assert distancia_edicion(a, b) == d
+    assert distancia_edicion(b, a) == d
+
+
+def test_distancia_edicion_con_limite_corta():
+    assert distancia_edicion("panaderia", "pasteleria", limite=1) == 2
+
+
+def test_diccionario_borrados_encuentra_palabras_cercanas():
+    diccionario = DiccionarioBorrados(max_distancia=2)
+    for palabra in ["moreno", "morena", "moral", "azucar", "glas"]:
+        diccionario.agregar(palabra)
+    assert sorted(diccionario.buscar("morenos", 1)) == [("moreno", 1)]
+    assert sorted(diccionario.buscar("moreno", 2)) == [("morena", 1), ("moreno", 0)] # 'moral' está a 3
+    assert sorted(diccionario.buscar("mora", 2)) == [("moral", 1), ("morena", 2)]
+    assert len(diccionario) == 5
+
+
+def test_difuso_reconstruir_igual_que_incremental():
+    incremental = _indice(IndiceDifuso)
+    incremental.agregar(2, "Pan integral")
+    incremental.quitar(4)
+    nombres = dict(NOMBRES); nombres[2] = "Pan integral"; del nombres[4]
+    masivo = IndiceDifuso()
+    masivo.reconstruir(nombres.items())
+    for termino in ["pam", "azucar morena", "harnia para pan", "empanada", "integrla"]:
+        assert incremental.buscar(termino) == masivo.buscar(termino)
+
+
+def test_difuso_azucar_morena_encuentra_azucar_moreno():
+    indice = _indice(IndiceDifuso)
+    resultados = indice.buscar("azucar morena")
+    assert resultados[0] == (5, 1)
+    assert 6 not in dict(resultados) # 'glas' está lejos de 'morena'
+
+
+def test_difuso_tolera_tildes_y_errores_de_tipeo():
+    indice = _indice(IndiceDifuso)
+    assert dict(indice.buscar("harnia para pan")).get(3) == 2
+    assert indice.buscar("AZÚCAR MORENO")[0] == (5, 0)
+    assert indice.buscar("ta") == [] # Menos de 3 letras: sin tolerancia
+    assert indice.buscar("te") == [(8, 0)]
+    assert [i for i, _ in indice.buscar("pam")] == [1, 2, 3] # 3 letras: un error
+    assert indice.buscar("") == []
+
+
+def test_difuso_respeta_el_presupuesto_total():
+    indice = _indice(IndiceDifuso)
+    assert indice.buscar("azucra moerno", max_distancia=2) == [] # Dos errores por palabra: 4 en total
+    assert indice.buscar("azucra moreno", max_distancia=2)[0] == (5, 2)
+
+
+def test_difuso_agregar_y_quitar_incremental():
+    indice = _indice(IndiceDifuso)
+    indice.quitar(5)
+    assert 5 not in dict(indice.buscar("azucar morena"))
+    indice.agregar(9, "Azúcar Morena de caña")
+    assert indice.buscar("azucar morena")[0] == (9, 0)
+    indice.agregar(9, "Sal gorda") # Reindexar con otro nombre
+    assert indice.buscar("azucar morena") == []
+    assert indice.buscar("sal gorda", entre={1, 2}) == []
@@ -0,0 +1,23 @@
+# tests/test_producto.py
+# Eventos de ProductoController sin réplica: el nombre de categoría lo pasa la vista, no se relee el producto.
+from src.controller import producto as controlador
+from src.controller.producto import ProductoController
+from src.model.producto import ProductoDao
+from src.utils import eventos
+from src.utils.eventos import ProductoCreado
+
+
+def test_alta_sin_replica_no_relee_el_producto(monkeypatch):
+    monkeypatch.setattr(controlador, "get_replica", lambda: None)
+    monkeypatch.setattr(controlador.auditoria, "registrar", lambda *args: None)
+    monkeypatch.setattr(ProductoDao, "create", staticmethod(lambda producto: None))
+    def read_one(id_producto):
+        raise AssertionError("read_one no debería llamarse")
+    monkeypatch.setattr(ProductoDao, "read_one", staticmethod(read_one))
+    publicados = []
+    monkeypatch.setattr(eventos, "bus", eventos.BusEventos())
+    eventos.suscribir(ProductoCreado, publicados.append)
+
+    ProductoController.new(7, "Pan de maíz", 3, 1.5, 2, nombre_categoria="Panes")
+
+    assert [(e.producto.id_productos, e.producto.nombre_categoria) for e in publicados] == [(7, "Panes")]
@@ -0,0 +1,182 @@
+# tests/test_reconciliacion.py
+# reconcile_treeview (src/utils/utils.py) contra un Treeview falso que anota cada llamada a Tcl:
+# transiciones aleatorias de claves y filas, sin pantalla.
+import random
+from tkinter import ttk
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from src.utils.utils import reconcile_treeview, clear_treeview, TreeviewSorter
+
+
+class _TclFalso:
+    """Lo que insert_rows pide al intérprete: definir el proc (eval) y llamarlo con un bloque de filas."""
+    def __init__(self, arbol: "ArbolFalso") -> None:
+        self.arbol = arbol
+
+    def eval(self, script: str) -> str:
+        return ""
+
+    def call(self, proc: str, widget: str, posicion: Any, filas: List[Tuple[tuple, str]]) -> tuple:
+        return self.arbol._insertar_bloque(posicion, filas)
+
+    def splitlist(self, valor: tuple) -> tuple:
+        return valor
+
+
+class ArbolFalso(ttk.Treeview):
+    """Treeview en memoria (no llama al constructor de Tk). 'llamadas' registra (operación, claves tocadas)."""
+    def __init__(self) -> None:
+        self._w = ".arbol"
+        self.tk = _TclFalso(self)
+        self.orden: List[str] = []
+        self.datos: Dict[str, Dict[str, Any]] = {}
+        self.llamadas: List[Tuple[str, List[Any]]] = []
+        self._siguiente = 0
+
+    def _root(self) -> "ArbolFalso":
+        return self
+
+    def _clave(self, item: str) -> Any:
+        return self.datos[item]["values"][0]
+
+    def _insertar_bloque(self, posicion: Any, filas: List[Tuple[tuple, str]]) -> tuple:
+        self.llamadas.append(("insert", [valores[0] for valores, _ in filas]))
+        nuevos = []
+        for valores, tag in filas:
+            self._siguiente += 1
+            item = f"I{self._siguiente:05d}"
+            self.datos[item] = {"values": tuple(valores), "tags": (tag,)}
+            nuevos.append(item)
+        i = len(self.orden) if posicion == "end" else int(posicion)
+        self.orden[i:i] = nuevos
+        return tuple(nuevos)
+
+    def get_children(self, item: Any = None) -> tuple:
+        return tuple(self.orden)
+
+    def delete(self, *items: str) -> None:
+        self.llamadas.append(("delete", [self._clave(item) for item in items]))
+        for item in items:
+            self.orden.remove(item)
+            del self.datos[item]
+
+    def move(self, item: str, parent: str, index: int) -> None:
+        self.llamadas.append(("move", [self._clave(item)]))
+        self.orden.remove(item)
+        self.orden.insert(index, item)
+
+    def item(self, item: str, option: Any = None, **kw: Any) -> Any:
+        self.llamadas.append(("item", [self._clave(item)]))
+        if "values" in kw: self.datos[item]["values"] = tuple(kw["values"])
+        if "tags" in kw: self.datos[item]["tags"] = tuple(kw["tags"])
+
+    def mostrado(self) -> List[Tuple[tuple, tuple]]:
+        return [(self.datos[item]["values"], self.datos[item]["tags"]) for item in self.orden]
+
+
+def _tag(i: int) -> str:
+    return 'oddrow' if i % 2 else 'evenrow'
+
+
+def _transicion(rng: random.Random, claves: List[int], filas: Dict[int, tuple]) -> List[int]:
+    """Siguiente resultado: filtrar, ampliar, reordenar o editar, como hace la tabla principal."""
+    tipo = rng.choice(("filtrar", "ampliar", "reordenar", "editar", "todo"))
+    universo = list(range(1, 121))
+    if tipo == "filtrar":
+        nuevas = [c for c in claves if rng.random() < 0.6]
+    elif tipo == "ampliar":
+        nuevas = sorted(set(claves) | set(rng.sample(universo, 20)))
+    elif tipo == "reordenar":
+        nuevas = list(claves)
+        rng.shuffle(nuevas)
+    elif tipo == "editar":
+        nuevas = list(claves)
+    else:
+        nuevas = list(universo)
+    for clave in rng.sample(nuevas, min(3, len(nuevas))): # Algunas cantidades cambian
+        filas[clave] = (clave, filas[clave][1], rng.randint(0, 50), filas[clave][3])
+    return nuevas
+
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_transiciones_aleatorias(semilla):
+    rng = random.Random(semilla)
+    arbol = ArbolFalso()
+    filas = {c: (c, f"Producto {c:03d}", rng.randint(0, 50), f"Categoria {c % 5}") for c in range(1, 121)}
+    claves: List[int] = []
+    antes: Dict[int, Tuple[tuple, str]] = {}
+    for _ in range(40):
+        claves = _transicion(rng, claves, filas)
+        arbol.llamadas.clear()
+        reconcile_treeview(arbol, claves, [filas[c] for c in claves])
+
+        # Orden, valores y tags alternos finales
+        assert arbol.mostrado() == [(filas[c], (_tag(i),)) for i, c in enumerate(claves)]
+
+        # Las filas que siguen con los mismos valores y tag no reciben ninguna llamada 'item'
+        ahora = {c: (filas[c], _tag(i)) for i, c in enumerate(claves)}
+        tocadas = {c for op, cs in arbol.llamadas if op == "item" for c in cs}
+        assert tocadas == {c for c in claves if c in antes and antes[c] != ahora[c]}
+
+        # Solo se mueve algo si cambió el orden relativo de las que se mantienen
+        orden_anterior = [c for c in antes if c in ahora]
+        orden_nuevo = [c for c in claves if c in antes]
+        movidas = [c for op, cs in arbol.llamadas if op == "move" for c in cs]
+        if orden_anterior == orden_nuevo:
+            assert movidas == []
+
+        # Lo que se va, en un solo borrado; lo que llega, insertado (en bloques) y nunca recreado
+        borrados = [cs for op, cs in arbol.llamadas if op == "delete"]
+        assert len(borrados) <= 1
+        assert sorted(sum(borrados, [])) == sorted(c for c in antes if c not in ahora)
+        insertadas = [c for op, cs in arbol.llamadas if op == "insert" for c in cs]
+        assert sorted(insertadas) == sorted(c for c in claves if c not in antes)
+        antes = dict((c, ahora[c]) for c in claves) # Conserva el orden de 'claves'
+
+
+def test_sin_cambios_no_llama_a_tcl():
+    arbol = ArbolFalso()
+    filas = [(c, f"Producto {c}", c, "Panes") for c in range(1, 50)]
+    reconcile_treeview(arbol, [f[0] for f in filas], filas)
+    arbol.llamadas.clear()
+    reconcile_treeview(arbol, [f[0] for f in filas], list(filas))
+    assert arbol.llamadas == []
+
+
+def test_items_tocados_por_fuera_reconstruyen_la_tabla():
+    arbol = ArbolFalso()
+    filas = [(c, f"Producto {c}", c, "Panes") for c in range(1, 10)]
+    reconcile_treeview(arbol, [f[0] for f in filas], filas)
+    arbol.delete(arbol.orden[0]) # Alguien borró un item sin pasar por reconcile
+    reconcile_treeview(arbol, [f[0] for f in filas], filas)
+    assert arbol.mostrado() == [(f, (_tag(i),)) for i, f in enumerate(filas)]
+    clear_treeview(arbol)
+    assert arbol.orden == []
+
+
+class ArbolOrdenable(ArbolFalso):
+    """Lo que TreeviewSorter consulta al crearse: columnas, títulos y el bind del clic."""
+    def __getitem__(self, opcion: str) -> Any:
+        return ("id_productos", "nombre", "cantidad", "categoria")
+
+    def heading(self, columna: str, opcion: Any = None, **kw: Any) -> Any:
+        return columna
+
+    def bind(self, *args: Any, **kw: Any) -> None:
+        pass
+
+
+def test_las_claves_de_orden_solo_guardan_filas_cargadas():
+    ordenador = TreeviewSorter(ArbolOrdenable(), numeric_columns=("id_productos", "cantidad"))
+    ordenador.spec = [("nombre", False), ("cantidad", True)]
+    filas = {c: (c, f"Producto {c:03d}", c % 7, f"Categoria {c % 5}") for c in range(1, 501)}
+    for claves in (list(filas), list(range(1, 11)), list(range(300, 320))): # Búsquedas sucesivas
+        ordenadas, _ = ordenador.sort(claves, [filas[c] for c in claves])
+        assert sorted(ordenadas) == claves
+        assert set(ordenador._cache["nombre"]) == set(claves) and set(ordenador._cache["cantidad"]) == set(claves)
+    ordenador.forget(305) # Baja en la grilla
+    assert 305 not in ordenador._cache["nombre"]
+    ordenador.clear()
+    assert not any(ordenador._cache.values())
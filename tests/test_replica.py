@@ -0,0 +1,42 @@
+# tests/test_replica.py
+# Búsqueda de la réplica (src/model/replica.py) sin BD: la categoría se aplica como mapa de bits
+# sobre los números del índice, que se mantiene al día con las escrituras locales.
+from datetime import datetime
+
+from src.model.producto import Categoria, Producto
+from src.model.replica import InventarioReplica
+
+ENORME = 400_000_000 # id_productos es INT: los mapas no pueden ir por ID
+
+
+def _replica() -> InventarioReplica:
+    productos = [Producto(i, f"Pan {i}", 5, 1.0, 1 + i % 2) for i in range(1, 101)]
+    productos.append(Producto(ENORME, "Pan de molde", 5, 1.0, 1))
+    replica = InventarioReplica()
+    replica._cargar_datos([Categoria(1, "Panes"), Categoria(2, "Bollería")], productos, datetime.now())
+    return replica
+
+
+def _ids(productos):
+    return [p.id_productos for p in productos]
+
+
+def test_buscar_por_categoria_con_ids_enormes():
+    replica = _replica()
+    assert _ids(replica.buscar("molde", 1)) == [ENORME]
+    assert _ids(replica.buscar("molde", 2)) == []
+    assert set(_ids(replica.buscar("pan", 2))) == set(range(1, 101, 2))
+    assert replica._mascara_categoria(1).bit_length() <= 101
+
+
+def test_la_mascara_de_categoria_sigue_las_escrituras():
+    replica = _replica()
+    assert ENORME in _ids(replica.buscar("pan", 1)) # Arma la máscara de la categoría 1
+    replica.eliminar_producto(ENORME)
+    replica.aplicar_producto(Producto(ENORME + 1, "Pan rallado", 5, 1.0, 2)) # Reutiliza el número liberado
+    replica.aplicar_producto(Producto(3, "Pan de centeno", 5, 1.0, 1))       # Cambia de categoría
+    en_1 = set(_ids(replica.buscar("pan", 1)))
+    assert ENORME not in en_1 and ENORME + 1 not in en_1
+    assert 3 in en_1
+    assert ENORME + 1 in _ids(replica.buscar("rallado", 2))
+    assert en_1 == {p.id_productos for p in replica.buscar("", 1)}
@@ -0,0 +1,59 @@
+# tests/test_servidor.py
+# Servicio HTTP (src/api/servidor.py) sin base de datos: los errores de conexión se responden
+# con 503 (el TPV reintenta), no con 400 como si la petición estuviera mal formada.
+import http.client
+import json
+import threading
+
+import pytest
+
+import database
+from src.api.servidor import ServidorInventario
+from src.model import auditoria
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    """Servicio en un puerto libre con el pool sin crear y sin configuración de BD."""
+    monkeypatch.setattr(database, "cnx_pool", None)
+    monkeypatch.setitem(database.DB_CONFIG, "database", None)
+    monkeypatch.setitem(database.DB_CONFIG, "user", None)
+    monkeypatch.setattr(auditoria, "registrar", lambda *args, **kwargs: None) # Sin hilo escritor
+    servidor = ServidorInventario(("127.0.0.1", 0), hilos=2)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def pedir(servidor, metodo, ruta, cuerpo=None):
+    conexion = http.client.HTTPConnection(*servidor.server_address, timeout=10)
+    try:
+        conexion.request(metodo, ruta, body=json.dumps(cuerpo).encode() if cuerpo is not None else None,
+                         headers={"Content-Type": "application/json"})
+        respuesta = conexion.getresponse()
+        return respuesta.status, json.loads(respuesta.read() or b"null")
+    finally:
+        conexion.close()
+
+
+@pytest.mark.parametrize("metodo, ruta, cuerpo", [
+    ("GET", "/productos/1", None),
+    ("GET", "/productos", None),
+    ("GET", "/categorias", None),
+    ("PUT", "/productos/1", {"nombre": "Pan", "cantidad": 1, "valor_unidad": 1.0}),
+    ("POST", "/ventas", {"lineas": [{"id_productos": 1, "cantidad": 1}]}),
+    ("GET", "/productos/1/movimientos", None), # Este controlador no envuelve el error
+])
+def test_sin_bd_responde_503(servidor, metodo, ruta, cuerpo):
+    estado, respuesta = pedir(servidor, metodo, ruta, cuerpo)
+    assert estado == 503
+    assert respuesta == {"error": "Base de datos no disponible"}
+
+
+def test_una_peticion_mal_formada_sigue_siendo_400(servidor):
+    estado, _ = pedir(servidor, "POST", "/ventas", {"lineas": [{"id_productos": 1, "cantidad": -1}]})
+    assert estado == 400
+    estado, _ = pedir(servidor, "PUT", "/productos/1", {"id_productos": "uno"})
+    assert estado == 400
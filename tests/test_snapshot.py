@@ -0,0 +1,24 @@
+# tests/test_snapshot.py
+# Instantánea en disco (src/model/snapshot.py): solo se carga si salió de la BD configurada.
+from datetime import datetime
+
+import database
+from src.model.producto import Categoria, Producto
+from src.model.snapshot import guardar_snapshot, leer_snapshot, huella_bd
+
+
+def test_la_instantanea_de_otra_bd_se_ignora(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "inventario.snap")
+    monkeypatch.setitem(database.DB_CONFIG, "host", "tahona-a")
+    monkeypatch.setitem(database.DB_CONFIG, "database", "inventario")
+    guardar_snapshot(ruta, [Categoria(1, "Panes")], [Producto(7, "Pan de maíz", 3, 1.5, 1)], datetime(2026, 1, 2), huella_bd())
+
+    categorias, productos, marca = leer_snapshot(ruta, huella_bd())
+    assert [(p.id_productos, p.nombre, p.nombre_categoria) for p in productos] == [(7, "Pan de maíz", "Panes")]
+    assert marca == datetime(2026, 1, 2)
+
+    monkeypatch.setitem(database.DB_CONFIG, "database", "inventario_pruebas") # Otro .env
+    assert leer_snapshot(ruta, huella_bd()) is None
+    monkeypatch.setitem(database.DB_CONFIG, "database", "inventario")
+    monkeypatch.setitem(database.DB_CONFIG, "host", "tahona-b")
+    assert leer_snapshot(ruta, huella_bd()) is None